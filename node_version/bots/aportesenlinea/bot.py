@@ -4,13 +4,14 @@ from __future__ import annotations
 import csv
 import logging
 import sys
-import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
-from playwright.sync_api import Frame, Page, sync_playwright
+from playwright.sync_api import Frame, Page
 
+from common.browser_pool import PoolNavegadores, abrir_contexto
+from common.esperas import cumple, esperar_primero, jsf_inactivo, pausa, visible
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
 from common.storage import registrar_consulta
 from common.timezone_utils import ZONA_BOGOTA
@@ -50,7 +51,6 @@ def _seleccionar_eps(page: Page, *, eps: str, modo_lento: bool) -> bool:
                 inp.type(prefijo, delay=90)
             else:
                 inp.fill(prefijo)
-            page.wait_for_timeout(700)
 
             opcion = page.locator(
                 f"li:has-text('{eps}'), "
@@ -61,7 +61,7 @@ def _seleccionar_eps(page: Page, *, eps: str, modo_lento: bool) -> bool:
             try:
                 opcion.wait_for(state="visible", timeout=3000)
                 opcion.click()
-                page.wait_for_timeout(300)
+                esperar_primero(page, jsf_inactivo(), timeout_ms=3000)
                 valor = inp.input_value().strip()
                 logger.info("EPS seleccionada (clic dropdown): %r", valor)
                 return True
@@ -70,11 +70,11 @@ def _seleccionar_eps(page: Page, *, eps: str, modo_lento: bool) -> bool:
 
             for _ in range(30):
                 inp.press("ArrowDown")
-                time.sleep(0.08)
+                pausa(0.08)
                 valor = inp.input_value().strip()
                 if eps_norm in _normalizar_eps(valor):
                     inp.press("Enter")
-                    page.wait_for_timeout(300)
+                    esperar_primero(page, jsf_inactivo(), timeout_ms=3000)
                     logger.info("EPS seleccionada (ArrowDown): %r", valor)
                     return True
 
@@ -107,16 +107,22 @@ def _seleccionar_eps(page: Page, *, eps: str, modo_lento: bool) -> bool:
     )
 
 
-def _localizar_frame_anchor(page: Page, *, max_espera_s: float = 25.0) -> Frame | None:
-    t0 = time.monotonic()
-    while time.monotonic() - t0 < max_espera_s:
-        for fr in page.frames:
-            if "recaptcha" in fr.url and "anchor" in fr.url:
-                return fr
-        page.wait_for_timeout(400)
+def _buscar_frame_anchor(page: Page) -> Frame | None:
+    for fr in page.frames:
+        if "recaptcha" in fr.url and "anchor" in fr.url:
+            return fr
     return None
 
 
+def _localizar_frame_anchor(page: Page, *, max_espera_s: float = 25.0) -> Frame | None:
+    esperar_primero(
+        page,
+        cumple(lambda: _buscar_frame_anchor(page) is not None, nombre="anchor"),
+        timeout_ms=max_espera_s * 1000,
+    )
+    return _buscar_frame_anchor(page)
+
+
 def _recaptcha_marcado(frame: Frame) -> bool:
     try:
         return frame.locator("#recaptcha-anchor").first.get_attribute("aria-checked") == "true"
@@ -137,9 +143,9 @@ def _intentar_clic_automatico(page: Page, frame: Frame) -> bool:
             cy = box["y"] + box["height"] / 2
             for dx, dy in [(-60, 30), (-20, -15), (10, 20), (0, -5)]:
                 page.mouse.move(cx + dx, cy + dy)
-                time.sleep(0.12)
+                pausa(0.12)
             page.mouse.move(cx + 2, cy)
-            time.sleep(0.18)
+            pausa(0.18)
     except Exception:
         pass
 
@@ -152,14 +158,18 @@ def _intentar_clic_automatico(page: Page, frame: Frame) -> bool:
         logger.debug("Clic automatico fallo: %s", e)
         return False
 
-    for i in range(20):
-        if _recaptcha_marcado(frame):
-            logger.info("reCAPTCHA marcado automaticamente.")
-            return True
-        if _hay_desafio_imagenes(page):
-            logger.info("reCAPTCHA lanzo desafio de imagenes (iter %s).", i)
-            return False
-        time.sleep(0.4)
+    desenlace = esperar_primero(
+        page,
+        visible("#recaptcha-anchor[aria-checked='true']", nombre="marcado", en=frame),
+        cumple(lambda: _hay_desafio_imagenes(page), nombre="desafio"),
+        timeout_ms=8000,
+    )
+    if desenlace == "marcado":
+        logger.info("reCAPTCHA marcado automaticamente.")
+        return True
+    if desenlace == "desafio":
+        logger.info("reCAPTCHA lanzo desafio de imagenes.")
+        return False
 
     logger.warning("reCAPTCHA no quedo marcado tras el clic automatico.")
     return False
@@ -210,21 +220,18 @@ def _clic_generar_y_esperar_descarga(page: Page, *, numero_id: str, output_dir:
         nueva = nueva_info.value
         nueva.set_default_timeout(60000)
 
-        t0 = time.monotonic()
+        esperar_primero(
+            nueva,
+            cumple(lambda: (nueva.url or "about:blank") != "about:blank", nombre="url"),
+            timeout_ms=45000,
+        )
         url_nueva = nueva.url or ""
-        while (not url_nueva or url_nueva == "about:blank") and time.monotonic() - t0 < 45:
-            time.sleep(0.5)
-            try:
-                url_nueva = nueva.url or ""
-            except Exception:
-                break
         logger.info("Nueva pestana/popup URL: %s", url_nueva)
 
         try:
             nueva.wait_for_load_state("domcontentloaded", timeout=30000)
         except Exception:
             pass
-        time.sleep(0.8)
 
         if url_nueva.lower().startswith("http"):
             try:
@@ -303,7 +310,7 @@ def _clic_generar_y_esperar_descarga(page: Page, *, numero_id: str, output_dir:
 
 def _pausa(modo_lento: bool, segundos: float) -> None:
     if modo_lento:
-        time.sleep(segundos)
+        pausa(segundos)
 
 
 def _tipo_lento(locator, texto: str, *, modo_lento: bool) -> None:
@@ -320,9 +327,9 @@ def _scroll_visual(page: Page, *, modo_lento: bool) -> None:
         return
     for delta in (280, 520, 340, 620, 400):
         page.mouse.wheel(0, delta)
-        time.sleep(0.55)
+        pausa(0.55)
     page.evaluate("window.scrollTo({top: 0, behavior: 'smooth'})")
-    time.sleep(0.5)
+    pausa(0.5)
 
 
 def ejecutar_consulta(
@@ -335,6 +342,7 @@ def ejecutar_consulta(
     captcha_interactivo: bool,
     modo_lento: bool,
     output_dir: Path | None,
+    pool: PoolNavegadores | None = None,
 ) -> dict[str, str]:
     logger.info(
         "Iniciando bot Aportes en Linea | headless=%s | numero_id=%s",
@@ -343,24 +351,23 @@ def ejecutar_consulta(
     out = output_dir or SALIDAS_DIR
     mes_hasta_valor = _mes_anterior_valor()
 
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(
-            headless=headless,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-infobars",
-            ],
-        )
-        context = browser.new_context(
-            viewport={"width": 1366, "height": 900},
-            locale="es-CO",
-            timezone_id="America/Bogota",
-            user_agent=CHROME_UA_LINUX,
-            extra_http_headers={"Accept-Language": "es-CO,es;q=0.9,en;q=0.5"},
-            accept_downloads=True,
-        )
+    with abrir_contexto(
+        pool,
+        headless=headless,
+        perfil="aportesenlinea",
+        args=[
+            "--disable-blink-features=AutomationControlled",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-infobars",
+        ],
+        viewport={"width": 1366, "height": 900},
+        locale="es-CO",
+        timezone_id="America/Bogota",
+        user_agent=CHROME_UA_LINUX,
+        extra_http_headers={"Accept-Language": "es-CO,es;q=0.9,en;q=0.5"},
+        accept_downloads=True,
+    ) as context:
         aplicar_stealth(context)
 
         page = context.new_page()
@@ -444,7 +451,3 @@ def ejecutar_consulta(
                 "motivo": str(e),
                 "archivo_pdf": "",
             }
-        finally:
-            context.close()
-            browser.close()
-            logger.info("Navegador cerrado.")
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
+from common.browser_pool import PoolNavegadores
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
 from common.storage import registrar_consulta
 from . import bot
@@ -19,6 +20,7 @@ def run_aportesenlinea_bot(
     output_dir: Path | None = None,
     registro_csv: Path | None = None,
     verbose: bool = False,
+    pool: PoolNavegadores | None = None,
 ) -> dict[str, str]:
     configurar_logging(verbose=verbose)
     silenciar_logs_ruidosos()
@@ -32,6 +34,7 @@ def run_aportesenlinea_bot(
         captcha_interactivo=captcha_interactivo,
         modo_lento=modo_lento,
         output_dir=output_dir,
+        pool=pool,
     )
 
     csv_path = registro_csv or bot.CSV_DEFAULT
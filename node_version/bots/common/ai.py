@@ -5,6 +5,7 @@ import json
 import logging
 import os
 import re
+import threading
 from pathlib import Path
 from typing import Any
 
@@ -20,6 +21,30 @@ logger = logging.getLogger(__name__)
 
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 GEMINI_MODEL = os.environ.get("BYBOT_GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_USD_MTOK_ENTRADA = float(os.environ.get("BYBOT_GEMINI_USD_MTOK_ENTRADA", "0.30") or 0)
+GEMINI_USD_MTOK_SALIDA = float(os.environ.get("BYBOT_GEMINI_USD_MTOK_SALIDA", "2.50") or 0)
+
+_uso_gemini = {"llamadas": 0, "tokens_entrada": 0, "tokens_salida": 0}
+_uso_lock = threading.Lock()
+
+
+def _registrar_uso(response: Any) -> None:
+    meta = getattr(response, "usage_metadata", None)
+    with _uso_lock:
+        _uso_gemini["llamadas"] += 1
+        _uso_gemini["tokens_entrada"] += int(getattr(meta, "prompt_token_count", 0) or 0)
+        _uso_gemini["tokens_salida"] += int(getattr(meta, "candidates_token_count", 0) or 0)
+
+
+def obtener_uso_gemini() -> dict[str, float]:
+    with _uso_lock:
+        uso: dict[str, float] = dict(_uso_gemini)
+    uso["costo_usd"] = round(
+        uso["tokens_entrada"] / 1e6 * GEMINI_USD_MTOK_ENTRADA
+        + uso["tokens_salida"] / 1e6 * GEMINI_USD_MTOK_SALIDA,
+        6,
+    )
+    return uso
 
 _VALIDACIONES_POR_CAMPO: dict[str, str] = {
     "nit": r"^\d{8,11}$",
@@ -74,6 +99,7 @@ def _llamar_gemini(prompt: str, imagen_bytes: bytes | None = None) -> str | None
             response = model.generate_content(parts)
         else:
             response = model.generate_content(prompt)
+        _registrar_uso(response)
 
         if response and response.text:
             return response.text.strip()
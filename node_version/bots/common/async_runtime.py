@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+
+from common.bloqueo_recursos import aplicar_perfil_async, cerrar_metricas
+from common.cache_estaticos import instalar_cache_async
+from common.browser_pool import POOL_MAX_CONTEXTOS, POOL_TAMANO
+from common.storage import registrar_consulta
+
+logger = logging.getLogger(__name__)
+
+ASYNC_CONCURRENCIA = int(os.environ.get("BYBOT_ASYNC_CONCURRENCIA", "8") or 8)
+
+_registro_lock: asyncio.Lock | None = None
+
+
+class _NavegadorAsync:
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.contextos = 0
+        self.en_uso = 0
+
+    def sano(self) -> bool:
+        return self.browser.is_connected()
+
+
+class RuntimeAsync:
+    """
+    Un event loop, un `async_playwright` y pocos Chromium compartidos. Cada
+    consulta recibe su propio contexto; a lo sumo `concurrencia` contextos
+    abiertos a la vez, repartidos entre hasta `navegadores` instancias por
+    configuracion de lanzamiento. Un Chromium se recicla tras `max_contextos`.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrencia: int = ASYNC_CONCURRENCIA,
+        navegadores: int = POOL_TAMANO,
+        max_contextos: int = POOL_MAX_CONTEXTOS,
+    ):
+        self.concurrencia = max(1, concurrencia)
+        self.navegadores = max(1, navegadores)
+        self.max_contextos = max(1, max_contextos)
+        self._pw: Playwright | None = None
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self._lanzar_lock = asyncio.Lock()
+        self._instancias: dict[tuple[Any, ...], list[_NavegadorAsync]] = {}
+        self.lanzados = 0
+        self.consultas = 0
+
+    async def __aenter__(self) -> RuntimeAsync:
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.cerrar()
+
+    async def iniciar(self) -> None:
+        if self._pw is None:
+            self._pw = await async_playwright().start()
+
+    async def _elegir(self, clave: tuple[Any, ...]) -> _NavegadorAsync:
+        async with self._lanzar_lock:
+            lista = self._instancias.setdefault(clave, [])
+            for nav in list(lista):
+                if not nav.sano() or (nav.contextos >= self.max_contextos and nav.en_uso == 0):
+                    lista.remove(nav)
+                    logger.info("Runtime async: Chromium retirado tras %s contextos", nav.contextos)
+                    try:
+                        await nav.browser.close()
+                    except Exception as e:
+                        logger.debug("Cerrar Chromium retirado: %s", e)
+            disponibles = [n for n in lista if n.contextos < self.max_contextos]
+            if len(lista) < self.navegadores or not disponibles:
+                await self.iniciar()
+                headless, args = clave
+                opciones: dict[str, Any] = {"headless": headless}
+                if args:
+                    opciones["args"] = list(args)
+                nav = _NavegadorAsync(await self._pw.chromium.launch(**opciones))
+                lista.append(nav)
+                self.lanzados += 1
+                logger.info("Runtime async: Chromium lanzado (headless=%s, total=%s)", headless, self.lanzados)
+                return nav
+            return min(disponibles, key=lambda n: n.en_uso)
+
+    @asynccontextmanager
+    async def contexto(
+        self,
+        *,
+        headless: bool = True,
+        args: list[str] | None = None,
+        perfil: str | None = None,
+        **opciones_contexto: Any,
+    ) -> AsyncIterator[BrowserContext]:
+        async with self._semaforo:
+            nav = await self._elegir((headless, tuple(args or ())))
+            context = await nav.browser.new_context(**opciones_contexto)
+            nav.contextos += 1
+            nav.en_uso += 1
+            self.consultas += 1
+            metricas = None
+            try:
+                await instalar_cache_async(context)
+                metricas = await aplicar_perfil_async(context, perfil)
+                yield context
+            finally:
+                nav.en_uso -= 1
+                cerrar_metricas(metricas)
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.debug("Cerrar contexto async: %s", e)
+
+    def resumen(self) -> dict[str, int]:
+        return {
+            "consultas": self.consultas,
+            "lanzados": self.lanzados,
+            "navegadores": sum(len(v) for v in self._instancias.values()),
+        }
+
+    async def cerrar(self) -> None:
+        for lista in self._instancias.values():
+            for nav in lista:
+                try:
+                    await nav.browser.close()
+                except Exception as e:
+                    logger.debug("Cerrar Chromium async: %s", e)
+        self._instancias.clear()
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+
+async def ejecutar_lote(
+    trabajos: list[Callable[[], Awaitable[dict[str, Any]]]],
+) -> list[dict[str, Any]]:
+    """Lanza todas las corutinas a la vez (el runtime limita la concurrencia) y conserva el orden."""
+
+    async def _uno(trabajo: Callable[[], Awaitable[dict[str, Any]]]) -> dict[str, Any]:
+        try:
+            return await trabajo()
+        except Exception as e:
+            logger.error("Consulta async fallo: %s", e)
+            return {"estado": "ERROR_SCRIPT", "motivo": str(e)}
+
+    return list(await asyncio.gather(*(_uno(t) for t in trabajos)))
+
+
+async def registrar_consulta_async(**kwargs: Any) -> None:
+    """`registrar_consulta` en un hilo, de a una (CSV y MySQL no admiten escrituras intercaladas)."""
+    global _registro_lock
+    if _registro_lock is None:
+        _registro_lock = asyncio.Lock()
+    async with _registro_lock:
+        await asyncio.to_thread(registrar_consulta, **kwargs)
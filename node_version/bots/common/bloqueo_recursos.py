@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+BLOQUEO_RECURSOS = os.environ.get("BYBOT_BLOQUEO_RECURSOS", "1").strip().lower() not in ("0", "false", "no")
+
+TIPOS_PRESCINDIBLES = frozenset({"image", "media", "font", "manifest", "texttrack"})
+
+HOSTS_TERCEROS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "analytics.google.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "facebook.net",
+    "facebook.com",
+    "twitter.com",
+    "linkedin.com",
+    "licdn.com",
+    "instagram.com",
+    "youtube.com",
+    "ytimg.com",
+    "hotjar.com",
+    "clarity.ms",
+    "newrelic.com",
+    "nr-data.net",
+    "addthis.com",
+    "sharethis.com",
+    "tawk.to",
+    "zopim.com",
+    "fonts.googleapis.com",
+    "fonts.gstatic.com",
+)
+
+# Tamano tipico por solicitud (mediana aproximada de HTTP Archive). Lo abortado
+# no se descarga, asi que los bytes evitados son una estimacion.
+_BYTES_TIPICOS = {
+    "image": 15_000,
+    "media": 250_000,
+    "font": 35_000,
+    "script": 25_000,
+    "stylesheet": 15_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+    "manifest": 1_000,
+    "texttrack": 5_000,
+}
+_BYTES_OTRO = 5_000
+
+
+class PerfilRecursos:
+    """
+    Que solicitudes aborta un portal: tipos de recurso prescindibles y hosts de
+    terceros (analitica, redes sociales, fuentes). `permitidos` son regex de URL
+    que nunca se bloquean (captcha, reCAPTCHA, recursos JSF que el bot usa).
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        *,
+        tipos_bloqueados: frozenset[str] = TIPOS_PRESCINDIBLES,
+        hosts_bloqueados: tuple[str, ...] = HOSTS_TERCEROS,
+        permitidos: tuple[str, ...] = (),
+    ):
+        self.nombre = nombre
+        self.tipos_bloqueados = tipos_bloqueados
+        self.hosts_bloqueados = hosts_bloqueados
+        self._permitidos = [re.compile(p, re.IGNORECASE) for p in permitidos]
+
+    def _host_tercero(self, host: str) -> bool:
+        return any(host == h or host.endswith("." + h) for h in self.hosts_bloqueados)
+
+    def decidir(self, url: str, tipo: str) -> str | None:
+        """Motivo del bloqueo (`tipo:<x>` / `host:<y>`) o None si la solicitud sigue."""
+        if url.startswith(("data:", "blob:")):
+            return None
+        if any(p.search(url) for p in self._permitidos):
+            return None
+        host = (urlsplit(url).hostname or "").lower()
+        if self._host_tercero(host):
+            return f"host:{host}"
+        if tipo in self.tipos_bloqueados:
+            return f"tipo:{tipo}"
+        return None
+
+
+_RECAPTCHA = (
+    r"^https://www\.google\.com/recaptcha/",
+    r"^https://www\.gstatic\.com/recaptcha/",
+    r"^https://www\.recaptcha\.net/",
+)
+_JSF = (r"/(javax|jakarta)\.faces\.resource/", r"\.faces\?", r"/bot_[a-z_]+\.(jpg|gif|png)")
+
+PERFILES: dict[str, PerfilRecursos] = {
+    "rues": PerfilRecursos("rues", permitidos=(r"bootstrap-icons",)),
+    "fosiga": PerfilRecursos("fosiga", permitidos=_RECAPTCHA),
+    "simpleco": PerfilRecursos("simpleco", permitidos=_JSF),
+    "suaporte": PerfilRecursos("suaporte", permitidos=_JSF),
+    "aportesenlinea": PerfilRecursos("aportesenlinea", permitidos=_RECAPTCHA + (r"WebResource\.axd", r"ScriptResource\.axd")),
+    "ruaf": PerfilRecursos(
+        "ruaf",
+        permitidos=(r"captcha", r"Reserved\.ReportViewerWebControl\.axd", r"WebResource\.axd", r"ScriptResource\.axd"),
+    ),
+}
+
+
+class MetricasBloqueo:
+    """Solicitudes abortadas por un perfil en un contexto, por tipo y con bytes estimados."""
+
+    def __init__(self, perfil: PerfilRecursos):
+        self.perfil = perfil
+        self.permitidas = 0
+        self.bloqueadas = 0
+        self.bytes_evitados = 0
+        self.por_motivo: Counter[str] = Counter()
+
+    def registrar(self, tipo: str, motivo: str | None) -> None:
+        if motivo is None:
+            self.permitidas += 1
+            return
+        self.bloqueadas += 1
+        self.bytes_evitados += _BYTES_TIPICOS.get(tipo, _BYTES_OTRO)
+        self.por_motivo[motivo if motivo.startswith("tipo:") else "terceros"] += 1
+
+    def resumen(self) -> dict[str, Any]:
+        return {
+            "perfil": self.perfil.nombre,
+            "permitidas": self.permitidas,
+            "bloqueadas": self.bloqueadas,
+            "bytes_evitados_est": self.bytes_evitados,
+            "por_motivo": dict(self.por_motivo),
+        }
+
+
+_totales_lock = threading.Lock()
+_totales: dict[str, Counter[str]] = {}
+
+
+def obtener_perfil(nombre: str | None) -> PerfilRecursos | None:
+    if not BLOQUEO_RECURSOS or not nombre:
+        return None
+    perfil = PERFILES.get(nombre)
+    if perfil is None:
+        logger.warning("Perfil de bloqueo de recursos desconocido: %s", nombre)
+    return perfil
+
+
+def _manejador(perfil: PerfilRecursos, metricas: MetricasBloqueo):
+    def manejar(route) -> None:
+        request = route.request
+        motivo = perfil.decidir(request.url, request.resource_type)
+        metricas.registrar(request.resource_type, motivo)
+        if motivo is None:
+            route.fallback()
+        else:
+            route.abort("blockedbyclient")
+
+    return manejar
+
+
+def _manejador_async(perfil: PerfilRecursos, metricas: MetricasBloqueo):
+    async def manejar(route) -> None:
+        request = route.request
+        motivo = perfil.decidir(request.url, request.resource_type)
+        metricas.registrar(request.resource_type, motivo)
+        if motivo is None:
+            await route.fallback()
+        else:
+            await route.abort("blockedbyclient")
+
+    return manejar
+
+
+def aplicar_perfil(context, nombre: str | None) -> MetricasBloqueo | None:
+    perfil = obtener_perfil(nombre)
+    if perfil is None:
+        return None
+    metricas = MetricasBloqueo(perfil)
+    context.route("**/*", _manejador(perfil, metricas))
+    return metricas
+
+
+async def aplicar_perfil_async(context, nombre: str | None) -> MetricasBloqueo | None:
+    perfil = obtener_perfil(nombre)
+    if perfil is None:
+        return None
+    metricas = MetricasBloqueo(perfil)
+    await context.route("**/*", _manejador_async(perfil, metricas))
+    return metricas
+
+
+def cerrar_metricas(metricas: MetricasBloqueo | None) -> None:
+    """Registra en el log lo evitado por el contexto y lo suma al total del proceso."""
+    if metricas is None:
+        return
+    logger.info(
+        "Recursos evitados (%s): %s de %s solicitudes, ~%.0f KB %s",
+        metricas.perfil.nombre,
+        metricas.bloqueadas,
+        metricas.bloqueadas + metricas.permitidas,
+        metricas.bytes_evitados / 1024,
+        dict(metricas.por_motivo),
+    )
+    with _totales_lock:
+        total = _totales.setdefault(metricas.perfil.nombre, Counter())
+        total["contextos"] += 1
+        total["permitidas"] += metricas.permitidas
+        total["bloqueadas"] += metricas.bloqueadas
+        total["bytes_evitados_est"] += metricas.bytes_evitados
+
+
+def resumen_bloqueo() -> dict[str, dict[str, int]]:
+    with _totales_lock:
+        return {nombre: dict(c) for nombre, c in _totales.items()}
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from playwright.sync_api import Browser, BrowserContext, Playwright, sync_playwright
+
+from common.bloqueo_recursos import aplicar_perfil, cerrar_metricas
+from common.cache_estaticos import instalar_cache
+from common.esperas import medir_esperas
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+POOL_TAMANO = int(os.environ.get("BYBOT_POOL_NAVEGADORES", "2") or 2)
+POOL_MAX_CONTEXTOS = int(os.environ.get("BYBOT_POOL_MAX_CONTEXTOS", "50") or 50)
+POOL_MAX_RSS_MB = int(os.environ.get("BYBOT_POOL_MAX_RSS_MB", "1500") or 0)
+
+
+def _descendientes() -> set[int]:
+    if psutil is None:
+        return set()
+    try:
+        return {p.pid for p in psutil.Process().children(recursive=True)}
+    except psutil.Error:
+        return set()
+
+
+class _Navegador:
+    def __init__(self, browser: Browser, pids: set[int]):
+        self.browser = browser
+        self.pids = pids
+        self.contextos = 0
+        self.en_uso = 0
+        self.caido = False
+        browser.on("disconnected", lambda _b: setattr(self, "caido", True))
+
+    def sano(self) -> bool:
+        return not self.caido and self.browser.is_connected()
+
+    def rss_mb(self) -> float:
+        if psutil is None or not self.pids:
+            return 0.0
+        total = 0
+        for pid in self.pids:
+            try:
+                proc = psutil.Process(pid)
+                total += proc.memory_info().rss
+                total += sum(c.memory_info().rss for c in proc.children(recursive=True))
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+
+class PoolNavegadores:
+    """
+    Instancias Chromium de larga vida que entregan un contexto aislado nuevo por
+    consulta. Un navegador se recicla tras `max_contextos` contextos o si su RSS
+    supera `max_rss_mb` (requiere psutil), y se reemplaza si se cayo. Igual que
+    la API sync de Playwright, el pool se usa desde un solo hilo.
+    """
+
+    def __init__(
+        self,
+        *,
+        tamano: int = POOL_TAMANO,
+        max_contextos: int = POOL_MAX_CONTEXTOS,
+        max_rss_mb: int = POOL_MAX_RSS_MB,
+    ):
+        self.tamano = max(1, tamano)
+        self.max_contextos = max(1, max_contextos)
+        self.max_rss_mb = max_rss_mb
+        self._pw: Playwright | None = None
+        self._navegadores: dict[tuple[Any, ...], list[_Navegador]] = {}
+        self.lanzados = 0
+        self.reciclados = 0
+
+    def _playwright(self) -> Playwright:
+        if self._pw is None:
+            self._pw = sync_playwright().start()
+        return self._pw
+
+    def _lanzar(self, clave: tuple[Any, ...]) -> _Navegador:
+        headless, args, slow_mo = clave
+        antes = _descendientes()
+        opciones: dict[str, Any] = {"headless": headless}
+        if args:
+            opciones["args"] = list(args)
+        if slow_mo:
+            opciones["slow_mo"] = slow_mo
+        browser = self._playwright().chromium.launch(**opciones)
+        nav = _Navegador(browser, _descendientes() - antes)
+        self._navegadores.setdefault(clave, []).append(nav)
+        self.lanzados += 1
+        logger.info("Pool: Chromium lanzado (headless=%s, total lanzados=%s)", headless, self.lanzados)
+        return nav
+
+    def _retirar(self, clave: tuple[Any, ...], nav: _Navegador, motivo: str) -> None:
+        lista = self._navegadores.get(clave, [])
+        if nav in lista:
+            lista.remove(nav)
+        self.reciclados += 1
+        logger.info("Pool: navegador retirado (%s) tras %s contextos", motivo, nav.contextos)
+        try:
+            nav.browser.close()
+        except Exception as e:
+            logger.debug("Cerrar navegador retirado: %s", e)
+
+    def _elegir(self, clave: tuple[Any, ...]) -> _Navegador:
+        for nav in list(self._navegadores.get(clave, [])):
+            if not nav.sano():
+                self._retirar(clave, nav, "caido")
+        vivos = self._navegadores.get(clave, [])
+        libres = [n for n in vivos if n.en_uso == 0]
+        if libres:
+            return min(libres, key=lambda n: n.contextos)
+        if len(vivos) < self.tamano:
+            return self._lanzar(clave)
+        return min(vivos, key=lambda n: n.en_uso)
+
+    def _revisar(self, clave: tuple[Any, ...], nav: _Navegador) -> None:
+        if nav.en_uso > 0:
+            return
+        if not nav.sano():
+            self._retirar(clave, nav, "caido")
+        elif nav.contextos >= self.max_contextos:
+            self._retirar(clave, nav, f"{nav.contextos} contextos")
+        elif self.max_rss_mb > 0 and (rss := nav.rss_mb()) > self.max_rss_mb:
+            self._retirar(clave, nav, f"RSS {rss:.0f} MB")
+
+    @contextmanager
+    def contexto(
+        self,
+        *,
+        headless: bool = True,
+        args: list[str] | None = None,
+        slow_mo: float = 0,
+        perfil: str | None = None,
+        **opciones_contexto: Any,
+    ) -> Iterator[BrowserContext]:
+        clave = (headless, tuple(args or ()), slow_mo)
+        nav = self._elegir(clave)
+        try:
+            context = nav.browser.new_context(**opciones_contexto)
+        except Exception as e:
+            logger.warning("Pool: new_context fallo (%s); se relanza el navegador.", e)
+            self._retirar(clave, nav, "new_context fallo")
+            nav = self._lanzar(clave)
+            context = nav.browser.new_context(**opciones_contexto)
+        nav.contextos += 1
+        nav.en_uso += 1
+        metricas = None
+        try:
+            instalar_cache(context)
+            metricas = aplicar_perfil(context, perfil)
+            yield context
+        finally:
+            nav.en_uso -= 1
+            cerrar_metricas(metricas)
+            try:
+                context.close()
+            except Exception as e:
+                logger.debug("Cerrar contexto del pool: %s", e)
+            self._revisar(clave, nav)
+
+    def resumen(self) -> dict[str, int]:
+        return {
+            "navegadores": sum(len(v) for v in self._navegadores.values()),
+            "lanzados": self.lanzados,
+            "reciclados": self.reciclados,
+        }
+
+    def cerrar(self) -> None:
+        for lista in self._navegadores.values():
+            for nav in lista:
+                try:
+                    nav.browser.close()
+                except Exception as e:
+                    logger.debug("Cerrar navegador del pool: %s", e)
+        self._navegadores.clear()
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+
+@contextmanager
+def abrir_contexto(
+    pool: PoolNavegadores | None,
+    *,
+    headless: bool,
+    args: list[str] | None = None,
+    slow_mo: float = 0,
+    perfil: str | None = None,
+    **opciones_contexto: Any,
+) -> Iterator[BrowserContext]:
+    """
+    Contexto del pool si se entrega uno; si no, Chromium propio lanzado y cerrado
+    aqui. `perfil` es el perfil de bloqueo de recursos del portal (ver
+    `common.bloqueo_recursos`).
+    """
+    if pool is not None:
+        with medir_esperas(perfil or "contexto"), pool.contexto(
+            headless=headless, args=args, slow_mo=slow_mo, perfil=perfil, **opciones_contexto
+        ) as context:
+            yield context
+        return
+
+    opciones: dict[str, Any] = {"headless": headless}
+    if args:
+        opciones["args"] = args
+    if slow_mo:
+        opciones["slow_mo"] = slow_mo
+    with medir_esperas(perfil or "contexto"), sync_playwright() as pw:
+        browser = pw.chromium.launch(**opciones)
+        context = browser.new_context(**opciones_contexto)
+        instalar_cache(context)
+        metricas = aplicar_perfil(context, perfil)
+        try:
+            yield context
+        finally:
+            cerrar_metricas(metricas)
+            context.close()
+            browser.close()
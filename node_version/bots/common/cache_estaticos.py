@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+CACHE_ESTATICOS = os.environ.get("BYBOT_CACHE_ESTATICOS", "1").strip().lower() not in ("0", "false", "no")
+CACHE_ESTATICOS_PATH = Path(
+    os.environ.get("BYBOT_CACHE_ESTATICOS_PATH", "") or (BOTS_DIR / "cache_estaticos.sqlite3")
+)
+CACHE_ESTATICOS_MAX_MB = float(os.environ.get("BYBOT_CACHE_ESTATICOS_MAX_MB", "200") or 200)
+CACHE_ESTATICOS_TTL_S = float(os.environ.get("BYBOT_CACHE_ESTATICOS_TTL_S", "86400") or 86400)
+
+TIPOS_CACHEABLES = frozenset({"script", "stylesheet", "font", "image"})
+# Nunca desde cache: captchas y contenido generado por consulta.
+_NO_CACHEAR = re.compile(r"captcha|ReportViewerWebControl|/recaptcha/", re.IGNORECASE)
+_CABECERAS_OMITIDAS = frozenset(
+    {"set-cookie", "content-encoding", "content-length", "transfer-encoding", "connection", "date", "age"}
+)
+
+_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS estaticos (
+        clave TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        estado INTEGER NOT NULL,
+        cabeceras TEXT NOT NULL,
+        cuerpo BLOB NOT NULL,
+        bytes INTEGER NOT NULL,
+        expira REAL NOT NULL,
+        ultimo_uso REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_estaticos_uso ON estaticos (ultimo_uso)",
+)
+
+
+def _max_age(cabeceras: dict[str, str], ttl_defecto: float) -> float | None:
+    """Segundos de vigencia segun Cache-Control; None si la respuesta no se puede compartir."""
+    cc = cabeceras.get("cache-control", "").lower()
+    if any(d in cc for d in ("no-store", "no-cache", "private")):
+        return None
+    if "set-cookie" in cabeceras:
+        return None
+    vary = cabeceras.get("vary", "").lower().replace(" ", "")
+    if vary and vary not in ("accept-encoding", "origin", "accept-encoding,origin", "origin,accept-encoding"):
+        return None
+    m = re.search(r"(?:s-maxage|max-age)=(\d+)", cc)
+    if m:
+        return float(m.group(1)) or None
+    return ttl_defecto
+
+
+class CacheEstaticos:
+    """
+    Cache compartido (SQLite) de recursos estaticos de los portales: scripts,
+    hojas de estilo, fuentes e imagenes que la respuesta permite compartir. Se
+    sirve desde `route.fulfill`, sin cookies ni estado de sesion: cada contexto
+    sigue aislado. Desalojo LRU al superar `max_mb`.
+    """
+
+    def __init__(
+        self,
+        ruta: Path = CACHE_ESTATICOS_PATH,
+        *,
+        max_mb: float = CACHE_ESTATICOS_MAX_MB,
+        ttl_s: float = CACHE_ESTATICOS_TTL_S,
+    ):
+        self.ruta = ruta
+        self.max_bytes = int(max(1.0, max_mb) * 1024 * 1024)
+        self.ttl_s = ttl_s
+        self.aciertos = 0
+        self.fallos = 0
+        self.bytes_servidos = 0
+        self._lock = threading.Lock()
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as conn:
+            for ddl in _DDL:
+                conn.execute(ddl)
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.ruta, timeout=10)
+
+    @staticmethod
+    def _clave(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cacheable(url: str, metodo: str, tipo: str) -> bool:
+        return metodo == "GET" and tipo in TIPOS_CACHEABLES and url.startswith("http") and not _NO_CACHEAR.search(url)
+
+    def buscar(self, url: str) -> tuple[int, dict[str, str], bytes] | None:
+        ahora = time.time()
+        try:
+            with self._conectar() as conn:
+                fila = conn.execute(
+                    "SELECT estado, cabeceras, cuerpo, expira FROM estaticos WHERE clave = ?",
+                    (self._clave(url),),
+                ).fetchone()
+                if fila is not None and fila[3] >= ahora:
+                    conn.execute(
+                        "UPDATE estaticos SET ultimo_uso = ? WHERE clave = ?", (ahora, self._clave(url))
+                    )
+        except sqlite3.Error as e:
+            logger.debug("Cache de estaticos no disponible (%s): %s", self.ruta, e)
+            return None
+        with self._lock:
+            if fila is None or fila[3] < ahora:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self.bytes_servidos += len(fila[2])
+        return fila[0], json.loads(fila[1]), fila[2]
+
+    def guardar(self, url: str, estado: int, cabeceras: dict[str, str], cuerpo: bytes) -> bool:
+        if estado != 200 or not cuerpo or len(cuerpo) > self.max_bytes // 20:
+            return False
+        vigencia = _max_age(cabeceras, self.ttl_s)
+        if vigencia is None:
+            return False
+        guardadas = {k: v for k, v in cabeceras.items() if k.lower() not in _CABECERAS_OMITIDAS}
+        ahora = time.time()
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO estaticos (clave, url, estado, cabeceras, cuerpo, bytes, expira, ultimo_uso)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (self._clave(url), url, estado, json.dumps(guardadas), cuerpo, len(cuerpo), ahora + vigencia, ahora),
+                )
+                self._desalojar(conn)
+        except sqlite3.Error as e:
+            logger.debug("No se pudo escribir cache de estaticos (%s): %s", self.ruta, e)
+            return False
+        return True
+
+    def _desalojar(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM estaticos").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        exceso = total - self.max_bytes
+        liberados = 0
+        claves: list[str] = []
+        for clave, n in conn.execute("SELECT clave, bytes FROM estaticos ORDER BY ultimo_uso ASC"):
+            claves.append(clave)
+            liberados += n
+            if liberados >= exceso:
+                break
+        conn.executemany("DELETE FROM estaticos WHERE clave = ?", [(c,) for c in claves])
+        logger.debug("Cache de estaticos: %s entradas desalojadas (%s bytes)", len(claves), liberados)
+
+    def resumen(self) -> dict[str, Any]:
+        with self._conectar() as conn:
+            entradas, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM estaticos").fetchone()
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "bytes_servidos": self.bytes_servidos,
+            "entradas": entradas,
+            "bytes_en_disco": total,
+        }
+
+
+_cache: CacheEstaticos | None = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_estaticos() -> CacheEstaticos | None:
+    global _cache
+    if not CACHE_ESTATICOS:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = CacheEstaticos()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Cache de estaticos desactivado: %s", e)
+                return None
+        return _cache
+
+
+def _manejador(cache: CacheEstaticos):
+    def manejar(route) -> None:
+        request = route.request
+        if not cache.cacheable(request.url, request.method, request.resource_type):
+            route.fallback()
+            return
+        guardado = cache.buscar(request.url)
+        if guardado is not None:
+            estado, cabeceras, cuerpo = guardado
+            route.fulfill(status=estado, headers=cabeceras, body=cuerpo)
+            return
+        try:
+            respuesta = route.fetch()
+            cuerpo = respuesta.body()
+        except Exception as e:
+            logger.debug("Cache de estaticos: fetch fallo (%s); se deja pasar", e)
+            route.fallback()
+            return
+        cache.guardar(request.url, respuesta.status, respuesta.headers, cuerpo)
+        route.fulfill(response=respuesta, body=cuerpo)
+
+    return manejar
+
+
+def _manejador_async(cache: CacheEstaticos):
+    # SQLite bloquea: lecturas y escrituras van a un hilo para no frenar el event loop.
+    async def manejar(route) -> None:
+        request = route.request
+        if not cache.cacheable(request.url, request.method, request.resource_type):
+            await route.fallback()
+            return
+        guardado = await asyncio.to_thread(cache.buscar, request.url)
+        if guardado is not None:
+            estado, cabeceras, cuerpo = guardado
+            await route.fulfill(status=estado, headers=cabeceras, body=cuerpo)
+            return
+        try:
+            respuesta = await route.fetch()
+            cuerpo = await respuesta.body()
+        except Exception as e:
+            logger.debug("Cache de estaticos: fetch fallo (%s); se deja pasar", e)
+            await route.fallback()
+            return
+        await asyncio.to_thread(cache.guardar, request.url, respuesta.status, respuesta.headers, cuerpo)
+        await route.fulfill(response=respuesta, body=cuerpo)
+
+    return manejar
+
+
+def instalar_cache(context) -> None:
+    """Registrar antes que el perfil de bloqueo: Playwright prueba las rutas en orden inverso."""
+    cache = obtener_cache_estaticos()
+    if cache is not None:
+        context.route("**/*", _manejador(cache))
+
+
+async def instalar_cache_async(context) -> None:
+    cache = obtener_cache_estaticos()
+    if cache is not None:
+        await context.route("**/*", _manejador_async(cache))
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+CACHE_PATH = Path(os.environ.get("BYBOT_OCR_CACHE_PATH", "") or (BOTS_DIR / "ocr_cache.sqlite3"))
+CACHE_MAXIMO = int(os.environ.get("BYBOT_OCR_CACHE_MAX", "5000") or 5000)
+
+ESTADO_LECTURA = "lectura"
+ESTADO_VERIFICADO = "verificado"
+
+_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS cache_ocr (
+        portal TEXT NOT NULL,
+        sha1 TEXT NOT NULL,
+        phash TEXT NOT NULL,
+        texto TEXT NOT NULL,
+        estrategia TEXT NOT NULL,
+        estado TEXT NOT NULL,
+        ultimo_uso REAL NOT NULL,
+        PRIMARY KEY (portal, sha1)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cache_ocr_phash ON cache_ocr (portal, phash)",
+    "CREATE INDEX IF NOT EXISTS idx_cache_ocr_uso ON cache_ocr (portal, ultimo_uso)",
+    """
+    CREATE TABLE IF NOT EXISTS cache_ocr_rechazos (
+        portal TEXT NOT NULL,
+        sha1 TEXT NOT NULL,
+        phash TEXT NOT NULL,
+        texto TEXT NOT NULL,
+        ultimo_uso REAL NOT NULL,
+        PRIMARY KEY (portal, sha1, texto)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cache_rechazos_phash ON cache_ocr_rechazos (portal, phash)",
+)
+
+
+def hash_perceptual(png_bytes: bytes) -> str:
+    """dHash 64 bits: igual para recodificaciones del mismo captcha con bytes distintos."""
+    g = Image.open(io.BytesIO(png_bytes)).convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    px = list(g.getdata())
+    bits = 0
+    for y in range(8):
+        fila = px[y * 9 : y * 9 + 9]
+        for x in range(8):
+            bits = (bits << 1) | (fila[x] > fila[x + 1])
+    return f"{bits:016x}"
+
+
+class CacheOCR:
+    """
+    Memo persistente (SQLite) de lecturas de captcha por SHA1 de la imagen. Las
+    respuestas aceptadas quedan verificadas y las rechazadas como entradas
+    negativas que nunca se vuelven a enviar para esa misma imagen. El hash
+    perceptual solo sirve de pista (`similares`): dos captchas con el mismo
+    dHash pueden tener textos distintos, asi que nunca se usa como respuesta.
+    Desalojo LRU al superar `maximo` entradas por portal.
+    """
+
+    def __init__(self, portal: str, *, ruta: Path = CACHE_PATH, maximo: int = CACHE_MAXIMO):
+        self.portal = portal
+        self.ruta = ruta
+        self.maximo = max(1, maximo)
+        self.aciertos = 0
+        self.fallos = 0
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as conn:
+            for ddl in _DDL:
+                conn.execute(ddl)
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.ruta, timeout=10)
+
+    @staticmethod
+    def _claves(png_bytes: bytes) -> tuple[str, str]:
+        sha1 = hashlib.sha1(png_bytes).hexdigest()
+        try:
+            phash = hash_perceptual(png_bytes)
+        except Exception as e:
+            logger.debug("Hash perceptual no disponible: %s", e)
+            phash = sha1
+        return sha1, phash
+
+    def buscar(self, png_bytes: bytes) -> tuple[str, str] | None:
+        sha1 = hashlib.sha1(png_bytes).hexdigest()
+        try:
+            with self._conectar() as conn:
+                fila = conn.execute(
+                    "SELECT sha1, texto, estado FROM cache_ocr WHERE portal = ? AND sha1 = ?",
+                    (self.portal, sha1),
+                ).fetchone()
+                if fila is not None:
+                    conn.execute(
+                        "UPDATE cache_ocr SET ultimo_uso = ? WHERE portal = ? AND sha1 = ?",
+                        (time.time(), self.portal, sha1),
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Cache OCR no disponible (%s): %s", self.ruta, e)
+            return None
+        if fila is None:
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        logger.debug("Cache OCR: %r (%s) para sha1=%s", fila[1], fila[2], sha1[:10])
+        return fila[1], fila[2]
+
+    def rechazados(self, png_bytes: bytes) -> set[str]:
+        sha1 = hashlib.sha1(png_bytes).hexdigest()
+        try:
+            with self._conectar() as conn:
+                filas = conn.execute(
+                    "SELECT texto FROM cache_ocr_rechazos WHERE portal = ? AND sha1 = ?",
+                    (self.portal, sha1),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Cache OCR no disponible (%s): %s", self.ruta, e)
+            return set()
+        return {f[0] for f in filas}
+
+    def similares(self, png_bytes: bytes) -> list[str]:
+        """Textos verificados de otras imagenes con el mismo dHash: pista de orden, no respuesta."""
+        sha1, phash = self._claves(png_bytes)
+        try:
+            with self._conectar() as conn:
+                filas = conn.execute(
+                    """
+                    SELECT texto FROM cache_ocr
+                    WHERE portal = ? AND phash = ? AND sha1 != ? AND estado = ?
+                    ORDER BY ultimo_uso DESC
+                    """,
+                    (self.portal, phash, sha1, ESTADO_VERIFICADO),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Cache OCR no disponible (%s): %s", self.ruta, e)
+            return []
+        return [f[0] for f in filas]
+
+    def _guardar(self, png_bytes: bytes, texto: str, estrategia: str, estado: str) -> None:
+        sha1, phash = self._claves(png_bytes)
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO cache_ocr (portal, sha1, phash, texto, estrategia, estado, ultimo_uso)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (portal, sha1) DO UPDATE SET
+                        texto = excluded.texto,
+                        estrategia = excluded.estrategia,
+                        estado = excluded.estado,
+                        ultimo_uso = excluded.ultimo_uso
+                    WHERE cache_ocr.estado != 'verificado' OR excluded.estado = 'verificado'
+                    """,
+                    (self.portal, sha1, phash, texto, estrategia, estado, time.time()),
+                )
+                self._desalojar(conn)
+        except sqlite3.Error as e:
+            logger.warning("No se pudo escribir cache OCR (%s): %s", self.ruta, e)
+
+    def guardar_lectura(self, png_bytes: bytes, texto: str, estrategia: str) -> None:
+        self._guardar(png_bytes, texto, estrategia, ESTADO_LECTURA)
+
+    def marcar_aceptado(self, png_bytes: bytes, texto: str, estrategia: str = "") -> None:
+        self._guardar(png_bytes, texto, estrategia, ESTADO_VERIFICADO)
+
+    def marcar_rechazado(self, png_bytes: bytes, texto: str) -> None:
+        sha1, phash = self._claves(png_bytes)
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO cache_ocr_rechazos (portal, sha1, phash, texto, ultimo_uso)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (self.portal, sha1, phash, texto, time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM cache_ocr WHERE portal = ? AND sha1 = ? AND texto = ? AND estado = ?",
+                    (self.portal, sha1, texto, ESTADO_LECTURA),
+                )
+                self._desalojar(conn)
+        except sqlite3.Error as e:
+            logger.warning("No se pudo escribir cache OCR (%s): %s", self.ruta, e)
+
+    def _desalojar(self, conn: sqlite3.Connection) -> None:
+        for tabla in ("cache_ocr", "cache_ocr_rechazos"):
+            conn.execute(
+                f"""
+                DELETE FROM {tabla} WHERE portal = ? AND rowid IN (
+                    SELECT rowid FROM {tabla} WHERE portal = ?
+                    ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.portal, self.portal, self.maximo),
+            )
+
+    def resumen(self) -> dict[str, int]:
+        return {"aciertos": self.aciertos, "fallos": self.fallos}
@@ -2,13 +2,26 @@ from __future__ import annotations
 
 import hashlib
 import logging
-import time
+import os
+import threading
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
+from PIL import Image
+
+from common.corpus_captcha import obtener_corpus
+from common.ocr import PoolOCR, contar_lecturas, iterar_lote
+from common.ocr_daemon import ClienteOCR
+
 logger = logging.getLogger(__name__)
 
 ESTADISTICAS: dict[str, dict[str, int]] = {}
+USAR_DAEMON_OCR = os.environ.get("BYBOT_OCR_DAEMON", "1").strip() != "0"
+# Lecturas por solicitud al daemon: entre bloques el llamador puede cortar el nivel.
+DAEMON_BLOQUE = max(1, int(os.environ.get("BYBOT_OCR_DAEMON_BLOQUE", "4") or 4))
+
+_cliente_ocr = ClienteOCR()
 
 
 def registrar_intento(tipo_captcha: str, *, exito: bool, metodo: str) -> None:
@@ -67,19 +80,65 @@ class BucleCaptcha:
         }
 
 
-def guardar_intento_captcha(directorio: Path, intento: int, png_bytes: bytes, texto: str, estrategia: str) -> None:
-    directorio.mkdir(parents=True, exist_ok=True)
-    stamp = time.strftime("%Y%m%d_%H%M%S")
-    base = f"intento_{intento:03d}_{stamp}"
-    png_path = directorio / f"{base}_original.png"
-    meta_path = directorio / f"{base}_meta.txt"
-    png_path.write_bytes(png_bytes)
-    meta_path.write_text(
-        f"intento={intento}\n"
-        f"timestamp={stamp}\n"
-        f"ocr={texto}\n"
-        f"longitud={len(texto)}\n"
-        f"estrategia={estrategia}\n",
-        encoding="utf-8",
-    )
-    logger.info("Captcha guardado: %s | %s", png_path.name, meta_path.name)
+def guardar_intento_captcha(
+    directorio: Path,
+    intento: int,
+    png_bytes: bytes,
+    texto: str,
+    estrategia: str,
+    *,
+    portal: str = "",
+) -> str:
+    corpus = obtener_corpus(directorio, portal=portal)
+    clave = corpus.registrar(intento=intento, png_bytes=png_bytes, texto=texto, estrategia=estrategia)
+    logger.info("Captcha encolado en corpus: %s (intento %s)", corpus.ruta.name, intento)
+    return clave
+
+
+def daemon_ocr_disponible() -> bool:
+    return USAR_DAEMON_OCR and _cliente_ocr.disponible()
+
+
+def iterar_lote_ocr(
+    trabajos: list[tuple[Image.Image, int, int]],
+    *,
+    pool: PoolOCR | None = None,
+    cancelar: threading.Event | None = None,
+) -> Iterator[tuple[int, str | None]]:
+    """
+    Lecturas (imagen, oem, psm) via daemon OCR si esta arriba; si no, en este
+    proceso. Al daemon se envian bloques de DAEMON_BLOQUE para que el llamador
+    pueda dejar de iterar (acuerdo alcanzado) sin pagar el resto del nivel.
+    Con `cancelar` activado se deja de leer en el siguiente bloque o lectura.
+    """
+    inicio = 0
+    if daemon_ocr_disponible():
+        try:
+            while inicio < len(trabajos):
+                if cancelar is not None and cancelar.is_set():
+                    return
+                bloque = trabajos[inicio : inicio + DAEMON_BLOQUE]
+                textos = _cliente_ocr.leer_lote(bloque)
+                contar_lecturas(len(textos))
+                for k, texto in enumerate(textos):
+                    yield inicio + k, texto
+                inicio += len(bloque)
+            return
+        except ConnectionError as e:
+            logger.warning("%s; se usa OCR en proceso.", e)
+    for k, texto in iterar_lote(trabajos[inicio:], pool=pool):
+        if cancelar is not None and cancelar.is_set():
+            return
+        yield inicio + k, texto
+
+
+def leer_lote_ocr(
+    trabajos: list[tuple[Image.Image, int, int]],
+    *,
+    pool: PoolOCR | None = None,
+    cancelar: threading.Event | None = None,
+) -> list[str | None]:
+    resultados: list[str | None] = [None] * len(trabajos)
+    for indice, texto in iterar_lote_ocr(trabajos, pool=pool, cancelar=cancelar):
+        resultados[indice] = texto
+    return resultados
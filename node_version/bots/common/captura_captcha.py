@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import logging
+import re
+from collections import deque
+
+from playwright.sync_api import Page, Response, TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+
+PATRON_URL_CAPTCHA = r"captcha"
+
+
+class CapturaRespuestasCaptcha:
+    """
+    Escucha las respuestas de imagen de la pagina cuya URL parece de captcha y
+    guarda la ultima. `tomar()` entrega los bytes exactos que el navegador
+    cargo (sin volver a pedir el `src`, que en algunos handlers ASP.NET genera
+    otro captcha) y espera la siguiente si la ultima ya se uso. Con `url` solo
+    vale la respuesta de esa URL exacta: otra imagen de captcha no es la que
+    muestra el `<img>`.
+    """
+
+    def __init__(self, page: Page, *, patron: str = PATRON_URL_CAPTCHA):
+        self.page = page
+        self._patron = re.compile(patron, re.IGNORECASE)
+        self._respuestas: deque[tuple[int, Response]] = deque(maxlen=8)
+        self._seq = 0
+        self._consumido = 0
+        self.capturas = 0
+        page.on("response", self._al_recibir)
+
+    def _coincide(self, response: Response) -> bool:
+        try:
+            return (
+                response.request.resource_type == "image"
+                and response.ok
+                and bool(self._patron.search(response.url))
+            )
+        except Exception:
+            return False
+
+    def _al_recibir(self, response: Response) -> None:
+        if self._coincide(response):
+            self._seq += 1
+            self._respuestas.append((self._seq, response))
+            logger.debug("Respuesta captcha #%s: %s", self._seq, response.url)
+
+    def _ultima(self, url: str | None) -> tuple[int, Response] | None:
+        frescas = [(s, r) for s, r in self._respuestas if s > self._consumido]
+        if url:
+            frescas = [x for x in frescas if x[1].url == url]
+        return frescas[-1] if frescas else None
+
+    def tomar(self, *, url: str | None = None, timeout_ms: int = 5000) -> bytes | None:
+        nueva = self._ultima(url)
+        if nueva is None:
+            try:
+                self.page.wait_for_event(
+                    "response",
+                    predicate=lambda r: self._coincide(r) and (not url or r.url == url),
+                    timeout=timeout_ms,
+                )
+            except PlaywrightTimeoutError:
+                logger.debug("Sin respuesta de captcha nueva en %s ms", timeout_ms)
+                return None
+            nueva = self._ultima(url)
+            if nueva is None:
+                return None
+        seq, response = nueva
+        try:
+            body = response.body()
+        except Exception as e:
+            logger.debug("No se pudo leer el cuerpo de la respuesta captcha: %s", e)
+            return None
+        self._consumido = seq
+        self.capturas += 1
+        return body
+
+    def detener(self) -> None:
+        try:
+            self.page.remove_listener("response", self._al_recibir)
+        except Exception as e:
+            logger.debug("remove_listener captcha: %s", e)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from common.timezone_utils import ZONA_BOGOTA
+
+logger = logging.getLogger(__name__)
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+CONFIANZA_PATH = Path(
+    os.environ.get("BYBOT_CONFIANZA_CAPTCHA_PATH", "") or (BOTS_DIR / "confianza_captcha.sqlite3")
+)
+
+DECISION_ENVIADO = "enviado"
+DECISION_RENOVADO = "renovado"
+
+_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS decisiones_captcha (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        portal TEXT NOT NULL,
+        creado TEXT NOT NULL,
+        confianza REAL NOT NULL,
+        umbral REAL NOT NULL,
+        decision TEXT NOT NULL,
+        aceptado INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_decisiones_portal ON decisiones_captcha (portal, decision)",
+)
+
+
+def confianza_por_posicion(candidatos: list[tuple[str, str]], texto: str) -> list[float]:
+    """
+    Margen de voto por caracter: fraccion de lecturas de la misma longitud que
+    coinciden con `texto` en esa posicion. Se suma un voto en contra ficticio
+    para que una sola lectura no cuente como certeza (1 lectura -> 0.5).
+    """
+    lecturas = [t for t, _ in candidatos if len(t) == len(texto)]
+    if not texto:
+        return []
+    n = len(lecturas) + 1
+    return [round(sum(t[i] == c for t in lecturas) / n, 3) for i, c in enumerate(texto)]
+
+
+class EstadisticasConfianza:
+    """
+    Registro (SQLite) de cada decision del filtro de confianza: captchas
+    renovados sin enviar y captchas enviados con su veredicto. Permite estimar,
+    para otro umbral, cuantas idas y vueltas se ahorrarian y cuantos aciertos se
+    perderian.
+    """
+
+    def __init__(self, portal: str, *, ruta: Path = CONFIANZA_PATH):
+        self.portal = portal
+        self.ruta = ruta
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as conn:
+            for ddl in _DDL:
+                conn.execute(ddl)
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.ruta, timeout=10)
+
+    def registrar(
+        self,
+        confianza: float,
+        umbral: float,
+        decision: str,
+        aceptado: bool | None = None,
+    ) -> None:
+        ahora = datetime.now(ZONA_BOGOTA).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO decisiones_captcha (portal, creado, confianza, umbral, decision, aceptado)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        self.portal, ahora, confianza, umbral, decision,
+                        None if aceptado is None else int(aceptado),
+                    ),
+                )
+        except sqlite3.Error as e:
+            logger.warning("No se pudo registrar decision de confianza (%s): %s", self.ruta, e)
+
+    def simular(self, umbral: float) -> dict[str, Any]:
+        with self._conectar() as conn:
+            enviados = conn.execute(
+                """
+                SELECT confianza, aceptado FROM decisiones_captcha
+                WHERE portal = ? AND decision = ? AND aceptado IS NOT NULL
+                """,
+                (self.portal, DECISION_ENVIADO),
+            ).fetchall()
+            renovados = conn.execute(
+                "SELECT COUNT(*) FROM decisiones_captcha WHERE portal = ? AND decision = ?",
+                (self.portal, DECISION_RENOVADO),
+            ).fetchone()[0]
+        bajo = [(c, a) for c, a in enviados if c < umbral]
+        sobre = [(c, a) for c, a in enviados if c >= umbral]
+        aceptados_sobre = sum(a for _, a in sobre)
+        return {
+            "umbral": umbral,
+            "enviados": len(enviados),
+            "renovados_registrados": renovados,
+            "idas_ahorradas": sum(1 for _, a in bajo if not a),
+            "aciertos_perdidos": sum(a for _, a in bajo),
+            "precision_enviados": round(aceptados_sobre / len(sobre), 4) if sobre else 0.0,
+            "precision_actual": round(sum(a for _, a in enviados) / len(enviados), 4) if enviados else 0.0,
+        }
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import atexit
+import csv
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from common.timezone_utils import ZONA_BOGOTA
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_CORPUS = "corpus_captcha.sqlite3"
+VEREDICTO_ACEPTADO = "aceptado"
+VEREDICTO_RECHAZADO = "rechazado"
+
+_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS imagenes (
+        sha1 TEXT PRIMARY KEY,
+        png BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS intentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clave TEXT NOT NULL UNIQUE,
+        portal TEXT NOT NULL,
+        creado TEXT NOT NULL,
+        intento INTEGER NOT NULL,
+        sha1 TEXT NOT NULL REFERENCES imagenes (sha1),
+        ocr TEXT NOT NULL,
+        estrategia TEXT NOT NULL,
+        veredicto TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_intentos_sha1 ON intentos (sha1)",
+    "CREATE INDEX IF NOT EXISTS idx_intentos_portal_veredicto ON intentos (portal, veredicto)",
+)
+
+_FIN = object()
+
+
+class CorpusCaptcha:
+    """
+    Corpus de captchas en un unico SQLite: imagen (deduplicada por SHA1), texto
+    OCR, estrategia y veredicto del portal. Las escrituras van por una cola a un
+    hilo escritor, de modo que el bucle del navegador nunca espera al disco.
+    """
+
+    def __init__(self, ruta: Path, *, portal: str):
+        self.ruta = ruta
+        self.portal = portal
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.ruta) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for ddl in _DDL:
+                conn.execute(ddl)
+        self._cola: queue.Queue[Any] = queue.Queue()
+        self._hilo = threading.Thread(target=self._escritor, name="corpus-captcha", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def _escritor(self) -> None:
+        conn = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            while True:
+                op = self._cola.get()
+                lote = [op]
+                while lote[-1] is not _FIN:
+                    try:
+                        lote.append(self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    with conn:
+                        for sql_params in lote:
+                            if sql_params is _FIN:
+                                continue
+                            for sql, params in sql_params:
+                                conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    logger.warning("Corpus captcha: fallo escribiendo %s operaciones: %s", len(lote), e)
+                if lote[-1] is _FIN:
+                    return
+        finally:
+            conn.close()
+
+    def registrar(
+        self,
+        *,
+        intento: int,
+        png_bytes: bytes,
+        texto: str,
+        estrategia: str,
+        veredicto: str | None = None,
+        creado: str | None = None,
+    ) -> str:
+        clave = uuid.uuid4().hex
+        sha1 = hashlib.sha1(png_bytes).hexdigest()
+        stamp = creado or datetime.now(ZONA_BOGOTA).strftime("%Y-%m-%d %H:%M:%S")
+        self._cola.put(
+            (
+                ("INSERT OR IGNORE INTO imagenes (sha1, png) VALUES (?, ?)", (sha1, png_bytes)),
+                (
+                    "INSERT INTO intentos (clave, portal, creado, intento, sha1, ocr, estrategia, veredicto) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (clave, self.portal, stamp, intento, sha1, texto, estrategia, veredicto),
+                ),
+            )
+        )
+        logger.debug("Corpus captcha: intento %s encolado (sha1=%s)", intento, sha1[:10])
+        return clave
+
+    def marcar_veredicto(self, clave: str, veredicto: str) -> None:
+        self._cola.put(
+            (("UPDATE intentos SET veredicto = ? WHERE clave = ?", (veredicto, clave)),)
+        )
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo.is_alive()
+
+    def cerrar(self) -> None:
+        if self._hilo.is_alive():
+            self._cola.put(_FIN)
+            self._hilo.join(timeout=30)
+
+
+_corpus: dict[tuple[Path, str], CorpusCaptcha] = {}
+_corpus_lock = threading.Lock()
+
+
+def obtener_corpus(directorio: Path, *, portal: str) -> CorpusCaptcha:
+    clave = (directorio.resolve(), portal)
+    with _corpus_lock:
+        corpus = _corpus.get(clave)
+        if corpus is None or not corpus.activo:
+            corpus = CorpusCaptcha(directorio / NOMBRE_CORPUS, portal=portal)
+            _corpus[clave] = corpus
+        return corpus
+
+
+def iterar_corpus(
+    ruta: Path,
+    *,
+    portal: str | None = None,
+    veredicto: str | None = None,
+):
+    sql = (
+        "SELECT i.id, i.portal, i.creado, i.intento, i.sha1, i.ocr, i.estrategia, i.veredicto, m.png "
+        "FROM intentos i JOIN imagenes m ON m.sha1 = i.sha1 WHERE 1 = 1"
+    )
+    params: list[Any] = []
+    if portal:
+        sql += " AND i.portal = ?"
+        params.append(portal)
+    if veredicto:
+        sql += " AND i.veredicto = ?"
+        params.append(veredicto)
+    sql += " ORDER BY i.id"
+    with sqlite3.connect(ruta) as conn:
+        conn.row_factory = sqlite3.Row
+        for fila in conn.execute(sql, params):
+            yield dict(fila)
+
+
+def resumen_corpus(ruta: Path) -> list[dict[str, Any]]:
+    with sqlite3.connect(ruta) as conn:
+        filas = conn.execute(
+            "SELECT portal, COALESCE(veredicto, 'sin_enviar'), COUNT(*), COUNT(DISTINCT sha1) "
+            "FROM intentos GROUP BY 1, 2 ORDER BY 1, 2"
+        ).fetchall()
+    return [
+        {"portal": p, "veredicto": v, "intentos": n, "imagenes": u}
+        for p, v, n, u in filas
+    ]
+
+
+def exportar_corpus(
+    ruta: Path,
+    destino: Path,
+    *,
+    portal: str | None = None,
+    solo_aceptados: bool = False,
+) -> int:
+    """
+    Exporta a `destino/` un PNG por imagen y `etiquetas.csv` (archivo, texto,
+    veredicto, estrategia, portal). Con `solo_aceptados`, el texto es la
+    respuesta aceptada por el portal: conjunto etiquetado para entrenamiento.
+    """
+    destino.mkdir(parents=True, exist_ok=True)
+    vistos: set[str] = set()
+    n = 0
+    with (destino / "etiquetas.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["archivo", "texto", "veredicto", "estrategia", "portal"])
+        w.writeheader()
+        for fila in iterar_corpus(
+            ruta, portal=portal, veredicto=VEREDICTO_ACEPTADO if solo_aceptados else None
+        ):
+            archivo = f"{fila['sha1']}.png"
+            if fila["sha1"] not in vistos:
+                (destino / archivo).write_bytes(fila["png"])
+                vistos.add(fila["sha1"])
+            w.writerow(
+                {
+                    "archivo": archivo,
+                    "texto": fila["ocr"],
+                    "veredicto": fila["veredicto"] or "",
+                    "estrategia": fila["estrategia"],
+                    "portal": fila["portal"],
+                }
+            )
+            n += 1
+    logger.info("Corpus exportado: %s filas, %s imagenes en %s", n, len(vistos), destino)
+    return n
+
+
+def importar_directorio_intentos(corpus: CorpusCaptcha, directorio: Path) -> int:
+    """Importa pares legados `intento_NNN_<stamp>_original.png` + `_meta.txt`."""
+    n = 0
+    for png_path in sorted(directorio.glob("intento_*_original.png")):
+        meta_path = png_path.with_name(png_path.name.replace("_original.png", "_meta.txt"))
+        meta: dict[str, str] = {}
+        if meta_path.exists():
+            for linea in meta_path.read_text(encoding="utf-8").splitlines():
+                k, _, v = linea.partition("=")
+                meta[k.strip()] = v.strip()
+        corpus.registrar(
+            intento=int(meta.get("intento", "0") or 0),
+            png_bytes=png_path.read_bytes(),
+            texto=meta.get("ocr", ""),
+            estrategia=meta.get("estrategia") or meta.get("estrategia_ganadora", ""),
+        )
+        n += 1
+    return n
+
+
+def cargar_muestras_aceptadas(origen: Path, *, portal: str | None = None) -> list[tuple[bytes, str]]:
+    """
+    (png, texto aceptado) desde un corpus SQLite, una carpeta que lo contiene
+    (p. ej. `captcha_intentos/`) o una carpeta exportada con `etiquetas.csv`.
+    Sin duplicados por (imagen, texto).
+    """
+    muestras: dict[tuple[bytes, str], None] = {}
+    if origen.is_dir() and (origen / "etiquetas.csv").exists():
+        with (origen / "etiquetas.csv").open(encoding="utf-8") as f:
+            for fila in csv.DictReader(f):
+                if fila.get("veredicto") != VEREDICTO_ACEPTADO:
+                    continue
+                if portal and fila.get("portal") != portal:
+                    continue
+                muestras[((origen / fila["archivo"]).read_bytes(), fila["texto"])] = None
+        return list(muestras)
+    ruta = origen / NOMBRE_CORPUS if origen.is_dir() else origen
+    for fila in iterar_corpus(ruta, portal=portal, veredicto=VEREDICTO_ACEPTADO):
+        muestras[(fila["png"], fila["ocr"])] = None
+    return list(muestras)
@@ -0,0 +1,523 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SONDEO_MS = 100
+
+# Funciones auxiliares disponibles para todas las condiciones JS.
+_JS_AUXILIARES = """
+    const _visible = (el) => {
+        if (!el || !el.isConnected) return false;
+        const st = getComputedStyle(el);
+        if (st.visibility === 'hidden' || st.display === 'none') return false;
+        return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    };
+    const _todos = (sel) => [...document.querySelectorAll(sel)];
+    const _texto = () => ((document.body && document.body.innerText) || '')
+        .normalize('NFD').replace(/[\\u0300-\\u036f]/g, '')
+        .replace(/\\s+/g, ' ').toLowerCase();
+"""
+
+_JS_JSF_INACTIVO = """(() => {
+        if (document.readyState === 'loading') return false;
+        const pf = window.PrimeFaces;
+        if (pf && pf.ajax && pf.ajax.Queue && pf.ajax.Queue.isEmpty && !pf.ajax.Queue.isEmpty()) return false;
+        if (window.jQuery && window.jQuery.active > 0) return false;
+        try {
+            const prm = window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager
+                && Sys.WebForms.PageRequestManager.getInstance();
+            if (prm && prm.get_isInAsyncPostBack()) return false;
+        } catch (e) {}
+        return !_todos('.ui-blockui, .ui-blockui-document').some(_visible);
+    })()"""
+
+
+class Condicion:
+    """
+    Un desenlace esperado. Las condiciones JS (`js`: expresion sobre el argumento
+    `a`) se evaluan en el documento de `en` o, si es None, en el destino de
+    `esperar_primero`; las de Python (`py`) se sondean desde aqui.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        *,
+        js: str | None = None,
+        arg: Any = None,
+        py: Callable[[], bool] | None = None,
+        en: Any = None,
+        liberar: Callable[[], None] | None = None,
+    ):
+        self.nombre = nombre
+        self.js = js
+        self.arg = arg
+        self.py = py
+        self.en = en
+        self._liberar = liberar
+
+    def liberar(self) -> None:
+        if self._liberar is not None:
+            self._liberar()
+            self._liberar = None
+
+
+def visible(selector: str, *, nombre: str = "visible", en: Any = None) -> Condicion:
+    """Algun elemento CSS `selector` visible (selectores CSS, no los propios de Playwright)."""
+    return Condicion(nombre, js="_todos(a).some(_visible)", arg=selector, en=en)
+
+
+def oculto(selector: str, *, nombre: str = "oculto", en: Any = None) -> Condicion:
+    """Ningun elemento `selector` visible (ausente u oculto)."""
+    return Condicion(nombre, js="!_todos(a).some(_visible)", arg=selector, en=en)
+
+
+def imagen_cargada(
+    selector: str, *, distinta_de: str | None = None, nombre: str = "imagen", en: Any = None
+) -> Condicion:
+    """Imagen decodificada con tamano > 0; con `distinta_de`, solo si ya cambio de `src`."""
+    return Condicion(
+        nombre,
+        js=(
+            "(() => { const img = document.querySelector(a[0]);"
+            " return !!img && img.complete && img.naturalWidth > 0"
+            " && (a[1] === null || img.getAttribute('src') !== a[1]); })()"
+        ),
+        arg=[selector, distinta_de],
+        en=en,
+    )
+
+
+def jsf_inactivo(*, nombre: str = "jsf_inactivo", en: Any = None) -> Condicion:
+    """Sin AJAX en curso: cola PrimeFaces vacia, jQuery.active en 0, sin postback parcial ASP.NET ni blockUI."""
+    return Condicion(nombre, js=_JS_JSF_INACTIVO, en=en)
+
+
+def texto(patron: str, *, nombre: str = "texto", en: Any = None) -> Condicion:
+    """Regex sobre el texto visible del body, en minusculas, sin tildes y con espacios colapsados."""
+    return Condicion(nombre, js="new RegExp(a).test(_texto())", arg=patron, en=en)
+
+
+def js(expresion: str, arg: Any = None, *, nombre: str = "js", en: Any = None) -> Condicion:
+    """Expresion JS arbitraria sobre `a`; verdadera cuando el desenlace ocurrio."""
+    return Condicion(nombre, js=expresion, arg=arg, en=en)
+
+
+def cumple(predicado: Callable[[], bool], *, nombre: str = "cumple") -> Condicion:
+    """Predicado Python (p. ej. una pestana nueva en el contexto)."""
+    return Condicion(nombre, py=predicado)
+
+
+def red_inactiva(
+    page: Any, patron: str | None = None, *, quieto_ms: int = 500, nombre: str = "red_inactiva"
+) -> Condicion:
+    """
+    Ninguna solicitud cuya URL coincida con `patron` (regex; None = todas) en
+    curso durante `quieto_ms`. Escucha desde que se crea: construirla antes del
+    clic que dispara las solicitudes.
+    """
+    regex = re.compile(patron, re.IGNORECASE) if patron else None
+    pendientes: set[Any] = set()
+    ultimo = [time.monotonic()]
+
+    def inicio(request: Any) -> None:
+        if regex is None or regex.search(request.url):
+            pendientes.add(request)
+            ultimo[0] = time.monotonic()
+
+    def fin(request: Any) -> None:
+        if request in pendientes:
+            pendientes.discard(request)
+            ultimo[0] = time.monotonic()
+
+    eventos = (("request", inicio), ("requestfinished", fin), ("requestfailed", fin))
+    for evento, manejador in eventos:
+        page.on(evento, manejador)
+
+    def liberar() -> None:
+        for evento, manejador in eventos:
+            try:
+                page.remove_listener(evento, manejador)
+            except Exception as e:
+                logger.debug("Quitar listener %s: %s", evento, e)
+
+    return Condicion(
+        nombre,
+        py=lambda: not pendientes and (time.monotonic() - ultimo[0]) * 1000 >= quieto_ms,
+        liberar=liberar,
+    )
+
+
+@lru_cache(maxsize=64)
+def _js_carrera(expresiones: tuple[str, ...]) -> str:
+    funciones = ",\n".join(f"(a) => ({e})" for e in expresiones)
+    return f"""(args) => {{
+    {_JS_AUXILIARES}
+    const conds = [{funciones}];
+    for (let i = 0; i < conds.length; i++) {{
+        try {{ if (conds[i](args[i])) return i + 1; }} catch (e) {{}}
+    }}
+    return 0;
+}}"""
+
+
+def _grupos(destino: Any, condiciones: tuple[Condicion, ...]) -> list[tuple[Any, list[int]]]:
+    grupos: list[tuple[Any, list[int]]] = []
+    for i, c in enumerate(condiciones):
+        if c.js is None:
+            continue
+        en = c.en if c.en is not None else destino
+        for g_en, indices in grupos:
+            if g_en is en:
+                indices.append(i)
+                break
+        else:
+            grupos.append((en, [i]))
+    return grupos
+
+
+def _pagina(destino: Any) -> Any:
+    pagina = getattr(destino, "page", None)
+    return destino if pagina is None or callable(pagina) else pagina
+
+
+_lock = threading.Lock()
+_totales = {"fijas_s": 0.0, "eventos_s": 0.0, "esperas": 0, "agotadas": 0}
+# Contadores de la consulta en curso (medir_esperas): cada hilo/tarea tiene los suyos.
+_de_consulta: ContextVar[dict[str, float] | None] = ContextVar("esperas_consulta", default=None)
+
+
+def _acumular(clave: str, valor: float) -> None:
+    propios = _de_consulta.get()
+    with _lock:
+        _totales[clave] += valor
+        if propios is not None:
+            propios[clave] += valor
+
+
+def _registrar_evento(segundos: float, agotada: bool) -> None:
+    _acumular("eventos_s", segundos)
+    _acumular("esperas", 1)
+    _acumular("agotadas", int(agotada))
+
+
+def esperar_primero(destino: Any, *condiciones: Condicion, timeout_ms: float = 30000) -> str | None:
+    """
+    Espera el primero de varios desenlaces y devuelve su `nombre` (ante empate,
+    el primero listado) o None si vence `timeout_ms`. Si todas las condiciones
+    son JS del mismo documento, una sola `wait_for_function`; si no, sondeo con
+    una evaluacion por documento cada INTERVALO_SONDEO_MS.
+    """
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    t0 = time.monotonic()
+    ganadora: str | None = None
+    try:
+        grupos = _grupos(destino, condiciones)
+        solo_js = all(c.js is not None for c in condiciones) and len(grupos) == 1
+        if solo_js:
+            en, indices = grupos[0]
+            try:
+                handle = en.wait_for_function(
+                    _js_carrera(tuple(condiciones[i].js for i in indices)),
+                    arg=[condiciones[i].arg for i in indices],
+                    timeout=timeout_ms,
+                    polling=INTERVALO_SONDEO_MS,
+                )
+                ganadora = condiciones[indices[int(handle.json_value()) - 1]].nombre
+            except PlaywrightTimeoutError:
+                ganadora = None
+            return ganadora
+
+        pagina = _pagina(destino)
+        limite = t0 + timeout_ms / 1000
+        while True:
+            cumplidas: set[int] = set()
+            for en, indices in grupos:
+                try:
+                    r = en.evaluate(
+                        _js_carrera(tuple(condiciones[i].js for i in indices)),
+                        [condiciones[i].arg for i in indices],
+                    )
+                except Exception as e:
+                    logger.debug("Condicion JS no evaluable (navegacion en curso?): %s", e)
+                    continue
+                if r:
+                    cumplidas.add(indices[int(r) - 1])
+            for i, c in enumerate(condiciones):
+                if c.py is not None and i not in cumplidas:
+                    try:
+                        if c.py():
+                            cumplidas.add(i)
+                    except Exception as e:
+                        logger.debug("Condicion %s: %s", c.nombre, e)
+            if cumplidas:
+                ganadora = condiciones[min(cumplidas)].nombre
+                return ganadora
+            restante_ms = (limite - time.monotonic()) * 1000
+            if restante_ms <= 0:
+                return None
+            pagina.wait_for_timeout(min(INTERVALO_SONDEO_MS, restante_ms))
+    finally:
+        for c in condiciones:
+            c.liberar()
+        _registrar_evento(time.monotonic() - t0, ganadora is None)
+
+
+async def esperar_primero_async(
+    destino: Any, *condiciones: Condicion, timeout_ms: float = 30000
+) -> str | None:
+    """`esperar_primero` sobre la API async de Playwright."""
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    t0 = time.monotonic()
+    ganadora: str | None = None
+    try:
+        grupos = _grupos(destino, condiciones)
+        solo_js = all(c.js is not None for c in condiciones) and len(grupos) == 1
+        if solo_js:
+            en, indices = grupos[0]
+            try:
+                handle = await en.wait_for_function(
+                    _js_carrera(tuple(condiciones[i].js for i in indices)),
+                    arg=[condiciones[i].arg for i in indices],
+                    timeout=timeout_ms,
+                    polling=INTERVALO_SONDEO_MS,
+                )
+                ganadora = condiciones[indices[int(await handle.json_value()) - 1]].nombre
+            except PlaywrightTimeoutError:
+                ganadora = None
+            return ganadora
+
+        pagina = _pagina(destino)
+        limite = t0 + timeout_ms / 1000
+        while True:
+            cumplidas: set[int] = set()
+            for en, indices in grupos:
+                try:
+                    r = await en.evaluate(
+                        _js_carrera(tuple(condiciones[i].js for i in indices)),
+                        [condiciones[i].arg for i in indices],
+                    )
+                except Exception as e:
+                    logger.debug("Condicion JS no evaluable (navegacion en curso?): %s", e)
+                    continue
+                if r:
+                    cumplidas.add(indices[int(r) - 1])
+            for i, c in enumerate(condiciones):
+                if c.py is not None and i not in cumplidas:
+                    try:
+                        if c.py():
+                            cumplidas.add(i)
+                    except Exception as e:
+                        logger.debug("Condicion %s: %s", c.nombre, e)
+            if cumplidas:
+                ganadora = condiciones[min(cumplidas)].nombre
+                return ganadora
+            restante_ms = (limite - time.monotonic()) * 1000
+            if restante_ms <= 0:
+                return None
+            await pagina.wait_for_timeout(min(INTERVALO_SONDEO_MS, restante_ms))
+    finally:
+        for c in condiciones:
+            c.liberar()
+        _registrar_evento(time.monotonic() - t0, ganadora is None)
+
+
+# Observador en la pagina: un MutationObserver resuelve la promesa en cuanto
+# aparece el objetivo y devuelve solo el fragmento, sin serializar el documento
+# desde Python. El intervalo cubre iframes del mismo origen y mutaciones que el
+# observador del documento principal no ve.
+_JS_OBSERVAR = """([objetivos, timeoutMs, marca, marcar]) => new Promise((resolve) => {
+    const norm = (s) => (s || '').normalize('NFD').replace(/[\\u0300-\\u036f]/g, '')
+        .replace(/\\s+/g, ' ').toLowerCase();
+    const docs = () => {
+        const out = [document];
+        for (const f of document.querySelectorAll('iframe, frame')) {
+            try { if (f.contentDocument) out.push(f.contentDocument); } catch (e) {}
+        }
+        return out;
+    };
+    if (marcar) window.__bybotMarca = marca;
+    const buscar = () => {
+        const ds = docs();
+        for (let i = 0; i < objetivos.length; i++) {
+            const [tipo, valor] = objetivos[i];
+            if (tipo === 'nuevo') {
+                if (window.__bybotMarca !== marca) return [i, ''];
+                continue;
+            }
+            for (const d of ds) {
+                try {
+                    if (tipo === 'elemento') {
+                        const el = d.querySelector(valor);
+                        if (el) return [i, el.outerHTML];
+                    } else {
+                        const m = norm(d.body && d.body.innerText).match(new RegExp(valor));
+                        if (m) return [i, m[0]];
+                    }
+                } catch (e) {}
+            }
+        }
+        return null;
+    };
+    let hecho = false, pendiente = false, obs = null, iv = null, to = null;
+    const fin = (r) => {
+        if (hecho) return;
+        hecho = true;
+        if (obs) obs.disconnect();
+        clearInterval(iv);
+        clearTimeout(to);
+        resolve(r);
+    };
+    const revisar = () => { pendiente = false; const r = buscar(); if (r) fin(r); };
+    revisar();
+    if (hecho) return;
+    obs = new MutationObserver(() => {
+        if (!pendiente) { pendiente = true; setTimeout(revisar, 0); }
+    });
+    obs.observe(document.documentElement, { childList: true, subtree: true, characterData: true });
+    iv = setInterval(revisar, 250);
+    to = setTimeout(() => fin(null), timeoutMs);
+})"""
+
+
+class Objetivo:
+    """Lo que `esperar_fragmento` observa: `tipo` elemento / texto / nuevo y su `valor`."""
+
+    def __init__(self, nombre: str, tipo: str, valor: str = ""):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.valor = valor
+
+
+def aparece_elemento(selector: str, *, nombre: str = "elemento") -> Objetivo:
+    """Primer elemento CSS `selector` en el documento (o iframe del mismo origen); fragmento: su outerHTML."""
+    return Objetivo(nombre, "elemento", selector)
+
+
+def aparece_texto(patron: str, *, nombre: str = "texto") -> Objetivo:
+    """Regex sobre el texto visible normalizado como en `texto()`; fragmento: lo que coincidio."""
+    return Objetivo(nombre, "texto", patron)
+
+
+def documento_nuevo(*, nombre: str = "documento_nuevo") -> Objetivo:
+    """El destino navego a otro documento (postback completo); fragmento vacio."""
+    return Objetivo(nombre, "nuevo")
+
+
+def _contexto_destruido(error: Exception) -> bool:
+    msg = str(error)
+    return "Execution context was destroyed" in msg or "navigat" in msg.lower()
+
+
+def esperar_fragmento(
+    destino: Any, *objetivos: Objetivo, timeout_ms: float = 30000
+) -> tuple[str, str] | None:
+    """
+    Primer objetivo que aparece en `destino` como (`nombre`, fragmento), o None
+    si vence `timeout_ms`. Si el documento navega se vuelve a observar el nuevo.
+    """
+    t0 = time.monotonic()
+    limite = t0 + timeout_ms / 1000
+    marca = f"{id(objetivos):x}{time.monotonic_ns():x}"
+    datos = [[o.tipo, o.valor] for o in objetivos]
+    resultado: tuple[str, str] | None = None
+    marcar = True
+    try:
+        while (restante_ms := (limite - time.monotonic()) * 1000) > 0:
+            try:
+                r = destino.evaluate(_JS_OBSERVAR, [datos, restante_ms, marca, marcar])
+            except Exception as e:
+                if not _contexto_destruido(e):
+                    raise
+                logger.debug("Documento observado navego; se observa el nuevo: %s", e)
+                marcar = False
+                try:
+                    destino.wait_for_load_state("domcontentloaded", timeout=max(1.0, restante_ms))
+                except Exception as e_carga:
+                    logger.debug("Esperando documento nuevo: %s", e_carga)
+                continue
+            if r:
+                resultado = (objetivos[int(r[0])].nombre, r[1])
+            return resultado
+        return None
+    finally:
+        _registrar_evento(time.monotonic() - t0, resultado is None)
+
+
+async def esperar_fragmento_async(
+    destino: Any, *objetivos: Objetivo, timeout_ms: float = 30000
+) -> tuple[str, str] | None:
+    """`esperar_fragmento` sobre la API async de Playwright."""
+    t0 = time.monotonic()
+    limite = t0 + timeout_ms / 1000
+    marca = f"{id(objetivos):x}{time.monotonic_ns():x}"
+    datos = [[o.tipo, o.valor] for o in objetivos]
+    resultado: tuple[str, str] | None = None
+    marcar = True
+    try:
+        while (restante_ms := (limite - time.monotonic()) * 1000) > 0:
+            try:
+                r = await destino.evaluate(_JS_OBSERVAR, [datos, restante_ms, marca, marcar])
+            except Exception as e:
+                if not _contexto_destruido(e):
+                    raise
+                logger.debug("Documento observado navego; se observa el nuevo: %s", e)
+                marcar = False
+                try:
+                    await destino.wait_for_load_state("domcontentloaded", timeout=max(1.0, restante_ms))
+                except Exception as e_carga:
+                    logger.debug("Esperando documento nuevo: %s", e_carga)
+                continue
+            if r:
+                resultado = (objetivos[int(r[0])].nombre, r[1])
+            return resultado
+        return None
+    finally:
+        _registrar_evento(time.monotonic() - t0, resultado is None)
+
+
+def pausa(segundos: float) -> None:
+    """Espera fija (ritmo humano, teclas, reintentos); se contabiliza aparte de las esperas por evento."""
+    if segundos <= 0:
+        return
+    time.sleep(segundos)
+    _acumular("fijas_s", segundos)
+
+
+def resumen_esperas() -> dict[str, float]:
+    with _lock:
+        return dict(_totales)
+
+
+@contextmanager
+def medir_esperas(etiqueta: str) -> Iterator[None]:
+    """
+    Registra en el log los segundos de espera fija y por evento de una consulta.
+    Cuenta solo las esperas de este hilo/tarea, aunque corran otras consultas a la vez.
+    """
+    propios = {"fijas_s": 0.0, "eventos_s": 0.0, "esperas": 0, "agotadas": 0}
+    token = _de_consulta.set(propios)
+    try:
+        yield
+    finally:
+        _de_consulta.reset(token)
+        logger.info(
+            "Esperas (%s): %.1fs fijas, %.1fs por evento en %s esperas (%s vencidas)",
+            etiqueta,
+            propios["fijas_s"],
+            propios["eventos_s"],
+            propios["esperas"],
+            propios["agotadas"],
+        )
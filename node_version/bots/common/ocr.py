@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+WHITELIST_ALFANUMERICO = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+OCR_BACKEND = os.environ.get("BYBOT_OCR_BACKEND", "auto").strip().lower()
+TESSERACT_LANG = os.environ.get("BYBOT_TESSERACT_LANG", "eng")
+OCR_WORKERS = int(os.environ.get("BYBOT_OCR_WORKERS", "0") or 0)
+
+_BACKENDS_VALIDOS = ("auto", "tesserocr", "pytesseract")
+
+_lecturas = 0
+_lecturas_lock = threading.Lock()
+
+
+def lecturas_realizadas() -> int:
+    """Lecturas Tesseract entregadas en este proceso (serie, pool o daemon OCR)."""
+    return _lecturas
+
+
+def contar_lecturas(n: int = 1) -> None:
+    global _lecturas
+    with _lecturas_lock:
+        _lecturas += n
+
+
+def ocr_disponible() -> bool:
+    return tesserocr is not None or pytesseract is not None
+
+
+def _resolver_backend(preferido: str) -> str:
+    if preferido not in _BACKENDS_VALIDOS:
+        logger.warning("BYBOT_OCR_BACKEND=%r no reconocido; se usa 'auto'.", preferido)
+        preferido = "auto"
+    if preferido in ("auto", "tesserocr") and tesserocr is not None:
+        return "tesserocr"
+    if preferido == "tesserocr":
+        logger.warning("tesserocr no instalado; se usa pytesseract (subproceso por lectura).")
+    if pytesseract is None:
+        raise RuntimeError("Instale tesserocr o pytesseract: pip install pytesseract")
+    return "pytesseract"
+
+
+class MotorTesseract:
+    """
+    Lector Tesseract reutilizable. Con tesserocr mantiene un handle TessBaseAPI
+    cargado por cada combinacion (oem, psm) y lo reutiliza entre variantes e
+    intentos; sin tesserocr delega en pytesseract (un subproceso por lectura).
+    """
+
+    def __init__(
+        self,
+        *,
+        whitelist: str = WHITELIST_ALFANUMERICO,
+        backend: str = OCR_BACKEND,
+        lang: str = TESSERACT_LANG,
+    ):
+        self.whitelist = whitelist
+        self.lang = lang
+        self.backend = _resolver_backend(backend)
+        self._apis: dict[tuple[int, int], Any] = {}
+        self._locks: dict[tuple[int, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _api(self, oem: int, psm: int) -> tuple[Any, threading.Lock]:
+        clave = (oem, psm)
+        with self._lock:
+            api = self._apis.get(clave)
+            if api is None:
+                api = tesserocr.PyTessBaseAPI(
+                    lang=self.lang,
+                    oem=oem,
+                    psm=psm,
+                    variables={"tessedit_char_whitelist": self.whitelist},
+                )
+                self._apis[clave] = api
+                self._locks[clave] = threading.Lock()
+                logger.debug("TessBaseAPI cargada (oem=%s psm=%s)", oem, psm)
+            return api, self._locks[clave]
+
+    def _leer_pytesseract(self, imagen: Image.Image, oem: int, psm: int) -> str:
+        cfg = f"--oem {oem} --psm {psm} -c tessedit_char_whitelist={self.whitelist}"
+        return pytesseract.image_to_string(imagen, lang=self.lang, config=cfg)
+
+    def leer(self, imagen: Image.Image, *, oem: int, psm: int) -> str:
+        if self.backend == "tesserocr":
+            try:
+                api, lock = self._api(oem, psm)
+            except Exception as e:
+                if pytesseract is None:
+                    raise
+                logger.warning("No se pudo iniciar tesserocr (%s); se usa pytesseract.", e)
+                self.backend = "pytesseract"
+                return self._leer_pytesseract(imagen, oem, psm)
+            with lock:
+                api.SetImage(imagen)
+                return api.GetUTF8Text()
+        return self._leer_pytesseract(imagen, oem, psm)
+
+    def precalentar(self, combinaciones: Iterable[tuple[int, int]]) -> None:
+        if self.backend != "tesserocr":
+            return
+        for oem, psm in combinaciones:
+            try:
+                self._api(oem, psm)
+            except Exception as e:
+                logger.debug("Precalentar oem=%s psm=%s: %s", oem, psm, e)
+
+    def leer_lote(
+        self, trabajos: list[tuple[Image.Image, int, int]]
+    ) -> Iterator[tuple[int, str | None]]:
+        for indice, (imagen, oem, psm) in enumerate(trabajos):
+            try:
+                yield indice, self.leer(imagen, oem=oem, psm=psm)
+            except Exception as e:
+                logger.debug("OCR fallo (oem=%s psm=%s): %s", oem, psm, e)
+                yield indice, None
+
+    def cerrar(self) -> None:
+        with self._lock:
+            for api in self._apis.values():
+                try:
+                    api.End()
+                except Exception as e:
+                    logger.debug("End TessBaseAPI: %s", e)
+            self._apis.clear()
+            self._locks.clear()
+
+
+_motor: MotorTesseract | None = None
+_motor_lock = threading.Lock()
+
+
+def obtener_motor() -> MotorTesseract:
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorTesseract()
+            logger.info("Motor OCR: %s", _motor.backend)
+        return _motor
+
+
+def _inicializar_worker(backend: str, lang: str, whitelist: str, precalentar: tuple[tuple[int, int], ...]) -> None:
+    global _motor
+    _motor = MotorTesseract(whitelist=whitelist, backend=backend, lang=lang)
+    _motor.precalentar(precalentar)
+
+
+def _leer_grupo_en_worker(
+    imagen: Image.Image, lecturas: list[tuple[int, int, int]]
+) -> list[tuple[int, str | None]]:
+    motor = obtener_motor()
+    out: list[tuple[int, str | None]] = []
+    for indice, oem, psm in lecturas:
+        try:
+            out.append((indice, motor.leer(imagen, oem=oem, psm=psm)))
+        except Exception:
+            out.append((indice, None))
+    return out
+
+
+def _ping_worker() -> int:
+    return os.getpid()
+
+
+class PoolOCR:
+    """
+    Reparte lecturas (imagen, oem, psm) entre procesos con motores Tesseract
+    precalentados. Las lecturas de una misma imagen viajan juntas para no
+    serializarla una vez por PSM/OEM.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        precalentar: Iterable[tuple[int, int]] = (),
+        motor: MotorTesseract | None = None,
+    ):
+        base = motor or obtener_motor()
+        self.workers = max(1, workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar_worker,
+            initargs=(base.backend, base.lang, base.whitelist, tuple(precalentar)),
+        )
+
+    def calentar(self) -> None:
+        pids = {f.result() for f in [self._executor.submit(_ping_worker) for _ in range(self.workers)]}
+        logger.info("Pool OCR listo: %s procesos (%s)", self.workers, sorted(pids))
+
+    def leer_lote(
+        self, trabajos: list[tuple[Image.Image, int, int]]
+    ) -> Iterator[tuple[int, str | None]]:
+        grupos: dict[int, tuple[Image.Image, list[tuple[int, int, int]]]] = {}
+        for indice, (imagen, oem, psm) in enumerate(trabajos):
+            grupos.setdefault(id(imagen), (imagen, []))[1].append((indice, oem, psm))
+        pendientes = {
+            self._executor.submit(_leer_grupo_en_worker, imagen, lecturas)
+            for imagen, lecturas in grupos.values()
+        }
+        try:
+            while pendientes:
+                hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for fut in hechos:
+                    yield from fut.result()
+        finally:
+            for fut in pendientes:
+                fut.cancel()
+
+    def cerrar(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: PoolOCR | None = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool(
+    workers: int | None = None,
+    *,
+    precalentar: Iterable[tuple[int, int]] = (),
+) -> PoolOCR | None:
+    global _pool
+    n = OCR_WORKERS if workers is None else workers
+    if n <= 1:
+        return None
+    motor = obtener_motor()
+    with _pool_lock:
+        if _pool is None:
+            pool = PoolOCR(n, precalentar=precalentar, motor=motor)
+            try:
+                pool.calentar()
+            except Exception as e:
+                logger.warning("Pool OCR no disponible (%s); se usa OCR en serie.", e)
+                pool.cerrar()
+                return None
+            _pool = pool
+            atexit.register(pool.cerrar)
+        return _pool
+
+
+def iterar_lote(
+    trabajos: list[tuple[Image.Image, int, int]],
+    *,
+    pool: PoolOCR | None = None,
+) -> Iterator[tuple[int, str | None]]:
+    entregados: set[int] = set()
+    if pool is not None:
+        try:
+            for indice, texto in pool.leer_lote(trabajos):
+                entregados.add(indice)
+                contar_lecturas()
+                yield indice, texto
+            return
+        except BrokenProcessPool as e:
+            logger.warning("Pool OCR roto (%s); se completa el lote en serie.", e)
+    faltantes = [i for i in range(len(trabajos)) if i not in entregados]
+    for k, texto in obtener_motor().leer_lote([trabajos[i] for i in faltantes]):
+        contar_lecturas()
+        yield faltantes[k], texto
+
+
+def leer_lote(
+    trabajos: list[tuple[Image.Image, int, int]],
+    *,
+    pool: PoolOCR | None = None,
+) -> list[str | None]:
+    resultados: list[str | None] = [None] * len(trabajos)
+    for indice, texto in iterar_lote(trabajos, pool=pool):
+        resultados[indice] = texto
+    return resultados
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from common.ocr import iterar_lote, obtener_motor, obtener_pool
+
+logger = logging.getLogger(__name__)
+
+DAEMON_SOCKET = Path(os.environ.get("BYBOT_OCR_DAEMON_SOCKET", "") or "/tmp/bybot_ocr.sock")
+DAEMON_TIMEOUT = float(os.environ.get("BYBOT_OCR_DAEMON_TIMEOUT", "30") or 30)
+DAEMON_CPUS = int(os.environ.get("BYBOT_OCR_DAEMON_CPUS", "0") or 0) or max(1, (os.cpu_count() or 2) // 2)
+DAEMON_VENTANA_MS = float(os.environ.get("BYBOT_OCR_DAEMON_VENTANA_MS", "5") or 0)
+
+_CABECERA = struct.Struct(">II")
+
+
+def _recibir_exacto(sock: socket.socket, n: int) -> bytes:
+    partes: list[bytes] = []
+    while n > 0:
+        bloque = sock.recv(min(n, 1 << 20))
+        if not bloque:
+            raise ConnectionError("Conexion cerrada por el otro extremo")
+        partes.append(bloque)
+        n -= len(bloque)
+    return b"".join(partes)
+
+
+def enviar_mensaje(sock: socket.socket, cabecera: dict[str, Any], cuerpo: bytes = b"") -> None:
+    meta = json.dumps(cabecera).encode("utf-8")
+    sock.sendall(_CABECERA.pack(len(meta), len(cuerpo)) + meta + cuerpo)
+
+
+def recibir_mensaje(sock: socket.socket) -> tuple[dict[str, Any], bytes]:
+    n_meta, n_cuerpo = _CABECERA.unpack(_recibir_exacto(sock, _CABECERA.size))
+    meta = json.loads(_recibir_exacto(sock, n_meta).decode("utf-8"))
+    return meta, _recibir_exacto(sock, n_cuerpo)
+
+
+def empaquetar_trabajos(trabajos: list[tuple[Image.Image, int, int]]) -> tuple[dict[str, Any], bytes]:
+    # Cada imagen distinta viaja una sola vez (crudo, sin recomprimir); las
+    # lecturas la referencian por indice.
+    indices: dict[int, int] = {}
+    imagenes: list[dict[str, Any]] = []
+    cuerpo = bytearray()
+    lecturas: list[tuple[int, int, int]] = []
+    for imagen, oem, psm in trabajos:
+        k = indices.get(id(imagen))
+        if k is None:
+            crudo = imagen.tobytes()
+            k = indices[id(imagen)] = len(imagenes)
+            imagenes.append({"modo": imagen.mode, "ancho": imagen.width, "alto": imagen.height, "bytes": len(crudo)})
+            cuerpo += crudo
+        lecturas.append((k, oem, psm))
+    return {"tipo": "leer", "imagenes": imagenes, "lecturas": lecturas}, bytes(cuerpo)
+
+
+def desempaquetar_trabajos(cabecera: dict[str, Any], cuerpo: bytes) -> list[tuple[Image.Image, int, int]]:
+    imagenes: list[Image.Image] = []
+    pos = 0
+    for meta in cabecera["imagenes"]:
+        crudo = cuerpo[pos : pos + meta["bytes"]]
+        pos += meta["bytes"]
+        imagenes.append(Image.frombytes(meta["modo"], (meta["ancho"], meta["alto"]), crudo))
+    return [(imagenes[k], oem, psm) for k, oem, psm in cabecera["lecturas"]]
+
+
+class _Solicitud:
+    def __init__(self, trabajos: list[tuple[Image.Image, int, int]]):
+        self.trabajos = trabajos
+        self.textos: list[str | None] = [None] * len(trabajos)
+        self.lista = threading.Event()
+
+
+class ServidorOCR:
+    """
+    Servicio OCR local (socket Unix) con motores Tesseract precalentados. Junta
+    las solicitudes que llegan dentro de una ventana corta en un solo lote y lo
+    resuelve con a lo sumo `cpus` procesos, de modo que muchos bots en paralelo
+    no sobresuscriban la maquina.
+    """
+
+    def __init__(
+        self,
+        ruta_socket: Path = DAEMON_SOCKET,
+        *,
+        cpus: int = DAEMON_CPUS,
+        ventana_ms: float = DAEMON_VENTANA_MS,
+        precalentar: list[tuple[int, int]] | None = None,
+    ):
+        self.ruta_socket = ruta_socket
+        self.cpus = max(1, cpus)
+        self.ventana_s = max(0.0, ventana_ms) / 1000
+        obtener_motor().precalentar(precalentar or [])
+        self._pool = obtener_pool(self.cpus, precalentar=precalentar or [])
+        self._cola: queue.Queue[_Solicitud] = queue.Queue()
+        self._servidor: socketserver.ThreadingUnixStreamServer | None = None
+        self.solicitudes = 0
+        self.lotes = 0
+        self.lecturas = 0
+
+    def _despachar(self) -> None:
+        while True:
+            grupo = [self._cola.get()]
+            limite = time.monotonic() + self.ventana_s
+            while (restante := limite - time.monotonic()) > 0:
+                try:
+                    grupo.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            while True:
+                try:
+                    grupo.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            trabajos: list[tuple[Image.Image, int, int]] = []
+            destino: list[tuple[_Solicitud, int]] = []
+            for sol in grupo:
+                for i, trabajo in enumerate(sol.trabajos):
+                    trabajos.append(trabajo)
+                    destino.append((sol, i))
+            try:
+                for k, texto in iterar_lote(trabajos, pool=self._pool):
+                    sol, i = destino[k]
+                    sol.textos[i] = texto
+            except Exception as e:
+                logger.warning("Lote OCR fallo (%s lecturas): %s", len(trabajos), e)
+            self.lotes += 1
+            self.lecturas += len(trabajos)
+            logger.debug("Lote OCR: %s solicitudes, %s lecturas", len(grupo), len(trabajos))
+            for sol in grupo:
+                sol.lista.set()
+
+    def atender(self, sock: socket.socket) -> None:
+        cabecera, cuerpo = recibir_mensaje(sock)
+        tipo = cabecera.get("tipo")
+        if tipo == "estado":
+            enviar_mensaje(
+                sock,
+                {
+                    "pid": os.getpid(),
+                    "cpus": self.cpus,
+                    "solicitudes": self.solicitudes,
+                    "lotes": self.lotes,
+                    "lecturas": self.lecturas,
+                    "pendientes": self._cola.qsize(),
+                },
+            )
+            return
+        if tipo != "leer":
+            enviar_mensaje(sock, {"error": f"tipo desconocido: {tipo!r}"})
+            return
+        sol = _Solicitud(desempaquetar_trabajos(cabecera, cuerpo))
+        self.solicitudes += 1
+        self._cola.put(sol)
+        sol.lista.wait()
+        enviar_mensaje(sock, {"textos": sol.textos})
+
+    def servir(self) -> None:
+        if self.ruta_socket.exists():
+            self.ruta_socket.unlink()
+        servicio = self
+
+        class _Manejador(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                try:
+                    servicio.atender(self.request)
+                except (ConnectionError, OSError, ValueError) as e:
+                    logger.debug("Cliente OCR desconectado: %s", e)
+
+        threading.Thread(target=self._despachar, name="ocr-despachador", daemon=True).start()
+        self._servidor = socketserver.ThreadingUnixStreamServer(str(self.ruta_socket), _Manejador)
+        self._servidor.daemon_threads = True
+        os.chmod(self.ruta_socket, 0o660)
+        logger.info(
+            "Daemon OCR escuchando en %s | cpus=%s | ventana=%.0f ms",
+            self.ruta_socket, self.cpus, self.ventana_s * 1000,
+        )
+        try:
+            self._servidor.serve_forever()
+        finally:
+            self._servidor.server_close()
+            self.ruta_socket.unlink(missing_ok=True)
+
+    def detener(self) -> None:
+        if self._servidor is not None:
+            self._servidor.shutdown()
+
+
+class ClienteOCR:
+    """Cliente del daemon OCR. Tras un fallo de conexion no reintenta durante `espera_s`."""
+
+    def __init__(self, ruta_socket: Path = DAEMON_SOCKET, *, timeout: float = DAEMON_TIMEOUT, espera_s: float = 30):
+        self.ruta_socket = ruta_socket
+        self.timeout = timeout
+        self.espera_s = espera_s
+        self._caido_hasta = 0.0
+
+    def disponible(self) -> bool:
+        return time.monotonic() >= self._caido_hasta and self.ruta_socket.exists()
+
+    def _consultar(self, cabecera: dict[str, Any], cuerpo: bytes = b"") -> dict[str, Any]:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(str(self.ruta_socket))
+                enviar_mensaje(sock, cabecera, cuerpo)
+                respuesta, _ = recibir_mensaje(sock)
+        except (OSError, ConnectionError, ValueError) as e:
+            self._caido_hasta = time.monotonic() + self.espera_s
+            raise ConnectionError(f"Daemon OCR no responde ({self.ruta_socket}): {e}") from e
+        if "error" in respuesta:
+            raise ConnectionError(f"Daemon OCR: {respuesta['error']}")
+        return respuesta
+
+    def leer_lote(self, trabajos: list[tuple[Image.Image, int, int]]) -> list[str | None]:
+        cabecera, cuerpo = empaquetar_trabajos(trabajos)
+        return self._consultar(cabecera, cuerpo)["textos"]
+
+    def estado(self) -> dict[str, Any]:
+        return self._consultar({"tipo": "estado"})
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from typing import Any
+
+from playwright.sync_api import Page
+
+from common.browser_pool import PoolNavegadores, abrir_contexto
+from common.esperas import medir_esperas
+
+logger = logging.getLogger(__name__)
+
+PAGINAS_POR_PORTAL = int(os.environ.get("BYBOT_PAGINAS_CALIENTES", "1") or 0)
+PAGINAS_TTL_S = float(os.environ.get("BYBOT_PAGINAS_TTL_S", "600") or 600)
+
+
+class PortalCaliente:
+    """
+    Como dejar una pagina de un portal lista para llenar (`preparar`) y como
+    saber si una pagina estacionada sigue sirviendo (`vigente`). `preparar`
+    puede devolver un adjunto (p. ej. un listener instalado antes de navegar)
+    que viaja con la pagina.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        *,
+        preparar: Callable[[Page], Any],
+        vigente: Callable[[Page], bool] | None = None,
+        opciones_contexto: dict[str, Any] | None = None,
+        ttl_s: float = PAGINAS_TTL_S,
+        timeout_ms: float = 30000,
+    ):
+        self.nombre = nombre
+        self.preparar = preparar
+        self.vigente = vigente
+        self.opciones_contexto = opciones_contexto or {}
+        self.ttl_s = ttl_s
+        self.timeout_ms = timeout_ms
+
+
+class PaginaLista:
+    """Pagina entregada a una consulta. Si no vino del pool, `preparar()` la lleva al formulario."""
+
+    def __init__(self, portal: PortalCaliente, page: Page, *, adjunto: Any = None, caliente: bool = False):
+        self.portal = portal
+        self.page = page
+        self.adjunto = adjunto
+        self.caliente = caliente
+        self.preparada = caliente
+        self.creada = time.monotonic()
+
+    def preparar(self) -> Any:
+        if not self.preparada:
+            self.adjunto = self.portal.preparar(self.page)
+            self.preparada = True
+            self.creada = time.monotonic()
+        return self.adjunto
+
+
+class _Estacionada:
+    def __init__(self, pila: ExitStack, lista: PaginaLista):
+        self.pila = pila
+        self.lista = lista
+
+
+class PoolPaginasCalientes:
+    """
+    Paginas ya navegadas hasta el formulario de cada portal, cada una en su
+    propio contexto del pool de navegadores. `tomar()` entrega una vigente o,
+    si no hay, una nueva sin preparar; `reponer()` rellena el pool y se llama
+    entre consultas (la API sync de Playwright no admite trabajo en otro hilo).
+    """
+
+    def __init__(self, navegadores: PoolNavegadores, *, por_portal: int = PAGINAS_POR_PORTAL):
+        self.navegadores = navegadores
+        self.por_portal = max(0, por_portal)
+        self._portales: dict[tuple[str, bool], PortalCaliente] = {}
+        self._estacionadas: dict[tuple[str, bool], list[_Estacionada]] = {}
+        self.calientes = 0
+        self.frias = 0
+        self.descartadas = 0
+
+    def _abrir(self, portal: PortalCaliente, headless: bool) -> tuple[ExitStack, PaginaLista]:
+        pila = ExitStack()
+        try:
+            context = pila.enter_context(
+                self.navegadores.contexto(headless=headless, **portal.opciones_contexto)
+            )
+            page = context.new_page()
+            page.set_default_timeout(portal.timeout_ms)
+        except Exception:
+            pila.close()
+            raise
+        return pila, PaginaLista(portal, page)
+
+    def _descartar(self, est: _Estacionada, motivo: str) -> None:
+        self.descartadas += 1
+        logger.info("Pagina caliente %s descartada (%s)", est.lista.portal.nombre, motivo)
+        try:
+            est.pila.close()
+        except Exception as e:
+            logger.debug("Cerrar pagina caliente: %s", e)
+
+    def _motivo_vencida(self, est: _Estacionada) -> str:
+        lista = est.lista
+        edad = time.monotonic() - lista.creada
+        if lista.page.is_closed():
+            return "pagina cerrada"
+        if edad > lista.portal.ttl_s:
+            return f"{edad:.0f} s estacionada"
+        if lista.portal.vigente is not None:
+            try:
+                if not lista.portal.vigente(lista.page):
+                    return "sesion o formulario vencido"
+            except Exception as e:
+                return f"chequeo fallo: {e}"
+        return ""
+
+    @contextmanager
+    def tomar(self, portal: PortalCaliente, *, headless: bool) -> Iterator[PaginaLista]:
+        clave = (portal.nombre, headless)
+        self._portales[clave] = portal
+        estacionadas = self._estacionadas.setdefault(clave, [])
+        while estacionadas:
+            est = estacionadas.pop(0)
+            motivo = self._motivo_vencida(est)
+            if motivo:
+                self._descartar(est, motivo)
+                continue
+            self.calientes += 1
+            logger.info("Pagina caliente %s tomada del pool", portal.nombre)
+            with est.pila:
+                yield est.lista
+            return
+
+        self.frias += 1
+        pila, lista = self._abrir(portal, headless)
+        with pila:
+            yield lista
+
+    def reponer(self, *, limite_s: float | None = None) -> int:
+        inicio = time.monotonic()
+        repuestas = 0
+        for clave, portal in list(self._portales.items()):
+            estacionadas = self._estacionadas.setdefault(clave, [])
+            for est in list(estacionadas):
+                motivo = self._motivo_vencida(est)
+                if motivo:
+                    estacionadas.remove(est)
+                    self._descartar(est, motivo)
+            while len(estacionadas) < self.por_portal:
+                if limite_s is not None and time.monotonic() - inicio >= limite_s:
+                    return repuestas
+                t0 = time.monotonic()
+                pila, lista = self._abrir(portal, clave[1])
+                try:
+                    lista.preparar()
+                except Exception as e:
+                    pila.close()
+                    logger.warning("No se pudo calentar pagina %s: %s", portal.nombre, e)
+                    break
+                lista.caliente = True
+                estacionadas.append(_Estacionada(pila, lista))
+                repuestas += 1
+                logger.info("Pagina caliente %s lista en %.1f s", portal.nombre, time.monotonic() - t0)
+        return repuestas
+
+    def resumen(self) -> dict[str, int]:
+        return {
+            "calientes": self.calientes,
+            "frias": self.frias,
+            "descartadas": self.descartadas,
+            "estacionadas": sum(len(v) for v in self._estacionadas.values()),
+        }
+
+    def cerrar(self) -> None:
+        for estacionadas in self._estacionadas.values():
+            for est in estacionadas:
+                try:
+                    est.pila.close()
+                except Exception as e:
+                    logger.debug("Cerrar pagina caliente: %s", e)
+        self._estacionadas.clear()
+
+
+@contextmanager
+def abrir_pagina_portal(
+    pool: PoolNavegadores | None,
+    paginas: PoolPaginasCalientes | None,
+    portal: PortalCaliente,
+    *,
+    headless: bool,
+) -> Iterator[PaginaLista]:
+    """Pagina del pool caliente si se entrega uno; si no, contexto nuevo (pool de navegadores u one-off)."""
+    if paginas is not None:
+        with medir_esperas(portal.nombre), paginas.tomar(portal, headless=headless) as lista:
+            yield lista
+        return
+
+    with abrir_contexto(pool, headless=headless, **portal.opciones_contexto) as context:
+        page = context.new_page()
+        page.set_default_timeout(portal.timeout_ms)
+        yield PaginaLista(portal, page)
@@ -12,6 +12,10 @@ from playwright.sync_api import (
     TimeoutError as PlaywrightTimeoutError,
 )
 
+from common.esperas import esperar_primero, js, jsf_inactivo, pausa
+from common.plan_interaccion import intentar_en_orden, portal_de
+from common.sondeo_dom import sondear, sondear_superficies
+
 logger = logging.getLogger(__name__)
 
 IMG_CONSULTAR = 'img[src*="bot_consultar.jpg"].borderImage'
@@ -59,6 +63,17 @@ SELECTORES_RADIO_PERIODO = [
     r'label:has([for$=":radio_periodoCotizacion"])',
 ]
 
+SELECTOR_CARGANDO = ".ui-blockui, .ui-blockui-document"
+_PATRON_CARGANDO = "favor, espere"
+# Solo donde hay radios vale la pena preguntar por nombre accesible (get_by_role).
+_SELECTOR_RADIOS = "input[type='radio'], [role='radio']"
+_SELECTOR_FILA_CUADRO = "table#cuadro1 tbody tr"
+_SELECTOR_RADIO_FORMATO_PDF = (
+    'input[type="radio"][value*="PDF" i], '
+    'input[type="radio"][id*="PDF" i], '
+    'input[type="radio"][name*="formato" i]'
+)
+
 
 def as_page(sup: Page | Frame) -> Page:
     return sup if isinstance(sup, Page) else sup.page
@@ -87,6 +102,11 @@ def _superficies_busqueda_calendario(sup: Page | Frame) -> list[Page | Frame]:
     return [sup, as_page(sup)]
 
 
+def _clave_estrategia(opcion: tuple[str, bool | None]) -> str:
+    sel, force = opcion
+    return sel if force is None else f"{sel} force={force}"
+
+
 def resumen_pagina(page: Page) -> str:
     partes: list[str] = [f"url={page.url!r}", f"title={page.title()!r}"]
     for i, fr in enumerate(page.frames):
@@ -114,19 +134,21 @@ def _clic_locator_robusto(mono: Locator) -> bool:
 
 
 def _esperar_cargando_suave(page: Page) -> None:
-    for sel in (".ui-blockui", ".ui-blockui-document"):
-        try:
-            loc = page.locator(sel)
-            if loc.count() and loc.first.is_visible():
-                loc.first.wait_for(state="hidden", timeout=120000)
-        except Exception as e:
-            logger.debug("Espera %s: %s", sel, e)
+    s = sondear(page, [SELECTOR_CARGANDO], {"cargando": _PATRON_CARGANDO})
+    if not s.visibles(SELECTOR_CARGANDO) and not s.hay("cargando"):
+        return
     try:
-        t = page.get_by_text("Favor, Espere", exact=False)
-        if t.count() and t.first.is_visible():
-            t.first.wait_for(state="hidden", timeout=120000)
+        esperar_primero(
+            page,
+            js(
+                "!_todos(a[0]).some(_visible) && !new RegExp(a[1]).test(_texto())",
+                [SELECTOR_CARGANDO, _PATRON_CARGANDO],
+                nombre="sin_cargando",
+            ),
+            timeout_ms=120000,
+        )
     except Exception as e:
-        logger.debug("Espera texto cargando: %s", e)
+        logger.debug("Espera cargando: %s", e)
 
 
 def clic_radio_periodo_cotizacion(p: Page) -> Page | Frame:
@@ -144,7 +166,15 @@ def clic_radio_periodo_cotizacion(p: Page) -> Page | Frame:
             except Exception:
                 pass
         busca += 1
-        for sup in _superficies(p):
+        for s in sondear_superficies(_superficies(p), [*SELECTORES_RADIO_PERIODO, _SELECTOR_RADIOS]):
+            sup = s.superficie
+            for sel in SELECTORES_RADIO_PERIODO:
+                for i in s.habilitados(sel):
+                    if _clic_locator_robusto(sup.locator(sel).nth(i)):
+                        logger.info("Radio: selector %r indice %s", sel, i)
+                        return sup
+            if not s.n(_SELECTOR_RADIOS):
+                continue
             for pat in (r"periodo.*cotiz", r"período.*cotiz", r"periodo"):
                 try:
                     g = sup.get_by_role("radio", name=re.compile(pat, re.IGNORECASE))
@@ -156,67 +186,60 @@ def clic_radio_periodo_cotizacion(p: Page) -> Page | Frame:
                             return sup
                 except Exception as e:
                     logger.debug("get_by_role %r: %s", pat, e)
-            for sel in SELECTORES_RADIO_PERIODO:
-                try:
-                    loc = sup.locator(sel)
-                except Exception as e:
-                    logger.debug("selector %r: %s", sel, e)
-                    continue
-                n = loc.count()
-                for i in range(n):
-                    uno = loc.nth(i)
-                    try:
-                        if not uno.is_enabled():
-                            continue
-                    except Exception:
-                        continue
-                    if _clic_locator_robusto(uno):
-                        logger.info("Radio: selector %r indice %s", sel, i)
-                        return sup
-        time.sleep(0.25)
+        pausa(0.25)
     err = f"No se encontro o no se pudo pulsar el radio de periodo. {resumen_pagina(p)}"
     raise RuntimeError(err)
 
 
-def _esperar_panel_mes_anio(_raiz: Page) -> None:
-    time.sleep(0.45)
+def _esperar_panel_mes_anio(raiz: Page) -> None:
+    # El panel se abre en cliente; los select de mes/anio se esperan en seleccionar_mes_anio.
+    esperar_primero(raiz, jsf_inactivo(), timeout_ms=2000)
 
 
 def abrir_panel_calendario_periodo(sup: Page | Frame) -> None:
     raiz = as_page(sup)
-    for surface in _superficies_busqueda_calendario(sup):
-        for sel in SELECTORES_TRIGGER_CALENDARIO:
-            loc = surface.locator(sel)
-            n = loc.count()
+    sondeos = list(sondear_superficies(_superficies_busqueda_calendario(sup), SELECTORES_TRIGGER_CALENDARIO))
+
+    def probar(opcion: tuple[str, bool | None]) -> bool | None:
+        sel, force = opcion
+        if force is None:
+            if raiz.evaluate(
+                """() => {
+                    if (typeof mostrarPeriodoRestringido !== 'function') return false;
+                    mostrarPeriodoRestringido('periodoCotizacion');
+                    return true;
+                }"""
+            ):
+                logger.info("Panel periodo: mostrarPeriodoRestringido('periodoCotizacion') via JavaScript")
+                return True
+            return None
+        for s in sondeos:
+            n = s.n(sel)
             if n == 0:
                 continue
-            for force in (False, True):
-                try:
-                    el = loc.last if n > 1 else loc.first
-                    el.wait_for(state="attached", timeout=15000)
-                    el.scroll_into_view_if_needed()
-                    el.click(timeout=20000, force=force, delay=50)
-                    logger.info(
-                        "Panel periodo: clic %r (force=%s) en %s",
-                        sel,
-                        force,
-                        type(surface).__name__,
-                    )
-                    time.sleep(0.4)
-                    _esperar_panel_mes_anio(raiz)
-                    return
-                except Exception as e:
-                    logger.debug("calendario %r force=%s: %s", sel, force, e)
+            surface = s.superficie
+            loc = surface.locator(sel)
+            try:
+                el = loc.last if n > 1 else loc.first
+                el.wait_for(state="attached", timeout=15000)
+                el.scroll_into_view_if_needed()
+                el.click(timeout=20000, force=force, delay=50)
+                logger.info(
+                    "Panel periodo: clic %r (force=%s) en %s",
+                    sel,
+                    force,
+                    type(surface).__name__,
+                )
+                return True
+            except Exception as e:
+                logger.debug("calendario %r force=%s: %s", sel, force, e)
+        return None
 
-    if raiz.evaluate(
-        """() => {
-            if (typeof mostrarPeriodoRestringido !== 'function') return false;
-            mostrarPeriodoRestringido('periodoCotizacion');
-            return true;
-        }"""
+    opciones = [(sel, force) for sel in SELECTORES_TRIGGER_CALENDARIO for force in (False, True)]
+    respaldos = [("mostrarPeriodoRestringido", None)]
+    if intentar_en_orden(
+        portal_de(raiz), "calendario_periodo", opciones, probar, clave=_clave_estrategia, respaldos=respaldos
     ):
-        logger.info("Panel periodo: mostrarPeriodoRestringido('periodoCotizacion') via JavaScript")
-        time.sleep(0.5)
         _esperar_panel_mes_anio(raiz)
         return
 
@@ -225,20 +248,15 @@ def abrir_panel_calendario_periodo(sup: Page | Frame) -> None:
     )
 
 
-def _indices_prioridad_select(locator: Locator) -> list[int]:
-    n = locator.count()
+def _indices_prioridad_select(page: Page | Frame, selector: str) -> tuple[int, list[int]]:
+    s = sondear(page, [selector])
+    n = s.n(selector)
     if n <= 1:
-        return [0]
-    visibles: list[int] = []
-    for i in range(n):
-        try:
-            if locator.nth(i).is_visible():
-                visibles.append(i)
-        except Exception as e:
-            logger.debug("nth=%s visible?: %s", i, e)
+        return n, [0]
+    visibles = s.visibles(selector)
     if visibles:
-        return sorted(visibles, reverse=True)
-    return list(reversed(range(n)))
+        return n, sorted(visibles, reverse=True)
+    return n, list(reversed(range(n)))
 
 
 def _aplicar_valor_select_periodo_dom(
@@ -333,6 +351,45 @@ MESES_HTML = (
 )
 
 
+def _seleccionar_en_select(
+    page: Page | Frame,
+    id_select: str,
+    *,
+    paso: str,
+    criterios: dict[str, dict[str, str]],
+    valores_js: tuple[str, ...],
+) -> str | None:
+    """Modo que fijo el valor (`value`, `label`, ... o `js`) o None; el plan del portal decide el orden."""
+    sel = f'[id="{id_select}"]'
+    loc = page.locator(sel)
+    n, orden = _indices_prioridad_select(page, sel)
+
+    def probar(opcion: tuple[str, bool | None]) -> str | None:
+        modo, force = opcion
+        if force is None:
+            for valtry in valores_js:
+                if _asignar_select_nativo_jsf(page, id_select, valtry):
+                    logger.info("%s evaluate val=%r", id_select, valtry)
+                    return modo
+            return None
+        for idx in orden:
+            try:
+                loc.nth(idx).select_option(**criterios[modo], timeout=8000, force=force)
+                logger.info(
+                    "%s %s=%r (nth=%s/%s force=%s)",
+                    id_select, modo, next(iter(criterios[modo].values())), idx, n, force,
+                )
+                return modo
+            except Exception as e:
+                logger.debug("%s %s nth=%s force=%s: %s", id_select, modo, idx, force, e)
+        return None
+
+    opciones: list[tuple[str, bool | None]] = [(modo, force) for modo in criterios for force in (False, True)]
+    return intentar_en_orden(
+        portal_de(page), paso, opciones, probar, clave=_clave_estrategia, respaldos=[("js", None)]
+    )
+
+
 def seleccionar_mes_anio(
     page: Page | Frame,
     *,
@@ -341,109 +398,36 @@ def seleccionar_mes_anio(
     mes: int,
     anio: int,
 ) -> None:
-    loc_mes = page.locator(f'[id="{id_mes}"]')
-    loc_anio = page.locator(f'[id="{id_anio}"]')
-    loc_mes.first.wait_for(state="attached", timeout=60000)
-    loc_anio.first.wait_for(state="attached", timeout=60000)
-
-    mes_ok = False
-    nm = loc_mes.count()
-    orden_m = _indices_prioridad_select(loc_mes)
-
-    valores_mes = (str(mes), f"{mes:02d}")
-    for valor in valores_mes:
-        if mes_ok:
-            break
-        for idx in orden_m:
-            uno = loc_mes.nth(idx)
-            for force in (False, True):
-                try:
-                    uno.select_option(value=valor, timeout=8000, force=force)
-                    logger.info(
-                        "periodoCotizacion:mes value=%r (nth=%s/%s force=%s)",
-                        valor, idx, nm, force,
-                    )
-                    mes_ok = True
-                    break
-                except Exception as e:
-                    logger.debug("mes value=%r nth=%s force=%s: %s", valor, idx, force, e)
-            if mes_ok:
-                break
-
-    if not mes_ok:
-        etiqueta = MESES_HTML[mes]
-        for idx in orden_m:
-            uno = loc_mes.nth(idx)
-            for force in (False, True):
-                try:
-                    uno.select_option(label=etiqueta, timeout=8000, force=force)
-                    logger.info(
-                        "periodoCotizacion:mes label=%r (nth=%s/%s force=%s)",
-                        etiqueta, idx, nm, force,
-                    )
-                    mes_ok = True
-                    break
-                except Exception as e:
-                    logger.debug("mes label nth=%s force=%s: %s", idx, force, e)
-            if mes_ok:
-                break
-
-    if not mes_ok:
-        for valtry in (str(mes), f"{mes:02d}", MESES_HTML[mes]):
-            if _asignar_select_nativo_jsf(page, id_mes, valtry):
-                logger.info("periodoCotizacion:mes evaluate val=%r", valtry)
-                mes_ok = True
-                break
-
-    if not mes_ok:
+    page.locator(f'[id="{id_mes}"]').first.wait_for(state="attached", timeout=60000)
+    page.locator(f'[id="{id_anio}"]').first.wait_for(state="attached", timeout=60000)
+
+    criterios_mes = {"value": {"value": str(mes)}}
+    if f"{mes:02d}" != str(mes):
+        criterios_mes["value_02d"] = {"value": f"{mes:02d}"}
+    criterios_mes["label"] = {"label": MESES_HTML[mes]}
+    modo_mes = _seleccionar_en_select(
+        page,
+        id_mes,
+        paso="select_mes",
+        criterios=criterios_mes,
+        valores_js=(str(mes), f"{mes:02d}", MESES_HTML[mes]),
+    )
+    if modo_mes is None:
         raise RuntimeError(f"No se pudo seleccionar el mes {mes} ({MESES_HTML[mes]}) en {id_mes}")
 
     _aplicar_valor_select_periodo_dom(page, id_mes, str(mes))
 
     sa = str(anio)
-    na = loc_anio.count()
-    orden_a = _indices_prioridad_select(loc_anio)
-
-    anio_ok = False
-    for idx in orden_a:
-        uno = loc_anio.nth(idx)
-        for force in (False, True):
-            try:
-                uno.select_option(value=sa, timeout=8000, force=force)
-                logger.info(
-                    "periodoCotizacion:anio value=%r (nth=%s/%s force=%s)",
-                    sa, idx, na, force,
-                )
-                anio_ok = True
-                break
-            except Exception as e:
-                logger.debug("anio value nth=%s force=%s: %s", idx, force, e)
-        if anio_ok:
-            break
-
-    if not anio_ok:
-        for idx in orden_a:
-            uno = loc_anio.nth(idx)
-            for force in (False, True):
-                try:
-                    uno.select_option(label=sa, timeout=8000, force=force)
-                    logger.info(
-                        "periodoCotizacion:anio label=%r (nth=%s/%s force=%s)",
-                        sa, idx, na, force,
-                    )
-                    anio_ok = True
-                    break
-                except Exception as e:
-                    logger.debug("anio label nth=%s force=%s: %s", idx, force, e)
-            if anio_ok:
-                break
-
-    if not anio_ok:
-        if _asignar_select_nativo_jsf(page, id_anio, sa):
-            logger.info("periodoCotizacion:anio via evaluate")
-        else:
-            raise RuntimeError(f"No se pudo seleccionar el anio {anio} en {id_anio}")
-    else:
+    modo_anio = _seleccionar_en_select(
+        page,
+        id_anio,
+        paso="select_anio",
+        criterios={"value": {"value": sa}, "label": {"label": sa}},
+        valores_js=(sa,),
+    )
+    if modo_anio is None:
+        raise RuntimeError(f"No se pudo seleccionar el anio {anio} en {id_anio}")
+    if modo_anio != "js":
         _aplicar_valor_select_periodo_dom(page, id_anio, sa)
 
     _aplicar_valor_select_periodo_dom(page, id_mes, str(mes))
@@ -475,41 +459,51 @@ def cerrar_overlays_primefaces(p: Page | Frame) -> None:
 
 def clic_aceptar_periodo_restringido(p: Page | Frame) -> None:
     raiz = as_page(p)
-    for surface in _superficies_busqueda_calendario(p):
-        for sel in SELECTORES_ACEPTAR_PERIODO:
-            loc = surface.locator(sel)
-            n = loc.count()
+    sondeos = list(sondear_superficies(_superficies_busqueda_calendario(p), SELECTORES_ACEPTAR_PERIODO))
+
+    def probar(opcion: tuple[str, bool | None]) -> bool | None:
+        sel, force = opcion
+        if force is None:
+            if raiz.evaluate(
+                """() => {
+                    if (typeof actualizarPeriodoRestringido !== 'function') return false;
+                    actualizarPeriodoRestringido('periodoCotizacion');
+                    return true;
+                }"""
+            ):
+                logger.info("Periodo: actualizarPeriodoRestringido('periodoCotizacion') via JavaScript")
+                return True
+            return None
+        for s in sondeos:
+            n = s.n(sel)
             if n == 0:
                 continue
+            surface = s.superficie
+            loc = surface.locator(sel)
             el = loc.last if n > 1 else loc.first
-            for force in (False, True):
+            try:
+                el.wait_for(state="attached", timeout=15000)
+                el.scroll_into_view_if_needed()
+                el.click(timeout=30000, force=force, delay=40)
+                logger.info(
+                    "Periodo: Aceptar (%r force=%s) en %s",
+                    sel, force, type(surface).__name__,
+                )
                 try:
-                    el.wait_for(state="attached", timeout=15000)
-                    el.scroll_into_view_if_needed()
-                    el.click(timeout=30000, force=force, delay=40)
-                    logger.info(
-                        "Periodo: Aceptar (%r force=%s) en %s",
-                        sel, force, type(surface).__name__,
-                    )
-                    time.sleep(0.6)
-                    try:
-                        raiz.wait_for_load_state("load", timeout=15000)
-                    except PlaywrightTimeoutError:
-                        logger.debug("Sin load tras Aceptar (postback AJAX JSF habitual).")
-                    time.sleep(0.35)
-                    return
-                except Exception as e:
-                    logger.debug("aceptar %r force=%s: %s", sel, force, e)
+                    raiz.wait_for_load_state("load", timeout=15000)
+                except PlaywrightTimeoutError:
+                    logger.debug("Sin load tras Aceptar (postback AJAX JSF habitual).")
+                return True
+            except Exception as e:
+                logger.debug("aceptar %r force=%s: %s", sel, force, e)
+        return None
 
-    if raiz.evaluate(
-        """() => {
-            if (typeof actualizarPeriodoRestringido !== 'function') return false;
-            actualizarPeriodoRestringido('periodoCotizacion');
-            return true;
-        }"""
+    opciones = [(sel, force) for sel in SELECTORES_ACEPTAR_PERIODO for force in (False, True)]
+    respaldos = [("actualizarPeriodoRestringido", None)]
+    if intentar_en_orden(
+        portal_de(raiz), "aceptar_periodo", opciones, probar, clave=_clave_estrategia, respaldos=respaldos
     ):
-        logger.info("Periodo: actualizarPeriodoRestringido('periodoCotizacion') via JavaScript")
-        time.sleep(0.9)
+        esperar_primero(raiz, jsf_inactivo(), timeout_ms=15000)
         return
 
     raise RuntimeError(
@@ -527,20 +521,15 @@ def clic_consultar(p: Page | Frame, *, force: bool = True) -> None:
 
 
 def localizar_boton_descarga_pdf(p: Page | Frame) -> tuple[Page | Frame, Locator] | None:
-    for surface in _superficies_pagina(p):
-        for sel in SELECTORES_DESCARGA_PDF:
-            loc = surface.locator(sel)
-            try:
-                n = loc.count()
-            except Exception as e:
-                logger.debug("pdf selector %r: %s", sel, e)
-                continue
-            if n > 0:
-                logger.info(
-                    "Descarga PDF: selector %r en %s (n=%s)",
-                    sel, type(surface).__name__, n,
-                )
-                return surface, loc.first
+    for s in sondear_superficies(_superficies_pagina(p), SELECTORES_DESCARGA_PDF):
+        sel = s.primero()
+        if sel is not None:
+            surface = s.superficie
+            logger.info(
+                "Descarga PDF: selector %r en %s (n=%s)",
+                sel, type(surface).__name__, s.n(sel),
+            )
+            return surface, surface.locator(sel).first
     return None
 
 
@@ -566,33 +555,35 @@ def esperar_boton_pdf(
                 "Esperando boton PDF... %.0fs / %.0fs",
                 time.monotonic() - t0, max_espera_s,
             )
-        time.sleep(intervalo_s)
+        esperar_primero(
+            as_page(p),
+            js("_todos(a).length > 0", ", ".join(SELECTORES_DESCARGA_PDF), nombre="boton_pdf"),
+            timeout_ms=intervalo_s * 1000,
+        )
     return None
 
 
 def preparar_tabla_cuadro_antes_pdf(p: Page | Frame) -> None:
-    for surface in _superficies_pagina(p):
-        try:
-            row = surface.locator("table#cuadro1 tbody tr").first
-            if row.count() > 0:
+    for s in sondear_superficies(_superficies_pagina(p), [_SELECTOR_FILA_CUADRO, _SELECTOR_RADIO_FORMATO_PDF]):
+        surface = s.superficie
+        if s.n(_SELECTOR_FILA_CUADRO):
+            try:
+                row = surface.locator(_SELECTOR_FILA_CUADRO).first
                 row.scroll_into_view_if_needed()
                 row.click(timeout=8000)
                 logger.info("Clic primera fila table#cuadro1 (%s)", type(surface).__name__)
-                time.sleep(0.3)
-        except Exception as e:
-            logger.debug("fila cuadro1: %s", e)
-        try:
-            rad = surface.locator(
-                'input[type="radio"][value*="PDF" i], '
-                'input[type="radio"][id*="PDF" i], '
-                'input[type="radio"][name*="formato" i]'
-            )
-            if rad.count() > 0:
-                rad.first.click(timeout=5000)
+                esperar_primero(surface, jsf_inactivo(), timeout_ms=3000)
+                # El postback de la fila puede traer el radio de formato.
+                s = sondear(surface, [_SELECTOR_RADIO_FORMATO_PDF])
+            except Exception as e:
+                logger.debug("fila cuadro1: %s", e)
+        if s.n(_SELECTOR_RADIO_FORMATO_PDF):
+            try:
+                surface.locator(_SELECTOR_RADIO_FORMATO_PDF).first.click(timeout=5000)
                 logger.info("Opcion formato PDF (%s)", type(surface).__name__)
-                time.sleep(0.25)
-        except Exception as e:
-            logger.debug("radio PDF: %s", e)
+                esperar_primero(surface, jsf_inactivo(), timeout_ms=3000)
+            except Exception as e:
+                logger.debug("radio PDF: %s", e)
 
 
 def _click_boton_pdf_js(surface: Page | Frame) -> bool:
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Callable, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeVar
+from urllib.parse import urlsplit
+
+from common.timezone_utils import ZONA_BOGOTA
+
+logger = logging.getLogger(__name__)
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+PLAN_INTERACCION = os.environ.get("BYBOT_PLAN_INTERACCION", "1").strip().lower() not in ("0", "false", "no")
+PLAN_PATH = Path(os.environ.get("BYBOT_PLAN_PATH", "") or (BOTS_DIR / "plan_interaccion.sqlite3"))
+PLAN_MAX_FALLOS = int(os.environ.get("BYBOT_PLAN_MAX_FALLOS", "3") or 3)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS plan_interaccion (
+    portal TEXT NOT NULL,
+    paso TEXT NOT NULL,
+    opcion TEXT,
+    fallos_seguidos INTEGER NOT NULL DEFAULT 0,
+    aciertos INTEGER NOT NULL DEFAULT 0,
+    fallos INTEGER NOT NULL DEFAULT 0,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (portal, paso)
+)
+"""
+
+
+class PlanInteraccion:
+    """
+    Por portal y paso (p. ej. `select_mes`, `aceptar_periodo`), la opcion —selector y
+    estrategia— que resolvio el paso la ultima vez. Se prueba primero; la
+    cascada completa solo corre si falla, y tras `max_fallos` desaciertos
+    seguidos la opcion recordada se reemplaza por la que gano.
+    """
+
+    def __init__(self, *, ruta: Path = PLAN_PATH, max_fallos: int = PLAN_MAX_FALLOS):
+        self.ruta = ruta
+        self.max_fallos = max(1, max_fallos)
+        self._lock = threading.Lock()
+        self._planes: dict[tuple[str, str], tuple[str | None, int]] = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.sin_plan = 0
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute(_DDL)
+        self.recargar()
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.ruta, timeout=10)
+
+    def recargar(self) -> None:
+        with self._conectar() as conn:
+            filas = conn.execute("SELECT portal, paso, opcion, fallos_seguidos FROM plan_interaccion").fetchall()
+        with self._lock:
+            self._planes = {(portal, paso): (opcion, seguidos) for portal, paso, opcion, seguidos in filas}
+
+    def recordada(self, portal: str, paso: str) -> str | None:
+        with self._lock:
+            return self._planes.get((portal, paso), (None, 0))[0]
+
+    def registrar(self, portal: str, paso: str, recordada: str | None, ganadora: str | None) -> None:
+        """`recordada`: lo que se probo primero (None si no habia plan); `ganadora`: la que resolvio o None."""
+        with self._lock:
+            _, seguidos = self._planes.get((portal, paso), (None, 0))
+            if recordada is None:
+                self.sin_plan += 1
+                if ganadora is None:
+                    return
+                nueva, seguidos, acierto = ganadora, 0, None
+            elif ganadora == recordada:
+                self.aciertos += 1
+                nueva, seguidos, acierto = recordada, 0, True
+            else:
+                self.fallos += 1
+                seguidos += 1
+                acierto = False
+                if seguidos >= self.max_fallos:
+                    logger.info(
+                        "Plan %s/%s: %r fallo %s veces seguidas; se reemplaza por %r",
+                        portal, paso, recordada, seguidos, ganadora,
+                    )
+                    nueva, seguidos = ganadora, 0
+                else:
+                    nueva = recordada
+            self._planes[(portal, paso)] = (nueva, seguidos)
+
+        ahora = datetime.now(ZONA_BOGOTA).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO plan_interaccion (portal, paso, opcion, fallos_seguidos, aciertos, fallos, actualizado)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (portal, paso) DO UPDATE SET
+                        opcion = excluded.opcion,
+                        fallos_seguidos = excluded.fallos_seguidos,
+                        aciertos = aciertos + excluded.aciertos,
+                        fallos = fallos + excluded.fallos,
+                        actualizado = excluded.actualizado
+                    """,
+                    (portal, paso, nueva, seguidos, int(acierto is True), int(acierto is False), ahora),
+                )
+        except sqlite3.Error as e:
+            logger.warning("No se pudo actualizar el plan de interaccion (%s): %s", self.ruta, e)
+
+    def resumen(self) -> list[dict[str, Any]]:
+        with self._conectar() as conn:
+            filas = conn.execute(
+                """
+                SELECT portal, paso, opcion, fallos_seguidos, aciertos, fallos
+                FROM plan_interaccion ORDER BY portal, paso
+                """
+            ).fetchall()
+        return [
+            {
+                "portal": portal,
+                "paso": paso,
+                "opcion": opcion,
+                "fallos_seguidos": seguidos,
+                "aciertos": aciertos,
+                "fallos": fallos,
+                "tasa": round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None,
+            }
+            for portal, paso, opcion, seguidos, aciertos, fallos in filas
+        ]
+
+    def reiniciar(self, portal: str | None = None) -> int:
+        with self._conectar() as conn:
+            if portal is None:
+                borradas = conn.execute("DELETE FROM plan_interaccion").rowcount
+            else:
+                borradas = conn.execute("DELETE FROM plan_interaccion WHERE portal = ?", (portal,)).rowcount
+        self.recargar()
+        logger.info("Plan de interaccion %s reiniciado (%s pasos borrados).", portal or "(todos)", borradas)
+        return borradas
+
+
+_plan: PlanInteraccion | None = None
+_plan_lock = threading.Lock()
+
+
+def obtener_plan() -> PlanInteraccion | None:
+    global _plan
+    if not PLAN_INTERACCION:
+        return None
+    with _plan_lock:
+        if _plan is None:
+            try:
+                _plan = PlanInteraccion()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Plan de interaccion desactivado: %s", e)
+                return None
+        return _plan
+
+
+def portal_de(superficie: Any) -> str:
+    """Host del documento (Page o Frame): identifica el portal sin que el llamador lo pase."""
+    try:
+        pagina = getattr(superficie, "page", superficie)
+        return (urlsplit(pagina.url).hostname or "").lower() or "?"
+    except Exception:
+        return "?"
+
+
+def intentar_en_orden(
+    portal: str,
+    paso: str,
+    opciones: Sequence[T],
+    probar: Callable[[T], R | None],
+    *,
+    clave: Callable[[T], str] = str,
+    respaldos: Sequence[T] = (),
+) -> R | None:
+    """
+    Cascada de `opciones` empezando por la recordada; la primera con resultado
+    distinto de None gana y queda registrada. Sin plan, el orden es el dado.
+    Los `respaldos` (heuristicas laxas, JavaScript directo) corren siempre al
+    final y nunca se recuerdan: si uno gana, el paso cuenta como fallo del plan.
+    """
+    plan = obtener_plan()
+    recordada = plan.recordada(portal, paso) if plan is not None else None
+    if recordada is not None and all(clave(o) != recordada for o in opciones):
+        recordada = None
+    ganadora: str | None = None
+    resultado: R | None = None
+    try:
+        for opcion in sorted(opciones, key=lambda o: clave(o) != recordada):
+            resultado = probar(opcion)
+            if resultado is not None:
+                ganadora = clave(opcion)
+                if recordada is not None and ganadora != recordada:
+                    logger.info("Plan %s/%s: %r no sirvio; gano %r", portal, paso, recordada, ganadora)
+                return resultado
+        for opcion in respaldos:
+            resultado = probar(opcion)
+            if resultado is not None:
+                logger.info("Plan %s/%s: resuelto por respaldo %r", portal, paso, clave(opcion))
+                return resultado
+        return None
+    finally:
+        if plan is not None:
+            plan.registrar(portal, paso, recordada, ganadora)
+
+
+def resumen_plan() -> dict[str, int]:
+    plan = _plan
+    if plan is None:
+        return {"aciertos": 0, "fallos": 0, "sin_plan": 0}
+    return {"aciertos": plan.aciertos, "fallos": plan.fallos, "sin_plan": plan.sin_plan}
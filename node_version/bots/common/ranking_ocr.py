@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from common.timezone_utils import ZONA_BOGOTA
+
+logger = logging.getLogger(__name__)
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+RANKING_PATH = Path(os.environ.get("BYBOT_OCR_RANKING_PATH", "") or (BOTS_DIR / "ocr_ranking.sqlite3"))
+MIN_LECTURAS_DESCARTE = int(os.environ.get("BYBOT_OCR_RANKING_MIN_LECTURAS", "30") or 30)
+TASA_MINIMA = float(os.environ.get("BYBOT_OCR_RANKING_TASA_MINIMA", "0.02") or 0.02)
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS ranking_ocr (
+    portal TEXT NOT NULL,
+    estrategia TEXT NOT NULL,
+    lecturas INTEGER NOT NULL DEFAULT 0,
+    aciertos INTEGER NOT NULL DEFAULT 0,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (portal, estrategia)
+)
+"""
+
+
+class RankingOCR:
+    """
+    Estadisticas persistentes (SQLite) por estrategia OCR `oemX variante psm=Y`:
+    cuantas veces su lectura coincidio con la respuesta que el portal acepto.
+    Sirven para ordenar las combinaciones y descartar las que nunca aciertan.
+    """
+
+    def __init__(self, portal: str, *, ruta: Path = RANKING_PATH):
+        self.portal = portal
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._stats: dict[str, tuple[int, int]] = {}
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute(_DDL)
+        self.recargar()
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.ruta, timeout=10)
+
+    def recargar(self) -> None:
+        with self._conectar() as conn:
+            filas = conn.execute(
+                "SELECT estrategia, lecturas, aciertos FROM ranking_ocr WHERE portal = ?",
+                (self.portal,),
+            ).fetchall()
+        with self._lock:
+            self._stats = {tag: (lect, aci) for tag, lect, aci in filas}
+
+    def puntaje(self, estrategia: str) -> float:
+        lecturas, aciertos = self._stats.get(estrategia, (0, 0))
+        return (aciertos + 1) / (lecturas + 2)
+
+    def descartada(self, estrategia: str) -> bool:
+        lecturas, aciertos = self._stats.get(estrategia, (0, 0))
+        return lecturas >= MIN_LECTURAS_DESCARTE and aciertos / lecturas < TASA_MINIMA
+
+    def registrar_veredicto(
+        self,
+        candidatos: list[tuple[str, str]],
+        texto_enviado: str,
+        *,
+        aceptado: bool,
+    ) -> None:
+        # Aceptado: toda lectura es acierto o fallo. Rechazado: solo se sabe que
+        # fallaron las que leyeron lo enviado (o no llegaron a 5 caracteres).
+        deltas: dict[str, tuple[int, int]] = {}
+        for texto, estrategia in candidatos:
+            if aceptado:
+                delta = (1, 1 if texto == texto_enviado else 0)
+            elif texto == texto_enviado or len(texto) != len(texto_enviado):
+                delta = (1, 0)
+            else:
+                continue
+            lect, aci = deltas.get(estrategia, (0, 0))
+            deltas[estrategia] = (lect + delta[0], aci + delta[1])
+        if not deltas:
+            return
+
+        ahora = datetime.now(ZONA_BOGOTA).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with self._conectar() as conn:
+                conn.executemany(
+                    """
+                    INSERT INTO ranking_ocr (portal, estrategia, lecturas, aciertos, actualizado)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (portal, estrategia) DO UPDATE SET
+                        lecturas = lecturas + excluded.lecturas,
+                        aciertos = aciertos + excluded.aciertos,
+                        actualizado = excluded.actualizado
+                    """,
+                    [(self.portal, tag, lect, aci, ahora) for tag, (lect, aci) in deltas.items()],
+                )
+        except sqlite3.Error as e:
+            logger.warning("No se pudo actualizar ranking OCR (%s): %s", self.ruta, e)
+            return
+        self.recargar()
+        logger.debug(
+            "Ranking OCR %s: %s estrategias actualizadas (aceptado=%s)",
+            self.portal, len(deltas), aceptado,
+        )
+
+    def resumen(self) -> list[dict[str, float | int | str | bool]]:
+        filas = [
+            {
+                "estrategia": tag,
+                "lecturas": lect,
+                "aciertos": aci,
+                "puntaje": round(self.puntaje(tag), 4),
+                "descartada": self.descartada(tag),
+            }
+            for tag, (lect, aci) in self._stats.items()
+        ]
+        return sorted(filas, key=lambda f: f["puntaje"], reverse=True)
+
+    def reiniciar(self) -> int:
+        with self._conectar() as conn:
+            borradas = conn.execute(
+                "DELETE FROM ranking_ocr WHERE portal = ?", (self.portal,)
+            ).rowcount
+        self.recargar()
+        logger.info("Ranking OCR %s reiniciado (%s estrategias borradas).", self.portal, borradas)
+        return borradas
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import random
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageFilter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+LONGITUD_CAPTCHA = 5
+LADO_GLIFO = 16
+TEMPERATURA = 0.05
+
+
+def reconocedor_disponible() -> bool:
+    return np is not None
+
+
+def _binarizar(imagen: Image.Image) -> np.ndarray:
+    g = np.asarray(imagen.convert("L").filter(ImageFilter.MedianFilter(3)), dtype=np.uint8)
+    hist = np.bincount(g.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    acumulado = np.cumsum(hist)
+    media_acum = np.cumsum(hist * np.arange(256))
+    w0 = acumulado / total
+    w1 = 1.0 - w0
+    mu0 = media_acum / np.maximum(acumulado, 1)
+    mu1 = (media_acum[-1] - media_acum) / np.maximum(total - acumulado, 1)
+    umbral = int(np.argmax(w0 * w1 * (mu0 - mu1) ** 2))
+    tinta = g <= umbral
+    # Texto oscuro sobre fondo claro; si la "tinta" domina, el captcha viene invertido.
+    if tinta.mean() > 0.5:
+        tinta = ~tinta
+    return tinta
+
+
+def _corridas(columnas: np.ndarray) -> list[tuple[int, int]]:
+    corridas: list[tuple[int, int]] = []
+    inicio = None
+    for x, hay in enumerate(columnas):
+        if hay and inicio is None:
+            inicio = x
+        elif not hay and inicio is not None:
+            corridas.append((inicio, x))
+            inicio = None
+    if inicio is not None:
+        corridas.append((inicio, len(columnas)))
+    return [c for c in corridas if c[1] - c[0] >= 2]
+
+
+def segmentar(imagen: Image.Image, longitud: int = LONGITUD_CAPTCHA) -> list[np.ndarray]:
+    """
+    Separa el captcha en `longitud` glifos por proyeccion vertical de la tinta:
+    fusiona los tramos mas angostos y parte los mas anchos por su valle hasta
+    cuadrar el conteo. Lista vacia si no hay tinta.
+    """
+    tinta = _binarizar(imagen)
+    proyeccion = tinta.sum(axis=0)
+    tramos = _corridas(proyeccion > 0)
+    if not tramos:
+        return []
+
+    while len(tramos) > longitud:
+        i = min(range(len(tramos)), key=lambda k: tramos[k][1] - tramos[k][0])
+        if i == 0:
+            j = 1
+        elif i == len(tramos) - 1:
+            j = i - 1
+        else:
+            izq = tramos[i][0] - tramos[i - 1][1]
+            der = tramos[i + 1][0] - tramos[i][1]
+            j = i - 1 if izq <= der else i + 1
+        a, b = sorted((i, j))
+        tramos[a : b + 1] = [(tramos[a][0], tramos[b][1])]
+
+    while len(tramos) < longitud:
+        i = max(range(len(tramos)), key=lambda k: tramos[k][1] - tramos[k][0])
+        x0, x1 = tramos[i]
+        if x1 - x0 < 2:
+            break
+        cuarto = max(1, (x1 - x0) // 4)
+        centro = proyeccion[x0 + cuarto : x1 - cuarto]
+        corte = x0 + cuarto + int(np.argmin(centro)) if centro.size else (x0 + x1) // 2
+        tramos[i : i + 1] = [(x0, corte), (corte, x1)]
+
+    glifos: list[np.ndarray] = []
+    for x0, x1 in tramos:
+        recorte = tinta[:, x0:x1]
+        filas = np.flatnonzero(recorte.any(axis=1))
+        if filas.size:
+            recorte = recorte[filas[0] : filas[-1] + 1]
+        glifos.append(recorte)
+    return glifos
+
+
+def _vectorizar(glifo: np.ndarray, lado: int = LADO_GLIFO) -> np.ndarray:
+    alto, ancho = glifo.shape
+    m = max(alto, ancho, 1)
+    cuadro = np.zeros((m, m), dtype=np.uint8)
+    y0, x0 = (m - alto) // 2, (m - ancho) // 2
+    cuadro[y0 : y0 + alto, x0 : x0 + ancho] = glifo.astype(np.uint8) * 255
+    v = np.asarray(
+        Image.fromarray(cuadro).resize((lado, lado), Image.Resampling.BILINEAR), dtype=np.float32
+    ).ravel()
+    v -= v.mean()
+    norma = float(np.linalg.norm(v))
+    return v / norma if norma > 0 else v
+
+
+class ReconocedorCaptcha:
+    """
+    Reconocedor local de captchas de longitud fija: segmenta por columnas y
+    clasifica cada glifo normalizado por vecino mas cercano (coseno) contra
+    prototipos aprendidos de captchas aceptados. Devuelve confianza por caracter.
+    """
+
+    def __init__(
+        self,
+        prototipos: np.ndarray,
+        etiquetas: np.ndarray,
+        *,
+        longitud: int = LONGITUD_CAPTCHA,
+        lado: int = LADO_GLIFO,
+    ):
+        self.prototipos = prototipos.astype(np.float32)
+        self.etiquetas = etiquetas
+        self.longitud = longitud
+        self.lado = lado
+        self.clases = sorted(set(etiquetas.tolist()))
+        self._indice_clase = np.array([self.clases.index(c) for c in etiquetas.tolist()])
+
+    @classmethod
+    def entrenar(
+        cls,
+        muestras: Iterable[tuple[bytes, str]],
+        *,
+        longitud: int = LONGITUD_CAPTCHA,
+        lado: int = LADO_GLIFO,
+    ) -> tuple[ReconocedorCaptcha, dict[str, int]]:
+        vectores: list[np.ndarray] = []
+        etiquetas: list[str] = []
+        usadas = descartadas = 0
+        for png, texto in muestras:
+            texto = (texto or "").strip().upper()
+            if len(texto) != longitud:
+                descartadas += 1
+                continue
+            try:
+                glifos = segmentar(Image.open(io.BytesIO(png)), longitud)
+            except Exception as e:
+                logger.debug("Muestra ilegible (%r): %s", texto, e)
+                glifos = []
+            if len(glifos) != longitud:
+                descartadas += 1
+                continue
+            vectores.extend(_vectorizar(g, lado) for g in glifos)
+            etiquetas.extend(texto)
+            usadas += 1
+        if not vectores:
+            raise ValueError("No hay muestras utilizables para entrenar el reconocedor.")
+        modelo = cls(np.stack(vectores), np.array(etiquetas), longitud=longitud, lado=lado)
+        return modelo, {"usadas": usadas, "descartadas": descartadas, "glifos": len(etiquetas)}
+
+    def guardar(self, ruta: Path) -> None:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        meta = json.dumps({"longitud": self.longitud, "lado": self.lado})
+        with ruta.open("wb") as f:
+            np.savez_compressed(f, prototipos=self.prototipos, etiquetas=self.etiquetas, meta=np.array(meta))
+
+    @classmethod
+    def cargar(cls, ruta: Path) -> ReconocedorCaptcha:
+        with np.load(ruta, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            return cls(datos["prototipos"], datos["etiquetas"], longitud=meta["longitud"], lado=meta["lado"])
+
+    def _clasificar(self, vector: np.ndarray) -> tuple[str, float]:
+        similitud = self.prototipos @ vector
+        por_clase = np.full(len(self.clases), -1.0, dtype=np.float32)
+        np.maximum.at(por_clase, self._indice_clase, similitud)
+        pesos = np.exp((por_clase - por_clase.max()) / TEMPERATURA)
+        k = int(np.argmax(por_clase))
+        return self.clases[k], float(pesos[k] / pesos.sum())
+
+    def reconocer(self, imagen: Image.Image) -> tuple[str, list[float]] | None:
+        glifos = segmentar(imagen, self.longitud)
+        if len(glifos) != self.longitud:
+            return None
+        lecturas = [self._clasificar(_vectorizar(g, self.lado)) for g in glifos]
+        return "".join(c for c, _ in lecturas), [round(p, 3) for _, p in lecturas]
+
+    def evaluar(self, muestras: Iterable[tuple[bytes, str]]) -> dict[str, Any]:
+        total = exactas = caracteres = aciertos_caracter = 0
+        for png, texto in muestras:
+            texto = (texto or "").strip().upper()
+            lectura = self.reconocer(Image.open(io.BytesIO(png)))
+            leido = lectura[0] if lectura else ""
+            total += 1
+            exactas += int(leido == texto)
+            caracteres += len(texto)
+            aciertos_caracter += sum(a == b for a, b in zip(leido, texto))
+        return {
+            "muestras": total,
+            "exactas": exactas,
+            "precision": round(exactas / total, 4) if total else 0.0,
+            "precision_caracter": round(aciertos_caracter / caracteres, 4) if caracteres else 0.0,
+        }
+
+
+def dividir_muestras(
+    muestras: list[tuple[bytes, str]], fraccion_validacion: float, semilla: int = 7
+) -> tuple[list[tuple[bytes, str]], list[tuple[bytes, str]]]:
+    mezcladas = list(muestras)
+    random.Random(semilla).shuffle(mezcladas)
+    n_val = int(len(mezcladas) * fraccion_validacion)
+    return mezcladas[n_val:], mezcladas[:n_val]
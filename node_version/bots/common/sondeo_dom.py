@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from common.esperas import _JS_AUXILIARES
+
+logger = logging.getLogger(__name__)
+
+# Un solo evaluate por documento: por selector [n, visibles, habilitados] (null si
+# el navegador no lo acepta) y, por patron, si aparece en el texto del body.
+_JS_SONDEO = (
+    "([selectores, patrones]) => {"
+    + _JS_AUXILIARES
+    + """
+    const _habilitado = (el) => !el.disabled && el.getAttribute('aria-disabled') !== 'true';
+    const conteos = selectores.map((sel) => {
+        let els;
+        try { els = _todos(sel); } catch (e) { return null; }
+        const vis = [], hab = [];
+        els.forEach((el, i) => {
+            if (_visible(el)) vis.push(i);
+            if (_habilitado(el)) hab.push(i);
+        });
+        return [els.length, vis, hab];
+    });
+    const txt = patrones.length ? _texto() : '';
+    return [conteos, patrones.map((p) => new RegExp(p).test(txt))];
+}"""
+)
+
+
+class Sondeo:
+    """
+    Lo que `sondear` vio en una superficie. Los indices de `visibles` y
+    `habilitados` son los de `superficie.locator(selector).nth(i)`.
+    """
+
+    def __init__(
+        self,
+        superficie: Any,
+        conteos: dict[str, tuple[int, list[int], list[int]]] | None = None,
+        textos: dict[str, bool] | None = None,
+    ):
+        self.superficie = superficie
+        self.conteos = conteos or {}
+        self.textos = textos or {}
+
+    def n(self, selector: str) -> int:
+        return self.conteos.get(selector, (0, [], []))[0]
+
+    def visibles(self, selector: str) -> list[int]:
+        return self.conteos.get(selector, (0, [], []))[1]
+
+    def habilitados(self, selector: str) -> list[int]:
+        return self.conteos.get(selector, (0, [], []))[2]
+
+    def primero(self, selectores: Iterable[str] | None = None) -> str | None:
+        """Primer selector (en el orden dado o el del sondeo) con algun elemento."""
+        return next((s for s in (selectores or self.conteos) if self.n(s) > 0), None)
+
+    def hay(self, nombre: str) -> bool:
+        return self.textos.get(nombre, False)
+
+
+def sondear(
+    superficie: Any,
+    selectores: Iterable[str] = (),
+    patrones: dict[str, str] | None = None,
+) -> Sondeo:
+    """
+    Una lista de selectores CSS y patrones de texto (regex sobre el body en
+    minusculas, sin tildes y con espacios colapsados) en un solo viaje al
+    navegador. Si el documento no responde (navegacion, frame soltado) el
+    sondeo sale vacio.
+    """
+    selectores = list(dict.fromkeys(selectores))
+    patrones = patrones or {}
+    try:
+        conteos, textos = superficie.evaluate(_JS_SONDEO, [selectores, list(patrones.values())])
+    except Exception as e:
+        logger.debug("Sondeo DOM sin respuesta: %s", e)
+        return Sondeo(superficie)
+    resultado: dict[str, tuple[int, list[int], list[int]]] = {}
+    for sel, c in zip(selectores, conteos):
+        if c is None:
+            logger.debug("Selector no valido para querySelectorAll: %r", sel)
+            continue
+        resultado[sel] = (c[0], c[1], c[2])
+    return Sondeo(superficie, resultado, dict(zip(patrones, textos)))
+
+
+def sondear_superficies(
+    superficies: Iterable[Any],
+    selectores: Iterable[str] = (),
+    patrones: dict[str, str] | None = None,
+) -> Iterator[Sondeo]:
+    """
+    `sondear` cada superficie a medida que se consume. El marco principal de
+    una Page presente en la lista no se sondea dos veces.
+    """
+    superficies = list(superficies)
+    selectores = list(selectores)
+    principales = {id(s.main_frame) for s in superficies if hasattr(s, "main_frame")}
+    for sup in superficies:
+        if id(sup) in principales:
+            continue
+        yield sondear(sup, selectores, patrones)
+
+
+def hay_texto(superficies: Iterable[Any], patron: str) -> bool:
+    """`patron` en el texto de alguna superficie (p. ej. la pagina y todos sus frames)."""
+    return any(s.hay("t") for s in sondear_superficies(superficies, patrones={"t": patron}))
@@ -1,3 +1,3 @@
-from .service import run_fosiga_bot
+from .service import run_fosiga_bot, run_fosiga_bot_async
 
-__all__ = ["run_fosiga_bot"]
+__all__ = ["run_fosiga_bot", "run_fosiga_bot_async"]
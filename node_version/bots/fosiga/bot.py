@@ -7,9 +7,22 @@ from datetime import datetime
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
-from playwright.sync_api import BrowserContext, Frame, Page, sync_playwright
-
+from playwright.sync_api import BrowserContext, Frame, Page
+
+from common.browser_pool import PoolNavegadores
+from common.esperas import (
+    aparece_elemento,
+    aparece_texto,
+    cumple,
+    documento_nuevo,
+    esperar_fragmento,
+    esperar_primero,
+    js,
+    texto,
+    visible,
+)
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.paginas_calientes import PoolPaginasCalientes, PortalCaliente, abrir_pagina_portal
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +30,29 @@ URL_CONSULTA_EPS = "https://www.adres.gov.co/consulte-su-eps"
 FOSIGA_DATA_DIR = Path(__file__).resolve().parent
 ZONA_BOGOTA = ZoneInfo("America/Bogota")
 
+SELECTOR_RESULTADO = "#GridViewBasica, #GridViewAfiliacion"
+PATRON_NO_ENCONTRADO = r"no se encuentra en (la )?bdua"
+PATRON_BLOQUEO = (
+    r"no soy un robot"
+    r"|debe desactivar el bloqueo predeterminado de las ventanas emergentes"
+    r"|imagenes de validacion que genera la prueba captcha"
+)
+JS_GRECAPTCHA_LISTO = "!!(window.grecaptcha && grecaptcha.enterprise && grecaptcha.enterprise.execute)"
+JS_TOKEN_PRESENTE = "!!(document.querySelector('#recaptchaToken') || {}).value"
+
 
-def _obtener_frame_formulario(page_url_frames: list[Frame]) -> Frame:
+def _buscar_frame_formulario(page_url_frames: list[Frame]) -> Frame | None:
     for frame in page_url_frames:
         if "BDUA_Internet/Pages/ConsultarAfiliadoWeb_2.aspx" in frame.url:
             return frame
-    raise RuntimeError("No se encontro el iframe del formulario de consulta EPS.")
+    return None
+
+
+def _obtener_frame_formulario(page_url_frames: list[Frame]) -> Frame:
+    frame = _buscar_frame_formulario(page_url_frames)
+    if frame is None:
+        raise RuntimeError("No se encontro el iframe del formulario de consulta EPS.")
+    return frame
 
 
 def _diligenciar_numero(frame: Frame, numero_documento: str) -> None:
@@ -61,18 +91,26 @@ def _clic_consultar_y_capturar_pestana(
     paginas_antes = set(context.pages)
     boton.click(timeout=15000)
 
-    limite = datetime.now().timestamp() + 35
-    while datetime.now().timestamp() < limite:
-        for pagina in context.pages:
-            if pagina in paginas_antes:
-                continue
-            try:
-                pagina.wait_for_load_state("domcontentloaded", timeout=15000)
-            except Exception:
-                pass
-            return pagina
-        frame.page.wait_for_timeout(500)
-    return None
+    def pagina_nueva() -> Page | None:
+        return next((p for p in context.pages if p not in paginas_antes), None)
+
+    # La respuesta suele abrir pestana; si se pinta en el iframe no tiene sentido esperarla.
+    desenlace = esperar_primero(
+        frame,
+        cumple(lambda: pagina_nueva() is not None, nombre="pestana"),
+        visible(SELECTOR_RESULTADO, nombre="resultado_en_iframe"),
+        texto(PATRON_NO_ENCONTRADO, nombre="no_encontrado_en_iframe"),
+        timeout_ms=35000,
+    )
+    pagina = pagina_nueva()
+    if desenlace != "pestana" or pagina is None:
+        logger.info("Sin pestana nueva tras Consultar (%s).", desenlace or "tiempo agotado")
+        return None
+    try:
+        pagina.wait_for_load_state("domcontentloaded", timeout=15000)
+    except Exception:
+        pass
+    return pagina
 
 
 def _guardar_html_resultado(html: str, *, output_dir: Path, numero_documento: str) -> Path:
@@ -84,28 +122,30 @@ def _guardar_html_resultado(html: str, *, output_dir: Path, numero_documento: st
 
 
 def _esperar_html_resultado_en_frame(frame: Frame, *, timeout_ms: int = 180000) -> str:
-    html_inicial = frame.content()
-    inicio = datetime.now().timestamp()
-    while (datetime.now().timestamp() - inicio) * 1000 < timeout_ms:
-        try:
-            frame.page.wait_for_timeout(700)
-            html_actual = frame.content()
-            if _es_texto_bloqueo_validacion(html_actual):
-                raise RuntimeError(
-                    "La validacion/captcha bloqueo la continuacion del flujo en el iframe."
-                )
-            if html_actual != html_inicial and len(html_actual) > 500:
-                return html_actual
-        except RuntimeError:
-            raise
-        except Exception as exc:
-            raise RuntimeError(
-                "El navegador/carga se cerro antes de obtener la pagina de resultado."
-            ) from exc
-    raise RuntimeError(
-        "No se detecto carga de pagina de resultado despues de Consultar. "
-        "Es posible que falte completar captcha/validacion."
-    )
+    try:
+        encontrado = esperar_fragmento(
+            frame,
+            aparece_texto(PATRON_BLOQUEO, nombre="bloqueo"),
+            aparece_elemento(SELECTOR_RESULTADO, nombre="resultado"),
+            aparece_texto(PATRON_NO_ENCONTRADO, nombre="no_encontrado"),
+            documento_nuevo(nombre="postback"),
+            timeout_ms=timeout_ms,
+        )
+        html_actual = frame.content() if encontrado else ""
+    except Exception as exc:
+        raise RuntimeError(
+            "El navegador/carga se cerro antes de obtener la pagina de resultado."
+        ) from exc
+    if encontrado is None:
+        raise RuntimeError(
+            "No se detecto carga de pagina de resultado despues de Consultar. "
+            "Es posible que falte completar captcha/validacion."
+        )
+    if encontrado[0] == "bloqueo" or _es_texto_bloqueo_validacion(html_actual):
+        raise RuntimeError(
+            "La validacion/captcha bloqueo la continuacion del flujo en el iframe."
+        )
+    return html_actual
 
 
 def _es_no_encontrado_bdua(html: str) -> bool:
@@ -136,10 +176,7 @@ RECAPTCHA_SITE_KEY = os.environ.get(
 )
 
 
-def _intentar_generar_token_recaptcha(frame: Frame) -> str:
-    site_key = RECAPTCHA_SITE_KEY
-    return frame.evaluate(
-        """([sk]) => new Promise((resolve) => {
+_JS_TOKEN_RECAPTCHA = """([sk]) => new Promise((resolve) => {
   try {
     const input = document.querySelector('#recaptchaToken');
     const current = (input && input.value) ? input.value : '';
@@ -155,9 +192,11 @@ def _intentar_generar_token_recaptcha(frame: Frame) -> str:
       } catch (e) { resolve(''); }
     });
   } catch (e) { resolve(''); }
-})""",
-        [site_key],
-    ) or ""
+})"""
+
+
+def _intentar_generar_token_recaptcha(frame: Frame) -> str:
+    return frame.evaluate(_JS_TOKEN_RECAPTCHA, [RECAPTCHA_SITE_KEY]) or ""
 
 
 def _asegurar_token_recaptcha(frame: Frame, *, headless: bool) -> str:
@@ -170,13 +209,54 @@ def _asegurar_token_recaptcha(frame: Frame, *, headless: bool) -> str:
         return token
 
     espera_max_s = 45 if not headless else 10
-    inicio = datetime.now().timestamp()
-    while datetime.now().timestamp() - inicio < espera_max_s:
-        frame.page.wait_for_timeout(700)
-        token = _leer_token_recaptcha(frame)
-        if token:
-            return token
-    return ""
+    esperar_primero(frame, js(JS_TOKEN_PRESENTE, nombre="token"), timeout_ms=espera_max_s * 1000)
+    return _leer_token_recaptcha(frame)
+
+
+def _limpiar_token_recaptcha(frame: Frame) -> None:
+    # Los tokens reCAPTCHA vencen a los ~2 min; una pagina estacionada pide uno nuevo.
+    frame.evaluate(
+        "() => { const i = document.querySelector('#recaptchaToken'); if (i) i.value = ''; }"
+    )
+
+
+def _preparar_formulario(page: Page) -> None:
+    logger.info("Abriendo ADRES: Consulte su EPS.")
+    page.goto(URL_CONSULTA_EPS, wait_until="domcontentloaded", timeout=60000)
+    esperar_primero(
+        page,
+        cumple(lambda: _buscar_frame_formulario(page.frames) is not None, nombre="iframe"),
+        timeout_ms=20000,
+    )
+    frame = _obtener_frame_formulario(page.frames)
+    esperar_primero(frame, visible("#txtNumDoc"), timeout_ms=15000)
+    # Con grecaptcha cargado el token se pide al momento en vez de sondear el input.
+    esperar_primero(frame, js(JS_GRECAPTCHA_LISTO, nombre="grecaptcha"), timeout_ms=2500)
+
+
+def _formulario_vigente(page: Page) -> bool:
+    frame = _obtener_frame_formulario(page.frames)
+    return bool(
+        frame.evaluate(
+            """() => {
+            const input = document.querySelector('#txtNumDoc');
+            return !!input && !input.value && !!document.querySelector("input[name='__VIEWSTATE']");
+        }"""
+        )
+    )
+
+
+PORTAL_FOSIGA = PortalCaliente(
+    "fosiga",
+    preparar=_preparar_formulario,
+    vigente=_formulario_vigente,
+    opciones_contexto={
+        "perfil": "fosiga",
+        "viewport": {"width": 1366, "height": 900},
+        "locale": "es-CO",
+        "timezone_id": "America/Bogota",
+    },
+)
 
 
 def ejecutar_consulta(
@@ -185,22 +265,18 @@ def ejecutar_consulta(
     headless: bool,
     output_dir: Path | None = None,
     keep_open_after_step: bool = False,
+    pool: PoolNavegadores | None = None,
+    paginas: PoolPaginasCalientes | None = None,
 ) -> dict[str, str]:
-    logger.info("Abriendo ADRES: Consulte su EPS.")
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=headless)
-        context = browser.new_context(
-            viewport={"width": 1366, "height": 900},
-            locale="es-CO",
-            timezone_id="America/Bogota",
-        )
-        page = context.new_page()
-        page.set_default_timeout(30000)
+    with abrir_pagina_portal(pool, paginas, PORTAL_FOSIGA, headless=headless) as lista:
+        page = lista.page
+        context = page.context
 
         try:
-            page.goto(URL_CONSULTA_EPS, wait_until="domcontentloaded", timeout=60000)
-            page.wait_for_timeout(2500)
+            lista.preparar()
             frame_formulario = _obtener_frame_formulario(page.frames)
+            if lista.caliente:
+                _limpiar_token_recaptcha(frame_formulario)
             logger.info("Digitando numero de identificacion: %s", numero_documento)
             _diligenciar_numero(frame_formulario, numero_documento)
             token = _asegurar_token_recaptcha(frame_formulario, headless=headless)
@@ -208,10 +284,15 @@ def ejecutar_consulta(
             nueva_pestana = _clic_consultar_y_capturar_pestana(
                 frame=frame_formulario, context=context
             )
-            page.wait_for_timeout(2500)
 
             if nueva_pestana:
                 logger.info("Se detecto nueva pestana; se exporta HTML completo de esa pestana.")
+                esperar_primero(
+                    nueva_pestana,
+                    visible(SELECTOR_RESULTADO),
+                    texto(PATRON_NO_ENCONTRADO),
+                    timeout_ms=5000,
+                )
                 html_resultado = nueva_pestana.content()
                 url_final = nueva_pestana.url
             else:
@@ -272,5 +353,3 @@ def ejecutar_consulta(
                     input()
                 except EOFError:
                     pass
-            context.close()
-            browser.close()
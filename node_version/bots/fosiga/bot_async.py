@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+from playwright.async_api import BrowserContext, Frame, Page
+
+from common.async_runtime import RuntimeAsync
+from common.esperas import (
+    aparece_elemento,
+    aparece_texto,
+    cumple,
+    documento_nuevo,
+    esperar_fragmento_async,
+    esperar_primero_async,
+    js,
+    texto,
+    visible,
+)
+from .bot import (
+    FOSIGA_DATA_DIR,
+    JS_GRECAPTCHA_LISTO,
+    JS_TOKEN_PRESENTE,
+    PATRON_BLOQUEO,
+    PATRON_NO_ENCONTRADO,
+    RECAPTCHA_SITE_KEY,
+    SELECTOR_RESULTADO,
+    URL_CONSULTA_EPS,
+    _JS_TOKEN_RECAPTCHA,
+    _buscar_frame_formulario,
+    _es_no_encontrado_bdua,
+    _es_texto_bloqueo_validacion,
+    _guardar_html_resultado,
+    _obtener_frame_formulario,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _diligenciar_numero(frame: Frame, numero_documento: str) -> None:
+    selectores = [
+        frame.locator("input#txtNumDoc").first,
+        frame.locator("input[name='txtNumDoc']").first,
+        frame.get_by_label("Numero", exact=False).first,
+        frame.locator("input[id*='num' i], input[name*='num' i]").first,
+        frame.locator("input[type='text']").first,
+    ]
+
+    ultimo_error: Exception | None = None
+    for campo in selectores:
+        try:
+            await campo.wait_for(state="visible", timeout=8000)
+            await campo.fill(numero_documento)
+            valor = await campo.input_value(timeout=2000)
+            if valor.strip() == numero_documento:
+                return
+        except Exception as exc:
+            ultimo_error = exc
+
+    if ultimo_error:
+        raise RuntimeError(
+            "No se pudo ubicar o diligenciar el campo 'Numero' en ADRES."
+        ) from ultimo_error
+    raise RuntimeError("No se pudo diligenciar el campo 'Numero' en ADRES.")
+
+
+async def _leer_token_recaptcha(frame: Frame) -> str:
+    try:
+        return await frame.locator("#recaptchaToken").input_value(timeout=1500) or ""
+    except Exception:
+        return ""
+
+
+async def _asegurar_token_recaptcha(frame: Frame, *, headless: bool) -> str:
+    token = await _leer_token_recaptcha(frame)
+    if token:
+        return token
+
+    token = await frame.evaluate(_JS_TOKEN_RECAPTCHA, [RECAPTCHA_SITE_KEY]) or ""
+    if token:
+        return token
+
+    espera_max_s = 45 if not headless else 10
+    await esperar_primero_async(frame, js(JS_TOKEN_PRESENTE, nombre="token"), timeout_ms=espera_max_s * 1000)
+    return await _leer_token_recaptcha(frame)
+
+
+async def _clic_consultar_y_capturar_pestana(
+    *, frame: Frame, context: BrowserContext
+) -> Page | None:
+    boton = frame.locator("input#btnConsultar").first
+    await boton.wait_for(state="visible", timeout=10000)
+    logger.info("Clic en consultar")
+    paginas_antes = set(context.pages)
+    await boton.click(timeout=15000)
+
+    def pagina_nueva() -> Page | None:
+        return next((p for p in context.pages if p not in paginas_antes), None)
+
+    desenlace = await esperar_primero_async(
+        frame,
+        cumple(lambda: pagina_nueva() is not None, nombre="pestana"),
+        visible(SELECTOR_RESULTADO, nombre="resultado_en_iframe"),
+        texto(PATRON_NO_ENCONTRADO, nombre="no_encontrado_en_iframe"),
+        timeout_ms=35000,
+    )
+    pagina = pagina_nueva()
+    if desenlace != "pestana" or pagina is None:
+        return None
+    try:
+        await pagina.wait_for_load_state("domcontentloaded", timeout=15000)
+    except Exception:
+        pass
+    return pagina
+
+
+async def _esperar_html_resultado_en_frame(frame: Frame, *, timeout_ms: int = 180000) -> str:
+    try:
+        encontrado = await esperar_fragmento_async(
+            frame,
+            aparece_texto(PATRON_BLOQUEO, nombre="bloqueo"),
+            aparece_elemento(SELECTOR_RESULTADO, nombre="resultado"),
+            aparece_texto(PATRON_NO_ENCONTRADO, nombre="no_encontrado"),
+            documento_nuevo(nombre="postback"),
+            timeout_ms=timeout_ms,
+        )
+        html_actual = await frame.content() if encontrado else ""
+    except Exception as exc:
+        raise RuntimeError(
+            "El navegador/carga se cerro antes de obtener la pagina de resultado."
+        ) from exc
+    if encontrado is None:
+        raise RuntimeError(
+            "No se detecto carga de pagina de resultado despues de Consultar. "
+            "Es posible que falte completar captcha/validacion."
+        )
+    if encontrado[0] == "bloqueo" or _es_texto_bloqueo_validacion(html_actual):
+        raise RuntimeError(
+            "La validacion/captcha bloqueo la continuacion del flujo en el iframe."
+        )
+    return html_actual
+
+
+async def ejecutar_consulta(
+    *,
+    numero_documento: str,
+    runtime: RuntimeAsync,
+    headless: bool = True,
+    output_dir: Path | None = None,
+) -> dict[str, str]:
+    """Misma consulta y mismo dict que `fosiga.bot.ejecutar_consulta`, sobre el runtime async."""
+    logger.info("Abriendo ADRES (async) para %s: Consulte su EPS.", numero_documento)
+    async with runtime.contexto(
+        headless=headless,
+        perfil="fosiga",
+        viewport={"width": 1366, "height": 900},
+        locale="es-CO",
+        timezone_id="America/Bogota",
+    ) as context:
+        page = await context.new_page()
+        page.set_default_timeout(30000)
+
+        try:
+            await page.goto(URL_CONSULTA_EPS, wait_until="domcontentloaded", timeout=60000)
+            await esperar_primero_async(
+                page,
+                cumple(lambda: _buscar_frame_formulario(page.frames) is not None, nombre="iframe"),
+                timeout_ms=20000,
+            )
+            frame_formulario = _obtener_frame_formulario(page.frames)
+            await esperar_primero_async(frame_formulario, visible("#txtNumDoc"), timeout_ms=15000)
+            await esperar_primero_async(
+                frame_formulario, js(JS_GRECAPTCHA_LISTO, nombre="grecaptcha"), timeout_ms=2500
+            )
+            logger.info("Digitando numero de identificacion: %s", numero_documento)
+            await _diligenciar_numero(frame_formulario, numero_documento)
+            token = await _asegurar_token_recaptcha(frame_formulario, headless=headless)
+            logger.info("Token reCAPTCHA disponible (%s): %s", numero_documento, "SI" if token else "NO")
+            nueva_pestana = await _clic_consultar_y_capturar_pestana(
+                frame=frame_formulario, context=context
+            )
+
+            if nueva_pestana:
+                await esperar_primero_async(
+                    nueva_pestana,
+                    visible(SELECTOR_RESULTADO),
+                    texto(PATRON_NO_ENCONTRADO),
+                    timeout_ms=5000,
+                )
+                html_resultado = await nueva_pestana.content()
+                url_final = nueva_pestana.url
+            else:
+                try:
+                    html_resultado = await _esperar_html_resultado_en_frame(frame_formulario)
+                except RuntimeError as exc:
+                    html_actual = await frame_formulario.content()
+                    if headless and _es_texto_bloqueo_validacion(html_actual):
+                        return {
+                            "estado": "ERROR",
+                            "motivo": (
+                                "El portal bloqueo la consulta en modo headless por validacion/captcha "
+                                "(no se abrio la pagina de respuesta)."
+                            ),
+                            "url_final": frame_formulario.url or page.url,
+                            "archivo_html": "",
+                        }
+                    raise exc
+                url_final = frame_formulario.url or page.url
+
+            if _es_no_encontrado_bdua(html_resultado):
+                logger.info("Documento %s no encontrado en BDUA.", numero_documento)
+                return {
+                    "estado": "FINALIZADO",
+                    "motivo": (
+                        f"El afiliado con numero de documento {numero_documento} no se encuentra en BDUA."
+                    ),
+                    "url_final": url_final,
+                    "archivo_html": "",
+                }
+
+            salida_dir = output_dir or (FOSIGA_DATA_DIR / "salidas_fosiga")
+            archivo_html = _guardar_html_resultado(
+                html_resultado, output_dir=salida_dir, numero_documento=numero_documento
+            )
+            logger.info("HTML exportado desde: %s", url_final)
+
+            return {
+                "estado": "EXITOSA",
+                "motivo": "Paso completado: numero diligenciado, clic en Consultar y HTML exportado.",
+                "url_final": url_final,
+                "archivo_html": str(archivo_html),
+            }
+        except Exception as e:
+            logger.error("Error en flujo FOSIGA (%s): %s", numero_documento, e)
+            return {
+                "estado": "ERROR",
+                "motivo": str(e),
+                "url_final": "",
+            }
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 from pathlib import Path
 
+from common.async_runtime import RuntimeAsync, registrar_consulta_async
+from common.browser_pool import PoolNavegadores
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.paginas_calientes import PoolPaginasCalientes
 from common.storage import registrar_consulta
-from . import bot
+from . import bot, bot_async
 
 
 def run_fosiga_bot(
@@ -15,6 +18,8 @@ def run_fosiga_bot(
     registro_csv: Path | None = None,
     keep_open_after_step: bool = False,
     verbose: bool = False,
+    pool: PoolNavegadores | None = None,
+    paginas: PoolPaginasCalientes | None = None,
 ) -> dict[str, str]:
     configurar_logging(verbose=verbose)
     silenciar_logs_ruidosos()
@@ -24,6 +29,8 @@ def run_fosiga_bot(
         headless=headless,
         output_dir=output_dir,
         keep_open_after_step=keep_open_after_step,
+        pool=pool,
+        paginas=paginas,
     )
 
     registro = registro_csv or (Path(__file__).resolve().parent / "fosiga_consultas.csv")
@@ -37,3 +44,31 @@ def run_fosiga_bot(
         campos_extra={"url_final": resultado.get("url_final", "")},
     )
     return resultado
+
+
+async def run_fosiga_bot_async(
+    *,
+    numero_documento: str,
+    runtime: RuntimeAsync,
+    headless: bool = True,
+    output_dir: Path | None = None,
+    registro_csv: Path | None = None,
+) -> dict[str, str]:
+    resultado = await bot_async.ejecutar_consulta(
+        numero_documento=numero_documento,
+        runtime=runtime,
+        headless=headless,
+        output_dir=output_dir,
+    )
+
+    registro = registro_csv or (Path(__file__).resolve().parent / "fosiga_consultas.csv")
+    await registrar_consulta_async(
+        tabla_db="fosiga_consultas",
+        csv_path=registro,
+        numero_id=numero_documento,
+        estado=resultado.get("estado", ""),
+        motivo=resultado.get("motivo", ""),
+        archivo_original=resultado.get("archivo_html", "") or "",
+        campos_extra={"url_final": resultado.get("url_final", "")},
+    )
+    return resultado
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline de resolucion de captcha RUAF sobre imagenes con respuesta conocida.
+
+Corre cada solucionador (reconocedor local, Tesseract escalonado, Tesseract
+completo, cada nivel Tesseract por separado y, con --gemini, Gemini) sobre los
+captchas aceptados de un corpus o carpeta exportada, y reporta precision exacta,
+precision por caracter, latencia p50/p95, segundos de CPU y lecturas Tesseract
+por captcha. El reconocedor se entrena en memoria con una parte de las muestras
+y todos los solucionadores se miden sobre la parte reservada (--validacion 0
+usa el modelo guardado y mide sobre todo). Con --json deja el resultado en un
+archivo para comparar entre commits.
+
+Uso:
+  python3 herramientas/benchmark_captcha.py ruaf/captcha_intentos
+  python3 herramientas/benchmark_captcha.py /tmp/dataset --solucionador tesseract_escalonado --json bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from PIL import Image
+
+from common.ai import resolver_captcha_ocr
+from common.corpus_captcha import cargar_muestras_aceptadas
+from common.logging_config import configurar_logging
+from common.ocr import lecturas_realizadas, obtener_pool, ocr_disponible
+from common.reconocedor_captcha import ReconocedorCaptcha, dividir_muestras, reconocedor_disponible
+from common.timezone_utils import ZONA_BOGOTA
+from ruaf.bot import (
+    NIVELES_OCR,
+    OCR_OEMS,
+    OCR_PSMS,
+    RECONOCEDOR_PATH,
+    cargar_reconocedor,
+    leer_captcha_multipass,
+    leer_captcha_nivel,
+    leer_captcha_reconocedor,
+)
+
+NIVELES_TESSERACT = tuple(f"tesseract_nivel{n}" for n in range(1, len(NIVELES_OCR) + 1))
+SOLUCIONADORES = ("reconocedor", "tesseract_escalonado", "tesseract_completo", *NIVELES_TESSERACT, "gemini")
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def _commit_actual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BOTS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def preparar_reconocedor(
+    muestras: list[tuple[bytes, str]], *, modelo: Path, validacion: float
+) -> tuple[ReconocedorCaptcha | None, list[tuple[bytes, str]]]:
+    """
+    Con validacion > 0 entrena el reconocedor en memoria con el resto de las
+    muestras y devuelve solo las reservadas para medir; si no, carga el modelo
+    guardado y mide sobre todas (puede incluir captchas de su entrenamiento).
+    """
+    if validacion <= 0:
+        print(f"(aviso) reconocedor medido con {modelo}: las muestras pueden ser de su entrenamiento")
+        return cargar_reconocedor(modelo), muestras
+    entrenamiento, reservadas = dividir_muestras(muestras, validacion)
+    if not reconocedor_disponible() or not reservadas:
+        return None, reservadas or muestras
+    try:
+        reconocedor, stats = ReconocedorCaptcha.entrenar(entrenamiento)
+    except ValueError as e:
+        print(f"(omitido) reconocedor: {e}")
+        return None, reservadas
+    print(
+        f"Reconocedor entrenado con {stats['usadas']} captchas; "
+        f"se mide sobre {len(reservadas)} reservados."
+    )
+    return reconocedor, reservadas
+
+
+def construir_solucionadores(
+    nombres: list[str], *, reconocedor: ReconocedorCaptcha | None, workers: int
+) -> dict[str, Callable[[bytes], str]]:
+    pool = obtener_pool(workers, precalentar=[(oem, psm) for oem in OCR_OEMS for psm in OCR_PSMS])
+    out: dict[str, Callable[[bytes], str]] = {}
+    for nombre in nombres:
+        if nombre == "reconocedor":
+            if reconocedor is None:
+                print("(omitido) reconocedor: sin modelo (falta numpy o muestras utilizables)")
+                continue
+            # Sin umbral: se mide la lectura cruda, no la decision de enviar.
+            out[nombre] = lambda png, r=reconocedor: leer_captcha_reconocedor(
+                r, Image.open(io.BytesIO(png)), umbral=0.0
+            )[0]
+        elif nombre.startswith("tesseract"):
+            if not ocr_disponible():
+                print(f"(omitido) {nombre}: falta tesserocr/pytesseract")
+                continue
+            if nombre in NIVELES_TESSERACT:
+                nivel = NIVELES_TESSERACT.index(nombre) + 1
+                out[nombre] = lambda png, n=nivel: leer_captcha_nivel(
+                    Image.open(io.BytesIO(png)), n, pool=pool
+                )[0]
+                continue
+            escalonado = nombre == "tesseract_escalonado"
+            out[nombre] = lambda png, e=escalonado: leer_captcha_multipass(
+                Image.open(io.BytesIO(png)), pool=pool, escalonado=e
+            )[0]
+        elif nombre == "gemini":
+            out[nombre] = lambda png: resolver_captcha_ocr(png) or ""
+    return out
+
+
+def medir(resolver: Callable[[bytes], str], muestras: list[tuple[bytes, str]]) -> dict[str, Any]:
+    latencias: list[float] = []
+    cpu: list[float] = []
+    lecturas: list[int] = []
+    exactas = aciertos_caracter = caracteres = 0
+    for png, esperado in muestras:
+        lect0, cpu0, t0 = lecturas_realizadas(), time.process_time(), time.perf_counter()
+        try:
+            leido = resolver(png)
+        except Exception as e:
+            print(f"  error resolviendo {esperado!r}: {e}")
+            leido = ""
+        latencias.append(time.perf_counter() - t0)
+        cpu.append(time.process_time() - cpu0)
+        lecturas.append(lecturas_realizadas() - lect0)
+        exactas += int(leido == esperado)
+        caracteres += len(esperado)
+        aciertos_caracter += sum(a == b for a, b in zip(leido, esperado))
+    n = len(muestras)
+    return {
+        "muestras": n,
+        "exactas": exactas,
+        "precision": round(exactas / n, 4) if n else 0.0,
+        "precision_caracter": round(aciertos_caracter / caracteres, 4) if caracteres else 0.0,
+        "latencia_p50_ms": round(_percentil(latencias, 50) * 1000, 1),
+        "latencia_p95_ms": round(_percentil(latencias, 95) * 1000, 1),
+        "cpu_s_por_captcha": round(statistics.fmean(cpu), 4) if cpu else 0.0,
+        "lecturas_tesseract_por_captcha": round(statistics.fmean(lecturas), 2) if lecturas else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de captcha RUAF")
+    parser.add_argument(
+        "origen",
+        type=Path,
+        nargs="+",
+        help="Corpus SQLite, carpeta que lo contiene o carpeta exportada (PNG + etiquetas.csv)",
+    )
+    parser.add_argument("--portal", default="ruaf", help="Portal de las muestras (default: ruaf)")
+    parser.add_argument(
+        "--solucionador",
+        action="append",
+        choices=SOLUCIONADORES,
+        default=None,
+        help="Solucionador a medir (repetible; por defecto todos menos gemini)",
+    )
+    parser.add_argument("--gemini", action="store_true", help="Incluir Gemini (consume API)")
+    parser.add_argument(
+        "--validacion",
+        type=float,
+        default=0.3,
+        help="Fraccion reservada para medir; el reconocedor se entrena con el resto (0 = usar --modelo)",
+    )
+    parser.add_argument(
+        "--modelo", type=Path, default=RECONOCEDOR_PATH, help="Modelo del reconocedor local (con --validacion 0)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Procesos OCR (0 = serie; el CPU de los workers no entra en cpu_s_por_captcha)",
+    )
+    parser.add_argument("--limite", type=int, default=0, help="Usar solo los primeros N captchas")
+    parser.add_argument("--json", type=Path, default=None, help="Escribir resultados en este archivo JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar el log de cada lectura")
+    args = parser.parse_args()
+
+    configurar_logging(verbose=args.verbose)
+    if not args.verbose:
+        for nombre in ("ruaf", "common.ai", "common.ocr", "common.reconocedor_captcha"):
+            logging.getLogger(nombre).setLevel(logging.WARNING)
+    muestras = list(
+        dict.fromkeys(m for origen in args.origen for m in cargar_muestras_aceptadas(origen, portal=args.portal))
+    )
+    if args.limite > 0:
+        muestras = muestras[: args.limite]
+    if not muestras:
+        print("No hay captchas aceptados con respuesta conocida.")
+        sys.exit(1)
+
+    nombres = args.solucionador or [s for s in SOLUCIONADORES if s != "gemini"]
+    if args.gemini and "gemini" not in nombres:
+        nombres.append("gemini")
+    reconocedor = None
+    if "reconocedor" in nombres:
+        reconocedor, muestras = preparar_reconocedor(muestras, modelo=args.modelo, validacion=args.validacion)
+    elif args.validacion > 0:
+        # Mismas muestras reservadas que con el reconocedor, para comparar corridas.
+        muestras = dividir_muestras(muestras, args.validacion)[1] or muestras
+    solucionadores = construir_solucionadores(nombres, reconocedor=reconocedor, workers=args.workers)
+
+    resultados: dict[str, dict[str, Any]] = {}
+    print(
+        f"{'solucionador':22s} {'exacta':>7s} {'x_car':>7s} {'p50_ms':>8s} {'p95_ms':>8s} "
+        f"{'cpu_s':>7s} {'tess':>6s}"
+    )
+    for nombre, resolver in solucionadores.items():
+        r = medir(resolver, muestras)
+        resultados[nombre] = r
+        print(
+            f"{nombre:22s} {r['precision']:7.2%} {r['precision_caracter']:7.2%} "
+            f"{r['latencia_p50_ms']:8.1f} {r['latencia_p95_ms']:8.1f} "
+            f"{r['cpu_s_por_captcha']:7.3f} {r['lecturas_tesseract_por_captcha']:6.1f}"
+        )
+
+    if args.json is not None:
+        reporte = {
+            "commit": _commit_actual(),
+            "fecha": datetime.now(ZONA_BOGOTA).strftime("%Y-%m-%d %H:%M:%S"),
+            "portal": args.portal,
+            "muestras": len(muestras),
+            "validacion": args.validacion,
+            "workers": args.workers,
+            "solucionadores": resultados,
+        }
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Resultados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
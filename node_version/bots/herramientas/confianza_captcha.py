@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Filtro de confianza del captcha — idas y vueltas ahorradas frente a aciertos perdidos.
+
+Uso:
+  python3 herramientas/confianza_captcha.py --portal ruaf
+  python3 herramientas/confianza_captcha.py --portal ruaf --umbral 0.3 --umbral 0.5 --umbral 0.7
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from common.confianza_captcha import CONFIANZA_PATH, EstadisticasConfianza
+from common.logging_config import configurar_logging
+
+UMBRALES_DEFECTO = (0.0, 0.2, 0.34, 0.5, 0.6, 0.75, 0.9)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simular umbrales del filtro de confianza de captcha")
+    parser.add_argument("--portal", default="ruaf", help="Portal (default: ruaf)")
+    parser.add_argument("--ruta", type=Path, default=CONFIANZA_PATH, help="Archivo SQLite de decisiones")
+    parser.add_argument("--umbral", type=float, action="append", default=None, help="Umbral a simular (repetible)")
+    args = parser.parse_args()
+
+    configurar_logging(verbose=False)
+    estadisticas = EstadisticasConfianza(args.portal, ruta=args.ruta)
+    filas = [estadisticas.simular(u) for u in (args.umbral or UMBRALES_DEFECTO)]
+    if not filas[0]["enviados"]:
+        print(f"Sin envios registrados para {args.portal!r} en {args.ruta}.")
+        return
+
+    print(
+        f"Enviados: {filas[0]['enviados']} (precision actual {filas[0]['precision_actual']:.2%}); "
+        f"renovados por confianza: {filas[0]['renovados_registrados']}"
+    )
+    print(f"{'umbral':>7s} {'ahorradas':>10s} {'perdidos':>9s} {'precision':>10s}")
+    for f in filas:
+        print(
+            f"{f['umbral']:7.2f} {f['idas_ahorradas']:10d} {f['aciertos_perdidos']:9d} "
+            f"{f['precision_enviados']:10.2%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
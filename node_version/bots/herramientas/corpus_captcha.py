@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Corpus etiquetado de captchas — resumen, exportacion e importacion.
+
+Uso:
+  python3 herramientas/corpus_captcha.py --corpus ruaf/captcha_intentos/corpus_captcha.sqlite3
+  python3 herramientas/corpus_captcha.py --corpus ... --exportar /tmp/dataset --solo-aceptados
+  python3 herramientas/corpus_captcha.py --corpus ... --importar-dir ruaf/captcha_intentos --portal ruaf
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from common.corpus_captcha import (
+    CorpusCaptcha,
+    exportar_corpus,
+    importar_directorio_intentos,
+    resumen_corpus,
+)
+from common.logging_config import configurar_logging
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Corpus etiquetado de captchas")
+    parser.add_argument("--corpus", type=Path, required=True, help="Archivo SQLite del corpus")
+    parser.add_argument("--portal", default=None, help="Filtrar/etiquetar por portal (ej. ruaf)")
+    parser.add_argument("--exportar", type=Path, default=None, help="Carpeta destino: PNG + etiquetas.csv")
+    parser.add_argument(
+        "--solo-aceptados",
+        action="store_true",
+        help="Exportar solo intentos que el portal acepto (texto = etiqueta verdadera)",
+    )
+    parser.add_argument(
+        "--importar-dir",
+        type=Path,
+        default=None,
+        help="Importar pares legados intento_*_original.png + _meta.txt",
+    )
+    args = parser.parse_args()
+
+    configurar_logging(verbose=False)
+
+    if args.importar_dir is not None:
+        corpus = CorpusCaptcha(args.corpus, portal=args.portal or "")
+        n = importar_directorio_intentos(corpus, args.importar_dir)
+        corpus.cerrar()
+        print(f"Importados {n} intentos desde {args.importar_dir}.")
+        return
+
+    if not args.corpus.exists():
+        print(f"No existe el corpus {args.corpus}.")
+        sys.exit(1)
+
+    if args.exportar is not None:
+        n = exportar_corpus(
+            args.corpus, args.exportar, portal=args.portal, solo_aceptados=args.solo_aceptados
+        )
+        print(f"Exportadas {n} filas en {args.exportar / 'etiquetas.csv'}.")
+        return
+
+    filas = resumen_corpus(args.corpus)
+    if not filas:
+        print(f"Corpus vacio: {args.corpus}.")
+        return
+    print(f"{'portal':12s} {'veredicto':12s} {'intentos':>8s} {'imagenes':>8s}")
+    for f in filas:
+        print(f"{f['portal']:12s} {f['veredicto']:12s} {f['intentos']:8d} {f['imagenes']:8d}")
+
+
+if __name__ == "__main__":
+    main()
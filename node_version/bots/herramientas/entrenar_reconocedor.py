@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Entrena el reconocedor local de captchas con los intentos que el portal acepto.
+
+Uso:
+  python3 herramientas/entrenar_reconocedor.py ruaf/captcha_intentos
+  python3 herramientas/entrenar_reconocedor.py /tmp/dataset --salida ruaf/reconocedor_captcha.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from common.corpus_captcha import cargar_muestras_aceptadas
+from common.logging_config import configurar_logging
+from common.reconocedor_captcha import (
+    LADO_GLIFO,
+    LONGITUD_CAPTCHA,
+    ReconocedorCaptcha,
+    dividir_muestras,
+    reconocedor_disponible,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Entrenar reconocedor local de captchas")
+    parser.add_argument(
+        "origen",
+        type=Path,
+        nargs="+",
+        help="Corpus SQLite, carpeta que lo contiene o carpeta exportada (PNG + etiquetas.csv)",
+    )
+    parser.add_argument("--portal", default="ruaf", help="Portal de las muestras (default: ruaf)")
+    parser.add_argument(
+        "--salida",
+        type=Path,
+        default=BOTS_DIR / "ruaf" / "reconocedor_captcha.npz",
+        help="Archivo del modelo entrenado",
+    )
+    parser.add_argument("--validacion", type=float, default=0.1, help="Fraccion reservada para validar")
+    parser.add_argument("--longitud", type=int, default=LONGITUD_CAPTCHA, help="Caracteres por captcha")
+    parser.add_argument("--lado", type=int, default=LADO_GLIFO, help="Lado del glifo normalizado (px)")
+    args = parser.parse_args()
+
+    configurar_logging(verbose=False)
+    if not reconocedor_disponible():
+        print("Falta numpy: pip install numpy")
+        sys.exit(1)
+    muestras = list(
+        dict.fromkeys(m for origen in args.origen for m in cargar_muestras_aceptadas(origen, portal=args.portal))
+    )
+    if not muestras:
+        print("No hay captchas aceptados para entrenar.")
+        sys.exit(1)
+    entrenamiento, validacion = dividir_muestras(muestras, args.validacion)
+
+    modelo, stats = ReconocedorCaptcha.entrenar(entrenamiento, longitud=args.longitud, lado=args.lado)
+    print(
+        f"Entrenado con {stats['usadas']} captchas ({stats['glifos']} glifos, "
+        f"{stats['descartadas']} descartados, {len(modelo.clases)} clases)."
+    )
+    if validacion:
+        ev = modelo.evaluar(validacion)
+        print(
+            f"Validacion: {ev['exactas']}/{ev['muestras']} exactas "
+            f"(precision={ev['precision']:.2%}, por caracter={ev['precision_caracter']:.2%})."
+        )
+    modelo.guardar(args.salida)
+    print(f"Modelo guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
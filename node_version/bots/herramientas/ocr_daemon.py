@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Daemon OCR local compartido por todos los bots del host (socket Unix).
+
+Mantiene motores Tesseract precalentados, agrupa las solicitudes concurrentes y
+limita el OCR a --cpus procesos. Los bots lo usan automaticamente si el socket
+existe (BYBOT_OCR_DAEMON_SOCKET); si no responde, hacen el OCR en proceso.
+
+Uso:
+  python3 herramientas/ocr_daemon.py --cpus 4
+  python3 herramientas/ocr_daemon.py --estado
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from common.logging_config import configurar_logging
+from common.ocr_daemon import DAEMON_CPUS, DAEMON_SOCKET, DAEMON_VENTANA_MS, ClienteOCR, ServidorOCR
+
+PRECALENTAR = [(oem, psm) for oem in (3, 1) for psm in (7, 8, 13)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Daemon OCR compartido (socket Unix)")
+    parser.add_argument("--socket", type=Path, default=DAEMON_SOCKET, help="Ruta del socket Unix")
+    parser.add_argument("--cpus", type=int, default=DAEMON_CPUS, help="Procesos Tesseract maximos (presupuesto CPU)")
+    parser.add_argument(
+        "--ventana-ms",
+        type=float,
+        default=DAEMON_VENTANA_MS,
+        help="Espera para agrupar solicitudes concurrentes en un lote",
+    )
+    parser.add_argument("--estado", action="store_true", help="Consultar un daemon en marcha y salir")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Logs DEBUG")
+    args = parser.parse_args()
+
+    configurar_logging(verbose=args.verbose)
+    if args.estado:
+        try:
+            print(json.dumps(ClienteOCR(args.socket).estado(), indent=2))
+        except ConnectionError as e:
+            print(e)
+            sys.exit(1)
+        return
+
+    servidor = ServidorOCR(args.socket, cpus=args.cpus, ventana_ms=args.ventana_ms, precalentar=PRECALENTAR)
+    try:
+        servidor.servir()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
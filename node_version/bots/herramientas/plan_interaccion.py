@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Plan de interaccion aprendido por portal — consulta y reinicio.
+
+Uso:
+  python3 herramientas/plan_interaccion.py
+  python3 herramientas/plan_interaccion.py --portal www.simple.co
+  python3 herramientas/plan_interaccion.py --portal www.simple.co --reiniciar
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from common.logging_config import configurar_logging
+from common.plan_interaccion import PLAN_PATH, PlanInteraccion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plan de interaccion aprendido (selector / estrategia por paso)")
+    parser.add_argument("--portal", default=None, help="Host del portal (default: todos)")
+    parser.add_argument("--ruta", type=Path, default=PLAN_PATH, help="Archivo SQLite del plan")
+    parser.add_argument(
+        "--reiniciar",
+        action="store_true",
+        help="Olvidar lo aprendido (p. ej. si el portal cambio su HTML)",
+    )
+    args = parser.parse_args()
+
+    configurar_logging(verbose=False)
+    plan = PlanInteraccion(ruta=args.ruta)
+
+    if args.reiniciar:
+        borradas = plan.reiniciar(args.portal)
+        print(f"Plan {args.portal or '(todos)'!r} reiniciado: {borradas} pasos borrados.")
+        return
+
+    filas = [f for f in plan.resumen() if args.portal is None or f["portal"] == args.portal]
+    if not filas:
+        print(f"Sin plan aprendido en {args.ruta}.")
+        return
+
+    print(f"{'portal':24s} {'paso':20s} {'aciertos':>8s} {'fallos':>7s} {'tasa':>6s}  opcion")
+    for f in filas:
+        tasa = f"{f['tasa']:6.2f}" if f["tasa"] is not None else f"{'-':>6s}"
+        print(
+            f"{f['portal']:24s} {f['paso']:20s} {f['aciertos']:8d} {f['fallos']:7d} {tasa}  {f['opcion'] or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
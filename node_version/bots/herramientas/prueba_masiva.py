@@ -6,11 +6,13 @@ y genera un reporte de cobertura.
 Uso:
   python3 herramientas/prueba_masiva.py --bots rues,fosiga,suaporte --cedulas cedulas.txt
   python3 herramientas/prueba_masiva.py --bots rues,fosiga --cedulas 1022434547,52727688,79431670
+  python3 herramientas/prueba_masiva.py --bots rues,fosiga --cedulas cedulas.txt --concurrencia 12
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
 import csv
 import logging
 import sys
@@ -21,6 +23,13 @@ from pathlib import Path
 BOTS2_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BOTS2_DIR))
 
+from common.async_runtime import RuntimeAsync, ejecutar_lote
+from common.bloqueo_recursos import resumen_bloqueo
+from common.browser_pool import PoolNavegadores
+from common.cache_estaticos import obtener_cache_estaticos
+from common.esperas import resumen_esperas
+from common.plan_interaccion import resumen_plan
+from common.paginas_calientes import PoolPaginasCalientes
 from common.storage import registrar_consulta
 from common.timezone_utils import ZONA_BOGOTA
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
@@ -33,14 +42,18 @@ BOTS_DISPONIBLES = {
         "func": None,
         "modulo": "rues.service",
         "func_name": "run_rues_bot",
+        "func_async_name": "run_rues_bot_async",
         "param": "numero_busqueda",
+        "paginas_calientes": True,
     },
     "fosiga": {
         "nombre": "FOSIGA — ADRES Consulte su EPS",
         "func": None,
         "modulo": "fosiga.service",
         "func_name": "run_fosiga_bot",
+        "func_async_name": "run_fosiga_bot_async",
         "param": "numero_documento",
+        "paginas_calientes": True,
     },
     "suaporte": {
         "nombre": "SuAporte — Comprobante PDF",
@@ -69,6 +82,7 @@ BOTS_DISPONIBLES = {
         "modulo": "ruaf.service",
         "func_name": "run_ruaf_bot",
         "param": "numero_id",
+        "paginas_calientes": True,
     },
 }
 
@@ -83,11 +97,42 @@ def cargar_funciones(bot_names: list[str]) -> None:
         try:
             mod = importlib.import_module(info["modulo"])
             info["func"] = getattr(mod, info["func_name"])
+            if info.get("func_async_name"):
+                info["func_async"] = getattr(mod, info["func_async_name"])
             logger.debug("%s cargado", name)
         except Exception as e:
             logger.warning("No se pudo cargar %s: %s", name, e)
 
 
+def _registrar_fila(bot_name: str, cedula: str, resultado: dict, duracion: float, reporte_path: Path) -> dict:
+    estado = resultado.get("estado", "?")
+    archivo = resultado.get("archivo_html") or resultado.get("archivo_pdf") or ""
+    registrar_consulta(
+        tabla_db=f"{bot_name}_consultas",
+        csv_path=reporte_path,
+        numero_id=cedula,
+        estado=estado,
+        motivo=resultado.get("motivo", ""),
+        archivo_original=archivo,
+        campos_extra=resultado.get("datos_extraidos"),
+    )
+
+    icono = "OK" if estado == "EXITOSA" else ("~" if estado in ("FINALIZADO", "SIN_PAGOS_6_MESES") else "FAIL")
+    logger.info("  -> %s %s %s (%.1fs)", icono, bot_name, estado, duracion)
+    return {
+        "bot": bot_name,
+        "cedula": cedula,
+        "estado": estado,
+        "motivo": (resultado.get("motivo", "") or "")[:200],
+        "duracion_s": duracion,
+        "archivo": archivo,
+    }
+
+
+def _ruta_reporte(out: Path) -> Path:
+    return out / f"reporte_pruebas_{datetime.now(ZONA_BOGOTA).strftime('%Y%m%d_%H%M%S')}.csv"
+
+
 def ejecutar_prueba_masiva(
     bots: list[str],
     cedulas: list[str],
@@ -95,6 +140,8 @@ def ejecutar_prueba_masiva(
     headless: bool = True,
     pausa_entre_consultas: float = 3.0,
     output_dir: Path | None = None,
+    pool_navegadores: bool = True,
+    paginas_calientes: bool = True,
 ) -> list[dict]:
     out = output_dir or (BOTS2_DIR / "resultados_pruebas")
     out.mkdir(parents=True, exist_ok=True)
@@ -104,67 +151,100 @@ def ejecutar_prueba_masiva(
     total = len(cedulas) * len(bots)
     ejecutadas = 0
 
-    reporte_path = out / f"reporte_pruebas_{datetime.now(ZONA_BOGOTA).strftime('%Y%m%d_%H%M%S')}.csv"
-
-    for cedula in cedulas:
-        for bot_name in bots:
-            ejecutadas += 1
-            info = BOTS_DISPONIBLES[bot_name]
-            func = info.get("func")
-            if not func:
-                logger.warning("[%s/%s] %s: SKIP (no cargado)", ejecutadas, total, bot_name)
-                continue
-
-            logger.info("[%s/%s] %s | cedula=%s", ejecutadas, total, bot_name, cedula)
-
-            t0 = time.monotonic()
-            try:
-                kwargs = {info["param"]: cedula, "headless": headless, "verbose": False}
-                if bot_name in ("aportesenlinea",):
-                    kwargs["captcha_interactivo"] = False
-                if bot_name in ("ruaf",):
-                    kwargs["fecha"] = "14/04/2026"
-                if bot_name == "aportesenlinea":
-                    kwargs["fecha_expedicion"] = "26-MAR-13"
-
-                resultado = func(**kwargs)
-                duracion = round(time.monotonic() - t0, 1)
-                estado = resultado.get("estado", "?")
+    reporte_path = _ruta_reporte(out)
+
+    pool = PoolNavegadores() if pool_navegadores else None
+    paginas = PoolPaginasCalientes(pool) if pool is not None and paginas_calientes else None
+    try:
+        for cedula in cedulas:
+            for bot_name in bots:
+                ejecutadas += 1
+                info = BOTS_DISPONIBLES[bot_name]
+                func = info.get("func")
+                if not func:
+                    logger.warning("[%s/%s] %s: SKIP (no cargado)", ejecutadas, total, bot_name)
+                    continue
+
+                logger.info("[%s/%s] %s | cedula=%s", ejecutadas, total, bot_name, cedula)
+
+                t0 = time.monotonic()
+                try:
+                    kwargs = {info["param"]: cedula, "headless": headless, "verbose": False, "pool": pool}
+                    if info.get("paginas_calientes"):
+                        kwargs["paginas"] = paginas
+                    if bot_name in ("aportesenlinea",):
+                        kwargs["captcha_interactivo"] = False
+                    if bot_name in ("ruaf",):
+                        kwargs["fecha"] = "14/04/2026"
+                    if bot_name == "aportesenlinea":
+                        kwargs["fecha_expedicion"] = "26-MAR-13"
+
+                    resultado = func(**kwargs)
+                    duracion = round(time.monotonic() - t0, 1)
+
+                except Exception as e:
+                    duracion = round(time.monotonic() - t0, 1)
+                    resultado = {"estado": "ERROR_SCRIPT", "motivo": str(e), "archivo_html": "", "archivo_pdf": ""}
+
+                resultados.append(_registrar_fila(bot_name, cedula, resultado, duracion, reporte_path))
+
+                if ejecutadas < total:
+                    t_pausa = time.monotonic()
+                    if paginas is not None:
+                        paginas.reponer()
+                    time.sleep(max(0.0, pausa_entre_consultas - (time.monotonic() - t_pausa)))
+    finally:
+        if paginas is not None:
+            logger.info("Paginas calientes: %s", paginas.resumen())
+            paginas.cerrar()
+        if pool is not None:
+            logger.info("Pool de navegadores: %s", pool.resumen())
+            pool.cerrar()
+
+    return resultados
 
-            except Exception as e:
+
+def ejecutar_prueba_masiva_async(
+    bots: list[str],
+    cedulas: list[str],
+    *,
+    headless: bool = True,
+    concurrencia: int = 8,
+    output_dir: Path | None = None,
+) -> list[dict]:
+    """Todas las consultas de los bots con version async en un solo event loop."""
+    out = output_dir or (BOTS2_DIR / "resultados_pruebas")
+    out.mkdir(parents=True, exist_ok=True)
+    cargar_funciones(bots)
+    reporte_path = _ruta_reporte(out)
+
+    async def _correr() -> list[dict]:
+        async with RuntimeAsync(concurrencia=concurrencia) as runtime:
+
+            async def _consulta(bot_name: str, cedula: str) -> dict:
+                info = BOTS_DISPONIBLES[bot_name]
+                t0 = time.monotonic()
+                try:
+                    resultado = await info["func_async"](
+                        **{info["param"]: cedula}, runtime=runtime, headless=headless
+                    )
+                except Exception as e:
+                    resultado = {"estado": "ERROR_SCRIPT", "motivo": str(e), "archivo_html": "", "archivo_pdf": ""}
                 duracion = round(time.monotonic() - t0, 1)
-                estado = "ERROR_SCRIPT"
-                resultado = {"estado": "ERROR_SCRIPT", "motivo": str(e), "archivo_html": "", "archivo_pdf": ""}
-
-            archivo = resultado.get("archivo_html") or resultado.get("archivo_pdf") or ""
-            fila = {
-                "bot": bot_name,
-                "cedula": cedula,
-                "estado": estado,
-                "motivo": (resultado.get("motivo", "") or "")[:200],
-                "duracion_s": duracion,
-                "archivo": archivo,
-            }
-            resultados.append(fila)
-
-            campos_extra = resultado.get("datos_extraidos")
-            registrar_consulta(
-                tabla_db=f"{bot_name}_consultas",
-                csv_path=reporte_path,
-                numero_id=cedula,
-                estado=estado,
-                motivo=resultado.get("motivo", ""),
-                archivo_original=archivo,
-                campos_extra=campos_extra,
-            )
-
-            icono = "OK" if estado == "EXITOSA" else ("~" if estado in ("FINALIZADO", "SIN_PAGOS_6_MESES") else "FAIL")
-            logger.info("  -> %s %s (%.1fs)", icono, estado, duracion)
-
-            if ejecutadas < total:
-                time.sleep(pausa_entre_consultas)
+                return _registrar_fila(bot_name, cedula, resultado, duracion, reporte_path)
 
-    return resultados
+            trabajos = [
+                (lambda b=b, c=c: _consulta(b, c))
+                for c in cedulas
+                for b in bots
+                if BOTS_DISPONIBLES[b].get("func_async")
+            ]
+            logger.info("Lote async: %s consultas, concurrencia %s", len(trabajos), runtime.concurrencia)
+            filas = await ejecutar_lote(trabajos)
+            logger.info("Runtime async: %s", runtime.resumen())
+            return filas
+
+    return asyncio.run(_correr())
 
 
 def generar_reporte_consola(resultados: list[dict], bots: list[str]) -> None:
@@ -234,6 +314,22 @@ def main() -> None:
         default=None,
         help="Directorio de salida para reportes",
     )
+    parser.add_argument(
+        "--sin-pool",
+        action="store_true",
+        help="Lanzar un Chromium por consulta en vez de reutilizar el pool de navegadores",
+    )
+    parser.add_argument(
+        "--sin-paginas-calientes",
+        action="store_true",
+        help="No dejar paginas de RUES/FOSIGA/RUAF estacionadas en el formulario entre consultas",
+    )
+    parser.add_argument(
+        "--concurrencia",
+        type=int,
+        default=1,
+        help="Consultas simultaneas en un solo proceso (runtime async; solo rues y fosiga). Default: 1 (en serie)",
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Logs DEBUG")
     args = parser.parse_args()
 
@@ -261,17 +357,61 @@ def main() -> None:
     print(f"Modo: {'headed' if args.headed else 'headless'}")
     print()
 
+    bots_async: list[str] = []
+    if args.concurrencia > 1:
+        bots_async = [b for b in bots if BOTS_DISPONIBLES[b].get("func_async_name")]
+        print(f"Async (concurrencia {args.concurrencia}): {', '.join(bots_async) or '-'}")
+        print()
+    bots_serie = [b for b in bots if b not in bots_async]
+
     t_inicio = time.monotonic()
-    resultados = ejecutar_prueba_masiva(
-        bots=bots,
-        cedulas=cedulas,
-        headless=not args.headed,
-        pausa_entre_consultas=args.pausa,
-        output_dir=args.output,
-    )
+    resultados: list[dict] = []
+    if bots_async:
+        resultados += ejecutar_prueba_masiva_async(
+            bots=bots_async,
+            cedulas=cedulas,
+            headless=not args.headed,
+            concurrencia=args.concurrencia,
+            output_dir=args.output,
+        )
+    if bots_serie:
+        resultados += ejecutar_prueba_masiva(
+            bots=bots_serie,
+            cedulas=cedulas,
+            headless=not args.headed,
+            pausa_entre_consultas=args.pausa,
+            output_dir=args.output,
+            pool_navegadores=not args.sin_pool,
+            paginas_calientes=not args.sin_paginas_calientes,
+        )
     t_total = time.monotonic() - t_inicio
 
     generar_reporte_consola(resultados, bots)
+    for perfil, totales in resumen_bloqueo().items():
+        print(
+            f"  Recursos evitados {perfil}: {totales.get('bloqueadas', 0)} solicitudes, "
+            f"~{totales.get('bytes_evitados_est', 0) / 1_048_576:.1f} MB en {totales.get('contextos', 0)} contextos"
+        )
+    cache_estaticos = obtener_cache_estaticos()
+    if cache_estaticos is not None:
+        r = cache_estaticos.resumen()
+        print(
+            f"  Cache de estaticos: {r['aciertos']} aciertos / {r['fallos']} fallos, "
+            f"{r['bytes_servidos'] / 1_048_576:.1f} MB servidos desde disco"
+        )
+    esperas = resumen_esperas()
+    print(
+        f"  Esperas: {esperas['fijas_s']:.1f}s fijas, {esperas['eventos_s']:.1f}s por evento "
+        f"({esperas['esperas']} esperas, {esperas['agotadas']} vencidas)"
+    )
+    plan = resumen_plan()
+    probados = plan["aciertos"] + plan["fallos"]
+    if probados or plan["sin_plan"]:
+        tasa = f"{plan['aciertos'] / probados * 100:.0f}%" if probados else "-"
+        print(
+            f"  Plan de interaccion: {tasa} aciertos ({plan['aciertos']}/{probados} pasos con plan, "
+            f"{plan['sin_plan']} aprendiendo)"
+        )
     print(f"\nTiempo total: {t_total:.1f}s")
 
 
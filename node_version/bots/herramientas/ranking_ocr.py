@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Ranking adaptativo de estrategias OCR de captcha — consulta y reinicio.
+
+Uso:
+  python3 herramientas/ranking_ocr.py --portal ruaf
+  python3 herramientas/ranking_ocr.py --portal ruaf --reiniciar
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+from common.logging_config import configurar_logging
+from common.ranking_ocr import RANKING_PATH, RankingOCR
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ranking de estrategias OCR de captcha")
+    parser.add_argument("--portal", default="ruaf", help="Portal del ranking (default: ruaf)")
+    parser.add_argument("--ruta", type=Path, default=RANKING_PATH, help="Archivo SQLite del ranking")
+    parser.add_argument(
+        "--reiniciar",
+        action="store_true",
+        help="Borrar las estadisticas del portal (p. ej. si cambio el estilo del captcha)",
+    )
+    parser.add_argument("--top", type=int, default=0, help="Mostrar solo las N mejores estrategias")
+    args = parser.parse_args()
+
+    configurar_logging(verbose=False)
+    ranking = RankingOCR(args.portal, ruta=args.ruta)
+
+    if args.reiniciar:
+        borradas = ranking.reiniciar()
+        print(f"Ranking {args.portal!r} reiniciado: {borradas} estrategias borradas.")
+        return
+
+    filas = ranking.resumen()
+    if args.top > 0:
+        filas = filas[: args.top]
+    if not filas:
+        print(f"Sin estadisticas para {args.portal!r} en {args.ruta}.")
+        return
+
+    print(f"{'estrategia':36s} {'lecturas':>8s} {'aciertos':>8s} {'puntaje':>8s}")
+    for f in filas:
+        marca = "  (descartada)" if f["descartada"] else ""
+        print(
+            f"{f['estrategia']:36s} {f['lecturas']:8d} {f['aciertos']:8d} {f['puntaje']:8.3f}{marca}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita el flujo WebForms de RUAF (terminos, formulario con
+__VIEWSTATE / __EVENTVALIDATION, handler de captcha, Verificar, Consultar,
+ReportViewer asincrono y su exportacion XML / CSV), para probar
+`ruaf.cliente_http` sin salir a internet.
+
+Uso:
+  python3 herramientas/servidor_ruaf_simulado.py --puerto 8766
+      BYBOT_RUAF_URL_INICIO=http://127.0.0.1:8766/TerminosCondiciones.aspx \\
+          ./venv/bin/python -m ruaf.cli --numero 1022434547 --fecha 14/04/2016 -v
+  python3 herramientas/servidor_ruaf_simulado.py --verificar
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import html
+import io
+import random
+import secrets
+import string
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image, ImageDraw
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+RUTA_TERMINOS = "/TerminosCondiciones.aspx"
+RUTA_CONSULTA = "/RUAFPersona.aspx"
+RUTA_CAPTCHA = "/Captcha.ashx"
+RUTA_VISOR = "/Reserved.ReportViewerWebControl.axd"
+PANEL_REPORTE = "ctl00$MainContent$rvConsulta$ctl09$ReportArea"
+OBJETIVO_ASINCRONO = "ctl00$MainContent$rvConsulta$ctl09$Reserved_AsyncLoadTarget"
+
+MSG_NO_INFO_1 = (
+    "No existe información con este tipo y número de documento Ministerio de Salud y "
+    "Protección Social, Por favor verifique!"
+)
+MSG_NO_INFO_2 = (
+    "La fecha de expedición o nacimiento no coincide con la la información reportada "
+    "en las tablas de referencia del Ministerio de Salud y Protección Social, Por favor verifique!"
+)
+
+_MARCADA = ' selected="selected"'
+
+# numero -> (fecha de expedicion, filas del reporte)
+REGISTROS_SIMULADOS: dict[str, tuple[str, list[tuple[str, str]]]] = {
+    "1022434547": (
+        "14/04/2016",
+        [
+            ("EPS", "EPS SANITAS S.A."),
+            ("Régimen", "CONTRIBUTIVO"),
+            ("Estado de Afiliación", "ACTIVO"),
+            ("Fecha de Afiliación", "01/01/2026"),
+            ("Tipo de Afiliado", "COTIZANTE"),
+        ],
+    ),
+}
+
+
+def _pagina(cuerpo: str) -> bytes:
+    return (
+        "<!DOCTYPE html><html><head><title>RUAF</title></head><body>"
+        f"{cuerpo}</body></html>"
+    ).encode("utf-8")
+
+
+def _oculto(nombre: str, valor: str) -> str:
+    return f'<input type="hidden" name="{nombre}" id="{nombre}" value="{html.escape(valor)}" />'
+
+
+class ServidorRuafSimulado:
+    """
+    ThreadingHTTPServer en 127.0.0.1 con HTTP/1.1 keep-alive. Exige la cookie de
+    sesion y el __VIEWSTATE / __EVENTVALIDATION de la ultima respuesta en cada
+    postback, como un WebForms real. `contrato_roto` renombra el boton Verificar;
+    `formatos` son las exportaciones que acepta el visor (las demas dan la
+    pagina de error del ReportViewer).
+    """
+
+    def __init__(
+        self, *, puerto: int = 0, contrato_roto: bool = False, formatos: tuple[str, ...] = ("XML", "CSV")
+    ):
+        self.contrato_roto = contrato_roto
+        self.formatos = formatos
+        self.exportaciones: list[str] = []
+        self.sesiones: dict[str, dict[str, Any]] = {}
+        self.codigos: dict[str, str] = {}
+        self.solicitudes = 0
+        self.conexiones = 0
+        self._lock = threading.Lock()
+        servidor = self
+
+        class _Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                with servidor._lock:
+                    servidor.conexiones += 1
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _responder(
+                self, estado: int, cuerpo: bytes, *, tipo: str = "text/html; charset=utf-8", **cabeceras: str
+            ) -> None:
+                self.send_response(estado)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                for k, v in cabeceras.items():
+                    self.send_header(k.replace("_", "-"), v)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def _sesion(self) -> tuple[str, dict[str, Any], dict[str, str]]:
+                galletas = dict(
+                    p.strip().split("=", 1) for p in (self.headers.get("Cookie") or "").split(";") if "=" in p
+                )
+                sid = galletas.get("ASP.NET_SessionId", "")
+                nueva = {}
+                if sid not in servidor.sesiones:
+                    sid = secrets.token_hex(12)
+                    servidor.sesiones[sid] = {"terminos": False, "verificado": False, "codigo": "", "estado": ""}
+                    nueva = {"Set_Cookie": f"ASP.NET_SessionId={sid}; path=/; HttpOnly"}
+                return sid, servidor.sesiones[sid], nueva
+
+            def _estado_vista(self, sesion: dict[str, Any], botones: list[str]) -> str:
+                servidor._renovar_vista(sesion, botones)
+                return _oculto("__VIEWSTATE", sesion["estado"]) + _oculto("__EVENTVALIDATION", sesion["validacion"])
+
+            def _postback_valido(self, sesion: dict[str, Any], campos: dict[str, str]) -> bool:
+                return bool(sesion["estado"]) and campos.get("__VIEWSTATE") == sesion["estado"] and (
+                    campos.get("__EVENTVALIDATION") == sesion.get("validacion")
+                )
+
+            def _error_vista(self) -> None:
+                self._responder(500, _pagina("<h2>Validation of viewstate MAC failed.</h2>"))
+
+            def do_GET(self) -> None:
+                servidor.solicitudes += 1
+                ruta = urlsplit(self.path).path
+                sid, sesion, nueva = self._sesion()
+                if ruta == RUTA_TERMINOS:
+                    self._responder(200, self._terminos(sesion), **nueva)
+                elif ruta == RUTA_CONSULTA:
+                    if not sesion["terminos"]:
+                        self._responder(302, b"", Location=RUTA_TERMINOS, **nueva)
+                        return
+                    self._responder(200, self._formulario(sesion, {}), **nueva)
+                elif ruta == RUTA_CAPTCHA:
+                    if nueva:
+                        self._responder(200, _pagina("<p>Sesion expirada</p>"), **nueva)
+                        return
+                    self._responder(200, servidor._imagen_captcha(sesion), tipo="image/png")
+                elif ruta == RUTA_VISOR:
+                    self._exportar(sesion, parse_qs(urlsplit(self.path).query))
+                else:
+                    self._responder(404, _pagina("<p>404</p>"))
+
+            def do_POST(self) -> None:
+                servidor.solicitudes += 1
+                ruta = urlsplit(self.path).path
+                largo = int(self.headers.get("Content-Length") or 0)
+                campos = {k: v[-1] for k, v in parse_qs(self.rfile.read(largo).decode("utf-8")).items()}
+                sid, sesion, nueva = self._sesion()
+                if nueva or not self._postback_valido(sesion, campos):
+                    self._error_vista()
+                    return
+                if ruta == RUTA_TERMINOS:
+                    if campos.get("ctl00$MainContent$RadioButtonList1") != "1" or "ctl00$MainContent$btnEnviar" not in campos:
+                        self._responder(200, self._terminos(sesion))
+                        return
+                    sesion["terminos"] = True
+                    self._responder(302, b"", Location=RUTA_CONSULTA)
+                elif ruta == RUTA_CONSULTA and sesion["terminos"]:
+                    self._postback_consulta(sesion, campos)
+                else:
+                    self._responder(404, _pagina("<p>404</p>"))
+
+            def _terminos(self, sesion: dict[str, Any]) -> bytes:
+                return _pagina(
+                    f'<form method="post" action="./TerminosCondiciones.aspx" id="form1">'
+                    + self._estado_vista(sesion, ["ctl00$MainContent$btnEnviar"])
+                    + '<table id="MainContent_RadioButtonList1"><tr><td>'
+                    '<input id="MainContent_RadioButtonList1_0" type="radio" '
+                    'name="ctl00$MainContent$RadioButtonList1" value="1" /><label>Acepto</label></td><td>'
+                    '<input id="MainContent_RadioButtonList1_1" type="radio" '
+                    'name="ctl00$MainContent$RadioButtonList1" value="0" /><label>No acepto</label>'
+                    "</td></tr></table>"
+                    '<input type="submit" name="ctl00$MainContent$btnEnviar" value="Enviar" id="MainContent_btnEnviar" />'
+                    "</form>"
+                )
+
+            def _formulario(self, sesion: dict[str, Any], campos: dict[str, str], *, mensaje: str = "", extra: str = "") -> bytes:
+                verify = "btnValidar" if servidor.contrato_roto else "btnVerify"
+                botones = [f"ctl00$MainContent${verify}", "ctl00$MainContent$btnConsultar", OBJETIVO_ASINCRONO]
+                tipo = campos.get("ctl00$MainContent$ddlTiposDocumentos", "0")
+                opciones = "".join(
+                    f'<option{_MARCADA if v == tipo else ""} value="{v}">{t}</option>'
+                    for v, t in (("0", "-- Seleccione --"), ("CC", "CEDULA DE CIUDADANIA"), ("CE", "CEDULA DE EXTRANJERIA"))
+                )
+                numero = html.escape(campos.get("ctl00$MainContent$txbNumeroIdentificacion", ""))
+                fecha = html.escape(campos.get("ctl00$MainContent$datepicker", ""))
+                n = random.randint(1, 10**6)
+                return _pagina(
+                    f'<form method="post" action="./RUAFPersona.aspx" id="form1">'
+                    + self._estado_vista(sesion, botones)
+                    + _oculto("__EVENTTARGET", "")
+                    + _oculto("__EVENTARGUMENT", "")
+                    + '<script src="/ScriptResource.axd?d=abc" type="text/javascript"></script>'
+                    f'<select name="ctl00$MainContent$ddlTiposDocumentos" id="MainContent_ddlTiposDocumentos">{opciones}</select>'
+                    f'<input name="ctl00$MainContent$txbNumeroIdentificacion" type="text" value="{numero}" '
+                    'id="MainContent_txbNumeroIdentificacion" />'
+                    f'<input name="ctl00$MainContent$datepicker" type="text" value="{fecha}" id="MainContent_datepicker" />'
+                    f'<img id="MainContent_imgCaptcha" src="Captcha.ashx?n={n}" alt="captcha" />'
+                    '<input name="ctl00$MainContent$txtCaptcha" type="text" id="MainContent_txtCaptcha" />'
+                    f'<input type="submit" name="ctl00$MainContent${verify}" value="Verificar" id="MainContent_{verify}" />'
+                    f'<span id="MainContent_lblMessage">{html.escape(mensaje)}</span>'
+                    '<input type="submit" name="ctl00$MainContent$btnConsultar" value="Consultar" id="MainContent_btnConsultar" />'
+                    f"{extra}</form>"
+                )
+
+            def _exportar(self, sesion: dict[str, Any], query: dict[str, list[str]]) -> None:
+                formato = query.get("Format", [""])[-1]
+                if (
+                    query.get("OpType", [""])[-1] != "Export"
+                    or query.get("ReportSession", [""])[-1] != sesion.get("sesion_reporte")
+                    or formato not in servidor.formatos
+                ):
+                    self._responder(200, _pagina("<h1>Report Viewer Configuration Error</h1>"))
+                    return
+                servidor.exportaciones.append(formato)
+                tipo = "text/xml" if formato == "XML" else "text/csv"
+                self._responder(200, servidor._exportacion(sesion["reporte"], formato), tipo=tipo)
+
+            def _postback_consulta(self, sesion: dict[str, Any], campos: dict[str, str]) -> None:
+                if campos.get("__ASYNCPOST") == "true":
+                    self._carga_asincrona(sesion, campos)
+                    return
+                if "ctl00$MainContent$btnVerify" in campos:
+                    sesion["verificado"] = bool(sesion["codigo"]) and campos.get("ctl00$MainContent$txtCaptcha") == sesion["codigo"]
+                    sesion["codigo"] = ""
+                    mensaje = "Texto Válido" if sesion["verificado"] else "Texto Inválido"
+                    self._responder(200, self._formulario(sesion, campos, mensaje=mensaje))
+                    return
+                if "ctl00$MainContent$btnConsultar" in campos:
+                    if not sesion.pop("verificado", False):
+                        self._responder(200, self._formulario(sesion, campos, mensaje="Debe verificar el captcha"))
+                        return
+                    numero = campos.get("ctl00$MainContent$txbNumeroIdentificacion", "")
+                    fecha = campos.get("ctl00$MainContent$datepicker", "")
+                    registro = REGISTROS_SIMULADOS.get(numero)
+                    if registro is None or campos.get("ctl00$MainContent$ddlTiposDocumentos") != "CC":
+                        self._responder(200, self._formulario(sesion, campos, mensaje=MSG_NO_INFO_1))
+                        return
+                    if registro[0] != fecha:
+                        self._responder(200, self._formulario(sesion, campos, mensaje=MSG_NO_INFO_2))
+                        return
+                    sesion["reporte"] = numero
+                    visor = (
+                        '<div id="MainContent_rvConsulta"><div id="MainContent_rvConsulta_ctl09_ReportArea">'
+                        f'<input type="hidden" name="{OBJETIVO_ASINCRONO}" id="MainContent_rvConsulta_ctl09_Reserved_AsyncLoadTarget" />'
+                        "<div>Cargando...</div></div></div>"
+                        "<script type=\"text/javascript\">Sys.WebForms.PageRequestManager._initialize("
+                        "'ctl00$ScriptManager1', 'form1', "
+                        f"['t{PANEL_REPORTE}','MainContent_rvConsulta_ctl09_ReportArea'], [], [], 90, 'ctl00');"
+                        f"__doPostBack('{OBJETIVO_ASINCRONO}','');</script>"
+                    )
+                    self._responder(200, self._formulario(sesion, campos, extra=visor))
+                    return
+                self._responder(200, self._formulario(sesion, campos))
+
+            def _carga_asincrona(self, sesion: dict[str, Any], campos: dict[str, str]) -> None:
+                numero = sesion.get("reporte")
+                if (
+                    numero is None
+                    or self.headers.get("X-MicrosoftAjax") != "Delta=true"
+                    or campos.get("__EVENTTARGET") != OBJETIVO_ASINCRONO
+                    or campos.get("ctl00$ScriptManager1") != f"{PANEL_REPORTE}|{OBJETIVO_ASINCRONO}"
+                ):
+                    error = "Solicitud asincrona invalida"
+                    delta = f"{len(error)}|error|500|{error}|"
+                    self._responder(200, delta.encode("utf-8"), tipo="text/plain; charset=utf-8")
+                    return
+                filas = "".join(
+                    f"<tr><td>{html.escape(k)}:</td><td>{html.escape(v)}</td></tr>"
+                    for k, v in REGISTROS_SIMULADOS[numero][1]
+                )
+                panel = f'<div id="ctl00_MainContent_rvConsulta_ctl13"><table>{filas}</table></div>'
+                sesion["sesion_reporte"] = secrets.token_hex(8)
+                export_url = (
+                    f"\\/Reserved.ReportViewerWebControl.axd?ReportSession={sesion['sesion_reporte']}"
+                    "\\u0026ControlID=rvConsulta\\u0026OpType=Export\\u0026FileName=Reporte"
+                    "\\u0026ContentDisposition=OnlyHtmlInline\\u0026Format="
+                )
+                script = (
+                    "Sys.Application.add_init(function() { $create(Microsoft.Reporting.WebFormsClient._InternalReportViewer, "
+                    f'{{"ExportUrlBase":"{export_url}","ReportAreaContentType":1}}, null, null, '
+                    '$get("MainContent_rvConsulta_ctl09")); });'
+                )
+                servidor._renovar_vista(sesion, sesion["botones"])
+                delta = "".join(
+                    f"{len(c)}|{t}|{i}|{c}|"
+                    for t, i, c in (
+                        ("updatePanel", "MainContent_rvConsulta_ctl09_ReportArea", panel),
+                        ("hiddenField", "__VIEWSTATE", sesion["estado"]),
+                        ("hiddenField", "__EVENTVALIDATION", sesion["validacion"]),
+                        ("scriptStartupBlock", "ScriptContentNoTags", script),
+                    )
+                )
+                self._responder(200, delta.encode("utf-8"), tipo="text/plain; charset=utf-8")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), _Manejador)
+        self._httpd.daemon_threads = True
+        self._hilo: threading.Thread | None = None
+
+    def _exportacion(self, numero: str, formato: str) -> bytes:
+        filas = REGISTROS_SIMULADOS[numero][1]
+        if formato == "XML":
+            fecha_iso = "-".join(reversed(filas[3][1].split("/")))
+            xml_filas = (
+                f'<Detail txtEPS="{html.escape(filas[0][1])}" txtRegimen="{html.escape(filas[1][1])}" '
+                f'EstadoAfiliacion="{html.escape(filas[2][1])}" FechaAfiliacion="{fecha_iso}T00:00:00" '
+                f'TipoAfiliado="{html.escape(filas[4][1])}" />'
+            )
+            return (
+                '<?xml version="1.0" encoding="utf-8"?>'
+                '<Report xmlns="rptAfiliacion" Name="rptAfiliacion">'
+                f"<tblSalud><Detail_Collection>{xml_filas}</Detail_Collection></tblSalud>"
+                '<tblPensiones><Detail_Collection><Detail Administradora="COLPENSIONES" txtRegimen="PRIMA MEDIA" />'
+                "</Detail_Collection></tblPensiones></Report>"
+            ).encode("utf-8")
+        encabezado = ",".join(k for k, _ in filas)
+        valores = ",".join(v for _, v in filas)
+        return f"\ufeff{encabezado}\r\n{valores}\r\n\r\nAdministradora,Regimen\r\nCOLPENSIONES,PRIMA MEDIA\r\n".encode("utf-8")
+
+    @staticmethod
+    def _renovar_vista(sesion: dict[str, Any], botones: list[str]) -> None:
+        sesion["estado"] = secrets.token_urlsafe(24)
+        sesion["botones"] = botones
+        sesion["validacion"] = hashlib.sha1((sesion["estado"] + "|".join(botones)).encode()).hexdigest()
+
+    def _imagen_captcha(self, sesion: dict[str, Any]) -> bytes:
+        """Captcha nuevo por solicitud (como el handler real); el codigo queda en la sesion."""
+        codigo = "".join(random.choices(string.ascii_uppercase + string.digits, k=5))
+        img = Image.new("RGB", (180, 50), "white")
+        dibujo = ImageDraw.Draw(img)
+        for _ in range(400):
+            dibujo.point((random.randrange(180), random.randrange(50)), fill=tuple(random.choices(range(256), k=3)))
+        dibujo.text((40, 18), " ".join(codigo), fill="black")
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        png = buf.getvalue()
+        with self._lock:
+            sesion["codigo"] = codigo
+            self.codigos[hashlib.sha1(png).hexdigest()] = codigo
+        return png
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}{RUTA_TERMINOS}"
+
+    def iniciar(self) -> ServidorRuafSimulado:
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, name="ruaf-simulado", daemon=True)
+        self._hilo.start()
+        return self
+
+    def servir(self) -> None:
+        """Atender en primer plano hasta Ctrl+C (uso desde la linea de comandos)."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def detener(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> ServidorRuafSimulado:
+        return self.iniciar()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.detener()
+
+
+class _LectorSimulado:
+    """Lee el captcha con la tabla del servidor; la primera lectura sale errada para ejercitar el rechazo."""
+
+    def __init__(self, servidor: ServidorRuafSimulado):
+        self.servidor = servidor
+        self.lecturas = 0
+        self.veredictos: list[bool] = []
+
+    def leer(self, png: bytes, pil: Any) -> tuple[str, str, list[tuple[str, str]]]:
+        self.lecturas += 1
+        codigo = self.servidor.codigos.get(hashlib.sha1(png).hexdigest(), "")
+        return ("XXXXX" if self.lecturas == 1 else codigo), "simulado", []
+
+    def veredicto(self, png: bytes, texto: str, estrategia: str, candidatos: list, aceptado: bool) -> None:
+        self.veredictos.append(aceptado)
+
+
+def _verificar() -> int:
+    from ruaf.cliente_http import ClienteRuaf, ErrorClienteRuaf
+
+    fallos: list[str] = []
+    with tempfile.TemporaryDirectory() as tmp, ServidorRuafSimulado() as servidor:
+        lector = _LectorSimulado(servidor)
+        cliente = ClienteRuaf(servidor.url, lector=lector, timeout_s=5)
+        consulta = {"salida_html": Path(tmp), "tipo_doc": "CEDULA DE CIUDADANIA"}
+
+        r = cliente.consultar(numero_id="1022434547", fecha="14/04/2016", **consulta)
+        if r["estado"] != "EXITOSA":
+            fallos.append(f"con reporte: {r}")
+        else:
+            contenido = Path(r["archivo_html"]).read_text(encoding="utf-8")
+            if "ctl00_MainContent_rvConsulta_ctl13" not in contenido or "EPS SANITAS S.A." not in contenido:
+                fallos.append("el HTML guardado no trae el reporte cargado por el postback asincrono")
+            esperado = {
+                "eps_afiliado": "EPS SANITAS S.A.",
+                "regimen": "CONTRIBUTIVO",
+                "estado_afiliacion": "ACTIVO",
+                "fecha_afiliacion_eps": "01/01/2026",
+                "tipo_afiliado": "COTIZANTE",
+            }
+            datos = r.get("datos_extraidos", {})
+            if any(datos.get(k) != v for k, v in esperado.items()) or datos.get("regimen_fuente") != "exportacion_xml":
+                fallos.append(f"exportacion XML: {datos}")
+        if lector.veredictos != [False, True]:
+            fallos.append(f"veredictos captcha: {lector.veredictos} (se esperaba rechazo y luego acierto)")
+
+        r = cliente.consultar(numero_id="999", fecha="14/04/2016", **consulta)
+        if r["estado"] != "NO_EXITOSA_NEGOCIO" or "No existe informacion" not in r["motivo"]:
+            fallos.append(f"MSG_NO_INFO_1: {r}")
+        r = cliente.consultar(numero_id="1022434547", fecha="01/01/2000", **consulta)
+        if r["estado"] != "NO_EXITOSA_NEGOCIO" or "no coincide" not in r["motivo"]:
+            fallos.append(f"MSG_NO_INFO_2: {r}")
+        if servidor.conexiones != 3:
+            fallos.append(f"keep-alive: {servidor.conexiones} conexiones para 3 consultas ({servidor.solicitudes} solicitudes)")
+
+    with tempfile.TemporaryDirectory() as tmp, ServidorRuafSimulado(formatos=("CSV",)) as servidor:
+        cliente = ClienteRuaf(servidor.url, lector=_LectorSimulado(servidor), timeout_s=5)
+        r = cliente.consultar(
+            salida_html=Path(tmp), numero_id="1022434547", fecha="14/04/2016", tipo_doc="CEDULA DE CIUDADANIA"
+        )
+        datos = r.get("datos_extraidos", {})
+        if datos.get("eps_afiliado") != "EPS SANITAS S.A." or datos.get("eps_afiliado_fuente") != "exportacion_csv":
+            fallos.append(f"exportacion CSV tras fallar XML: {datos}")
+
+    with tempfile.TemporaryDirectory() as tmp, ServidorRuafSimulado(contrato_roto=True) as servidor:
+        cliente = ClienteRuaf(servidor.url, lector=_LectorSimulado(servidor), timeout_s=5)
+        try:
+            cliente.consultar(
+                salida_html=Path(tmp), numero_id="1022434547", fecha="14/04/2016", tipo_doc="CEDULA DE CIUDADANIA"
+            )
+            fallos.append("contrato roto no detectado")
+        except ErrorClienteRuaf:
+            pass
+
+    # Columnas que contienen el nombre de otro campo: eps / estado no deben tomar fechas.
+    from ruaf.parser import extraer_datos_exportacion
+
+    esperado = {
+        "eps_afiliado": "EPS SANITAS S.A.",
+        "estado_afiliacion": "ACTIVO",
+        "fecha_afiliacion_eps": "01/01/2026",
+    }
+    disenos = (
+        (
+            "XML",
+            b'<Report><Detalle FechaAfiliacionEPS="2026-01-01T00:00:00" NombreEPS="EPS SANITAS S.A." '
+            b'FechaCambioEstado="2025-05-05T00:00:00" EstadoAfiliacion="ACTIVO"/></Report>',
+        ),
+        ("CSV", b"FechaAfiliacionEPS,EPS,FechaEstado,Estado\r\n01/01/2026,EPS SANITAS S.A.,05/05/2025,ACTIVO\r\n"),
+    )
+    for formato, contenido in disenos:
+        datos = extraer_datos_exportacion(contenido, formato)
+        if any(datos.get(k) != v for k, v in esperado.items()):
+            fallos.append(f"columnas ambiguas {formato}: {datos}")
+
+    for f in fallos:
+        print(f"FALLO {f}")
+    print("OK" if not fallos else f"{len(fallos)} fallos")
+    return 1 if fallos else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Portal WebForms de RUAF simulado")
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--verificar", action="store_true", help="Probar ruaf.cliente_http contra el servidor y salir")
+    args = parser.parse_args()
+
+    if args.verificar:
+        sys.exit(_verificar())
+
+    servidor = ServidorRuafSimulado(puerto=args.puerto)
+    print(f"BYBOT_RUAF_URL_INICIO={servidor.url}")
+    servidor.servir()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita el backend JSON de RUES, para probar `rues.cliente_http`
+sin salir a internet.
+
+Uso:
+  python3 herramientas/servidor_rues_simulado.py --puerto 8765
+      BYBOT_RUES_API_URL=http://127.0.0.1:8765/api/consultasRUES/BusquedaAvanzadaRM \\
+          ./venv/bin/python -m rues.cli --numero 52727688 -v
+  python3 herramientas/servidor_rues_simulado.py --verificar
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+BOTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOTS_DIR))
+
+RUTA_API = "/api/consultasRUES/BusquedaAvanzadaRM"
+
+# `contrato_roto` responde con una forma que el cliente no reconoce.
+REGISTROS_SIMULADOS: dict[str, Any] = {
+    "52727688": [
+        {
+            "identificacion": "52727688-7",
+            "razonSocial": "PERSONA DE PRUEBA",
+            "nit": "52727688",
+            "categoria": "PERSONA NATURAL",
+            "nomCamara": "BOGOTA",
+            "matricula": "2587739",
+            "estadoMatricula": "ACTIVA",
+            "municipio": "BOGOTA D.C.",
+            "fechaRenovacion": "20250331",
+        }
+    ],
+    "contrato_roto": {"resultado": {"filas": []}},
+}
+
+
+class ServidorRuesSimulado:
+    """ThreadingHTTPServer en 127.0.0.1 con HTTP/1.1 keep-alive; cuenta solicitudes y conexiones."""
+
+    def __init__(self, *, puerto: int = 0, registros: dict[str, Any] | None = None):
+        self.registros = REGISTROS_SIMULADOS if registros is None else registros
+        self.solicitudes = 0
+        self.conexiones = 0
+        servidor = self
+
+        class _Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                servidor.conexiones += 1
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _responder(self, estado: int, cuerpo: Any) -> None:
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_POST(self) -> None:
+                servidor.solicitudes += 1
+                largo = int(self.headers.get("Content-Length") or 0)
+                try:
+                    pedido = json.loads(self.rfile.read(largo) or b"{}")
+                except ValueError:
+                    self._responder(400, {"error": "json invalido"})
+                    return
+                if self.path.split("?")[0] != RUTA_API:
+                    self._responder(404, {"error": "ruta"})
+                    return
+                encontrado = servidor.registros.get(str(pedido.get("search", "")), [])
+                self._responder(200, encontrado if isinstance(encontrado, dict) else {"registros": encontrado})
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), _Manejador)
+        self._httpd.daemon_threads = True
+        self._hilo: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}{RUTA_API}"
+
+    def iniciar(self) -> ServidorRuesSimulado:
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, name="rues-simulado", daemon=True)
+        self._hilo.start()
+        return self
+
+    def servir(self) -> None:
+        """Atender en primer plano hasta Ctrl+C (uso desde la linea de comandos)."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def detener(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> ServidorRuesSimulado:
+        return self.iniciar()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.detener()
+
+
+def _verificar() -> int:
+    from rues.cliente_http import ClienteRues, ErrorClienteRues, ejecutar_consulta
+    from rues.parser import extraer_datos_json
+
+    fallos: list[str] = []
+    with ServidorRuesSimulado() as servidor:
+        cliente = ClienteRues(servidor.url, conexiones=1)
+        r = ejecutar_consulta(numero_busqueda="52727688", cliente=cliente)
+        if r["estado"] != "EXITOSA":
+            fallos.append(f"con resultado: {r}")
+        else:
+            datos = extraer_datos_json(Path(r["archivo_json"]))
+            if datos.get("matricula_mercantil") != "2587739" or datos.get("razon_social") != "PERSONA DE PRUEBA":
+                fallos.append(f"mapeo: {datos}")
+            Path(r["archivo_json"]).unlink()
+        if servidor.conexiones != 1:
+            fallos.append(f"keep-alive: {servidor.conexiones} conexiones para {servidor.solicitudes} solicitudes")
+        # Sin resultados, contrato roto y 404 vuelven al navegador.
+        ruta_rota = ClienteRues(servidor.url + "/otra", conexiones=1)
+        for numero, c in (("1", cliente), ("contrato_roto", cliente), ("52727688", ruta_rota)):
+            try:
+                r = ejecutar_consulta(numero_busqueda=numero, cliente=c)
+                fallos.append(f"{numero} ({c.url}): se esperaba ErrorClienteRues, llego {r}")
+            except ErrorClienteRues:
+                pass
+        ruta_rota.cerrar()
+        cliente.cerrar()
+
+    for f in fallos:
+        print(f"FALLO {f}")
+    print("OK" if not fallos else f"{len(fallos)} fallos")
+    return 1 if fallos else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backend JSON de RUES simulado")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--verificar", action="store_true", help="Probar rues.cliente_http contra el servidor y salir")
+    args = parser.parse_args()
+
+    if args.verificar:
+        sys.exit(_verificar())
+
+    servidor = ServidorRuesSimulado(puerto=args.puerto)
+    print(f"BYBOT_RUES_API_URL={servidor.url}")
+    servidor.servir()
+
+
+if __name__ == "__main__":
+    main()
@@ -16,26 +16,60 @@ import csv
 import hashlib
 import io
 import logging
+import os
 import re
 import sys
+import threading
 import time
 import unicodedata
 from collections import Counter
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from urllib.parse import urljoin
 
 from PIL import Image, ImageEnhance, ImageFilter, ImageOps
-from playwright.sync_api import Page, sync_playwright, TimeoutError as PlaywrightTimeoutError
-
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
+
+from common.browser_pool import PoolNavegadores
+from common.esperas import (
+    aparece_elemento,
+    esperar_fragmento,
+    esperar_primero,
+    imagen_cargada,
+    pausa,
+    red_inactiva,
+)
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.paginas_calientes import PoolPaginasCalientes, PortalCaliente, abrir_pagina_portal
+from common.plan_interaccion import intentar_en_orden, portal_de
 from common.storage import registrar_consulta
-from common.ai import resolver_captcha_ocr, extraer_datos_reporte_imagen
-from common.captcha import BucleCaptcha, guardar_intento_captcha
+from common.ai import GEMINI_API_KEY, extraer_datos_reporte_imagen, obtener_uso_gemini, resolver_captcha_ocr
+from common.confianza_captcha import (
+    DECISION_ENVIADO,
+    DECISION_RENOVADO,
+    EstadisticasConfianza,
+    confianza_por_posicion,
+)
+from common.cache_ocr import CacheOCR
+from common.captura_captcha import CapturaRespuestasCaptcha
+from common.captcha import (
+    BucleCaptcha,
+    daemon_ocr_disponible,
+    guardar_intento_captcha,
+    iterar_lote_ocr,
+    leer_lote_ocr,
+)
+from common.corpus_captcha import VEREDICTO_ACEPTADO, VEREDICTO_RECHAZADO, CorpusCaptcha, obtener_corpus
+from common.ocr import PoolOCR, obtener_pool, ocr_disponible
+from common.ranking_ocr import RankingOCR
+from common.reconocedor_captcha import ReconocedorCaptcha, reconocedor_disponible
+from .parser import extraer_datos_exportacion
 
 try:
-    import pytesseract
+    import numpy as np
 except ImportError:
-    pytesseract = None
+    np = None
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +82,39 @@ POST_VERIFY_WAIT_MS = 15000
 RUAF_DATA_DIR = Path(__file__).resolve().parent
 MAX_FALLOS_CAPTCHA_FUENTE = 3
 MAX_REINICIOS_FORMULARIO = 3
+OCR_PSMS = (7, 8, 13)
+OCR_OEMS = (3, 1)
+OCR_RANKING = os.environ.get("BYBOT_RUAF_OCR_RANKING", "1").strip() != "0"
+PREPROCESADO_VECTORIZADO = os.environ.get("BYBOT_RUAF_OCR_NUMPY", "1").strip() != "0"
+OCR_ESCALONADO = os.environ.get("BYBOT_RUAF_OCR_ESCALONADO", "1").strip() != "0"
+OCR_ACUERDO_MINIMO = int(os.environ.get("BYBOT_RUAF_OCR_ACUERDO", "3") or 3)
+RECONOCEDOR_PATH = Path(
+    os.environ.get("BYBOT_RUAF_RECONOCEDOR", "") or (RUAF_DATA_DIR / "reconocedor_captcha.npz")
+)
+RECONOCEDOR_UMBRAL = float(os.environ.get("BYBOT_RUAF_RECONOCEDOR_UMBRAL", "0.6") or 0.6)
+OCR_CACHE = os.environ.get("BYBOT_RUAF_OCR_CACHE", "1").strip() != "0"
+CONFIANZA_MINIMA = float(os.environ.get("BYBOT_RUAF_CONFIANZA_MINIMA", "0.34") or 0)
+MAX_RENOVACIONES_CONFIANZA = int(os.environ.get("BYBOT_RUAF_MAX_RENOVACIONES_CONFIANZA", "3") or 0)
+GEMINI_ESPECULATIVO = os.environ.get("BYBOT_RUAF_GEMINI_ESPECULATIVO", "0").strip() != "0"
+GEMINI_ESPECULATIVO_MAX = int(os.environ.get("BYBOT_RUAF_GEMINI_ESPECULATIVO_MAX", "10") or 0)
+CAPTURA_RESPUESTAS = os.environ.get("BYBOT_RUAF_CAPTURA_RESPUESTAS", "1").strip() != "0"
+CAPTURA_TIMEOUT_MS = int(os.environ.get("BYBOT_RUAF_CAPTURA_TIMEOUT_MS", "3000") or 3000)
+# Formatos de exportacion del ReportViewer a intentar, en orden ("" = solo Gemini Vision).
+FORMATOS_EXPORTACION = tuple(
+    f.strip().upper() for f in os.environ.get("BYBOT_RUAF_EXPORTACION", "XML,CSV").split(",") if f.strip()
+)
+SELECTOR_IMG_CAPTCHA = (
+    "#MainContent_imgCaptcha, #ctl00_MainContent_imgCaptcha, "
+    "img[id*='Captcha' i], img[src*='captcha' i], img[alt*='captcha' i]"
+)
+# Niveles de OCR escalonado: (oems, prefijos de variante). Primero lo barato y
+# que mas acierta; el ultimo nivel recoge todas las combinaciones restantes.
+NIVELES_OCR: tuple[tuple[tuple[int, ...], tuple[str, ...]], ...] = (
+    ((3,), ("autocontrast_median", "gray", "sharp_median")),
+    ((3,), ("scale",)),
+    ((3,), ("bin",)),
+    ((3, 1), ("",)),
+)
 MSG_NO_INFO_1 = (
     "No existe informacion con este tipo y numero de documento Ministerio de Salud y "
     "Proteccion Social, Por favor verifique!"
@@ -95,7 +162,6 @@ def cerrar_datepicker_jquery_ui(page: Page) -> None:
         page.keyboard.press("Escape")
     except Exception as e:
         logger.debug("Escape tras datepicker: %s", e)
-    time.sleep(0.12)
     try:
         page.evaluate(
             """() => {
@@ -122,6 +188,90 @@ def cerrar_datepicker_jquery_ui(page: Page) -> None:
 
 
 def _variantes_preprocesado(img: Image.Image) -> list[tuple[str, Image.Image]]:
+    if np is not None and PREPROCESADO_VECTORIZADO:
+        return _variantes_preprocesado_np(img)
+    return _variantes_preprocesado_pil(img)
+
+
+def _caja_texto(arr, margen: int = 4) -> tuple[slice, slice]:
+    h, w = arr.shape
+    tinta = arr < 128 if np.median(arr) >= 128 else arr >= 128
+    filas = np.flatnonzero(tinta.sum(axis=1) >= 2)
+    cols = np.flatnonzero(tinta.sum(axis=0) >= 2)
+    if filas.size == 0 or cols.size == 0:
+        return slice(0, h), slice(0, w)
+    return (
+        slice(max(0, filas[0] - margen), min(h, filas[-1] + margen + 1)),
+        slice(max(0, cols[0] - margen), min(w, cols[-1] + margen + 1)),
+    )
+
+
+def _mediana_3x3(arr):
+    ventanas = np.lib.stride_tricks.sliding_window_view(np.pad(arr, 1, mode="edge"), (3, 3))
+    return np.partition(ventanas.reshape(*arr.shape, 9), 4, axis=-1)[..., 4]
+
+
+def _nitidez(arr, factor: float):
+    # Equivalente a ImageEnhance.Sharpness: mezcla con el filtro SMOOTH de PIL.
+    if arr.shape[0] < 3 or arr.shape[1] < 3:
+        return arr
+    a = arr.astype(np.float32)
+    p = np.pad(a, 1, mode="edge")
+    suave = (
+        p[:-2, :-2] + p[:-2, 1:-1] + p[:-2, 2:]
+        + p[1:-1, :-2] + 5 * p[1:-1, 1:-1] + p[1:-1, 2:]
+        + p[2:, :-2] + p[2:, 1:-1] + p[2:, 2:]
+    ) / 13.0
+    suave[0, :], suave[-1, :], suave[:, 0], suave[:, -1] = a[0, :], a[-1, :], a[:, 0], a[:, -1]
+    return np.clip(suave + factor * (a - suave) + 0.5, 0, 255).astype(np.uint8)
+
+
+def _variantes_preprocesado_np(img: Image.Image) -> list[tuple[str, Image.Image]]:
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    w, h = img.size
+    g_full = np.asarray(ImageOps.grayscale(img))
+    filas, cols = _caja_texto(g_full)
+    g = np.ascontiguousarray(g_full[filas, cols])
+    ch, cw = g.shape
+
+    lo, hi = int(g.min()), int(g.max())
+    if hi > lo:
+        lut = np.clip((np.arange(256, dtype=np.float32) - lo) * (255.0 / (hi - lo)), 0, 255).astype(np.uint8)
+        ac = lut[g]
+    else:
+        ac = g
+    med = _mediana_3x3(ac)
+    med_img = Image.fromarray(med)
+
+    out: list[tuple[str, Image.Image]] = [
+        ("gray", Image.fromarray(g)),
+        ("autocontrast_median", med_img),
+    ]
+
+    if w < 220:
+        mults = (3, 4, 5) if w < 140 else (3, 4)
+        ac_img = Image.fromarray(ac)
+        for mult in mults:
+            tam = (cw * mult, ch * mult)
+            scaled_ac = ac_img.resize(tam, Image.Resampling.LANCZOS)
+            scaled_med = med_img.resize(tam, Image.Resampling.LANCZOS)
+            out.append((f"scale{mult}x_ac", scaled_ac))
+            out.append((f"scale{mult}x_med", scaled_med))
+            out.append((f"scale{mult}x_sharp", Image.fromarray(_nitidez(np.asarray(scaled_med), 2.1))))
+
+    out.append(("sharp_median", Image.fromarray(_nitidez(med, 2.0))))
+
+    umbrales = np.array((140, 160, 180), dtype=np.uint8)
+    binarias = np.where(g[None, :, :] > umbrales[:, None, None], np.uint8(255), np.uint8(0))
+    for t, bw in zip(umbrales, binarias):
+        out.append((f"bin{t}", Image.fromarray(bw)))
+        out.append((f"bin{t}_inv", Image.fromarray(255 - bw)))
+
+    return out
+
+
+def _variantes_preprocesado_pil(img: Image.Image) -> list[tuple[str, Image.Image]]:
     out: list[tuple[str, Image.Image]] = []
     if img.mode not in ("L", "RGB"):
         img = img.convert("RGB")
@@ -162,29 +312,228 @@ def _variantes_preprocesado(img: Image.Image) -> list[tuple[str, Image.Image]]:
     return out
 
 
-def leer_captcha_multipass(img: Image.Image) -> tuple[str, str]:
-    if pytesseract is None:
-        raise RuntimeError("Instale pytesseract: pip install pytesseract")
+def _tag_ocr(oem: int, nombre: str, psm: int) -> str:
+    return f"oem{oem} {nombre} psm={psm}"
 
-    whitelist = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
-    base_cfg = f"-c tessedit_char_whitelist={whitelist}"
-    psms = (7, 8, 13)
-    oems = (3, 1)
 
+def _aplicar_ranking(
+    combinaciones: list[tuple[int, str, Image.Image, int]],
+    ranking: RankingOCR | None,
+) -> list[tuple[int, str, Image.Image, int]]:
+    if ranking is None or not combinaciones:
+        return combinaciones
+    utiles = [c for c in combinaciones if not ranking.descartada(_tag_ocr(c[0], c[1], c[3]))]
+    if len(utiles) < len(combinaciones):
+        logger.debug("Ranking OCR descarta %s combinaciones", len(combinaciones) - len(utiles))
+    return sorted(utiles, key=lambda c: ranking.puntaje(_tag_ocr(c[0], c[1], c[3])), reverse=True)
+
+
+def _combinaciones_ocr(
+    variantes: list[tuple[str, Image.Image]],
+) -> list[tuple[int, str, Image.Image, int]]:
+    return [
+        (oem, nombre, proc, psm)
+        for oem in OCR_OEMS
+        for nombre, proc in variantes
+        for psm in OCR_PSMS
+    ]
+
+
+def _leer_combinaciones(
+    combinaciones: list[tuple[int, str, Image.Image, int]],
+    pool: PoolOCR | None,
+    cancelar: threading.Event | None = None,
+) -> list[tuple[str, str]]:
+    textos = leer_lote_ocr(
+        [(proc, oem, psm) for oem, _nombre, proc, psm in combinaciones], pool=pool, cancelar=cancelar
+    )
     candidatos: list[tuple[str, str]] = []
-    for oem in oems:
-        for nombre, proc in _variantes_preprocesado(img):
-            for psm in psms:
-                cfg = f"--oem {oem} --psm {psm} {base_cfg}"
-                try:
-                    raw = pytesseract.image_to_string(proc, config=cfg)
-                except Exception as e:
-                    logger.debug("OCR fallo (oem=%s %s psm=%s): %s", oem, nombre, psm, e)
-                    continue
-                norm = _norm_captcha(raw)
-                tag = f"oem{oem} {nombre} psm={psm}"
-                candidatos.append((norm, tag))
+    for (oem, nombre, _proc, psm), raw in zip(combinaciones, textos):
+        if raw is None:
+            continue
+        candidatos.append((_norm_captcha(raw), _tag_ocr(oem, nombre, psm)))
+    return candidatos
+
+
+def _iterar_combinaciones(
+    combinaciones: list[tuple[int, str, Image.Image, int]],
+    pool: PoolOCR | None,
+    cancelar: threading.Event | None = None,
+) -> Iterator[tuple[str, str]]:
+    trabajos = [(proc, oem, psm) for oem, _nombre, proc, psm in combinaciones]
+    for indice, raw in iterar_lote_ocr(trabajos, pool=pool, cancelar=cancelar):
+        if raw is None:
+            continue
+        oem, nombre, _proc, psm = combinaciones[indice]
+        yield _norm_captcha(raw), _tag_ocr(oem, nombre, psm)
+
+
+def _niveles_combinaciones(
+    combinaciones: list[tuple[int, str, Image.Image, int]],
+) -> list[list[tuple[int, str, Image.Image, int]]]:
+    restantes = list(combinaciones)
+    niveles: list[list[tuple[int, str, Image.Image, int]]] = []
+    for oems, prefijos in NIVELES_OCR:
+        nivel = [c for c in restantes if c[0] in oems and c[1].startswith(prefijos)]
+        restantes = [c for c in restantes if not (c[0] in oems and c[1].startswith(prefijos))]
+        niveles.append(nivel)
+    niveles[-1].extend(restantes)
+    return niveles
+
+
+def _lectura_acordada(candidatos: list[tuple[str, str]], minimo: int) -> tuple[str, str] | None:
+    conteo = Counter(t for t, _tag in candidatos if len(t) == 5).most_common(2)
+    if not conteo:
+        return None
+    texto, n = conteo[0]
+    if n < minimo or (len(conteo) > 1 and conteo[1][1] == n):
+        return None
+    tag = next(tag for t, tag in candidatos if t == texto)
+    return texto, f"acuerdo_{n} {tag}"
+
+
+def cargar_reconocedor(ruta: Path = RECONOCEDOR_PATH) -> ReconocedorCaptcha | None:
+    if not reconocedor_disponible() or not ruta.exists():
+        logger.debug("Reconocedor local no disponible (%s); se usa Tesseract.", ruta)
+        return None
+    try:
+        modelo = ReconocedorCaptcha.cargar(ruta)
+    except Exception as e:
+        logger.warning("No se pudo cargar el reconocedor local %s: %s", ruta, e)
+        return None
+    logger.info("Reconocedor local cargado: %s (%s prototipos)", ruta.name, len(modelo.etiquetas))
+    return modelo
+
+
+def leer_captcha_reconocedor(
+    reconocedor: ReconocedorCaptcha,
+    img: Image.Image,
+    *,
+    umbral: float | None = None,
+    confianzas_out: list[float] | None = None,
+) -> tuple[str, str]:
+    try:
+        lectura = reconocedor.reconocer(img)
+    except Exception as e:
+        logger.debug("Reconocedor local fallo: %s", e)
+        return "", ""
+    if lectura is None:
+        logger.debug("Reconocedor local: segmentacion sin %s glifos", reconocedor.longitud)
+        return "", ""
+    texto, confianzas = lectura
+    minima = min(confianzas)
+    logger.info("Reconocedor local: %r confianza por caracter=%s", texto, confianzas)
+    if minima < (RECONOCEDOR_UMBRAL if umbral is None else umbral):
+        return "", ""
+    if confianzas_out is not None:
+        confianzas_out[:] = confianzas
+    return texto, f"reconocedor min={minima:.2f}"
+
+
+def leer_captcha_multipass(
+    img: Image.Image,
+    *,
+    pool: PoolOCR | None = None,
+    escalonado: bool | None = None,
+    acuerdo_minimo: int | None = None,
+    ranking: RankingOCR | None = None,
+    candidatos_out: list[tuple[str, str]] | None = None,
+    cancelar: threading.Event | None = None,
+) -> tuple[str, str]:
+    if not ocr_disponible():
+        raise RuntimeError("Instale tesserocr o pytesseract: pip install pytesseract")
+
+    candidatos: list[tuple[str, str]] = [] if candidatos_out is None else candidatos_out
+    combinaciones = _combinaciones_ocr(_variantes_preprocesado(img))
+    if not (OCR_ESCALONADO if escalonado is None else escalonado):
+        candidatos.extend(_leer_combinaciones(_aplicar_ranking(combinaciones, ranking), pool, cancelar))
+        if cancelar is not None and cancelar.is_set():
+            return "", "cancelado"
+        return _elegir_candidato(candidatos)
+
+    minimo = acuerdo_minimo or OCR_ACUERDO_MINIMO
+    niveles = [_aplicar_ranking(nivel, ranking) for nivel in _niveles_combinaciones(combinaciones)]
+    if not any(niveles):
+        niveles = _niveles_combinaciones(combinaciones)
+    for n, nivel in enumerate(niveles, start=1):
+        for candidato in _iterar_combinaciones(nivel, pool, cancelar):
+            candidatos.append(candidato)
+            acordado = _lectura_acordada(candidatos, minimo)
+            if acordado:
+                texto, tag = acordado
+                logger.info(
+                    "OCR captcha decidido en nivel %s/%s: %r via [%s] (%s lecturas)",
+                    n, len(niveles), texto, tag, len(candidatos),
+                )
+                return texto, f"nivel{n} {tag}"
+        if cancelar is not None and cancelar.is_set():
+            return "", "cancelado"
+        logger.debug("Nivel OCR %s sin acuerdo (%s lecturas); escalando...", n, len(candidatos))
+
+    texto, tag = _elegir_candidato(candidatos)
+    return texto, f"nivel{len(niveles)} {tag}"
+
 
+def leer_captcha_nivel(img: Image.Image, nivel: int, *, pool: PoolOCR | None = None) -> tuple[str, str]:
+    """Lee solo las combinaciones del nivel OCR indicado (1..len(NIVELES_OCR)), sin escalar."""
+    combinaciones = _niveles_combinaciones(_combinaciones_ocr(_variantes_preprocesado(img)))[nivel - 1]
+    texto, tag = _elegir_candidato(_leer_combinaciones(combinaciones, pool))
+    return texto, f"nivel{nivel} {tag}"
+
+
+def leer_captcha_especulativo(
+    ejecutor: ThreadPoolExecutor,
+    img: Image.Image,
+    png: bytes,
+    *,
+    pool: PoolOCR | None = None,
+    ranking: RankingOCR | None = None,
+    candidatos_out: list[tuple[str, str]] | None = None,
+    rechazados: set[str] | None = None,
+) -> tuple[str, str, bool]:
+    """
+    Lanza Gemini en paralelo con el OCR local y se queda con la primera lectura
+    valida (5 caracteres, no rechazada antes), sin esperar a la otra. Si gana
+    Gemini, el OCR local se corta en la siguiente lectura o bloque y sus
+    candidatos se descartan. El tercer valor indica si Gemini ya respondio para
+    esta imagen (para no volver a consultarlo como respaldo).
+    """
+    rechazados = rechazados or set()
+    cancelar = threading.Event()
+    # Lista propia: el hilo perdedor puede seguir escribiendo tras el return.
+    candidatos_local: list[tuple[str, str]] = []
+    fut_local = ejecutor.submit(
+        leer_captcha_multipass,
+        img,
+        pool=pool,
+        ranking=ranking,
+        candidatos_out=candidatos_local,
+        cancelar=cancelar,
+    )
+    fut_gemini = ejecutor.submit(resolver_captcha_ocr, png)
+    pendientes = {fut_local, fut_gemini}
+    texto, estrategia = "", "sin resultados"
+    while pendientes:
+        hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        if fut_local in hechos:
+            texto, estrategia = fut_local.result()
+            if candidatos_out is not None:
+                candidatos_out.extend(candidatos_local)
+            if len(texto) == 5 and texto not in rechazados:
+                if not fut_gemini.cancel():
+                    logger.debug("OCR local gano; la respuesta de Gemini se descarta.")
+                return texto, estrategia, False
+        if fut_gemini in hechos:
+            texto_gemini = fut_gemini.result()
+            if texto_gemini and len(texto_gemini) == 5 and texto_gemini not in rechazados:
+                if not fut_local.done():
+                    cancelar.set()
+                logger.info("Gemini especulativo gano al OCR local: %r", texto_gemini)
+                return texto_gemini, "gemini_especulativo", True
+    return texto, estrategia, True
+
+
+def _elegir_candidato(candidatos: list[tuple[str, str]]) -> tuple[str, str]:
     if not candidatos:
         return "", "sin resultados"
 
@@ -215,6 +564,135 @@ def leer_captcha_multipass(img: Image.Image) -> tuple[str, str]:
     return mejor_txt, mejor_tag
 
 
+def _alternativa_no_rechazada(
+    candidatos: list[tuple[str, str]], rechazados: set[str]
+) -> tuple[str, str]:
+    lecturas = [t for t, _ in candidatos if len(t) == 5 and t not in rechazados]
+    if not lecturas:
+        return "", "sin alternativa"
+    mejor = Counter(lecturas).most_common(1)[0][0]
+    tag = next(tag for t, tag in candidatos if t == mejor)
+    logger.info("Lectura ya rechazada para esta imagen; se usa alternativa %r [%s]", mejor, tag)
+    return mejor, f"alternativa {tag}"
+
+
+def _preferir_pista(
+    candidatos: list[tuple[str, str]], texto: str, pistas: list[str], rechazados: set[str]
+) -> tuple[str, str] | None:
+    # Las pistas por hash perceptual solo desempatan entre lecturas que el OCR ya produjo.
+    if not pistas or texto in pistas:
+        return None
+    for pista in pistas:
+        tag = next((tag for t, tag in candidatos if t == pista and pista not in rechazados), None)
+        if tag is not None:
+            logger.info("Lectura %r coincide con captcha similar verificado; se prefiere a %r", pista, texto)
+            return pista, f"pista_phash {tag}"
+    return None
+
+
+class LectorCaptchaRuaf:
+    """
+    La cadena de lectura del captcha RUAF, comun al bot con navegador y al
+    cliente HTTP: cache por SHA1, reconocedor local, Gemini especulativo (si
+    esta activo), Tesseract escalonado con ranking y Gemini de respaldo. Los
+    veredictos del portal alimentan ranking y cache.
+    """
+
+    def __init__(self, *, especulativo: bool = GEMINI_ESPECULATIVO):
+        self.daemon = daemon_ocr_disponible()
+        self.pool = None
+        if not self.daemon:
+            self.pool = obtener_pool(precalentar=[(oem, psm) for oem in OCR_OEMS for psm in OCR_PSMS])
+        self.ranking = RankingOCR("ruaf") if OCR_RANKING else None
+        self.reconocedor = cargar_reconocedor()
+        self.cache = CacheOCR("ruaf") if OCR_CACHE else None
+        self.ejecutor = None
+        if especulativo and GEMINI_API_KEY and GEMINI_ESPECULATIVO_MAX > 0:
+            self.ejecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ruaf-especulativo")
+        self.especulativas = self.especulativas_ganadas = 0
+
+    def leer(
+        self, png: bytes, pil: Image.Image, *, confianzas_out: list[float] | None = None
+    ) -> tuple[str, str, list[tuple[str, str]]]:
+        """(texto, estrategia, candidatos OCR); texto de longitud distinta de 5 si nadie lo leyo."""
+        candidatos: list[tuple[str, str]] = []
+        texto, estrategia = "", ""
+        confianzas: list[float] | None = []
+        rechazados: set[str] = set()
+        if self.cache is not None:
+            rechazados = self.cache.rechazados(png)
+            en_cache = self.cache.buscar(png)
+            if en_cache is not None and en_cache[0] not in rechazados:
+                texto, estrategia = en_cache[0], f"cache_{en_cache[1]}"
+                confianzas = [1.0] * len(texto) if en_cache[1] == "verificado" else None
+                logger.info("Captcha ya visto; lectura en cache: %r (%s)", texto, en_cache[1])
+        if not texto and self.reconocedor is not None:
+            texto, estrategia = leer_captcha_reconocedor(self.reconocedor, pil, confianzas_out=confianzas)
+            if texto in rechazados:
+                texto = ""
+        gemini_consultado = False
+        if not texto and self.ejecutor is not None and self.especulativas < GEMINI_ESPECULATIVO_MAX:
+            self.especulativas += 1
+            texto, estrategia, gemini_consultado = leer_captcha_especulativo(
+                self.ejecutor,
+                pil,
+                png,
+                pool=self.pool,
+                ranking=self.ranking,
+                candidatos_out=candidatos,
+                rechazados=rechazados,
+            )
+            if estrategia == "gemini_especulativo":
+                self.especulativas_ganadas += 1
+                confianzas = None
+            else:
+                confianzas = confianza_por_posicion(candidatos, texto)
+            if texto in rechazados:
+                texto, estrategia = _alternativa_no_rechazada(candidatos, rechazados)
+        if not texto:
+            texto, estrategia = leer_captcha_multipass(
+                pil, pool=self.pool, ranking=self.ranking, candidatos_out=candidatos
+            )
+            if texto in rechazados:
+                texto, estrategia = _alternativa_no_rechazada(candidatos, rechazados)
+            if self.cache is not None:
+                preferida = _preferir_pista(candidatos, texto, self.cache.similares(png), rechazados)
+                if preferida is not None:
+                    texto, estrategia = preferida
+            confianzas = confianza_por_posicion(candidatos, texto)
+
+        if len(texto) != 5 and not gemini_consultado:
+            texto_gemini = resolver_captcha_ocr(png)
+            if texto_gemini and len(texto_gemini) == 5 and texto_gemini not in rechazados:
+                texto, estrategia, confianzas = texto_gemini, "gemini_fallback", None
+                logger.info("Gemini resolvio captcha donde Tesseract fallo: %r", texto)
+
+        if self.cache is not None and len(texto) == 5 and not estrategia.startswith("cache_"):
+            self.cache.guardar_lectura(png, texto, estrategia)
+        if confianzas_out is not None:
+            confianzas_out[:] = confianzas or []
+        return texto, estrategia, candidatos
+
+    def veredicto(
+        self, png: bytes, texto: str, estrategia: str, candidatos: list[tuple[str, str]], aceptado: bool
+    ) -> None:
+        if self.ranking is not None:
+            self.ranking.registrar_veredicto(candidatos, texto, aceptado=aceptado)
+        if self.cache is not None:
+            if aceptado:
+                self.cache.marcar_aceptado(png, texto, estrategia)
+            else:
+                self.cache.marcar_rechazado(png, texto)
+
+    def cerrar(self) -> None:
+        if self.ejecutor is not None:
+            self.ejecutor.shutdown(wait=False, cancel_futures=True)
+            logger.info(
+                "Gemini especulativo: %s llamadas (%s ganadas) | uso Gemini del proceso: %s",
+                self.especulativas, self.especulativas_ganadas, obtener_uso_gemini(),
+            )
+
+
 def seleccionar_tipo_documento(page: Page, tipo_doc: str) -> None:
     sel = page.locator("#MainContent_ddlTiposDocumentos, select[name='ctl00$MainContent$ddlTiposDocumentos']")
     try:
@@ -246,31 +724,6 @@ def seleccionar_tipo_documento(page: Page, tipo_doc: str) -> None:
     logger.info("Tipo de documento seleccionado (JavaScript): %s", tipo_doc)
 
 
-def guardar_intento_captcha(
-    directorio: Path,
-    intento: int,
-    imagen: Image.Image,
-    texto_ocr: str,
-    estrategia: str,
-) -> None:
-    directorio.mkdir(parents=True, exist_ok=True)
-    stamp = time.strftime("%Y%m%d_%H%M%S")
-    nombre = f"intento_{intento:03d}_{stamp}"
-    png_path = directorio / f"{nombre}_original.png"
-    meta_path = directorio / f"{nombre}_meta.txt"
-    rgb = imagen.convert("RGB") if imagen.mode in ("RGBA", "P") else imagen
-    rgb.save(png_path)
-    meta_path.write_text(
-        f"intento={intento}\n"
-        f"timestamp={stamp}\n"
-        f"ocr={texto_ocr}\n"
-        f"longitud={len(texto_ocr)}\n"
-        f"estrategia_ganadora={estrategia}\n",
-        encoding="utf-8",
-    )
-    logger.info("Captcha guardado: %s | %s", png_path.name, meta_path.name)
-
-
 def resolver_salida_html(base_output: Path, numero_id: str) -> Path:
     carpeta = base_output.parent if base_output.suffix.lower() == ".html" else base_output
     carpeta.mkdir(parents=True, exist_ok=True)
@@ -278,6 +731,31 @@ def resolver_salida_html(base_output: Path, numero_id: str) -> Path:
     return carpeta / f"{numero_id}_{stamp}.html"
 
 
+def _export_url_base_js(page: Page) -> str | None:
+    # Con renderizado asincrono el script del visor no queda en el HTML: se lee del componente.
+    try:
+        return page.evaluate(
+            """() => {
+            const app = window.Sys && Sys.Application;
+            for (const c of (app ? app.getComponents() : [])) {
+                if (c && typeof c.ExportUrlBase === 'string') return c.ExportUrlBase;
+            }
+            return null;
+        }"""
+        )
+    except Exception as e:
+        logger.debug("ExportUrlBase no disponible por JS: %s", e)
+        return None
+
+
+def _descargar_con_sesion(page: Page, url: str) -> bytes | None:
+    resp = page.context.request.get(url, timeout=30000)
+    if not resp.ok:
+        logger.debug("HTTP %s exportando reporte: %s", resp.status, url)
+        return None
+    return resp.body()
+
+
 def exportar_html_pagina_completa(page: Page) -> str:
     html_main = page.content()
     extras: list[str] = []
@@ -303,6 +781,59 @@ def exportar_html_pagina_completa(page: Page) -> str:
     return html_main + bloque_frames
 
 
+CAMPOS_REPORTE = [
+    {"nombre": "eps_afiliado", "descripcion": "Nombre de la EPS a la que esta afiliado", "ejemplo": "EPS SANITAS S.A."},
+    {"nombre": "regimen", "descripcion": "Regimen de afiliacion", "ejemplo": "CONTRIBUTIVO"},
+    {"nombre": "estado_afiliacion", "descripcion": "Estado de la afiliacion", "ejemplo": "ACTIVO"},
+    {"nombre": "fecha_afiliacion_eps", "descripcion": "Fecha de afiliacion efectiva en formato DD/MM/AAAA", "ejemplo": "01/01/2026"},
+    {"nombre": "tipo_afiliado", "descripcion": "Tipo de afiliado", "ejemplo": "COTIZANTE"},
+]
+_RE_EXPORT_URL_BASE = re.compile(r'\\?"ExportUrlBase\\?"\s*:\s*\\?"(.*?)\\?"')
+
+
+def buscar_export_url_base(html: str) -> str | None:
+    """
+    `ExportUrlBase` del ReportViewer (Reserved.ReportViewerWebControl.axd?...&Format=)
+    tal como lo deja el script de inicializacion del visor en la pagina.
+    """
+    m = _RE_EXPORT_URL_BASE.search(html)
+    if m is None:
+        return None
+    base = re.sub(r"\\*u0026", "&", m.group(1)).replace("\\/", "/").replace("&amp;", "&")
+    return base if "OpType=Export" in base else None
+
+
+def extraer_datos_exportados(
+    export_url_base: str | None,
+    url_pagina: str,
+    descargar: Callable[[str], bytes | None],
+) -> dict[str, str]:
+    """
+    Pide al ReportViewer la exportacion estructurada del reporte ya renderizado
+    (misma sesion que lo renderizo) y la lleva a los campos del parser. Cada
+    campo sale con su `<campo>_fuente`, como en la extraccion con Gemini.
+    """
+    if not export_url_base:
+        logger.info("ReportViewer sin ExportUrlBase; no se puede exportar el reporte.")
+        return {}
+    nombres = {c["nombre"] for c in CAMPOS_REPORTE}
+    for formato in FORMATOS_EXPORTACION:
+        url = urljoin(url_pagina, export_url_base + formato)
+        try:
+            contenido = descargar(url)
+        except Exception as e:
+            logger.debug("Exportacion %s del reporte fallo: %s", formato, e)
+            continue
+        if not contenido or _parece_html(contenido):
+            logger.debug("Exportacion %s del reporte sin contenido util", formato)
+            continue
+        datos = {k: v for k, v in extraer_datos_exportacion(contenido, formato).items() if k in nombres}
+        if datos:
+            fuente = f"exportacion_{formato.lower()}"
+            return {**datos, **{f"{campo}_fuente": fuente for campo in datos}}
+    return {}
+
+
 def _sin_tildes(s: str) -> str:
     n = unicodedata.normalize("NFKD", s)
     return "".join(c for c in n if not unicodedata.combining(c))
@@ -335,83 +866,107 @@ def _es_imagen_captcha_valida(img_locator) -> bool:
         return False
 
 
+SELECTORES_IMG_CAPTCHA = [
+    "#MainContent_imgCaptcha",
+    "#ctl00_MainContent_imgCaptcha",
+    'img[id*="Captcha" i]',
+    'img[id*="captcha" i]',
+    'img[alt*="captcha" i]',
+    'img[src*="Captcha" i]',
+    'img[src*="captcha" i]',
+]
+_CAPTCHA_POR_PROXIMIDAD = "proximidad"
+_CAPTCHA_POR_PROXIMIDAD_FLEXIBLE = "proximidad_flexible"
+
+
+def _captcha_por_proximidad(page: Page, *, flexible: bool):
+    near = page.locator(
+        "#MainContent_txtCaptcha, #ctl00_MainContent_txtCaptcha, "
+        "input[name='ctl00$MainContent$txtCaptcha']"
+    )
+    if near.count() == 0:
+        return None
+    box = near.first.bounding_box()
+    if not box:
+        return None
+    for im in page.locator("img").all():
+        try:
+            b = im.bounding_box()
+            if not b:
+                continue
+            if flexible:
+                if (
+                    abs(b["y"] - box["y"]) < 110
+                    and b["x"] < box["x"]
+                    and b["width"] >= 70
+                    and b["height"] >= 22
+                ):
+                    logger.warning(
+                        "Captcha localizado por fallback flexible de proximidad; "
+                        "conviene revisar tamanos esperados."
+                    )
+                    return im
+            elif (
+                abs(b["y"] - box["y"]) < 90
+                and b["x"] < box["x"]
+                and _es_imagen_captcha_valida(im)
+            ):
+                logger.info("Captcha localizado por proximidad al campo txtCaptcha")
+                return im
+        except Exception:
+            continue
+    return None
+
+
 def localizar_imagen_captcha(page: Page):
-    candidatos = [
-        "#MainContent_imgCaptcha",
-        "#ctl00_MainContent_imgCaptcha",
-        'img[id*="Captcha" i]',
-        'img[id*="captcha" i]',
-        'img[alt*="captcha" i]',
-        'img[src*="Captcha" i]',
-        'img[src*="captcha" i]',
-    ]
-    for sel in candidatos:
-        loc = page.locator(sel)
+    def probar(opcion: str):
         try:
+            if opcion == _CAPTCHA_POR_PROXIMIDAD:
+                return _captcha_por_proximidad(page, flexible=False)
+            if opcion == _CAPTCHA_POR_PROXIMIDAD_FLEXIBLE:
+                return _captcha_por_proximidad(page, flexible=True)
+            loc = page.locator(opcion)
             if loc.count() == 0:
-                continue
+                return None
             first = loc.first
             if not first.is_visible(timeout=2000):
-                continue
+                return None
             if _es_imagen_captcha_valida(first):
-                logger.info("Captcha localizado con selector: %s", sel)
+                logger.info("Captcha localizado con selector: %s", opcion)
                 return first
         except Exception as e:
-            logger.debug("Selector captcha %r: %s", sel, e)
-            continue
-    try:
-        near = page.locator(
-            "#MainContent_txtCaptcha, #ctl00_MainContent_txtCaptcha, "
-            "input[name='ctl00$MainContent$txtCaptcha']"
-        )
-        if near.count() == 0:
-            raise RuntimeError("sin campo captcha")
-        box = near.first.bounding_box()
-        if box:
-            for im in page.locator("img").all():
-                try:
-                    b = im.bounding_box()
-                    if not b:
-                        continue
-                    if (
-                        abs(b["y"] - box["y"]) < 90
-                        and b["x"] < box["x"]
-                        and _es_imagen_captcha_valida(im)
-                    ):
-                        logger.info("Captcha localizado por proximidad al campo txtCaptcha")
-                        return im
-                except Exception:
-                    continue
-            for im in page.locator("img").all():
-                try:
-                    b = im.bounding_box()
-                    if not b:
-                        continue
-                    if (
-                        abs(b["y"] - box["y"]) < 110
-                        and b["x"] < box["x"]
-                        and b["width"] >= 70
-                        and b["height"] >= 22
-                    ):
-                        logger.warning(
-                            "Captcha localizado por fallback flexible de proximidad; "
-                            "conviene revisar tamanos esperados."
-                        )
-                        return im
-                except Exception:
-                    continue
-    except Exception as e:
-        logger.debug("Busqueda captcha por proximidad: %s", e)
-    raise RuntimeError("No se encontro la imagen del captcha. Revise selectores en el sitio.")
+            logger.debug("Captcha con %r: %s", opcion, e)
+        return None
+
+    opciones = [*SELECTORES_IMG_CAPTCHA, _CAPTCHA_POR_PROXIMIDAD]
+    img = intentar_en_orden(
+        portal_de(page), "imagen_captcha", opciones, probar, respaldos=[_CAPTCHA_POR_PROXIMIDAD_FLEXIBLE]
+    )
+    if img is None:
+        raise RuntimeError("No se encontro la imagen del captcha. Revise selectores en el sitio.")
+    return img
 
 
-def obtener_png_captcha(page: Page, cap_img) -> bytes:
+def obtener_png_captcha(
+    page: Page,
+    cap_img,
+    captura: CapturaRespuestasCaptcha | None = None,
+) -> tuple[bytes, Image.Image]:
     src = None
     try:
         src = cap_img.get_attribute("src")
     except Exception as e:
         logger.debug("No se pudo leer src del captcha: %s", e)
 
+    if captura is not None and not (src or "").strip().startswith("data:image"):
+        body = captura.tomar(url=urljoin(page.url, src) if src else None, timeout_ms=CAPTURA_TIMEOUT_MS)
+        if body is not None:
+            imagen, motivo = decodificar_png_captcha(body)
+            if imagen is not None:
+                logger.debug("Captcha tomado de la respuesta interceptada (%s bytes)", len(body))
+                return body, imagen
+            logger.debug("Respuesta captcha interceptada rechazada: %s", motivo)
+
     bodies_desde_src: list[bytes] = []
     if src:
         s = src.strip()
@@ -433,16 +988,16 @@ def obtener_png_captcha(page: Page, cap_img) -> bytes:
                 logger.debug("Descarga HTTP captcha por src fallo: %s", e)
 
     for body in bodies_desde_src:
-        ok, motivo = validar_png_captcha(body)
-        if ok:
-            return body
+        imagen, motivo = decodificar_png_captcha(body)
+        if imagen is not None:
+            return body, imagen
         logger.debug("Captcha desde src rechazado: %s", motivo)
 
     try:
         shot = cap_img.screenshot(timeout=7000)
-        ok, motivo = validar_png_captcha(shot)
-        if ok:
-            return shot
+        imagen, motivo = decodificar_png_captcha(shot)
+        if imagen is not None:
+            return shot, imagen
         logger.warning("Screenshot captcha no paso validacion: %s", motivo)
     except PlaywrightTimeoutError as e:
         logger.warning(
@@ -450,12 +1005,7 @@ def obtener_png_captcha(page: Page, cap_img) -> bytes:
             e,
         )
 
-    for body in bodies_desde_src:
-        ok, _mot = validar_png_captcha(body)
-        if ok:
-            return body
-
-    raise RuntimeError("No se pudo capturar captcha valido (screenshot/src).")
+    raise RuntimeError("No se pudo capturar captcha valido (respuesta/src/screenshot).")
 
 
 def _parece_html(b: bytes) -> bool:
@@ -468,22 +1018,22 @@ def _parece_html(b: bytes) -> bool:
     )
 
 
-def validar_png_captcha(b: bytes) -> tuple[bool, str]:
+def decodificar_png_captcha(b: bytes) -> tuple[Image.Image | None, str]:
     if not b:
-        return False, "bytes vacios"
+        return None, "bytes vacios"
     if _parece_html(b):
-        return False, "respuesta HTML en lugar de imagen captcha"
+        return None, "respuesta HTML en lugar de imagen captcha"
     if len(b) < 600:
-        return False, f"imagen demasiado pequena ({len(b)} bytes)"
+        return None, f"imagen demasiado pequena ({len(b)} bytes)"
     try:
         im = Image.open(io.BytesIO(b))
         im.load()
     except Exception as e:
-        return False, f"imagen no decodificable por PIL: {e}"
+        return None, f"imagen no decodificable por PIL: {e}"
     w, h = im.size
     if w < 60 or h < 20:
-        return False, f"dimensiones anomalas {w}x{h}"
-    return True, "ok"
+        return None, f"dimensiones anomalas {w}x{h}"
+    return im, "ok"
 
 
 def detectar_imagen_captcha_rota(page: Page) -> str:
@@ -506,15 +1056,19 @@ def detectar_imagen_captcha_rota(page: Page) -> str:
     return resultado
 
 
+def esperar_imagen_captcha(page: Page, *, timeout_ms: float = 3000) -> None:
+    esperar_primero(page, imagen_cargada(SELECTOR_IMG_CAPTCHA), timeout_ms=timeout_ms)
+
+
 def forzar_renovacion_captcha(page: Page) -> None:
+    # Antes del clic: la renovacion puede ser postback o solo otra solicitud de imagen.
+    red = red_inactiva(page, quieto_ms=300)
     try:
-        loc_img = page.locator(
-            "#MainContent_imgCaptcha, #ctl00_MainContent_imgCaptcha, "
-            "img[id*='Captcha' i], img[src*='captcha' i], img[alt*='captcha' i]"
-        )
+        loc_img = page.locator(SELECTOR_IMG_CAPTCHA)
         if loc_img.count() > 0 and loc_img.first.is_visible(timeout=1200):
             loc_img.first.click(timeout=1500)
-            time.sleep(0.35)
+            esperar_primero(page, red, timeout_ms=3000)
+            esperar_imagen_captcha(page, timeout_ms=1500)
             return
     except Exception:
         pass
@@ -526,7 +1080,8 @@ def forzar_renovacion_captcha(page: Page) -> None:
         )
         if loc_ref.count() > 0 and loc_ref.first.is_visible(timeout=1200):
             loc_ref.first.click(timeout=1500)
-            time.sleep(0.35)
+            esperar_primero(page, red, timeout_ms=3000)
+            esperar_imagen_captcha(page, timeout_ms=1500)
             return
     except Exception:
         pass
@@ -548,7 +1103,56 @@ def forzar_renovacion_captcha(page: Page) -> None:
         )
     except Exception:
         pass
-    time.sleep(0.4)
+    esperar_primero(page, red, timeout_ms=3000)
+    esperar_imagen_captcha(page, timeout_ms=1500)
+
+
+def abrir_formulario_consulta(page: Page) -> None:
+    logger.info("Paso 1/... Abriendo terminos: %s", DEFAULT_URL_INICIO)
+    page.goto(DEFAULT_URL_INICIO, wait_until="domcontentloaded")
+    logger.info("Pagina cargada (domcontentloaded). URL actual: %s", page.url)
+
+    logger.info("Paso 2/... Marcando radio MainContent_RadioButtonList1_0 y enviando formulario")
+    page.locator("#MainContent_RadioButtonList1_0").click()
+    page.locator("#MainContent_btnEnviar, input[name='ctl00$MainContent$btnEnviar']").first.click()
+    logger.info("Esperando pantalla de consulta (selector tipo documento; no networkidle)...")
+    esperar_pagina_consulta_tras_terminos(page)
+    logger.info("Formulario enviado. URL: %s", page.url)
+
+
+def _preparar_pagina(page: Page) -> CapturaRespuestasCaptcha | None:
+    # El listener va antes de navegar para que la respuesta del primer captcha
+    # quede capturada aunque la pagina espere estacionada en el pool.
+    captura = CapturaRespuestasCaptcha(page) if CAPTURA_RESPUESTAS else None
+    abrir_formulario_consulta(page)
+    return captura
+
+
+def _formulario_vigente(page: Page) -> bool:
+    return bool(
+        page.evaluate(
+            """() => {
+            const sel = document.getElementById('MainContent_ddlTiposDocumentos');
+            const num = document.getElementById('MainContent_txbNumeroIdentificacion');
+            return !!sel && !!num && !num.value
+              && !!document.querySelector("input[name='__VIEWSTATE']");
+        }"""
+        )
+    )
+
+
+PORTAL_RUAF = PortalCaliente(
+    "ruaf",
+    preparar=_preparar_pagina,
+    vigente=_formulario_vigente,
+    opciones_contexto={
+        "perfil": "ruaf",
+        "viewport": {"width": 1280, "height": 900},
+        "locale": "es-CO",
+        "timezone_id": "America/Bogota",
+    },
+    timeout_ms=60000,
+)
 
 
 def ejecutar_consulta(
@@ -559,43 +1163,35 @@ def ejecutar_consulta(
     tipo_doc: str,
     headless: bool,
     captchas_dir: Path | None,
+    pool: PoolNavegadores | None = None,
+    paginas: PoolPaginasCalientes | None = None,
 ) -> dict[str, str]:
-    if pytesseract is None:
-        logger.error("Falta pytesseract. Ejecute: pip install pytesseract Pillow")
+    if not ocr_disponible():
+        logger.error("Falta OCR. Ejecute: pip install pytesseract Pillow (opcional: tesserocr)")
         sys.exit(1)
 
     salida_final = resolver_salida_html(salida_html, numero_id)
+    lector = LectorCaptchaRuaf()
+    estadisticas_confianza = EstadisticasConfianza("ruaf")
     logger.info(
-        "Inicio consulta RUAF | headless=%s | salida=%s | captchas_dir=%s",
+        "Inicio consulta RUAF | headless=%s | salida=%s | captchas_dir=%s | ocr_workers=%s",
         headless,
         salida_final,
         captchas_dir or "(no se guardan imagenes)",
+        "daemon" if lector.daemon else (lector.pool.workers if lector.pool else 1),
     )
 
-    with sync_playwright() as p:
-        logger.info("Iniciando navegador Chromium...")
-        browser = p.chromium.launch(headless=headless)
-        context = browser.new_context(
-            viewport={"width": 1280, "height": 900},
-            locale="es-CO",
-            timezone_id="America/Bogota",
-        )
-        page = context.new_page()
-        page.set_default_timeout(60000)
-        logger.debug("Timeout por defecto de pagina: 60000 ms")
+    logger.info("Iniciando navegador Chromium...")
+    with abrir_pagina_portal(pool, paginas, PORTAL_RUAF, headless=headless) as lista:
+        page = lista.page
+        logger.debug("Timeout por defecto de pagina: %s ms", PORTAL_RUAF.timeout_ms)
+        captura_captcha: CapturaRespuestasCaptcha | None = None
+        corpus: CorpusCaptcha | None = None
 
         try:
-            def preparar_formulario() -> None:
-                logger.info("Paso 1/... Abriendo terminos: %s", DEFAULT_URL_INICIO)
-                page.goto(DEFAULT_URL_INICIO, wait_until="domcontentloaded")
-                logger.info("Pagina cargada (domcontentloaded). URL actual: %s", page.url)
-
-                logger.info("Paso 2/... Marcando radio MainContent_RadioButtonList1_0 y enviando formulario")
-                page.locator("#MainContent_RadioButtonList1_0").click()
-                page.locator("#MainContent_btnEnviar, input[name='ctl00$MainContent$btnEnviar']").first.click()
-                logger.info("Esperando pantalla de consulta (selector tipo documento; no networkidle)...")
-                esperar_pagina_consulta_tras_terminos(page)
-                logger.info("Formulario enviado. URL: %s", page.url)
+            def preparar_formulario(*, navegar: bool = True) -> None:
+                if navegar:
+                    abrir_formulario_consulta(page)
 
                 logger.info("Paso 3/... Rellenando formulario de consulta")
                 seleccionar_tipo_documento(page, tipo_doc)
@@ -616,12 +1212,16 @@ def ejecutar_consulta(
                 cerrar_datepicker_jquery_ui(page)
                 logger.info("Datepicker cerrado (listo para captcha / Verificar).")
 
-            preparar_formulario()
+            captura_captcha = lista.preparar()
+            if lista.caliente:
+                logger.info("Pagina caliente: se empieza directo en el formulario de consulta.")
+            preparar_formulario(navegar=False)
             mensaje = page.locator("#MainContent_lblMessage, span[id='MainContent_lblMessage']")
             ultima_firma_captcha = ""
             repeticiones_captcha = 0
             fallos_captcha_fuente = 0
             reinicios_formulario = 0
+            renovaciones_confianza = 0
 
             logger.info("Paso 4/... Bucle captcha (max. %s intentos)", MAX_INTENTOS_CAPTCHA)
             for intento in range(1, MAX_INTENTOS_CAPTCHA + 1):
@@ -649,7 +1249,7 @@ def ejecutar_consulta(
                             fallos_captcha_fuente = 0
                             ultima_firma_captcha = ""
                             repeticiones_captcha = 0
-                            time.sleep(0.8)
+                            esperar_imagen_captcha(page)
                             continue
                         return {
                             "estado": "ERROR_PAGINA_CAPTCHA",
@@ -660,7 +1260,6 @@ def ejecutar_consulta(
                             "archivo_html": "",
                         }
                     forzar_renovacion_captcha(page)
-                    time.sleep(0.6)
                     continue
 
                 estado_imagen = detectar_imagen_captcha_rota(page)
@@ -673,7 +1272,7 @@ def ejecutar_consulta(
                         preparar_formulario()
                         fallos_captcha_fuente = 0
                         repeticiones_captcha = 0
-                        time.sleep(0.8)
+                        esperar_imagen_captcha(page)
                         continue
                     return {
                         "estado": "ERROR_PAGINA_CAPTCHA",
@@ -685,7 +1284,7 @@ def ejecutar_consulta(
                     }
 
                 try:
-                    png = obtener_png_captcha(page, cap_img)
+                    png, pil = obtener_png_captcha(page, cap_img, captura_captcha)
                 except Exception as e:
                     logger.warning("No se pudo obtener imagen captcha en intento %s: %s. Reiniciando formulario.", intento, e)
                     if reinicios_formulario < MAX_REINICIOS_FORMULARIO:
@@ -694,7 +1293,7 @@ def ejecutar_consulta(
                         fallos_captcha_fuente = 0
                         ultima_firma_captcha = ""
                         repeticiones_captcha = 0
-                        time.sleep(0.8)
+                        esperar_imagen_captcha(page)
                         continue
                     return {
                         "estado": "ERROR_PAGINA_CAPTCHA",
@@ -704,27 +1303,6 @@ def ejecutar_consulta(
                         ),
                         "archivo_html": "",
                     }
-                ok_png, motivo_png = validar_png_captcha(png)
-                if not ok_png:
-                    logger.warning(
-                        "Captcha invalido/no cargado (%s). Reiniciando formulario.", motivo_png
-                    )
-                    if reinicios_formulario < MAX_REINICIOS_FORMULARIO:
-                        reinicios_formulario += 1
-                        preparar_formulario()
-                        fallos_captcha_fuente = 0
-                        ultima_firma_captcha = ""
-                        repeticiones_captcha = 0
-                        time.sleep(0.8)
-                        continue
-                    return {
-                        "estado": "ERROR_PAGINA_CAPTCHA",
-                        "motivo": (
-                            "La pagina devuelve contenido invalido en el captcha "
-                            "(HTML/imagen rota) tras varios reinicios."
-                        ),
-                        "archivo_html": "",
-                    }
                 fallos_captcha_fuente = 0
 
                 firma = hashlib.sha1(png).hexdigest()
@@ -740,29 +1318,44 @@ def ejecutar_consulta(
                     forzar_renovacion_captcha(page)
                     continue
 
-                pil = Image.open(io.BytesIO(png))
-                texto, estrategia = leer_captcha_multipass(pil)
-
+                confianzas: list[float] = []
+                texto, estrategia, candidatos_ocr = lector.leer(png, pil, confianzas_out=confianzas)
                 if len(texto) != 5:
-                    texto_gemini = resolver_captcha_ocr(png)
-                    if texto_gemini and len(texto_gemini) == 5:
-                        texto = texto_gemini
-                        estrategia = "gemini_fallback"
-                        logger.info("Gemini resolvio captcha donde Tesseract fallo: %r", texto)
-                    else:
-                        if captchas_dir is not None:
-                            guardar_intento_captcha(captchas_dir, intento, pil, texto, estrategia)
-                        logger.warning(
-                            "OCR no devolvio 5 caracteres y Gemini tampoco; "
-                            "forzando renovacion de captcha y reintentando..."
+                    if captchas_dir is not None:
+                        corpus = obtener_corpus(captchas_dir, portal="ruaf")
+                        guardar_intento_captcha(
+                            captchas_dir, intento, png, texto, estrategia, portal="ruaf"
                         )
-                        forzar_renovacion_captcha(page)
-                        time.sleep(0.6)
-                        cerrar_datepicker_jquery_ui(page)
-                        continue
+                    logger.warning(
+                        "OCR no devolvio 5 caracteres y Gemini tampoco; "
+                        "forzando renovacion de captcha y reintentando..."
+                    )
+                    forzar_renovacion_captcha(page)
+                    cerrar_datepicker_jquery_ui(page)
+                    continue
 
+                confianza = min(confianzas) if confianzas else None
+                if (
+                    confianza is not None
+                    and confianza < CONFIANZA_MINIMA
+                    and renovaciones_confianza < MAX_RENOVACIONES_CONFIANZA
+                ):
+                    renovaciones_confianza += 1
+                    estadisticas_confianza.registrar(confianza, CONFIANZA_MINIMA, DECISION_RENOVADO)
+                    logger.info(
+                        "Lectura %r con confianza %.2f < %.2f (%s); se renueva el captcha sin enviar (%s/%s)",
+                        texto, confianza, CONFIANZA_MINIMA, confianzas,
+                        renovaciones_confianza, MAX_RENOVACIONES_CONFIANZA,
+                    )
+                    forzar_renovacion_captcha(page)
+                    continue
+                renovaciones_confianza = 0
+                clave_corpus = None
                 if captchas_dir is not None:
-                    guardar_intento_captcha(captchas_dir, intento, pil, texto, estrategia)
+                    corpus = obtener_corpus(captchas_dir, portal="ruaf")
+                    clave_corpus = guardar_intento_captcha(
+                        captchas_dir, intento, png, texto, estrategia, portal="ruaf"
+                    )
                 logger.info("Texto captcha: %r (longitud=%s, estrategia=%s)", texto, len(texto), estrategia)
 
                 page.locator("#MainContent_txtCaptcha, input[name='ctl00$MainContent$txtCaptcha']").fill(texto)
@@ -789,8 +1382,18 @@ def ejecutar_consulta(
 
                 if "Texto Valido" in txt or "Texto Válido" in txt:
                     logger.info("Captcha aceptado (Texto Valido).")
+                    lector.veredicto(png, texto, estrategia, candidatos_ocr, aceptado=True)
+                    if confianza is not None:
+                        estadisticas_confianza.registrar(confianza, CONFIANZA_MINIMA, DECISION_ENVIADO, True)
+                    if corpus is not None and clave_corpus is not None:
+                        corpus.marcar_veredicto(clave_corpus, VEREDICTO_ACEPTADO)
                     break
                 if "Texto Invalido" in txt or "Texto Inválido" in txt:
+                    lector.veredicto(png, texto, estrategia, candidatos_ocr, aceptado=False)
+                    if confianza is not None:
+                        estadisticas_confianza.registrar(confianza, CONFIANZA_MINIMA, DECISION_ENVIADO, False)
+                    if corpus is not None and clave_corpus is not None:
+                        corpus.marcar_veredicto(clave_corpus, VEREDICTO_RECHAZADO)
                     if intento == MAX_INTENTOS_CAPTCHA:
                         raise RuntimeError("Captcha invalido tras el maximo de intentos.")
                     logger.warning(
@@ -798,13 +1401,12 @@ def ejecutar_consulta(
                         "Forzando renovacion por seguridad y reintentando OCR..."
                     )
                     forzar_renovacion_captcha(page)
-                    time.sleep(0.85)
                     cerrar_datepicker_jquery_ui(page)
                     continue
                 logger.warning("Mensaje inesperado o vacio; reintentando en 0.5s...")
                 if intento == MAX_INTENTOS_CAPTCHA:
                     raise RuntimeError(f"No se obtuvo mensaje esperado. Ultimo texto: {txt!r}")
-                time.sleep(0.5)
+                pausa(0.5)
             else:
                 raise RuntimeError("No se valido el captcha.")
 
@@ -842,19 +1444,17 @@ def ejecutar_consulta(
                 return None
 
             logger.info("Paso 6/... Esperando elemento reporte %s", selector_reporte)
+            t_reporte = time.monotonic()
+            limite_reporte = t_reporte + 180
             html_fragment = None
-            for espera in range(60):
-                html_fragment = extraer_ctl13()
-                if html_fragment:
-                    logger.info("Elemento encontrado tras ~%s s de sondeo", espera + 1)
-                    break
-                if espera == 0:
-                    logger.info("Aun no visible; reintentando cada 1s (max. 60s)...")
-                time.sleep(1.0)
-            if not html_fragment:
-                logger.info("Esperando selector con wait_for_selector (hasta 120s)...")
-                page.wait_for_selector(selector_reporte, state="attached", timeout=120000)
-                html_fragment = extraer_ctl13()
+            while html_fragment is None and time.monotonic() < limite_reporte:
+                # El observador no ve iframes de otro origen: entre tramos, lectura frame por frame.
+                encontrado = esperar_fragmento(
+                    page, aparece_elemento(selector_reporte, nombre="reporte"), timeout_ms=1000
+                )
+                html_fragment = encontrado[1] if encontrado else extraer_ctl13()
+            if html_fragment:
+                logger.info("Elemento encontrado tras ~%.1f s", time.monotonic() - t_reporte)
             if not html_fragment:
                 raise RuntimeError(
                     "No se encontro ctl00_MainContent_rvConsulta_ctl13 (cambio el id del ReportViewer?)."
@@ -868,18 +1468,17 @@ def ejecutar_consulta(
             salida_final.write_text(html_completo, encoding="utf-8")
             logger.info("Paso 7/... Archivo guardado: %s", salida_final.resolve())
 
-            datos_extra = {}
+            datos_extra = extraer_datos_exportados(
+                buscar_export_url_base(html_completo) or _export_url_base_js(page),
+                page.url,
+                lambda url: _descargar_con_sesion(page, url),
+            )
+            # Gemini Vision solo para lo que la exportacion no trajo.
+            campos_reporte = [c for c in CAMPOS_REPORTE if c["nombre"] not in datos_extra]
             try:
                 reporte_locator = page.locator(selector_reporte)
-                if reporte_locator.count() > 0:
+                if campos_reporte and reporte_locator.count() > 0:
                     screenshot_bytes = reporte_locator.first.screenshot(timeout=15000)
-                    campos_reporte = [
-                        {"nombre": "eps_afiliado", "descripcion": "Nombre de la EPS a la que esta afiliado", "ejemplo": "EPS SANITAS S.A."},
-                        {"nombre": "regimen", "descripcion": "Regimen de afiliacion", "ejemplo": "CONTRIBUTIVO"},
-                        {"nombre": "estado_afiliacion", "descripcion": "Estado de la afiliacion", "ejemplo": "ACTIVO"},
-                        {"nombre": "fecha_afiliacion_eps", "descripcion": "Fecha de afiliacion efectiva en formato DD/MM/AAAA", "ejemplo": "01/01/2026"},
-                        {"nombre": "tipo_afiliado", "descripcion": "Tipo de afiliado", "ejemplo": "COTIZANTE"},
-                    ]
                     extraidos = extraer_datos_reporte_imagen(screenshot_bytes, campos_reporte)
                     for campo, (valor, fuente) in extraidos.items():
                         if valor:
@@ -902,10 +1501,12 @@ def ejecutar_consulta(
             return resultado
 
         finally:
-            logger.info("Cerrando contexto y navegador...")
-            context.close()
-            browser.close()
-            logger.info("Navegador cerrado.")
+            logger.info("Cerrando contexto del navegador...")
+            if corpus is not None:
+                corpus.cerrar()
+            if captura_captcha is not None:
+                logger.info("Captchas tomados de respuestas interceptadas: %s", captura_captcha.capturas)
+            lector.cerrar()
 
 
 def main() -> None:
@@ -930,7 +1531,7 @@ def main() -> None:
     ap.add_argument(
         "--save-captchas",
         action="store_true",
-        help="Guardar cada intento: PNG del captcha + meta (ocr, estrategia) en --captchas-dir",
+        help="Guardar cada intento (PNG, ocr, estrategia, veredicto) en el corpus SQLite de --captchas-dir",
     )
     ap.add_argument(
         "--captchas-dir",
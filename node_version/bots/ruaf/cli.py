@@ -5,6 +5,7 @@ import sys
 from pathlib import Path
 
 from ruaf import run_ruaf_bot
+from ruaf.cliente_http import RUAF_HTTP
 
 
 def main() -> None:
@@ -13,6 +14,11 @@ def main() -> None:
     parser.add_argument("--fecha", required=True, help='Fecha DD/MM/YYYY (ej. "14/04/2026")')
     parser.add_argument("--tipo-doc", default="CEDULA DE CIUDADANIA", help="Tipo de documento")
     parser.add_argument("--headed", action="store_true", help="Mostrar navegador")
+    parser.add_argument(
+        "--navegador",
+        action="store_true",
+        help="Forzar Playwright (no intentar el cliente HTTP sin navegador)",
+    )
     parser.add_argument("-o", "--output", type=Path, default=None, help="Carpeta de salida HTML")
     parser.add_argument("--registro-csv", type=Path, default=None, help="Ruta CSV de auditoria")
     parser.add_argument("--save-captchas", action="store_true", help="Guardar imagenes de captcha")
@@ -31,6 +37,7 @@ def main() -> None:
             save_captchas=args.save_captchas,
             captchas_dir=args.captchas_dir,
             verbose=args.verbose,
+            http=RUAF_HTTP and not (args.navegador or args.headed),
         )
     except KeyboardInterrupt:
         sys.exit(130)
@@ -0,0 +1,619 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import http.client
+import logging
+import os
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from pathlib import Path
+from typing import Any, Protocol
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from PIL import Image
+
+from common.captcha import guardar_intento_captcha
+from common.corpus_captcha import VEREDICTO_ACEPTADO, VEREDICTO_RECHAZADO, obtener_corpus
+from common.ocr import ocr_disponible
+from .bot import (
+    DEFAULT_URL_INICIO,
+    MAX_FALLOS_CAPTCHA_FUENTE,
+    MAX_INTENTOS_CAPTCHA,
+    LectorCaptchaRuaf,
+    buscar_export_url_base,
+    decodificar_png_captcha,
+    detectar_mensaje_no_exitoso,
+    extraer_datos_exportados,
+    resolver_salida_html,
+)
+
+logger = logging.getLogger(__name__)
+
+RUAF_HTTP = os.environ.get("BYBOT_RUAF_HTTP", "1").strip().lower() not in ("0", "false", "no")
+URL_INICIO_RUAF = os.environ.get("BYBOT_RUAF_URL_INICIO", "") or DEFAULT_URL_INICIO
+RUAF_HTTP_TIMEOUT_S = float(os.environ.get("BYBOT_RUAF_HTTP_TIMEOUT_S", "60") or 60)
+
+_CABECERAS = {
+    "Accept": "text/html,application/xhtml+xml,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Encoding": "gzip",
+    "Accept-Language": "es-CO,es;q=0.9",
+    "Connection": "keep-alive",
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+    ),
+}
+_REDIRECCIONES = (301, 302, 303, 307, 308)
+_TIPOS_SIN_VALOR = ("submit", "button", "image", "reset", "file")
+_RE_ID_REPORTE = re.compile(r"""id=["'][\w]*rvConsulta_ctl13["']""")
+_RE_OBJETIVO_ASINCRONO = re.compile(r"([\w$]+\$Reserved_AsyncLoadTarget)")
+_RE_INIT_AJAX = re.compile(r"PageRequestManager\._initialize\(\s*'([^']+)'\s*,\s*'[^']*'\s*,\s*\[([^\]]*)\]")
+
+
+class ErrorClienteRuaf(RuntimeError):
+    """El portal no respondio como un WebForms conocido: la consulta debe hacerse con el navegador."""
+
+
+class _Formulario(HTMLParser):
+    """Controles del formulario WebForms de una respuesta y su texto visible: lo necesario para el siguiente postback."""
+
+    def __init__(self, html: str):
+        super().__init__(convert_charrefs=True)
+        self.accion = ""
+        self.entradas: list[dict[str, str]] = []
+        self.selects: dict[str, list[tuple[str, str, bool]]] = {}
+        self.imagenes: list[dict[str, str]] = []
+        self.spans: dict[str, str] = {}
+        self._partes_texto: list[str] = []
+        self._spans_abiertos: list[str | None] = []
+        self._select: str | None = None
+        self._opcion: dict[str, Any] | None = None
+        self._omitir = 0
+        self.feed(html)
+        self.close()
+        self._cerrar_opcion()
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        a = {k.lower(): v or "" for k, v in attrs}
+        if tag == "form" and not self.accion:
+            self.accion = a.get("action", "")
+        elif tag == "input" and a.get("name"):
+            self.entradas.append(a)
+        elif tag == "select" and a.get("name"):
+            self._select = a["name"]
+            self.selects[self._select] = []
+        elif tag == "option" and self._select is not None:
+            self._cerrar_opcion()
+            self._opcion = {"valor": a.get("value"), "texto": "", "marcada": "selected" in a}
+        elif tag == "img":
+            self.imagenes.append(a)
+        elif tag == "span":
+            self._spans_abiertos.append(a.get("id") or None)
+        elif tag in ("script", "style"):
+            self._omitir += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "option":
+            self._cerrar_opcion()
+        elif tag == "select":
+            self._cerrar_opcion()
+            self._select = None
+        elif tag == "span" and self._spans_abiertos:
+            self._spans_abiertos.pop()
+        elif tag in ("script", "style") and self._omitir:
+            self._omitir -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._omitir:
+            return
+        self._partes_texto.append(data)
+        if self._opcion is not None:
+            self._opcion["texto"] += data
+        for id_span in self._spans_abiertos:
+            if id_span:
+                self.spans[id_span] = self.spans.get(id_span, "") + data
+
+    def _cerrar_opcion(self) -> None:
+        if self._opcion is None or self._select is None:
+            self._opcion = None
+            return
+        texto = " ".join(self._opcion["texto"].split())
+        valor = self._opcion["valor"]
+        self.selects[self._select].append((texto if valor is None else valor, texto, self._opcion["marcada"]))
+        self._opcion = None
+
+    @property
+    def texto(self) -> str:
+        return " ".join(" ".join(self._partes_texto).split())
+
+    def nombre(self, sufijo: str) -> str | None:
+        """Nombre del control cuyo UniqueID termina en `sufijo` (tolera cambios de master page)."""
+        for n in [e["name"] for e in self.entradas] + list(self.selects):
+            if n == sufijo or n.endswith("$" + sufijo):
+                return n
+        return None
+
+    def entrada_por_id(self, sufijo_id: str) -> dict[str, str] | None:
+        return next((e for e in self.entradas if e.get("id", "").endswith(sufijo_id)), None)
+
+    def mensaje(self, sufijo_id: str) -> str:
+        return next((" ".join(t.split()) for i, t in self.spans.items() if i.endswith(sufijo_id)), "")
+
+    def src_captcha(self) -> str | None:
+        for img in self.imagenes:
+            if any("captcha" in img.get(k, "").lower() for k in ("id", "src", "alt")) and img.get("src"):
+                return img["src"]
+        return None
+
+    def valor_opcion(self, nombre_select: str, texto: str) -> str | None:
+        t = texto.strip()
+        opciones = self.selects.get(nombre_select, [])
+        exacta = next((v for v, txt, _ in opciones if txt == t), None)
+        return exacta if exacta is not None else next((v for v, txt, _ in opciones if t in txt), None)
+
+    def campos(self, boton: str | None, valores: dict[str, str] | None = None) -> dict[str, str]:
+        """Lo que enviaria el navegador al pulsar `boton` (None = postback por script)."""
+        campos: dict[str, str] = {}
+        for e in self.entradas:
+            tipo = e.get("type", "text").lower()
+            if tipo in ("checkbox", "radio"):
+                if "checked" in e:
+                    campos[e["name"]] = e.get("value", "on")
+            elif tipo in _TIPOS_SIN_VALOR:
+                if e["name"] == boton:
+                    campos[e["name"]] = e.get("value", "")
+            else:
+                campos[e["name"]] = e.get("value", "")
+        for nombre, opciones in self.selects.items():
+            marcada = next((v for v, _, m in opciones if m), None)
+            if marcada is None and opciones:
+                marcada = opciones[0][0]
+            if marcada is not None:
+                campos[nombre] = marcada
+        campos.update(valores or {})
+        return campos
+
+    def actualizar_oculto(self, nombre: str, valor: str) -> None:
+        for e in self.entradas:
+            if e["name"] == nombre:
+                e["value"] = valor
+                return
+        self.entradas.append({"type": "hidden", "name": nombre, "value": valor})
+
+
+class _SesionHttp:
+    """Una consulta: conexion keep-alive y cookies (la sesion ASP.NET vive en `ASP.NET_SessionId`)."""
+
+    def __init__(self, *, timeout_s: float):
+        self.timeout_s = timeout_s
+        self.cookies: dict[str, str] = {}
+        self.solicitudes = 0
+        self._conn: http.client.HTTPConnection | None = None
+        self._origen: tuple[str, str, int | None] | None = None
+
+    def _conexion(self, url: str) -> http.client.HTTPConnection:
+        partes = urlsplit(url)
+        origen = (partes.scheme, partes.hostname or "", partes.port)
+        if self._conn is None or origen != self._origen:
+            self.cerrar()
+            clase = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+            self._conn = clase(origen[1], origen[2], timeout=self.timeout_s)
+            self._origen = origen
+        return self._conn
+
+    def _enviar(
+        self, metodo: str, url: str, cuerpo: bytes | None, cabeceras: dict[str, str]
+    ) -> tuple[http.client.HTTPResponse, bytes]:
+        partes = urlsplit(url)
+        ruta = (partes.path or "/") + (f"?{partes.query}" if partes.query else "")
+        if self.cookies:
+            cabeceras = {**cabeceras, "Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())}
+        # El servidor puede cerrar una conexion inactiva: un reintento con socket nuevo.
+        for intento in (1, 2):
+            conn = self._conexion(url)
+            try:
+                conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+                resp = conn.getresponse()
+                return resp, resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.cerrar()
+                if intento == 2:
+                    raise
+        raise ErrorClienteRuaf("Sin respuesta del portal RUAF.")
+
+    def solicitar(
+        self,
+        metodo: str,
+        url: str,
+        *,
+        cuerpo: bytes | None = None,
+        cabeceras: dict[str, str] | None = None,
+    ) -> tuple[int, str, bytes, str]:
+        """(estado, url final, cuerpo, content-type) siguiendo redirecciones como el navegador."""
+        cabeceras = {**_CABECERAS, **(cabeceras or {})}
+        for _ in range(6):
+            self.solicitudes += 1
+            try:
+                resp, crudo = self._enviar(metodo, url, cuerpo, cabeceras)
+            except (OSError, http.client.HTTPException) as e:
+                raise ErrorClienteRuaf(f"Portal RUAF no disponible: {e}") from e
+            for linea in resp.headers.get_all("Set-Cookie") or []:
+                galleta = SimpleCookie()
+                galleta.load(linea)
+                self.cookies.update({k: m.value for k, m in galleta.items()})
+            if resp.getheader("Content-Encoding", "").lower() == "gzip":
+                crudo = gzip.decompress(crudo)
+            ubicacion = resp.getheader("Location")
+            if resp.status in _REDIRECCIONES and ubicacion:
+                url = urljoin(url, ubicacion)
+                if resp.status not in (307, 308):
+                    metodo, cuerpo = "GET", None
+                    cabeceras = {k: v for k, v in cabeceras.items() if k != "Content-Type"}
+                continue
+            return resp.status, url, crudo, resp.getheader("Content-Type", "")
+        raise ErrorClienteRuaf(f"Demasiadas redirecciones desde {url}.")
+
+    def cerrar(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+
+def _decodificar(crudo: bytes, content_type: str) -> str:
+    m = re.search(r"charset=([\w-]+)", content_type, re.I)
+    try:
+        return crudo.decode(m.group(1) if m else "utf-8", errors="replace")
+    except LookupError:
+        return crudo.decode("utf-8", errors="replace")
+
+
+def _parsear_delta(texto: str) -> list[tuple[str, str, str]]:
+    """Respuesta de un postback asincrono (ASP.NET AJAX): bloques `largo|tipo|id|contenido|`."""
+    bloques: list[tuple[str, str, str]] = []
+    i = 0
+    try:
+        while i < len(texto):
+            a = texto.index("|", i)
+            largo = int(texto[i:a])
+            b = texto.index("|", a + 1)
+            c = texto.index("|", b + 1)
+            fin = c + 1 + largo
+            if texto[fin:fin + 1] != "|":
+                raise ValueError(f"bloque sin cierre en {fin}")
+            bloques.append((texto[a + 1:b], texto[b + 1:c], texto[c + 1:fin]))
+            i = fin + 1
+    except ValueError as e:
+        raise ErrorClienteRuaf(f"Respuesta asincrona del ReportViewer no reconocida: {e}") from e
+    return bloques
+
+
+def _segmentos_comunes(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a.split("$"), b.split("$")):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class LectorCaptcha(Protocol):
+    def leer(self, png: bytes, pil: Image.Image) -> tuple[str, str, list[tuple[str, str]]]: ...
+
+    def veredicto(
+        self, png: bytes, texto: str, estrategia: str, candidatos: list[tuple[str, str]], aceptado: bool
+    ) -> None: ...
+
+
+class LectorCaptchaOCR(LectorCaptchaRuaf):
+    """
+    `bot.LectorCaptchaRuaf` sin Gemini especulativo (su cupo es por consulta),
+    creado una vez y compartido por todas las consultas sin navegador del proceso.
+    """
+
+    def __init__(self) -> None:
+        if not ocr_disponible():
+            raise ErrorClienteRuaf("Falta OCR. Ejecute: pip install pytesseract Pillow (opcional: tesserocr)")
+        super().__init__(especulativo=False)
+
+
+class ClienteRuaf:
+    """
+    El flujo WebForms de RUAF sin navegador: GET de terminos, postback de
+    aceptacion, postback de Verificar con el captcha descargado del handler
+    de imagen y postback de Consultar, llevando `__VIEWSTATE` /
+    `__EVENTVALIDATION` y la cookie de sesion de una respuesta a la
+    siguiente. Una pagina que no tenga la forma conocida se reporta como
+    `ErrorClienteRuaf` para volver al flujo Playwright.
+    """
+
+    def __init__(
+        self,
+        url_inicio: str = URL_INICIO_RUAF,
+        *,
+        timeout_s: float = RUAF_HTTP_TIMEOUT_S,
+        lector: LectorCaptcha | None = None,
+    ):
+        self.url_inicio = url_inicio
+        self.timeout_s = timeout_s
+        self._lector = lector
+        self._lector_lock = threading.Lock()
+        self.consultas = 0
+
+    @property
+    def lector(self) -> LectorCaptcha:
+        with self._lector_lock:
+            if self._lector is None:
+                self._lector = LectorCaptchaOCR()
+            return self._lector
+
+    def _pagina(self, sesion: _SesionHttp, metodo: str, url: str, **kw: Any) -> tuple[str, str]:
+        estado, url_final, crudo, tipo = sesion.solicitar(metodo, url, **kw)
+        if estado != 200:
+            raise ErrorClienteRuaf(f"{metodo} {url_final} respondio HTTP {estado}.")
+        return url_final, _decodificar(crudo, tipo)
+
+    def _postback(
+        self, sesion: _SesionHttp, url: str, form: _Formulario, campos: dict[str, str], **cabeceras: str
+    ) -> tuple[str, str]:
+        destino = urljoin(url, form.accion) if form.accion else url
+        partes = urlsplit(url)
+        return self._pagina(
+            sesion,
+            "POST",
+            destino,
+            cuerpo=urlencode(campos).encode("utf-8"),
+            cabeceras={
+                "Content-Type": "application/x-www-form-urlencoded",
+                "Origin": f"{partes.scheme}://{partes.netloc}",
+                "Referer": url,
+                **cabeceras,
+            },
+        )
+
+    def abrir_formulario(self, sesion: _SesionHttp) -> tuple[str, _Formulario]:
+        url, html = self._pagina(sesion, "GET", self.url_inicio)
+        terminos = _Formulario(html)
+        radio = terminos.entrada_por_id("RadioButtonList1_0")
+        enviar = terminos.nombre("btnEnviar")
+        if radio is None or enviar is None or terminos.nombre("__VIEWSTATE") is None:
+            raise ErrorClienteRuaf("Contrato de RUAF cambio: la pagina de terminos no tiene el formulario esperado.")
+        url, html = self._postback(
+            sesion, url, terminos, terminos.campos(enviar, {radio["name"]: radio.get("value", "")})
+        )
+        form = _Formulario(html)
+        if form.nombre("ddlTiposDocumentos") is None:
+            raise ErrorClienteRuaf("Contrato de RUAF cambio: tras aceptar terminos no aparece el formulario de consulta.")
+        logger.info("RUAF HTTP: formulario de consulta en %s (%s solicitudes)", url, sesion.solicitudes)
+        return url, form
+
+    def _captcha(
+        self, sesion: _SesionHttp, url: str, form: _Formulario, *, renovar: bool
+    ) -> tuple[bytes, Image.Image] | None:
+        src = form.src_captcha()
+        if not src or src.strip().lower().startswith(("data:", "javascript:")):
+            raise ErrorClienteRuaf("Contrato de RUAF cambio: sin imagen de captcha descargable.")
+        base = urljoin(url, src.strip())
+        for forzar in (renovar, True):
+            url_img = base
+            if forzar:
+                url_img += ("&" if "?" in base else "?") + f"cb={int(time.time() * 1000)}"
+            estado, _, crudo, _ = sesion.solicitar(
+                "GET", url_img, cabeceras={"Accept": "image/avif,image/webp,image/*,*/*;q=0.8", "Referer": url}
+            )
+            if estado == 200:
+                imagen, motivo = decodificar_png_captcha(crudo)
+                if imagen is not None:
+                    return crudo, imagen
+                logger.debug("Captcha HTTP rechazado: %s", motivo)
+            else:
+                logger.debug("HTTP %s descargando captcha: %s", estado, url_img)
+        return None
+
+    def _descargar(self, sesion: _SesionHttp, url: str, *, referer: str) -> bytes | None:
+        estado, _, crudo, _ = sesion.solicitar("GET", url, cabeceras={"Referer": referer})
+        if estado != 200:
+            logger.debug("HTTP %s descargando %s", estado, url)
+            return None
+        return crudo
+
+    def _cargar_reporte_asincrono(self, sesion: _SesionHttp, url: str, form: _Formulario, html: str) -> str:
+        """
+        Con AsyncRendering el ReportViewer llega vacio y el script de la pagina
+        pide el contenido con un postback asincrono a `Reserved_AsyncLoadTarget`;
+        aqui se hace ese postback y los paneles recibidos (y sus scripts, donde
+        viene `ExportUrlBase`) se anexan al HTML.
+        """
+        objetivo = _RE_OBJETIVO_ASINCRONO.search(html)
+        init = _RE_INIT_AJAX.search(html)
+        if objetivo is None or init is None:
+            raise ErrorClienteRuaf("ReportViewer asincrono sin objetivo de carga o ScriptManager reconocible.")
+        target = objetivo.group(1)
+        paneles = [p[1:] for p in re.findall(r"'([^']*)'", init.group(2)) if p[:1] in ("t", "f") and "$" in p]
+        # El UpdatePanel del visor es el mas cercano al objetivo en el arbol de controles.
+        panel = max(paneles, key=lambda p: _segmentos_comunes(p, target), default=target)
+        campos = form.campos(
+            None,
+            {
+                init.group(1): f"{panel}|{target}",
+                "__EVENTTARGET": target,
+                "__EVENTARGUMENT": "",
+                "__ASYNCPOST": "true",
+            },
+        )
+        _, delta = self._postback(
+            sesion, url, form, campos, **{"X-MicrosoftAjax": "Delta=true", "X-Requested-With": "XMLHttpRequest"}
+        )
+        extras: list[str] = []
+        for tipo, ident, contenido in _parsear_delta(delta):
+            if tipo in ("error", "pageRedirect"):
+                raise ErrorClienteRuaf(f"Postback asincrono del ReportViewer devolvio {tipo}: {contenido[:200]!r}")
+            if tipo == "hiddenField":
+                form.actualizar_oculto(ident, contenido)
+            elif tipo == "updatePanel":
+                extras.append(
+                    f"\n<!-- ASYNC_PANEL_START id={ident!r} -->\n{contenido}\n<!-- ASYNC_PANEL_END id={ident!r} -->\n"
+                )
+            elif tipo in ("scriptBlock", "scriptStartupBlock") and ident != "ScriptPath":
+                extras.append(f"\n<script type=\"text/javascript\">{contenido}</script>\n")
+        if not extras:
+            return html
+        bloque = "\n<!-- EXTRA_ASYNC_CONTENT -->\n" + "\n".join(extras)
+        if "</body>" in html:
+            return html.replace("</body>", f"{bloque}\n</body>")
+        return html + bloque
+
+    def consultar(
+        self,
+        *,
+        salida_html: Path,
+        numero_id: str,
+        fecha: str,
+        tipo_doc: str,
+        captchas_dir: Path | None = None,
+    ) -> dict[str, str]:
+        t0 = time.monotonic()
+        lector = self.lector
+        sesion = _SesionHttp(timeout_s=self.timeout_s)
+        try:
+            url, form = self.abrir_formulario(sesion)
+            n_tipo = form.nombre("ddlTiposDocumentos")
+            nombres = {
+                s: form.nombre(s)
+                for s in ("txbNumeroIdentificacion", "datepicker", "txtCaptcha", "btnVerify", "btnConsultar")
+            }
+            faltan = [s for s, n in nombres.items() if n is None]
+            if faltan or n_tipo is None:
+                raise ErrorClienteRuaf(f"Contrato de RUAF cambio: faltan controles {faltan}.")
+            valor_tipo = form.valor_opcion(n_tipo, tipo_doc)
+            if valor_tipo is None:
+                raise RuntimeError(f"No se pudo seleccionar el tipo de documento: {tipo_doc!r}")
+            valores = {
+                n_tipo: valor_tipo,
+                nombres["txbNumeroIdentificacion"]: numero_id,
+                nombres["datepicker"]: fecha,
+            }
+
+            ultima_firma = ""
+            fallos_fuente = 0
+            renovar = False
+            for intento in range(1, MAX_INTENTOS_CAPTCHA + 1):
+                captcha = self._captcha(sesion, url, form, renovar=renovar)
+                renovar = False
+                if captcha is None:
+                    fallos_fuente += 1
+                    logger.warning("RUAF HTTP: captcha no valido (fallo %s/%s)", fallos_fuente, MAX_FALLOS_CAPTCHA_FUENTE)
+                    if fallos_fuente >= MAX_FALLOS_CAPTCHA_FUENTE:
+                        return {
+                            "estado": "ERROR_PAGINA_CAPTCHA",
+                            "motivo": "El handler de captcha no entrega una imagen valida.",
+                            "archivo_html": "",
+                        }
+                    continue
+                fallos_fuente = 0
+                png, pil = captcha
+                firma = hashlib.sha1(png).hexdigest()
+                if firma == ultima_firma:
+                    logger.warning("RUAF HTTP: captcha repetido (hash igual); se pide otro.")
+                    renovar = True
+                    continue
+                ultima_firma = firma
+
+                texto, estrategia, candidatos = lector.leer(png, pil)
+                clave_corpus = None
+                if captchas_dir is not None:
+                    clave_corpus = guardar_intento_captcha(
+                        captchas_dir, intento, png, texto, estrategia, portal="ruaf"
+                    )
+                if len(texto) != 5:
+                    logger.warning("RUAF HTTP: lectura %r sin 5 caracteres; se pide otro captcha.", texto)
+                    renovar = True
+                    continue
+
+                logger.info("RUAF HTTP intento %s: captcha %r (%s); postback Verificar", intento, texto, estrategia)
+                url, html = self._postback(
+                    sesion, url, form, form.campos(nombres["btnVerify"], {**valores, nombres["txtCaptcha"]: texto})
+                )
+                form = _Formulario(html)
+                txt = form.mensaje("lblMessage")
+                aceptado = "Texto Valido" in txt or "Texto Válido" in txt
+                if aceptado or "Texto Invalido" in txt or "Texto Inválido" in txt:
+                    lector.veredicto(png, texto, estrategia, candidatos, aceptado)
+                    if clave_corpus is not None:
+                        obtener_corpus(captchas_dir, portal="ruaf").marcar_veredicto(
+                            clave_corpus, VEREDICTO_ACEPTADO if aceptado else VEREDICTO_RECHAZADO
+                        )
+                    if aceptado:
+                        break
+                    logger.info("RUAF HTTP: captcha rechazado; la respuesta ya trae uno nuevo.")
+                    continue
+                if form.nombre("btnVerify") is None:
+                    raise ErrorClienteRuaf("Respuesta a Verificar sin formulario de consulta (sesion expirada?).")
+                raise ErrorClienteRuaf(f"Mensaje inesperado tras Verificar: {txt!r}")
+            else:
+                raise RuntimeError("Captcha invalido tras el maximo de intentos.")
+
+            url, html = self._postback(sesion, url, form, form.campos(nombres["btnConsultar"], valores))
+            form = _Formulario(html)
+            motivo_no_exitoso = detectar_mensaje_no_exitoso(form.texto)
+            if motivo_no_exitoso:
+                logger.warning("RUAF HTTP: consulta no exitosa por mensaje final: %s", motivo_no_exitoso)
+                return {"estado": "NO_EXITOSA_NEGOCIO", "motivo": motivo_no_exitoso, "archivo_html": ""}
+            if "Reserved_AsyncLoadTarget" in html and not _RE_ID_REPORTE.search(html):
+                html = self._cargar_reporte_asincrono(sesion, url, form, html)
+            if not _RE_ID_REPORTE.search(html):
+                raise ErrorClienteRuaf("No llego ctl00_MainContent_rvConsulta_ctl13 tras Consultar.")
+
+            salida_final = resolver_salida_html(salida_html, numero_id)
+            salida_final.write_text(html, encoding="utf-8")
+            datos_extra = extraer_datos_exportados(
+                buscar_export_url_base(html), url, lambda u: self._descargar(sesion, u, referer=url)
+            )
+            self.consultas += 1
+            logger.info(
+                "RUAF HTTP: reporte guardado en %s (%s campos exportados, %s solicitudes, %.1f s)",
+                salida_final, len(datos_extra) // 2, sesion.solicitudes, time.monotonic() - t0,
+            )
+            resultado = {"estado": "EXITOSA", "motivo": "OK", "archivo_html": str(salida_final.resolve())}
+            if datos_extra:
+                resultado["datos_extraidos"] = datos_extra
+            return resultado
+        finally:
+            sesion.cerrar()
+
+
+_cliente: ClienteRuaf | None = None
+_cliente_lock = threading.Lock()
+
+
+def obtener_cliente() -> ClienteRuaf:
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = ClienteRuaf()
+        return _cliente
+
+
+def ejecutar_consulta(
+    *,
+    salida_html: Path,
+    numero_id: str,
+    fecha: str,
+    tipo_doc: str,
+    captchas_dir: Path | None = None,
+    cliente: ClienteRuaf | None = None,
+) -> dict[str, str]:
+    """
+    Mismo dict que `ruaf.bot.ejecutar_consulta`. Lanza `ErrorClienteRuaf` si
+    hay que usar el navegador.
+    """
+    return (cliente or obtener_cliente()).consultar(
+        salida_html=salida_html,
+        numero_id=numero_id,
+        fecha=fecha,
+        tipo_doc=tipo_doc,
+        captchas_dir=captchas_dir,
+    )
@@ -1,39 +1,61 @@
 from __future__ import annotations
 
+import csv
+import io
 import json
 import logging
 import re
+import xml.etree.ElementTree as ET
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# `columnas_exportacion`: nombres del dato (cuadro de texto o encabezado) en la
+# exportacion XML / CSV del ReportViewer, ya pasados por `_clave_columna`; valen
+# tambien con prefijo (otro_nombre_eps). `columnas_exactas`: nombres genericos que
+# solo valen tal cual o como cuadro de texto (eps, txt_eps; no fecha_afiliacion_eps).
 EXTRACTION_CONFIG = {
     "eps_afiliado": {
         "patterns": [
             r"EPS[:\s]+([^\n<]{3,80})",
             r"Entidad\s*Promotora[^:]*:[:\s]+([^\n<]{3,80})",
         ],
+        "columnas_exportacion": ("nombre_eps", "eps_afiliado", "administradora", "entidad_promotora"),
+        "columnas_exactas": ("eps",),
     },
     "regimen": {
         "patterns": [
             r"[Rr][eé]gimen[:\s]+([^\n<]{2,40})",
         ],
+        "columnas_exportacion": ("regimen",),
     },
     "estado_afiliacion": {
         "patterns": [
             r"Estado\s+de\s+[Aa]filiaci[oó]n[:\s]+([^\n<]{2,40})",
             r"Estado[:\s]+([Aa]ctivo|[Ii]nactivo|[Rr]etirado|[Ss]uspendido)",
         ],
+        "columnas_exportacion": ("estado_afiliacion", "estado_de_afiliacion"),
+        "columnas_exactas": ("estado",),
     },
     "fecha_afiliacion_eps": {
         "patterns": [
             r"Fecha\s+de\s+[Aa]filiaci[oó]n[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
         ],
+        "columnas_exportacion": (
+            "fecha_afiliacion", "fecha_de_afiliacion", "fecha_afiliacion_efectiva", "fecha_afiliacion_eps",
+        ),
+    },
+    "tipo_afiliado": {
+        "patterns": [
+            r"Tipo\s+de\s+[Aa]filiado[:\s]+([^\n<]{2,40})",
+        ],
+        "columnas_exportacion": ("tipo_afiliado", "tipo_de_afiliado"),
     },
     "novedad": {
         "patterns": [
             r"[Nn]ovedad[:\s]+([^\n<]{3,200})",
         ],
+        "columnas_exportacion": ("novedad",),
     },
 }
 
@@ -83,13 +105,105 @@ def extraer_datos(html_file: Path) -> dict[str, str]:
             {
                 "campos_no_extraidos": no_extraidos,
                 "nota": "RUAF ReportViewer renderiza datos como imagen. "
-                        "Usar Gemini Vision con resolver_captcha_ocr() sobre "
-                        "la imagen del reporte para extraer datos con precision.",
+                        "Los campos salen de la exportacion XML/CSV del visor "
+                        "(extraer_datos_exportacion) o, si no esta disponible, "
+                        "de Gemini Vision sobre la imagen del reporte.",
             },
             ensure_ascii=False,
         )
 
-    logger.info("RUAF: %s campos extraidos, %s pendientes (requiere OCR/Gemini sobre imagen)",
+    logger.info("RUAF: %s campos extraidos, %s pendientes (ver exportacion del ReportViewer)",
                 len(resultado) - (1 if "metadata_json" in resultado else 0),
                 len(no_extraidos))
     return resultado
+
+
+def _clave_columna(nombre: str) -> str:
+    # txtRegimen, "Régimen:" y Estado_Afiliacion quedan como txt_regimen, regimen, estado_afiliacion.
+    separada = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", nombre)
+    return "_".join(re.sub(r"[^a-z0-9]+", " ", _normalizar(separada).lower()).split())
+
+
+def _pares_xml(contenido: bytes) -> list[tuple[str, str]]:
+    raiz = ET.fromstring(contenido)
+    pares: list[tuple[str, str]] = []
+    for el in raiz.iter():
+        pares.extend(el.attrib.items())
+        if len(el) == 0 and (el.text or "").strip():
+            pares.append((el.tag.rsplit("}", 1)[-1], el.text))
+    return pares
+
+
+def _pares_csv(contenido: bytes) -> list[tuple[str, str]]:
+    # Una region de datos por bloque (separados por linea vacia): encabezado y filas.
+    # Ademas, celdas "Etiqueta:" seguidas de su valor dentro de una misma fila.
+    filas = list(csv.reader(io.StringIO(contenido.decode("utf-8-sig", errors="replace"))))
+    pares: list[tuple[str, str]] = []
+    encabezado: list[str] | None = None
+    for fila in filas:
+        if not any(c.strip() for c in fila):
+            encabezado = None
+            continue
+        for etiqueta, valor in zip(fila, fila[1:]):
+            if etiqueta.strip().endswith(":"):
+                pares.append((etiqueta.strip()[:-1], valor))
+        if encabezado is None:
+            encabezado = fila
+            continue
+        pares.extend(zip(encabezado, fila))
+    return pares
+
+
+def _coincidencia(clave: str, config: dict) -> tuple[int, int] | None:
+    # (2, largo) si la clave es un nombre del campo; (1, largo) si lo trae como sufijo.
+    nombre = clave.removeprefix("txt_")
+    if nombre in config.get("columnas_exportacion", ()) or nombre in config.get("columnas_exactas", ()):
+        return 2, len(nombre)
+    sufijos = [len(c) for c in config.get("columnas_exportacion", ()) if clave.endswith("_" + c)]
+    return (1, max(sufijos)) if sufijos else None
+
+
+def _campo_de_columna(clave: str) -> str | None:
+    """El campo al que pertenece una columna: coincidencia exacta antes que sufijo, y el sufijo mas largo."""
+    mejor: tuple[tuple[int, int], str] | None = None
+    for campo, config in EXTRACTION_CONFIG.items():
+        c = _coincidencia(clave, config)
+        if c is not None and (mejor is None or c > mejor[0]):
+            mejor = (c, campo)
+    return mejor[1] if mejor else None
+
+
+def _fecha_exportada(valor: str) -> str | None:
+    # El XML trae fechas ISO (2026-01-01T00:00:00); el reporte las muestra DD/MM/AAAA.
+    m = re.match(r"(\d{4})-(\d{2})-(\d{2})", valor)
+    if m:
+        return f"{m.group(3)}/{m.group(2)}/{m.group(1)}"
+    m = re.search(r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}", valor)
+    return m.group(0) if m else None
+
+
+def extraer_datos_exportacion(contenido: bytes, formato: str) -> dict[str, str]:
+    """
+    Campos de EXTRACTION_CONFIG desde la exportacion XML o CSV del ReportViewer
+    (solo los que traen valor). Si un campo aparece en varias secciones del
+    reporte gana la primera, que en RUAF es la de salud.
+    """
+    try:
+        pares = _pares_xml(contenido) if formato.upper() == "XML" else _pares_csv(contenido)
+    except (ET.ParseError, csv.Error) as e:
+        logger.warning("Exportacion %s del reporte RUAF no legible: %s", formato, e)
+        return {}
+    por_clave = [(_clave_columna(k), " ".join(str(v).split())) for k, v in pares]
+    duenos = {k: _campo_de_columna(k) for k in {k for k, _ in por_clave}}
+    resultado: dict[str, str] = {}
+    for campo, config in EXTRACTION_CONFIG.items():
+        # Columnas con el nombre exacto primero y luego con prefijo, cada grupo en orden del documento.
+        propias = [(k, v) for k, v in por_clave if v and duenos[k] == campo]
+        candidatos = [v for k, v in propias if _coincidencia(k, config)[0] == 2]
+        candidatos += [v for k, v in propias if _coincidencia(k, config)[0] == 1]
+        if campo.startswith("fecha"):
+            candidatos = [f for f in map(_fecha_exportada, candidatos) if f]
+        if candidatos:
+            resultado[campo] = candidatos[0]
+    logger.info("RUAF (exportacion %s): %s/%s campos", formato, len(resultado), len(EXTRACTION_CONFIG))
+    return resultado
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import logging
 from pathlib import Path
 
+from common.browser_pool import PoolNavegadores
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.paginas_calientes import PoolPaginasCalientes
 from common.storage import registrar_consulta
-from . import bot
+from . import bot, cliente_http
+
+logger = logging.getLogger(__name__)
 
 
 def run_ruaf_bot(
@@ -18,6 +23,9 @@ def run_ruaf_bot(
     save_captchas: bool = False,
     captchas_dir: Path | None = None,
     verbose: bool = False,
+    pool: PoolNavegadores | None = None,
+    paginas: PoolPaginasCalientes | None = None,
+    http: bool = cliente_http.RUAF_HTTP,
 ) -> dict[str, str]:
     base_dir = Path(__file__).resolve().parent
 
@@ -30,14 +38,29 @@ def run_ruaf_bot(
     configurar_logging(verbose=verbose)
     silenciar_logs_ruidosos()
 
-    resultado = bot.ejecutar_consulta(
-        salida_html=salida_html,
-        numero_id=numero_id,
-        fecha=fecha,
-        tipo_doc=tipo_doc,
-        headless=headless,
-        captchas_dir=carpeta_captchas,
-    )
+    resultado = None
+    if http:
+        try:
+            resultado = cliente_http.ejecutar_consulta(
+                salida_html=salida_html,
+                numero_id=numero_id,
+                fecha=fecha,
+                tipo_doc=tipo_doc,
+                captchas_dir=carpeta_captchas,
+            )
+        except cliente_http.ErrorClienteRuaf as e:
+            logger.warning("RUAF sin navegador no disponible (%s); se usa Playwright.", e)
+    if resultado is None:
+        resultado = bot.ejecutar_consulta(
+            salida_html=salida_html,
+            numero_id=numero_id,
+            fecha=fecha,
+            tipo_doc=tipo_doc,
+            headless=headless,
+            captchas_dir=carpeta_captchas,
+            pool=pool,
+            paginas=paginas,
+        )
     registrar_consulta(
         tabla_db="ruaf_consultas",
         csv_path=registro,
@@ -1,3 +1,3 @@
-from .service import run_rues_bot
+from .service import run_rues_bot, run_rues_bot_async
 
-__all__ = ["run_rues_bot"]
+__all__ = ["run_rues_bot", "run_rues_bot_async"]
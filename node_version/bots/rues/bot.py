@@ -4,13 +4,14 @@ from __future__ import annotations
 import logging
 from datetime import datetime
 from pathlib import Path
-import unicodedata
 from zoneinfo import ZoneInfo
 
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
-from playwright.sync_api import sync_playwright
 
+from common.browser_pool import PoolNavegadores
+from common.esperas import Condicion, aparece_texto, esperar_fragmento, esperar_primero, red_inactiva, visible
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.paginas_calientes import PoolPaginasCalientes, PortalCaliente, abrir_pagina_portal
 
 logger = logging.getLogger(__name__)
 
@@ -23,15 +24,35 @@ URLS_RUES_FALLBACK = [
 ]
 ZONA_BOGOTA = ZoneInfo("America/Bogota")
 
+SELECTOR_MODAL_CERRAR = "button.swal2-close[aria-label='Close this dialog']"
+SELECTOR_INPUT_BUSQUEDA = "input#search[name='search']"
+PATRON_CON_RESULTADO = r"numero de matricula"
+PATRON_SIN_RESULTADOS = r"no se encontraron resultados"
+
 
 def _cerrar_modal_inicial(page) -> None:
-    boton_cerrar = page.locator("button.swal2-close[aria-label='Close this dialog']").first
+    # El aviso es opcional: si la red queda quieta con el buscador listo, no va a aparecer.
+    red = red_inactiva(page, quieto_ms=1200)
+    buscador = page.locator(SELECTOR_INPUT_BUSQUEDA).first
+    listo = Condicion(
+        "buscador_listo",
+        py=lambda: red.py() and buscador.is_visible(),
+        liberar=red.liberar,
+    )
+    desenlace = esperar_primero(
+        page,
+        visible(SELECTOR_MODAL_CERRAR, nombre="modal"),
+        listo,
+        timeout_ms=8000,
+    )
+    if desenlace != "modal":
+        logger.info("No aparecio aviso inicial para cerrar.")
+        return
     try:
-        boton_cerrar.wait_for(state="visible", timeout=8000)
-        boton_cerrar.click(timeout=8000)
+        page.locator(SELECTOR_MODAL_CERRAR).first.click(timeout=8000)
         logger.info("Aviso inicial cerrado con la X.")
     except PlaywrightTimeoutError:
-        logger.info("No aparecio aviso inicial para cerrar.")
+        logger.info("El aviso inicial se cerro antes del clic.")
 
 
 def _clic_boton_buscar(page, input_busqueda) -> None:
@@ -43,9 +64,7 @@ def _clic_boton_buscar(page, input_busqueda) -> None:
     try:
         boton.wait_for(state="visible", timeout=12000)
         boton.scroll_into_view_if_needed(timeout=5000)
-        page.wait_for_timeout(800)
         boton.hover(timeout=5000)
-        page.wait_for_timeout(700)
         boton.click(timeout=12000)
         logger.info("Clic ejecutado en boton Buscar (selector exacto con icono bi-search).")
         return
@@ -72,30 +91,20 @@ def _guardar_html_resultado(html: str, *, numero_busqueda: str) -> Path:
 
 
 def _esperar_estado_consulta(page) -> str:
-    def normalizar(texto: str) -> str:
-        base = unicodedata.normalize("NFKD", texto)
-        sin_tildes = "".join(ch for ch in base if not unicodedata.combining(ch))
-        return " ".join(sin_tildes.lower().split())
-
     logger.info("Esperando resultado de busqueda en RUES...")
-    limite_s = 60
-    inicio = datetime.now().timestamp()
-    while datetime.now().timestamp() - inicio < limite_s:
-        try:
-            page.wait_for_timeout(900)
-            texto_pagina = page.locator("body").inner_text(timeout=5000)
-            texto_norm = normalizar(texto_pagina)
-
-            if "numero de matricula" in texto_norm:
-                logger.info("Resultado detectado: Numero de Matricula.")
-                return "EXITOSA"
-            if "no se encontraron resultados" in texto_norm:
-                logger.info("Resultado detectado: No se encontraron resultados.")
-                return "FINALIZADO"
-        except Exception:
-            continue
-
-    raise RuntimeError("No se detecto resultado en RUES (matricula/sin resultados).")
+    encontrado = esperar_fragmento(
+        page,
+        aparece_texto(PATRON_CON_RESULTADO, nombre="EXITOSA"),
+        aparece_texto(PATRON_SIN_RESULTADOS, nombre="FINALIZADO"),
+        timeout_ms=60000,
+    )
+    if encontrado is None:
+        raise RuntimeError("No se detecto resultado en RUES (matricula/sin resultados).")
+    if encontrado[0] == "EXITOSA":
+        logger.info("Resultado detectado: Numero de Matricula.")
+    else:
+        logger.info("Resultado detectado: No se encontraron resultados.")
+    return encontrado[0]
 
 
 def _motivo_error_corto(exc: Exception) -> str:
@@ -119,7 +128,7 @@ def _abrir_rues(page) -> None:
             if "ERR_HTTP_RESPONSE_CODE_FAILURE" in str(exc):
                 try:
                     page.goto(url, wait_until="commit", timeout=60000)
-                    page.wait_for_timeout(1500)
+                    esperar_primero(page, visible(SELECTOR_INPUT_BUSQUEDA), timeout_ms=1500)
                     if page.url:
                         return
                 except Exception as exc_commit:
@@ -127,30 +136,52 @@ def _abrir_rues(page) -> None:
     raise RuntimeError("No fue posible abrir RUES.") from ultimo_error
 
 
+def _preparar_busqueda(page) -> None:
+    logger.info("Abriendo RUES: %s", URL_RUES)
+    _abrir_rues(page)
+    _cerrar_modal_inicial(page)
+
+
+def _busqueda_vigente(page) -> bool:
+    return bool(
+        page.evaluate(
+            """() => {
+            const input = document.querySelector("input#search[name='search']");
+            const modal = document.querySelector('.swal2-container');
+            return !!input && !input.value && input.offsetParent !== null && !modal;
+        }"""
+        )
+    )
+
+
+PORTAL_RUES = PortalCaliente(
+    "rues",
+    preparar=_preparar_busqueda,
+    vigente=_busqueda_vigente,
+    opciones_contexto={
+        "perfil": "rues",
+        "viewport": {"width": 1366, "height": 900},
+        "locale": "es-CO",
+        "timezone_id": "America/Bogota",
+    },
+)
+
+
 def ejecutar_consulta(
     *,
     numero_busqueda: str,
     headless: bool,
     keep_open_after_step: bool = False,
+    pool: PoolNavegadores | None = None,
+    paginas: PoolPaginasCalientes | None = None,
 ) -> dict[str, str]:
-    logger.info("Abriendo RUES: %s", URL_RUES)
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=headless)
-        context = browser.new_context(
-            viewport={"width": 1366, "height": 900},
-            locale="es-CO",
-            timezone_id="America/Bogota",
-        )
-        page = context.new_page()
-        page.set_default_timeout(30000)
+    with abrir_pagina_portal(pool, paginas, PORTAL_RUES, headless=headless) as lista:
+        page = lista.page
 
         try:
-            _abrir_rues(page)
-            page.wait_for_timeout(1500)
-
-            _cerrar_modal_inicial(page)
+            lista.preparar()
 
-            input_busqueda = page.locator("input#search[name='search']").first
+            input_busqueda = page.locator(SELECTOR_INPUT_BUSQUEDA).first
             input_busqueda.wait_for(state="visible", timeout=15000)
             input_busqueda.fill(numero_busqueda)
             logger.info("Numero escrito en Registro Mercantil: %s", numero_busqueda)
@@ -192,5 +223,3 @@ def ejecutar_consulta(
                     input()
                 except EOFError:
                     pass
-            context.close()
-            browser.close()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import logging
+
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+
+from common.async_runtime import RuntimeAsync
+from common.esperas import (
+    aparece_texto,
+    esperar_fragmento_async,
+    esperar_primero_async,
+    red_inactiva,
+    visible,
+)
+from .bot import (
+    PATRON_CON_RESULTADO,
+    PATRON_SIN_RESULTADOS,
+    SELECTOR_INPUT_BUSQUEDA,
+    SELECTOR_MODAL_CERRAR,
+    URL_RUES,
+    URLS_RUES_FALLBACK,
+    _guardar_html_resultado,
+    _motivo_error_corto,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _abrir_rues(page: Page) -> None:
+    ultimo_error: Exception | None = None
+    for url in URLS_RUES_FALLBACK:
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            return
+        except Exception as exc:
+            ultimo_error = exc
+            if "ERR_HTTP_RESPONSE_CODE_FAILURE" in str(exc):
+                try:
+                    await page.goto(url, wait_until="commit", timeout=60000)
+                    await esperar_primero_async(page, visible(SELECTOR_INPUT_BUSQUEDA), timeout_ms=1500)
+                    if page.url:
+                        return
+                except Exception as exc_commit:
+                    ultimo_error = exc_commit
+    raise RuntimeError("No fue posible abrir RUES.") from ultimo_error
+
+
+async def _cerrar_modal_inicial(page: Page) -> None:
+    desenlace = await esperar_primero_async(
+        page,
+        visible(SELECTOR_MODAL_CERRAR, nombre="modal"),
+        red_inactiva(page, quieto_ms=1200),
+        timeout_ms=8000,
+    )
+    if desenlace != "modal":
+        logger.info("No aparecio aviso inicial para cerrar.")
+        return
+    try:
+        await page.locator(SELECTOR_MODAL_CERRAR).first.click(timeout=8000)
+        logger.info("Aviso inicial cerrado con la X.")
+    except PlaywrightTimeoutError:
+        logger.info("El aviso inicial se cerro antes del clic.")
+
+
+async def _clic_boton_buscar(page: Page, input_busqueda) -> None:
+    form_busqueda = input_busqueda.locator("xpath=ancestor::form[1]")
+    boton = form_busqueda.locator(
+        "button[type='submit'].d-none.d-sm-block.btn.btn-primary.input-group-append.btn-busqueda.busqueda__button--xs:has(i.bi-search)"
+    ).first
+
+    try:
+        await boton.wait_for(state="visible", timeout=12000)
+        await boton.scroll_into_view_if_needed(timeout=5000)
+        await boton.hover(timeout=5000)
+        await boton.click(timeout=12000)
+        logger.info("Clic ejecutado en boton Buscar (selector exacto con icono bi-search).")
+        return
+    except Exception as exc:
+        logger.warning("Fallo clic normal en boton Buscar: %s", exc)
+
+    try:
+        await boton.click(timeout=12000, force=True)
+        logger.info("Clic forzado ejecutado en boton Buscar.")
+        return
+    except Exception as exc:
+        raise RuntimeError(
+            "No se pudo hacer clic en el boton Buscar de Registro Mercantil."
+        ) from exc
+
+
+async def _esperar_estado_consulta(page: Page) -> str:
+    logger.info("Esperando resultado de busqueda en RUES...")
+    encontrado = await esperar_fragmento_async(
+        page,
+        aparece_texto(PATRON_CON_RESULTADO, nombre="EXITOSA"),
+        aparece_texto(PATRON_SIN_RESULTADOS, nombre="FINALIZADO"),
+        timeout_ms=60000,
+    )
+    if encontrado is None:
+        raise RuntimeError("No se detecto resultado en RUES (matricula/sin resultados).")
+    if encontrado[0] == "EXITOSA":
+        logger.info("Resultado detectado: Numero de Matricula.")
+    else:
+        logger.info("Resultado detectado: No se encontraron resultados.")
+    return encontrado[0]
+
+
+async def ejecutar_consulta(
+    *,
+    numero_busqueda: str,
+    runtime: RuntimeAsync,
+    headless: bool = True,
+) -> dict[str, str]:
+    """Misma consulta y mismo dict que `rues.bot.ejecutar_consulta`, sobre el runtime async."""
+    logger.info("Abriendo RUES (async) para %s: %s", numero_busqueda, URL_RUES)
+    async with runtime.contexto(
+        headless=headless,
+        perfil="rues",
+        viewport={"width": 1366, "height": 900},
+        locale="es-CO",
+        timezone_id="America/Bogota",
+    ) as context:
+        page = await context.new_page()
+        page.set_default_timeout(30000)
+
+        try:
+            await _abrir_rues(page)
+            await _cerrar_modal_inicial(page)
+
+            input_busqueda = page.locator(SELECTOR_INPUT_BUSQUEDA).first
+            await input_busqueda.wait_for(state="visible", timeout=15000)
+            await input_busqueda.fill(numero_busqueda)
+            logger.info("Numero escrito en Registro Mercantil: %s", numero_busqueda)
+
+            await _clic_boton_buscar(page, input_busqueda)
+
+            estado = await _esperar_estado_consulta(page)
+            url_final = page.url
+
+            if estado == "FINALIZADO":
+                return {
+                    "estado": "FINALIZADO",
+                    "motivo": "No se encontraron resultados.",
+                    "url_final": url_final,
+                    "archivo_html": "",
+                }
+
+            archivo_html = _guardar_html_resultado(
+                await page.content(), numero_busqueda=numero_busqueda
+            )
+            return {
+                "estado": "EXITOSA",
+                "motivo": "Consulta encontrada en RUES.",
+                "url_final": url_final,
+                "archivo_html": str(archivo_html),
+            }
+        except Exception as exc:
+            logger.error("Error en flujo RUES (%s): %s", numero_busqueda, exc)
+            return {
+                "estado": "ERROR",
+                "motivo": _motivo_error_corto(exc),
+                "url_final": page.url,
+                "archivo_html": "",
+            }
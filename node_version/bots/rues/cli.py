@@ -5,6 +5,7 @@ import sys
 from pathlib import Path
 
 from rues import run_rues_bot
+from rues.cliente_http import RUES_HTTP
 
 
 def main() -> None:
@@ -31,6 +32,11 @@ def main() -> None:
         action="store_true",
         help="Mantener navegador abierto al finalizar (por defecto se cierra).",
     )
+    parser.add_argument(
+        "--navegador",
+        action="store_true",
+        help="Consultar con Playwright aunque BYBOT_RUES_HTTP=1.",
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Logs DEBUG")
     args = parser.parse_args()
 
@@ -41,13 +47,14 @@ def main() -> None:
             registro_csv=Path(args.registro_csv) if args.registro_csv else None,
             keep_open_after_step=args.headed and args.pausa,
             verbose=args.verbose,
+            http=RUES_HTTP and not (args.navegador or args.headed),
         )
     except KeyboardInterrupt:
         sys.exit(130)
 
     if resultado.get("estado") in {"EXITOSA", "FINALIZADO"}:
-        if resultado.get("archivo_html"):
-            print(resultado.get("archivo_html", ""))
+        if resultado.get("archivo_html") or resultado.get("archivo_json"):
+            print(resultado.get("archivo_html") or resultado.get("archivo_json"))
         else:
             print(resultado.get("motivo", "OK"))
         return
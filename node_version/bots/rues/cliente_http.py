@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from .bot import RUES_DATA_DIR, URL_RUES, ZONA_BOGOTA
+from .parser import mapear_registro_api
+
+logger = logging.getLogger(__name__)
+
+RUES_HTTP = os.environ.get("BYBOT_RUES_HTTP", "0").strip().lower() not in ("0", "false", "no")
+URL_API_RUES = os.environ.get(
+    "BYBOT_RUES_API_URL", "https://elasticprod.rues.org.co/api/consultasRUES/BusquedaAvanzadaRM"
+)
+RUES_HTTP_TIMEOUT_S = float(os.environ.get("BYBOT_RUES_HTTP_TIMEOUT_S", "10") or 10)
+RUES_HTTP_CONEXIONES = int(os.environ.get("BYBOT_RUES_HTTP_CONEXIONES", "4") or 4)
+
+# Donde puede venir la lista de registros segun la version del backend.
+_CLAVES_LISTA = ("registros", "resultados", "data", "items")
+
+_CABECERAS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip",
+    "Content-Type": "application/json",
+    "Connection": "keep-alive",
+    "Origin": URL_RUES.rstrip("/"),
+    "Referer": URL_RUES,
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+    ),
+}
+
+
+class ErrorClienteRues(RuntimeError):
+    """El backend no respondio como se esperaba: la consulta debe hacerse con el navegador."""
+
+
+class _PoolConexiones:
+    """Conexiones keep-alive a un solo host, reutilizadas entre consultas (a lo sumo `maximo` a la vez)."""
+
+    def __init__(self, url: str, *, maximo: int, timeout_s: float):
+        partes = urlsplit(url)
+        self.https = partes.scheme == "https"
+        self.host = partes.hostname or ""
+        self.puerto = partes.port
+        self.timeout_s = timeout_s
+        self._libres: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._cupos = threading.BoundedSemaphore(max(1, maximo))
+        self.abiertas = 0
+
+    def _nueva(self) -> http.client.HTTPConnection:
+        self.abiertas += 1
+        clase = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return clase(self.host, self.puerto, timeout=self.timeout_s)
+
+    @contextmanager
+    def conexion(self) -> Iterator[http.client.HTTPConnection]:
+        with self._cupos:
+            with self._lock:
+                conn = self._libres.pop() if self._libres else self._nueva()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            with self._lock:
+                self._libres.append(conn)
+
+    def cerrar(self) -> None:
+        with self._lock:
+            for conn in self._libres:
+                conn.close()
+            self._libres.clear()
+
+
+class ClienteRues:
+    """
+    Busqueda de Registro Mercantil contra el backend JSON que usa la SPA de
+    RUES, sin navegador. Cualquier respuesta fuera del contrato esperado se
+    reporta como `ErrorClienteRues` para volver al flujo Playwright; tambien
+    un 404 o una lista vacia, porque el backend no distingue de forma
+    verificada "sin resultados" de un cambio de contrato.
+    """
+
+    def __init__(
+        self,
+        url: str = URL_API_RUES,
+        *,
+        timeout_s: float = RUES_HTTP_TIMEOUT_S,
+        conexiones: int = RUES_HTTP_CONEXIONES,
+    ):
+        self.url = url
+        partes = urlsplit(url)
+        self._ruta = (partes.path or "/") + (f"?{partes.query}" if partes.query else "")
+        self._pool = _PoolConexiones(url, maximo=conexiones, timeout_s=timeout_s)
+        self.consultas = 0
+
+    def _post_json(self, cuerpo: dict[str, Any]) -> tuple[int, bytes]:
+        datos = json.dumps(cuerpo).encode("utf-8")
+        # Una conexion reutilizada puede haber sido cerrada por el servidor: un reintento con socket nuevo.
+        for intento in (1, 2):
+            with self._pool.conexion() as conn:
+                try:
+                    conn.request("POST", self._ruta, body=datos, headers=_CABECERAS)
+                    resp = conn.getresponse()
+                    crudo = resp.read()
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    conn.close()
+                    if intento == 2:
+                        raise
+                    continue
+                if resp.getheader("Content-Encoding", "").lower() == "gzip":
+                    crudo = gzip.decompress(crudo)
+                return resp.status, crudo
+        raise ErrorClienteRues("Sin respuesta del backend de RUES.")
+
+    def buscar(self, numero_busqueda: str) -> list[dict[str, Any]]:
+        """Registros crudos del backend (al menos uno; si no, `ErrorClienteRues`)."""
+        t0 = time.monotonic()
+        try:
+            estado, crudo = self._post_json({"search": numero_busqueda, "page": 1})
+        except (OSError, http.client.HTTPException) as e:
+            raise ErrorClienteRues(f"Backend RUES no disponible: {e}") from e
+        self.consultas += 1
+        if estado != 200:
+            raise ErrorClienteRues(f"Backend RUES respondio HTTP {estado}.")
+        try:
+            cuerpo = json.loads(crudo.decode("utf-8"))
+        except ValueError as e:
+            raise ErrorClienteRues("La respuesta del backend RUES no es JSON.") from e
+        registros = _registros(cuerpo)
+        logger.info(
+            "RUES HTTP: %s registros para %s en %.0f ms",
+            len(registros), numero_busqueda, (time.monotonic() - t0) * 1000,
+        )
+        return registros
+
+    def cerrar(self) -> None:
+        self._pool.cerrar()
+
+
+def _registros(cuerpo: Any) -> list[dict[str, Any]]:
+    if isinstance(cuerpo, dict):
+        lista = next((cuerpo[k] for k in _CLAVES_LISTA if isinstance(cuerpo.get(k), list)), None)
+    else:
+        lista = cuerpo
+    if not isinstance(lista, list) or not all(isinstance(r, dict) for r in lista):
+        raise ErrorClienteRues("Contrato del backend RUES cambio: no hay lista de registros.")
+    if not lista:
+        raise ErrorClienteRues("Backend RUES sin registros: el negativo se confirma con el navegador.")
+    if not any(mapear_registro_api(r).get("matricula_mercantil") for r in lista):
+        raise ErrorClienteRues("Contrato del backend RUES cambio: registros sin matricula.")
+    return lista
+
+
+def _guardar_json_resultado(artefacto: dict[str, Any], *, numero_busqueda: str) -> Path:
+    salida_dir = RUES_DATA_DIR / "salidas_rues"
+    salida_dir.mkdir(parents=True, exist_ok=True)
+    ts = datetime.now(ZONA_BOGOTA).strftime("%Y%m%d_%H%M%S")
+    archivo = salida_dir / f"rues_{numero_busqueda}_{ts}.json"
+    archivo.write_text(json.dumps(artefacto, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    return archivo
+
+
+_cliente: ClienteRues | None = None
+_cliente_lock = threading.Lock()
+
+
+def obtener_cliente() -> ClienteRues:
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = ClienteRues()
+        return _cliente
+
+
+def ejecutar_consulta(*, numero_busqueda: str, cliente: ClienteRues | None = None) -> dict[str, str]:
+    """
+    Mismo dict que `rues.bot.ejecutar_consulta`, con `archivo_json` en lugar de
+    `archivo_html`. Lanza `ErrorClienteRues` si hay que usar el navegador.
+    """
+    cliente = cliente or obtener_cliente()
+    registros = cliente.buscar(numero_busqueda)
+    artefacto = {
+        "fuente": "api",
+        "numero_busqueda": numero_busqueda,
+        "consultado": datetime.now(ZONA_BOGOTA).isoformat(timespec="seconds"),
+        "url": cliente.url,
+        "registros": [mapear_registro_api(r) for r in registros],
+        "crudo": registros,
+    }
+    archivo = _guardar_json_resultado(artefacto, numero_busqueda=numero_busqueda)
+    return {
+        "estado": "EXITOSA",
+        "motivo": "Consulta encontrada en RUES (backend JSON).",
+        "url_final": cliente.url,
+        "archivo_html": "",
+        "archivo_json": str(archivo),
+    }
@@ -7,20 +7,21 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# `claves_api`: nombres del mismo dato en la respuesta JSON del backend (ver cliente_http).
 EXTRACTION_CONFIG = {
-    "identificacion": {"etiqueta": "Identificación"},
-    "razon_social": {"etiqueta": "Razón Social"},
-    "nit": {"etiqueta": "NIT"},
-    "numero_inscripcion": {"etiqueta": "Numero de Inscripción"},
-    "categoria": {"etiqueta": "Categoria"},
-    "camara_comercio": {"etiqueta": "Cámara de Comercio"},
-    "matricula_mercantil": {"etiqueta": "Número de Matrícula"},
-    "estado_matricula": {"etiqueta": "Estado"},
-    "direccion": {"etiqueta": "Dirección"},
-    "municipio": {"etiqueta": "Municipio"},
-    "departamento": {"etiqueta": "Departamento"},
-    "fecha_renovacion": {"etiqueta": "Fecha de Renovación"},
-    "categoria_matricula": {"etiqueta": "Categoria"},
+    "identificacion": {"etiqueta": "Identificación", "claves_api": ("identificacion", "numero_identificacion")},
+    "razon_social": {"etiqueta": "Razón Social", "claves_api": ("razon_social", "nombre")},
+    "nit": {"etiqueta": "NIT", "claves_api": ("nit",)},
+    "numero_inscripcion": {"etiqueta": "Numero de Inscripción", "claves_api": ("numero_inscripcion", "inscripcion")},
+    "categoria": {"etiqueta": "Categoria", "claves_api": ("categoria", "organizacion_juridica")},
+    "camara_comercio": {"etiqueta": "Cámara de Comercio", "claves_api": ("camara_comercio", "nom_camara", "camara")},
+    "matricula_mercantil": {"etiqueta": "Número de Matrícula", "claves_api": ("matricula", "numero_matricula")},
+    "estado_matricula": {"etiqueta": "Estado", "claves_api": ("estado_matricula", "estado")},
+    "direccion": {"etiqueta": "Dirección", "claves_api": ("direccion", "direccion_comercial")},
+    "municipio": {"etiqueta": "Municipio", "claves_api": ("municipio", "municipio_comercial")},
+    "departamento": {"etiqueta": "Departamento", "claves_api": ("departamento", "dpto")},
+    "fecha_renovacion": {"etiqueta": "Fecha de Renovación", "claves_api": ("fecha_renovacion", "ultimo_ano_renovado")},
+    "categoria_matricula": {"etiqueta": "Categoria", "claves_api": ("categoria_matricula", "categoria")},
 }
 
 
@@ -73,3 +74,36 @@ def extraer_datos(html_file: Path) -> dict[str, str]:
 
     logger.info("RUES: %s campos extraidos, %s pendientes", len(resultado) - (1 if "metadata_json" in resultado else 0), len(no_extraidos))
     return resultado
+
+
+def _clave_api(clave: str) -> str:
+    # razonSocial, Razon_Social y "razón social" quedan como razon_social.
+    separada = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", clave)
+    return "_".join(re.sub(r"[^A-Z0-9]+", " ", _normalizar(separada)).lower().split())
+
+
+def mapear_registro_api(registro: dict) -> dict[str, str]:
+    """Un registro JSON del backend a los campos de EXTRACTION_CONFIG (solo los que traen valor)."""
+    por_clave = {_clave_api(str(k)): v for k, v in registro.items() if v not in (None, "")}
+    resultado: dict[str, str] = {}
+    for campo, config in EXTRACTION_CONFIG.items():
+        for clave in config["claves_api"]:
+            valor = por_clave.get(clave)
+            if valor is not None and not isinstance(valor, (dict, list)):
+                resultado[campo] = str(valor).strip()
+                break
+    return resultado
+
+
+def extraer_datos_json(json_file: Path) -> dict[str, str]:
+    """Mismo resultado que `extraer_datos`, desde el artefacto JSON del modo sin navegador."""
+    artefacto = json.loads(json_file.read_text(encoding="utf-8"))
+    campos = (artefacto.get("registros") or [{}])[0]
+
+    resultado = {campo: campos[campo] for campo in EXTRACTION_CONFIG if campos.get(campo)}
+    no_extraidos = {campo: "" for campo in EXTRACTION_CONFIG if campo not in resultado}
+    if no_extraidos:
+        resultado["metadata_json"] = json.dumps({"campos_no_extraidos": no_extraidos}, ensure_ascii=False)
+
+    logger.info("RUES (JSON): %s campos extraidos, %s pendientes", len(EXTRACTION_CONFIG) - len(no_extraidos), len(no_extraidos))
+    return resultado
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from pathlib import Path
 
+from common.async_runtime import RuntimeAsync, registrar_consulta_async
+from common.browser_pool import PoolNavegadores
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.paginas_calientes import PoolPaginasCalientes
 from common.storage import registrar_consulta
-from . import bot
+from . import bot, bot_async, cliente_http
+
+logger = logging.getLogger(__name__)
 
 
 def run_rues_bot(
@@ -14,15 +21,27 @@ def run_rues_bot(
     registro_csv: Path | None = None,
     keep_open_after_step: bool = False,
     verbose: bool = False,
+    pool: PoolNavegadores | None = None,
+    paginas: PoolPaginasCalientes | None = None,
+    http: bool = cliente_http.RUES_HTTP,
 ) -> dict[str, str]:
     configurar_logging(verbose=verbose)
     silenciar_logs_ruidosos()
 
-    resultado = bot.ejecutar_consulta(
-        numero_busqueda=numero_busqueda,
-        headless=headless,
-        keep_open_after_step=keep_open_after_step,
-    )
+    resultado = None
+    if http:
+        try:
+            resultado = cliente_http.ejecutar_consulta(numero_busqueda=numero_busqueda)
+        except cliente_http.ErrorClienteRues as e:
+            logger.warning("RUES sin navegador no disponible (%s); se usa Playwright.", e)
+    if resultado is None:
+        resultado = bot.ejecutar_consulta(
+            numero_busqueda=numero_busqueda,
+            headless=headless,
+            keep_open_after_step=keep_open_after_step,
+            pool=pool,
+            paginas=paginas,
+        )
 
     registro = registro_csv or (Path(__file__).resolve().parent / "rues_consultas.csv")
     registrar_consulta(
@@ -31,7 +50,41 @@ def run_rues_bot(
         numero_id=numero_busqueda,
         estado=resultado.get("estado", ""),
         motivo=resultado.get("motivo", ""),
-        archivo_original=resultado.get("archivo_html", "") or "",
+        archivo_original=resultado.get("archivo_html", "") or resultado.get("archivo_json", "") or "",
+        campos_extra={"url_final": resultado.get("url_final", "")},
+    )
+    return resultado
+
+
+async def run_rues_bot_async(
+    *,
+    numero_busqueda: str,
+    runtime: RuntimeAsync,
+    headless: bool = True,
+    registro_csv: Path | None = None,
+    http: bool = cliente_http.RUES_HTTP,
+) -> dict[str, str]:
+    resultado = None
+    if http:
+        try:
+            resultado = await asyncio.to_thread(cliente_http.ejecutar_consulta, numero_busqueda=numero_busqueda)
+        except cliente_http.ErrorClienteRues as e:
+            logger.warning("RUES sin navegador no disponible (%s); se usa Playwright.", e)
+    if resultado is None:
+        resultado = await bot_async.ejecutar_consulta(
+            numero_busqueda=numero_busqueda,
+            runtime=runtime,
+            headless=headless,
+        )
+
+    registro = registro_csv or (Path(__file__).resolve().parent / "rues_consultas.csv")
+    await registrar_consulta_async(
+        tabla_db="rues_consultas",
+        csv_path=registro,
+        numero_id=numero_busqueda,
+        estado=resultado.get("estado", ""),
+        motivo=resultado.get("motivo", ""),
+        archivo_original=resultado.get("archivo_html", "") or resultado.get("archivo_json", "") or "",
         campos_extra={"url_final": resultado.get("url_final", "")},
     )
     return resultado
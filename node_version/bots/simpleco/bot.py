@@ -17,14 +17,18 @@ from playwright.sync_api import (
     Frame,
     Locator,
     Page,
-    sync_playwright,
     TimeoutError as PlaywrightTimeoutError,
 )
 
+from common.browser_pool import PoolNavegadores, abrir_contexto
+from common.esperas import cumple, esperar_primero, jsf_inactivo, red_inactiva, texto, visible
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.plan_interaccion import intentar_en_orden, portal_de
+from common.sondeo_dom import Sondeo, sondear, sondear_superficies
 from common.storage import registrar_consulta
 from common.timezone_utils import periodo_mes_anterior
 from common.pdf_helpers import (
+    SELECTORES_RADIO_PERIODO,
     _esperar_cargando_suave,
     clic_radio_periodo_cotizacion,
     abrir_panel_calendario_periodo,
@@ -59,6 +63,15 @@ SELECTORES_NUMERO_DOC = [
 SIMPLECO_DATA_DIR = Path(__file__).resolve().parent
 
 _FRASE_SIN_PAGOS = "en el sistema no hay pagos realizados durante los ultimos 6 meses"
+_PATRON_SIN_PAGOS = _FRASE_SIN_PAGOS + r"|no hay pagos realizados.*ultimos 6 meses"
+_PATRON_ERROR_SEGURIDAD = r"(?=.*no fue posible validar la seguridad)(?=.*por favor intente nuevamente)"
+_PATRON_PREGUNTAS_SEGURIDAD = r"(?=.*autorizacion consulta directa)(?=.*verificar su identidad)"
+# Desenlaces del 1.er Consultar, comprobados en un solo sondeo del body.
+_ESTADOS_TRAS_CONSULTAR = {
+    "sin_pagos": _PATRON_SIN_PAGOS,
+    "error_seguridad": _PATRON_ERROR_SEGURIDAD,
+    "preguntas_seguridad": _PATRON_PREGUNTAS_SEGURIDAD,
+}
 
 CHROME_WA = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -66,28 +79,6 @@ CHROME_WA = (
 )
 
 
-def _hay_sin_pagos_ultimos_6_meses(texto_pagina: str) -> bool:
-    if not texto_pagina:
-        return False
-    n = " ".join(texto_pagina.lower().split())
-    if _FRASE_SIN_PAGOS in n:
-        return True
-    if "no hay pagos realizados" in n and ("ultimos 6 meses" in n or "ultimos 6 meses" in n):
-        return True
-    return False
-
-
-def _hay_error_seguridad(texto_pagina: str) -> bool:
-    if not texto_pagina:
-        return False
-    n = " ".join(texto_pagina.lower().split())
-    frases = [
-        "no fue posible validar la seguridad",
-        "por favor intente nuevamente",
-    ]
-    return all(f in n for f in frases)
-
-
 def _resultado_error_seguridad(err_base: dict[str, str | int]) -> dict[str, str | int]:
     logger.warning("Portal rechazo la consulta por validacion de seguridad.")
     return {
@@ -98,17 +89,10 @@ def _resultado_error_seguridad(err_base: dict[str, str | int]) -> dict[str, str
     }
 
 
-def _es_pagina_preguntas_seguridad(page) -> bool:
-    url = (page.url or "").lower()
-    if "preguntas" in url:
+def _es_pagina_preguntas_seguridad(page, estado: Sondeo) -> bool:
+    if "preguntas" in (page.url or "").lower():
         return True
-    try:
-        texto = (page.locator("body").inner_text() or "").lower()
-        if "autorizacion consulta directa" in texto and "verificar su identidad" in texto:
-            return True
-    except Exception:
-        pass
-    return False
+    return estado.hay("preguntas_seguridad")
 
 
 def _resultado_preguntas_seguridad(err_base: dict[str, str | int]) -> dict[str, str | int]:
@@ -149,29 +133,25 @@ def resumen_pagina(page: Page) -> str:
 def localizar_campo_numero_doc(page: Page, *, max_espera_s: float = 120.0) -> tuple[Page | Frame, Locator]:
     t0 = time.monotonic()
     while time.monotonic() - t0 < max_espera_s:
-        for sup in (page, *page.frames):
-            for sel in SELECTORES_NUMERO_DOC:
-                try:
-                    loc = sup.locator(sel)
-                except Exception as e:
-                    logger.debug("selector %r: %s", sel, e)
-                    continue
-                n = loc.count()
-                for i in range(n):
-                    uno = loc.nth(i)
-                    try:
-                        if not uno.is_visible():
-                            continue
-                    except Exception:
-                        continue
-                    try:
-                        furl = sup.url
-                    except Exception:
-                        furl = "?"
-                    quien = "main" if sup is page else f"frame(name={getattr(sup, 'name', None)!r} url={furl!r})"
-                    logger.info("Campo documento con %r (indice %s) en %s", sel, i, quien)
-                    return sup, uno
-        time.sleep(0.25)
+        for s in sondear_superficies((page, *page.frames), SELECTORES_NUMERO_DOC):
+            if not any(s.visibles(sel) for sel in SELECTORES_NUMERO_DOC):
+                continue
+            sup = s.superficie
+            sel = intentar_en_orden(
+                portal_de(page),
+                "campo_documento",
+                SELECTORES_NUMERO_DOC,
+                lambda sel: sel if s.visibles(sel) else None,
+            )
+            i = s.visibles(sel)[0]
+            try:
+                furl = sup.url
+            except Exception:
+                furl = "?"
+            quien = "main" if sup is page else f"frame(name={getattr(sup, 'name', None)!r} url={furl!r})"
+            logger.info("Campo documento con %r (indice %s) en %s", sel, i, quien)
+            return sup, sup.locator(sel).nth(i)
+        esperar_primero(page, visible(", ".join(SELECTORES_NUMERO_DOC)), timeout_ms=250)
     raise RuntimeError(f"No se encontro el input de documento en {max_espera_s:.0f}s. {resumen_pagina(page)}")
 
 
@@ -188,28 +168,37 @@ def abrir_pagina_tras_consultar_inicial(target: Page | Frame) -> Page:
     ctx = raiz.context
     ids_antes = {id(p) for p in ctx.pages}
 
+    def pagina_nueva() -> Page | None:
+        return next((p for p in ctx.pages if id(p) not in ids_antes), None)
+
     logger.info("1.er Consultar (por defecto misma ventana). url antes=%r", raiz.url)
     target.locator(IMG_CONSULTAR).first.scroll_into_view_if_needed()
+    red = red_inactiva(raiz, quieto_ms=800)
     target.locator(IMG_CONSULTAR).first.click()
 
-    for _ in range(15):
-        for p in ctx.pages:
-            if id(p) not in ids_antes:
-                logger.info("Nueva pestana detectada. URL: %r", p.url)
-                p.set_default_timeout(120000)
-                try:
-                    p.wait_for_load_state("load", timeout=120000)
-                except PlaywrightTimeoutError:
-                    logger.warning("Timeout load en la nueva pestana; se continua.")
-                return p
-        time.sleep(0.2)
+    # Pestana nueva o postback en la misma ventana: el que ocurra primero.
+    esperar_primero(
+        raiz,
+        cumple(lambda: pagina_nueva() is not None, nombre="pestana"),
+        red,
+        timeout_ms=3000,
+    )
+    p = pagina_nueva()
+    if p is not None:
+        logger.info("Nueva pestana detectada. URL: %r", p.url)
+        p.set_default_timeout(120000)
+        try:
+            p.wait_for_load_state("load", timeout=120000)
+        except PlaywrightTimeoutError:
+            logger.warning("Timeout load en la nueva pestana; se continua.")
+        return p
 
     logger.info("Misma ventana (postback JSF). url=%r", raiz.url)
     try:
         raiz.wait_for_load_state("load", timeout=120000)
     except PlaywrightTimeoutError:
         logger.debug("Sin evento 'load' (actualizacion parcial sin recargar el documento).")
-    time.sleep(0.5)
+    esperar_primero(raiz, jsf_inactivo(), timeout_ms=5000)
     return raiz
 
 
@@ -218,6 +207,7 @@ def ejecutar_consulta(
     salida_pdf: Path,
     numero_documento: str,
     headless: bool,
+    pool: PoolNavegadores | None = None,
 ) -> dict[str, str | int]:
     mes, anio = periodo_mes_anterior()
     out_final = resolver_salida_pdf(salida_pdf, numero_documento)
@@ -227,16 +217,17 @@ def ejecutar_consulta(
         headless, out_final, mes, anio, numero_documento,
     )
 
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=headless)
-        context = browser.new_context(
-            viewport={"width": 1280, "height": 900},
-            locale="es-CO",
-            timezone_id="America/Bogota",
-            accept_downloads=True,
-            user_agent=CHROME_WA,
-            extra_http_headers={"Accept-Language": "es-CO,es;q=0.9,en;q=0.5"},
-        )
+    with abrir_contexto(
+        pool,
+        headless=headless,
+        perfil="simpleco",
+        viewport={"width": 1280, "height": 900},
+        locale="es-CO",
+        timezone_id="America/Bogota",
+        accept_downloads=True,
+        user_agent=CHROME_WA,
+        extra_http_headers={"Accept-Language": "es-CO,es;q=0.9,en;q=0.5"},
+    ) as context:
         page = context.new_page()
         page.set_default_timeout(120000)
         p_work: Page = page
@@ -254,17 +245,22 @@ def ejecutar_consulta(
             p_work = abrir_pagina_tras_consultar_inicial(doc_sup)
             _esperar_cargando_suave(p_work)
 
-            texto_ini = (p_work.locator("body").inner_text() or "")
-            if not _hay_sin_pagos_ultimos_6_meses(texto_ini):
-                time.sleep(0.85)
-                texto_ini = (p_work.locator("body").inner_text() or "")
-            if _hay_sin_pagos_ultimos_6_meses(texto_ini):
+            estado = sondear(p_work, patrones=_ESTADOS_TRAS_CONSULTAR)
+            if not estado.hay("sin_pagos"):
+                esperar_primero(
+                    p_work,
+                    texto(_PATRON_SIN_PAGOS, nombre="sin_pagos"),
+                    visible(", ".join(SELECTORES_RADIO_PERIODO), nombre="periodo"),
+                    timeout_ms=850,
+                )
+                estado = sondear(p_work, patrones=_ESTADOS_TRAS_CONSULTAR)
+            if estado.hay("sin_pagos"):
                 return _resultado_sin_pagos_portal(err_base)
 
-            if _hay_error_seguridad(texto_ini):
+            if estado.hay("error_seguridad"):
                 return _resultado_error_seguridad(err_base)
 
-            if _es_pagina_preguntas_seguridad(p_work):
+            if _es_pagina_preguntas_seguridad(p_work, estado):
                 return _resultado_preguntas_seguridad(err_base)
 
             p_sup = clic_radio_periodo_cotizacion(p_work)
@@ -323,10 +319,6 @@ def ejecutar_consulta(
                 "motivo": str(e),
                 "archivo_pdf": "",
             }
-        finally:
-            context.close()
-            browser.close()
-            logger.info("Navegador cerrado.")
 
 
 def main() -> None:
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
+from common.browser_pool import PoolNavegadores
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
 from common.storage import registrar_consulta
 from . import bot
@@ -14,6 +15,7 @@ def run_simpleco_bot(
     output_dir: Path | None = None,
     registro_csv: Path | None = None,
     verbose: bool = False,
+    pool: PoolNavegadores | None = None,
 ) -> dict[str, str | int]:
     base_dir = Path(__file__).resolve().parent
     salida = output_dir or (base_dir / "salidas_simpleco")
@@ -26,6 +28,7 @@ def run_simpleco_bot(
         salida_pdf=salida,
         numero_documento=numero_documento,
         headless=headless,
+        pool=pool,
     )
     registrar_consulta(
         tabla_db="simpleco_consultas",
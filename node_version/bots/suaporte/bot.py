@@ -13,13 +13,17 @@ from zoneinfo import ZoneInfo
 from playwright.sync_api import (
     Frame,
     Page,
-    sync_playwright,
     TimeoutError as PlaywrightTimeoutError,
 )
 
+from common.browser_pool import PoolNavegadores, abrir_contexto
+from common.esperas import cumple, esperar_primero, pausa, texto, visible
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
+from common.sondeo_dom import hay_texto, sondear, sondear_superficies
 from common.csv_writer import registrar_consulta_csv
 from common.pdf_helpers import (
+    SELECTORES_DESCARGA_PDF,
+    SELECTORES_RADIO_PERIODO,
     as_page,
     _esperar_cargando_suave,
     clic_radio_periodo_cotizacion,
@@ -56,7 +60,11 @@ SELECTOR_IMG_CONSULTAR = 'img[src*="bot_consultar.jpg"].borderImage'
 SELECTOR_IMG_BORRAR = 'img[src*="bot_borrar.jpg"].borderImage'
 
 _FRASE_SIN_PAGOS = "en el sistema no hay pagos realizados durante los ultimos 6 meses"
+_PATRON_SIN_PAGOS = _FRASE_SIN_PAGOS + r"|no hay pagos realizados.*ultimos 6 meses"
 _FRASE_SIN_INFO_PARAMETROS = "nuestro sistema no registra informacion para los parametros seleccionados"
+_PATRON_SIN_INFO_PARAMETROS = (
+    _FRASE_SIN_INFO_PARAMETROS + r"|(?=.*no registra informacion)(?=.*parametros seleccionados)"
+)
 
 ZONA_BOGOTA = ZoneInfo("America/Bogota")
 MES_PERIODO_COTIZACION_SUAPORTE = 3
@@ -67,64 +75,35 @@ def _mes_y_anio_periodo_cotizacion_suaporte() -> tuple[int, int]:
     return MES_PERIODO_COTIZACION_SUAPORTE, anio
 
 
-def _hay_sin_pagos_ultimos_6_meses(texto_pagina: str) -> bool:
-    if not texto_pagina:
-        return False
-    n = " ".join(texto_pagina.lower().split())
-    if _FRASE_SIN_PAGOS in n:
-        return True
-    if "no hay pagos realizados" in n and ("ultimos 6 meses" in n or "ultimos 6 meses" in n):
-        return True
-    return False
-
-
-def _esperar_mensaje_sin_pagos(page: Page, *, max_espera_s: float = 6.0, intervalo_s: float = 0.18) -> bool:
-    t0 = time.monotonic()
-    while time.monotonic() - t0 < max_espera_s:
-        try:
-            texto = page.locator("body").inner_text() or ""
-        except Exception:
-            texto = ""
-        if _hay_sin_pagos_ultimos_6_meses(texto):
-            return True
-        time.sleep(intervalo_s)
-    return False
-
-
-def _hay_mensaje_sin_info_parametros(texto_pagina: str) -> bool:
-    if not texto_pagina:
-        return False
-    n = " ".join(texto_pagina.lower().split())
-    return (
-        _FRASE_SIN_INFO_PARAMETROS in n
-        or ("no registra informacion" in n and "parametros seleccionados" in n)
+def _esperar_mensaje_sin_pagos(page: Page, *, max_espera_s: float = 6.0) -> bool:
+    # Con pagos, el portal muestra el selector de periodo: no hace falta agotar la espera.
+    desenlace = esperar_primero(
+        page,
+        texto(_PATRON_SIN_PAGOS, nombre="sin_pagos"),
+        visible(", ".join(SELECTORES_RADIO_PERIODO), nombre="periodo"),
+        timeout_ms=max_espera_s * 1000,
     )
-
-
-def _texto_body_raiz_y_frames(raiz: Page) -> str:
-    partes: list[str] = []
-    try:
-        partes.append(raiz.locator("body").inner_text() or "")
-    except Exception:
-        pass
-    for fr in raiz.frames:
-        try:
-            partes.append(fr.locator("body").inner_text() or "")
-        except Exception:
-            pass
-    return "\n".join(partes)
+    return desenlace == "sin_pagos"
 
 
 def _cerrar_dialogo_sin_info_si_aparece(raiz: Page, *, delay_entre_pasos_s: float, max_espera_s: float = 8.0) -> bool:
     t0 = time.monotonic()
-    intervalo = 0.18
     while time.monotonic() - t0 < max_espera_s:
-        texto = _texto_body_raiz_y_frames(raiz)
-        if not _hay_mensaje_sin_info_parametros(texto):
-            time.sleep(intervalo)
-            continue
+        restante_s = max_espera_s - (time.monotonic() - t0)
+        # Con informacion, el resultado trae el boton PDF: no hace falta agotar la espera.
+        desenlace = esperar_primero(
+            raiz,
+            cumple(
+                lambda: hay_texto((raiz, *raiz.frames), _PATRON_SIN_INFO_PARAMETROS),
+                nombre="sin_info",
+            ),
+            visible(", ".join(SELECTORES_DESCARGA_PDF), nombre="boton_pdf"),
+            timeout_ms=restante_s * 1000,
+        )
+        if desenlace != "sin_info":
+            return False
         logger.info("Dialogo del portal: sin informacion para parametros; buscando Aceptar...")
-        _pausa(delay_entre_pasos_s)
+        pausa(delay_entre_pasos_s)
         dlg = raiz.locator(".ui-dialog:visible").filter(
             has_text=re.compile(r"no registra", re.IGNORECASE)
         )
@@ -135,7 +114,7 @@ def _cerrar_dialogo_sin_info_si_aparece(raiz: Page, *, delay_entre_pasos_s: floa
             if acept.count() > 0:
                 try:
                     acept.first.click(timeout=15000)
-                    _pausa(delay_entre_pasos_s)
+                    pausa(delay_entre_pasos_s)
                     _esperar_cargando_suave(raiz)
                     logger.info("Clic en Aceptar (dialogo sin informacion).")
                     return True
@@ -147,7 +126,7 @@ def _cerrar_dialogo_sin_info_si_aparece(raiz: Page, *, delay_entre_pasos_s: floa
         if acept2.count() > 0:
             try:
                 acept2.first.click(timeout=15000)
-                _pausa(delay_entre_pasos_s)
+                pausa(delay_entre_pasos_s)
                 _esperar_cargando_suave(raiz)
                 logger.info("Clic en Aceptar (dialogo visible).")
                 return True
@@ -159,7 +138,7 @@ def _cerrar_dialogo_sin_info_si_aparece(raiz: Page, *, delay_entre_pasos_s: floa
             )
             if fall.count() > 0:
                 fall.first.click(timeout=15000)
-                _pausa(delay_entre_pasos_s)
+                pausa(delay_entre_pasos_s)
                 _esperar_cargando_suave(raiz)
                 logger.info("Clic en Aceptar (span.ui-button-text).")
                 return True
@@ -170,10 +149,9 @@ def _cerrar_dialogo_sin_info_si_aparece(raiz: Page, *, delay_entre_pasos_s: floa
 
 
 def _localizar_input_documento(page: Page):
-    for sel in SELECTORES_NUMERO_DOC:
-        loc = page.locator(sel)
-        if loc.count() > 0:
-            return loc.first
+    sel = sondear(page, SELECTORES_NUMERO_DOC).primero()
+    if sel is not None:
+        return page.locator(sel).first
     raise RuntimeError("No se encontro el campo numeroDocumentoUsuario.")
 
 
@@ -184,24 +162,19 @@ def _ruta_salida_pdf(salida_dir: Path, numero_id: str) -> Path:
     return salida_dir / f"suaporte_{safe}_{ts}.pdf"
 
 
-def _pausa(segundos: float) -> None:
-    if segundos > 0:
-        time.sleep(segundos)
-
-
 def _resolver_ids_select_periodo(surf: Page | Frame) -> tuple[str, str]:
     exact_m, exact_a = "periodoCotizacion:mes", "periodoCotizacion:anio"
-    if surf.locator(f'[id="{exact_m}"]').count():
+    sel_exacto = f'[id="{exact_m}"]'
+    sel_sufijo = '[id$=":periodoCotizacion:mes"]'
+    s = sondear(surf, [sel_exacto, sel_sufijo])
+    if s.n(sel_exacto):
         return exact_m, exact_a
-    loc = surf.locator('[id$=":periodoCotizacion:mes"]')
-    for i in range(loc.count()):
-        el = loc.nth(i)
+    loc = surf.locator(sel_sufijo)
+    for i in s.visibles(sel_sufijo):
         try:
-            if not el.is_visible():
-                continue
+            full_m = loc.nth(i).get_attribute("id") or ""
         except Exception:
             continue
-        full_m = el.get_attribute("id") or ""
         if full_m.endswith(":periodoCotizacion:mes"):
             full_a = full_m.replace(":periodoCotizacion:mes", ":periodoCotizacion:anio")
             return full_m, full_a
@@ -210,47 +183,45 @@ def _resolver_ids_select_periodo(surf: Page | Frame) -> tuple[str, str]:
 
 def _superficie_clic_periodo_cotizacion(page: Page, *, delay_entre_pasos_s: float) -> Page | Frame:
     _esperar_cargando_suave(page)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     label_sels = (
         'label[for="radio_periodoCotizacion"]',
         r'label[for$=":radio_periodoCotizacion"]',
     )
-    for sup in (page, *page.frames):
+    for s in sondear_superficies((page, *page.frames), label_sels):
+        sup = s.superficie
         for sel in label_sels:
-            loc = sup.locator(sel)
-            if loc.count() == 0:
+            if not s.visibles(sel):
                 continue
-            lab = loc.first
+            lab = sup.locator(sel).nth(s.visibles(sel)[0])
             try:
-                if not lab.is_visible():
-                    continue
                 lab.scroll_into_view_if_needed(timeout=10000)
                 lab.click(timeout=15000)
                 logger.info("Periodo de cotizacion: clic en etiqueta (%s)", sel)
-                _pausa(delay_entre_pasos_s)
+                pausa(delay_entre_pasos_s)
                 return sup
             except Exception as e:
                 logger.debug("Etiqueta periodo %r: %s", sel, e)
     sup = clic_radio_periodo_cotizacion(page)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     return sup
 
 
 def _pasos_periodo_cotizacion_post_consultar(page: Page, *, delay_entre_pasos_s: float) -> tuple[int, int]:
     p_sup = _superficie_clic_periodo_cotizacion(page, delay_entre_pasos_s=delay_entre_pasos_s)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     abrir_panel_calendario_periodo(p_sup)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     mes, anio = _mes_y_anio_periodo_cotizacion_suaporte()
     id_mes, id_anio = _resolver_ids_select_periodo(p_sup)
     seleccionar_mes_anio(p_sup, id_mes=id_mes, id_anio=id_anio, mes=mes, anio=anio)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     clic_aceptar_periodo_restringido(p_sup)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     logger.info("Periodo de cotizacion: Marzo/%s (America/Bogota) tras calendario y Aceptar periodo.", anio)
     clic_consultar(p_sup)
     _esperar_cargando_suave(as_page(p_sup))
-    _pausa(max(delay_entre_pasos_s, 0.22))
+    pausa(max(delay_entre_pasos_s, 0.22))
     try:
         as_page(p_sup).wait_for_load_state("load", timeout=45000)
     except PlaywrightTimeoutError:
@@ -271,18 +242,18 @@ def _clic_borrar_si_visible(page: Page, delay_entre_pasos_s: float) -> bool:
         logger.debug("Borrar: no visible o no encontrado: %s", e)
         return False
 
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
     try:
         btn.scroll_into_view_if_needed(timeout=15000)
     except Exception as e:
         logger.debug("Borrar scrollIntoView: %s", e)
-    _pausa(delay_entre_pasos_s)
+    pausa(delay_entre_pasos_s)
 
     for force in (False, True):
         try:
             btn.click(timeout=20000, force=force, delay=30)
             logger.info("Clic en Borrar (bot_borrar.jpg).")
-            _pausa(delay_entre_pasos_s)
+            pausa(delay_entre_pasos_s)
             return True
         except Exception as e:
             logger.debug("Borrar click force=%s: %s", force, e)
@@ -299,6 +270,7 @@ def ejecutar_consulta(
     slow_mo_ms: int = 0,
     delay_entre_pasos_s: float = 0.0,
     delay_teclas_ms: int = 0,
+    pool: PoolNavegadores | None = None,
 ) -> dict[str, str]:
     url = url_inicio or DEFAULT_URL
     salida_pdf = output_dir or DEFAULT_SALIDA_PDF_DIR
@@ -307,50 +279,49 @@ def ejecutar_consulta(
             "Ritmo pausado: slow_mo_ms=%s delay_entre_pasos_s=%s delay_teclas_ms=%s",
             slow_mo_ms, delay_entre_pasos_s, delay_teclas_ms,
         )
-    with sync_playwright() as pw:
-        if slow_mo_ms > 0:
-            browser = pw.chromium.launch(headless=headless, slow_mo=slow_mo_ms)
-        else:
-            browser = pw.chromium.launch(headless=headless)
-        context = browser.new_context(
-            viewport={"width": 1366, "height": 900},
-            locale="es-CO",
-            timezone_id="America/Bogota",
-            accept_downloads=True,
-        )
+    with abrir_contexto(
+        pool,
+        headless=headless,
+        perfil="suaporte",
+        slow_mo=max(0, slow_mo_ms),
+        viewport={"width": 1366, "height": 900},
+        locale="es-CO",
+        timezone_id="America/Bogota",
+        accept_downloads=True,
+    ) as context:
         page = context.new_page()
         page.set_default_timeout(120000)
 
         try:
             logger.info("%s — abriendo pagina principal de consulta directa...", NOMBRE_BOT)
             page.goto(url, wait_until="load", timeout=120000)
-            _pausa(delay_entre_pasos_s)
+            pausa(delay_entre_pasos_s)
 
             campo = _localizar_input_documento(page)
             campo.scroll_into_view_if_needed()
-            _pausa(delay_entre_pasos_s)
+            pausa(delay_entre_pasos_s)
             campo.click()
-            _pausa(delay_entre_pasos_s)
+            pausa(delay_entre_pasos_s)
 
             if delay_teclas_ms > 0:
                 campo.press_sequentially(numero_documento, delay=delay_teclas_ms)
             else:
                 campo.fill(numero_documento)
-            _pausa(delay_entre_pasos_s)
+            pausa(delay_entre_pasos_s)
 
             boton = page.locator(SELECTOR_IMG_CONSULTAR).first
             boton.scroll_into_view_if_needed()
-            _pausa(delay_entre_pasos_s)
+            pausa(delay_entre_pasos_s)
             boton.click()
 
-            _pausa(max(delay_entre_pasos_s, 0.28))
+            pausa(max(delay_entre_pasos_s, 0.28))
             if _esperar_mensaje_sin_pagos(page):
                 logger.info(
                     "Aviso del portal: sin pagos en los ultimos 6 meses; "
                     "navegando de nuevo a la pagina principal de consulta."
                 )
                 page.goto(url, wait_until="load", timeout=120000)
-                _pausa(delay_entre_pasos_s)
+                pausa(delay_entre_pasos_s)
                 resultado = {
                     "estado": "SIN_PAGOS_6_MESES",
                     "motivo": (
@@ -412,6 +383,3 @@ def ejecutar_consulta(
                 "url_final": page.url,
                 "archivo_pdf": "",
             }
-        finally:
-            context.close()
-            browser.close()
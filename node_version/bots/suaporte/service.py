@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
+from common.browser_pool import PoolNavegadores
 from common.logging_config import configurar_logging, silenciar_logs_ruidosos
 from common.storage import registrar_consulta
 from . import bot
@@ -19,6 +20,7 @@ def run_suaporte_bot(
     delay_entre_pasos_s: float = 0.0,
     delay_teclas_ms: int = 0,
     verbose: bool = False,
+    pool: PoolNavegadores | None = None,
 ) -> dict[str, str]:
     base_dir = Path(__file__).resolve().parent
     csv_path = registro_csv or (base_dir / "suaporte_consultas.csv")
@@ -35,6 +37,7 @@ def run_suaporte_bot(
         slow_mo_ms=slow_mo_ms,
         delay_entre_pasos_s=delay_entre_pasos_s,
         delay_teclas_ms=delay_teclas_ms,
+        pool=pool,
     )
     registrar_consulta(
         tabla_db="suaporte_consultas",